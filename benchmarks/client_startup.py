@@ -0,0 +1,151 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Startup time of the drbdmanage command line client
+
+Measures, in fresh interpreters, how long importing drbdmanage_client and
+setting up the client for a command line takes, and reports the import time
+of each module like "python -X importtime" does on newer Python versions.
+No command is sent to the server.
+
+    python2 benchmarks/client_startup.py [-n RUNS] [--imports] [--check] [ARGS...]
+
+ARGS is the client command line to set up (default: ping). With --check,
+the exit code is nonzero if setting up the command line loads any of the
+SERVER_MODULES.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import argparse
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that the client must not load for commands that do not need them
+SERVER_MODULES = [
+    "drbdmanage.server",
+    "drbdmanage.dbusserver",
+    "drbdmanage.drbd.drbdcore",
+    "drbdmanage.drbd.persistence",
+    "drbdmanage.argcomplete",
+    "gobject",
+]
+
+# Runs in a fresh interpreter; wraps __import__ to record the cumulative
+# and the self time of every module import
+PROBE = r"""
+import sys, time, json, __builtin__
+
+records = []
+stack = []
+orig_import = __builtin__.__import__
+
+def timed_import(name, *args, **kwargs):
+    known = name in sys.modules
+    if known:
+        return orig_import(name, *args, **kwargs)
+    stack.append(0.0)
+    start = time.time()
+    try:
+        return orig_import(name, *args, **kwargs)
+    finally:
+        elapsed = time.time() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        if name in sys.modules:
+            records.append((name, elapsed - nested, elapsed, len(stack)))
+
+__builtin__.__import__ = timed_import
+start = time.time()
+import drbdmanage_client
+import_time = time.time() - start
+__builtin__.__import__ = orig_import
+
+sys.argv = ["drbdmanage"] + json.loads(sys.argv[1])
+start = time.time()
+client = drbdmanage_client.DrbdManage()
+setup_time = time.time() - start
+
+json.dump({
+    "import": import_time,
+    "setup": setup_time,
+    "modules": sorted(sys.modules.keys()),
+    "records": records,
+}, sys.stdout)
+"""
+
+
+def run_probe(cmd_args):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [REPO_PATH] + [path for path in env.get("PYTHONPATH", "").split(os.pathsep) if path]
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-c", PROBE, json.dumps(cmd_args)],
+        cwd=REPO_PATH, env=env, stdout=subprocess.PIPE, stderr=open(os.devnull, "w")
+    )
+    out = proc.communicate()[0]
+    if proc.returncode != 0:
+        raise RuntimeError("client startup probe failed (exit code %d)" % (proc.returncode))
+    return json.loads(out)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="drbdmanage client startup benchmark")
+    parser.add_argument("-n", "--runs", type=int, default=10)
+    parser.add_argument("--imports", action="store_true",
+                        help="print the import time of each module")
+    parser.add_argument("--check", action="store_true",
+                        help="fail if server-only modules are loaded")
+    parser.add_argument("args", nargs="*", default=["ping"],
+                        help="client command line (default: ping)")
+    args = parser.parse_args()
+
+    results = [run_probe(args.args) for _ in range(args.runs)]
+    last = results[-1]
+
+    if args.imports:
+        sys.stdout.write("%10s | %10s | module\n" % ("self [us]", "cumul [us]"))
+        for name, self_time, cumul_time, depth in last["records"]:
+            sys.stdout.write("%10d | %10d | %s%s\n"
+                             % (self_time * 1e6, cumul_time * 1e6, "  " * depth, name))
+        sys.stdout.write("\n")
+
+    loaded = [name for name in SERVER_MODULES if name in last["modules"]]
+    sys.stdout.write("command line:  drbdmanage %s\n" % (" ".join(args.args)))
+    sys.stdout.write("runs:          %d\n" % (args.runs))
+    sys.stdout.write("import:        %.1f ms\n" % (median([res["import"] for res in results]) * 1000))
+    sys.stdout.write("setup:         %.1f ms\n" % (median([res["setup"] for res in results]) * 1000))
+    sys.stdout.write("modules:       %d\n" % (len(last["modules"])))
+    sys.stdout.write("server-only:   %s\n" % (", ".join(loaded) if loaded else "none"))
+
+    return 1 if args.check and loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Rendering time of drbdadm resource configuration files
+
+Builds a resource that is assigned to a number of nodes and writes the
+configuration file of each assignment like the server does before it runs
+drbdadm. "cold" runs clear DrbdAdmConf's fragment cache before every run,
+"warm" runs reuse the cached fragments.
+
+    python2 benchmarks/conffile_render.py [--peers PEERS] [--volumes VOLUMES]
+                                          [--runs RUNS]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import drbdmanage.drbd.drbdcore as drbdcore
+
+from StringIO import StringIO
+
+from drbdmanage.conf.conffile import DrbdAdmConf
+from drbdmanage.propscontainer import PropsContainer
+from drbdmanage.storage.storagecore import MinorNr
+
+SETUPOPT_NS = PropsContainer.NAMESPACES[PropsContainer.KEY_SETUPOPT]
+
+# Number of diskless clients among the peers
+CLIENTS = 2
+
+
+def get_serial():
+    return 1
+
+
+def build_resource(nodes, volumes):
+    """
+    Builds a resource with the given number of volumes that is deployed
+    on the given number of nodes
+
+    @return: tuple (objects root, list of assignments)
+    """
+    objects_root = {"common": drbdcore.DrbdCommon(get_serial, None, None)}
+    resource = drbdcore.DrbdResource(
+        "res0", 7000, "secret", 0, None, get_serial, None, None
+    )
+    props = resource.get_props()
+    props.set_prop("on-io-error", "detach", SETUPOPT_NS + "disko")
+    props.set_prop("quorum", "majority", SETUPOPT_NS + "reso")
+    for vol_id in range(volumes):
+        volume = drbdcore.DrbdVolume(
+            vol_id, 1024 * (vol_id + 1), MinorNr(100 + vol_id), 0,
+            get_serial, None, None
+        )
+        volume.get_props().set_prop("resync-rate", "10M", SETUPOPT_NS + "disko")
+        resource.add_volume(volume)
+
+    assignments = []
+    for node_id in range(nodes):
+        node = drbdcore.DrbdNode(
+            "node%.2d" % (node_id), "10.0.0.%d" % (node_id + 1), 4, node_id,
+            0, 0, 0, get_serial, None, None
+        )
+        diskless = node_id >= nodes - CLIENTS
+        tstate = drbdcore.Assignment.FLAG_DEPLOY
+        if diskless:
+            tstate |= drbdcore.Assignment.FLAG_DISKLESS
+        assignment = drbdcore.Assignment(
+            node, resource, node_id, 0, tstate, 0, None, get_serial, None, None
+        )
+        for vol_state in assignment.iterate_volume_states():
+            vol_state.set_tstate(drbdcore.DrbdVolumeState.FLAG_DEPLOY)
+            if not diskless:
+                bd_name = "res0_%.2d" % (vol_state.get_id())
+                vol_state.set_bd(bd_name, "/dev/drbdpool/" + bd_name)
+        node.add_assignment(assignment)
+        resource.add_assignment(assignment)
+        assignments.append(assignment)
+    return objects_root, assignments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="drbdmanage configuration file rendering benchmark")
+    parser.add_argument("--peers", type=int, default=32)
+    parser.add_argument("--volumes", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    objects_root, assignments = build_resource(args.peers + 1, args.volumes)
+    conf = DrbdAdmConf(objects_root)
+    size = 0
+    sys.stdout.write("configuration files: %d\n" % (len(assignments)))
+    sys.stdout.write("volumes:             %d\n" % (args.volumes))
+    sys.stdout.write("runs:                %d\n" % (args.runs))
+    for label in ["cold", "warm"]:
+        times = []
+        for _ in range(args.runs):
+            if label == "cold":
+                DrbdAdmConf.fragment_cache.clear()
+            start = time.time()
+            for assignment in assignments:
+                stream = StringIO()
+                conf.write(stream, assignment, False)
+                size = len(stream.getvalue())
+            times.append(time.time() - start)
+        sys.stdout.write("%s:%s%.1f ms\n" % (label, " " * (20 - len(label)), min(times) * 1000))
+    sys.stdout.write("file size:           %d bytes\n" % (size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
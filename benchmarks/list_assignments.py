@@ -0,0 +1,150 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Server side cost of the assignments list with and without property projection
+
+Builds a configuration of nodes, resources, volumes and assignments and
+generates the list entries like DrbdManageServer.list_assignments() does,
+once with all properties (empty req_props) and once with only the
+properties that "drbdmanage list-assignments" displays. Reports the time
+for generating the entries and the size of the entries as JSON, which
+approximates the size of the D-Bus reply.
+
+Also reports the time for selecting the assignments that match a filter on
+an auxiliary property, once by checking every assignment and once by
+looking them up in a property index (see the server's props-index setting).
+
+    python2 benchmarks/list_assignments.py [-n NODES] [-r RESOURCES]
+                                           [--replicas N] [--volumes N]
+                                           [--props N] [--runs RUNS]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drbdmanage.drbd.drbdcore import DrbdNode, DrbdResource, DrbdVolume, Assignment
+from drbdmanage.drbd.views import AssignmentView, DrbdVolumeStateView
+from drbdmanage.propscontainer import PropsIndex
+from drbdmanage.storage.storagecore import MinorNr
+from drbdmanage.utils import props_filter
+
+# Number of different values of the filtered auxiliary property
+TENANTS = 50
+
+
+def get_serial():
+    return 1
+
+
+def build_config(node_count, res_count, replicas, volumes, props):
+    nodes = [
+        DrbdNode("node%03d" % (idx), "10.0.%d.%d" % (idx // 250, idx % 250 + 1), 4,
+                 idx, DrbdNode.FLAG_STORAGE, 1 << 30, 1 << 29, get_serial, None, None)
+        for idx in range(node_count)
+    ]
+    assignments = []
+    minor = 100
+    for res_idx in range(res_count):
+        res = DrbdResource("res%05d" % (res_idx), 7000 + res_idx, "secret", 0, None,
+                           get_serial, None, None)
+        for vol_id in range(volumes):
+            res.add_volume(DrbdVolume(vol_id, 1 << 20, MinorNr(minor), 0,
+                                      get_serial, None, None))
+            minor += 1
+        for replica in range(replicas):
+            node = nodes[(res_idx + replica) % node_count]
+            assg = Assignment(node, res, replica, 0, Assignment.FLAG_DEPLOY, 0, None,
+                              get_serial, None, None)
+            for obj in [assg] + list(assg.iterate_volume_states()):
+                obj_props = obj.get_props()
+                for prop_idx in range(props):
+                    obj_props.set_prop("option-%02d" % (prop_idx), str(prop_idx), "/setupopt/net/")
+            assg.get_props().set_prop("aux:tenant", "tenant%02d" % (len(assignments) % TENANTS))
+            node.add_assignment(assg)
+            res.add_assignment(assg)
+            assignments.append(assg)
+    return assignments
+
+
+def list_entries(assignments, req_props):
+    # see DrbdManageServer._assignment_entry()
+    assg_list = []
+    for assg in assignments:
+        vol_state_list = []
+        for vol_state in assg.iterate_volume_states():
+            vol_state_list.append([vol_state.get_id(), vol_state.get_properties(req_props)])
+        assg_list.append([
+            assg.get_node().get_name(), assg.get_resource().get_name(),
+            assg.get_properties(req_props), vol_state_list
+        ])
+    return assg_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description="drbdmanage list_assignments projection benchmark")
+    parser.add_argument("-n", "--nodes", type=int, default=32)
+    parser.add_argument("-r", "--resources", type=int, default=5000)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--volumes", type=int, default=2)
+    parser.add_argument("--props", type=int, default=10,
+                        help="number of additional properties per assignment and volume state")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    assignments = build_config(args.nodes, args.resources, args.replicas,
+                               args.volumes, args.props)
+    # The properties requested by "drbdmanage list-assignments"
+    projection = AssignmentView.REQ_PROPS + DrbdVolumeStateView.REQ_PROPS
+
+    sys.stdout.write("assignments:   %d\n" % (len(assignments)))
+    sys.stdout.write("runs:          %d\n" % (args.runs))
+    for label, req_props in [("all", []), ("projected", projection)]:
+        times = []
+        for _ in range(args.runs):
+            start = time.time()
+            entries = list_entries(assignments, req_props)
+            times.append(time.time() - start)
+        size = len(json.dumps(entries))
+        sys.stdout.write("%-14s %.1f ms, %d bytes\n" % (label + ":", min(times) * 1000, size))
+
+    filter_props = {"aux:tenant": "tenant07"}
+    props_index = PropsIndex(filter_props.keys(), lambda: assignments)
+    props_index.lookup(0, filter_props)
+    for label, select_fn in [
+        ("filter scan", lambda: list(props_filter(assignments, filter_props))),
+        ("filter index", lambda: list(props_index.lookup(0, filter_props)))
+    ]:
+        times = []
+        for _ in range(args.runs):
+            start = time.time()
+            selected = select_fn()
+            times.append(time.time() - start)
+        sys.stdout.write("%-14s %.2f ms, %d assignments\n"
+                         % (label + ":", min(times) * 1000, len(selected)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Rendering time of large client listings
+
+Fills a utils.Table like "drbdmanage list-assignments" does, with one row
+per assignment and volume, and measures how long adding the rows and
+rendering the table take. The output is discarded.
+
+    python2 benchmarks/table_render.py [-n ROWS] [--runs RUNS] [--pastable]
+                                       [--separators] [--no-groupby]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drbdmanage.utils import Table, COLOR_TEAL, COLOR_DARKGREEN, COLOR_DARKPINK, COLOR_RED
+
+
+class NullOutput(object):
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+    def flush(self):
+        pass
+
+
+def fill_table(rows, pastable):
+    random.seed(rows)
+    nodes = ["node%02d" % (idx) for idx in range(32)]
+    table = Table(colors=not pastable, pastable=pastable)
+    table.add_column("Node", color=COLOR_TEAL)
+    table.add_column("Resource", color=COLOR_DARKGREEN)
+    table.add_column("Vol_ID", color=COLOR_DARKPINK, just_txt='>')
+    table.add_column("Blockdevice")
+    table.add_column("Node_ID", just_txt='>')
+    table.add_column("State", color=COLOR_DARKGREEN, just_txt='>', just_col='>')
+    table.set_view(["Node", "Resource", "Vol_ID", "State"])
+
+    for idx in xrange(rows):
+        node_idx = random.randint(0, len(nodes) - 1)
+        vol_id = idx % 3
+        state = "ok"
+        if idx % 97 == 0:
+            state = (COLOR_RED, "pending actions: commission")
+        table.add_row([
+            nodes[node_idx], "res%05d" % (idx // 3), vol_id if vol_id else "*",
+            "/dev/drbd%d" % (1000 + idx) if vol_id else "*", str(node_idx), state
+        ])
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="drbdmanage table rendering benchmark")
+    parser.add_argument("-n", "--rows", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--pastable", action="store_true")
+    parser.add_argument("--separators", action="store_true")
+    parser.add_argument("--no-groupby", action="store_true")
+    args = parser.parse_args()
+
+    fill_times = []
+    show_times = []
+    output = None
+    for _ in range(args.runs):
+        start = time.time()
+        table = fill_table(args.rows, args.pastable)
+        fill_times.append(time.time() - start)
+        if not args.no_groupby:
+            table.set_groupby(["Node", "Resource"])
+        table.set_show_separators(args.separators)
+        table.maxwidth = 110
+
+        output = NullOutput()
+        stdout = sys.stdout
+        sys.stdout = output
+        try:
+            start = time.time()
+            table.show()
+            show_times.append(time.time() - start)
+        finally:
+            sys.stdout = stdout
+
+    sys.stdout.write("rows:          %d\n" % (args.rows))
+    sys.stdout.write("runs:          %d\n" % (args.runs))
+    sys.stdout.write("add_row:       %.1f ms\n" % (min(fill_times) * 1000))
+    sys.stdout.write("show:          %.1f ms\n" % (min(show_times) * 1000))
+    sys.stdout.write("output:        %d bytes\n" % (output.size))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
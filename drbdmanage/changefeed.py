@@ -0,0 +1,161 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import logging
+import drbdmanage.consts as consts
+
+
+# Object key prefixes
+KEY_COMMON     = "common"
+KEY_NODE       = "node:"
+KEY_RESOURCE   = "resource:"
+KEY_VOLUME     = "volume:"
+KEY_ASSIGNMENT = "assignment:"
+KEY_SNAPSHOT   = "snapshot:"
+KEY_SNAPS_ASSG = "snapshot-assignment:"
+
+
+def iterate_objects(server):
+    """
+    Generates the keys of all configuration objects
+
+    Volume states are reported with the assignment they belong to, snapshot
+    volume states with their snapshot assignment.
+
+    @return: iterator over tuples(object key, tuple of objects)
+    """
+    common = server.get_common()
+    if common is not None:
+        yield KEY_COMMON, (common,)
+    for node in server.iterate_nodes():
+        yield KEY_NODE + node.get_name(), (node,)
+    for resource in server.iterate_resources():
+        res_name = resource.get_name()
+        yield KEY_RESOURCE + res_name, (resource,)
+        for volume in resource.iterate_volumes():
+            yield KEY_VOLUME + res_name + "/" + str(volume.get_id()), (volume,)
+        for assg in resource.iterate_assignments():
+            yield (
+                KEY_ASSIGNMENT + assg.get_node().get_name() + "/" + res_name,
+                (assg,) + tuple(assg.iterate_volume_states())
+            )
+        for snaps in resource.iterate_snapshots():
+            snaps_name = snaps.get_name()
+            yield KEY_SNAPSHOT + res_name + "/" + snaps_name, (snaps,)
+            for snaps_assg in snaps.iterate_snaps_assgs():
+                yield (
+                    KEY_SNAPS_ASSG + snaps_assg.get_assignment().get_node().get_name() +
+                    "/" + res_name + "/" + snaps_name,
+                    (snaps_assg,) + tuple(snaps_assg.iterate_snaps_vol_states())
+                )
+
+
+class ChangeFeed(object):
+
+    """
+    Cluster-wide change notifications
+
+    After each change of the configuration, the feed sends one signal with
+    the current serial number of the cluster configuration and the keys of
+    all objects that were created, changed or removed since the last signal.
+    Clients that receive the signal can query the changed objects by passing
+    the previous serial number to the server's list_* functions.
+    """
+
+    _server  = None
+    _signal  = None
+    # Serial number at the time of the last signal
+    _serial  = None
+    # Object key -> tuple(objects, revisions) at the time of the last signal
+    _objects = None
+
+    def __init__(self, server, signal):
+        self._server  = server
+        self._signal  = signal
+        self._serial  = server.peek_serial()
+        self._objects = self._snapshot()
+
+    def _snapshot(self):
+        return dict([
+            (key, (objects, tuple([obj.get_props().get_revision() for obj in objects])))
+            for key, objects in iterate_objects(self._server)
+        ])
+
+    def collect(self):
+        """
+        Determines the changes since the last call
+
+        Objects that are still the same instances are compared by their
+        revision. Objects that were loaded anew from the control volume
+        count as changed if their serial number is greater than the serial
+        number of the last signal.
+
+        @return: tuple(serial number, sorted list of object keys)
+        """
+        serial = self._server.peek_serial()
+        current = self._snapshot()
+        changed = []
+        for key, (objects, revisions) in current.iteritems():
+            prev = self._objects.get(key)
+            if prev is None:
+                changed.append(key)
+            elif prev[0] == objects:
+                if prev[1] != revisions:
+                    changed.append(key)
+            else:
+                for obj in objects:
+                    obj_serial = obj.get_props().get_int_or_default(consts.SERIAL, None)
+                    if obj_serial is None or obj_serial > self._serial:
+                        changed.append(key)
+                        break
+        changed.extend([key for key in self._objects.iterkeys() if key not in current])
+        changed.sort()
+        self._serial  = serial
+        self._objects = current
+        return serial, changed
+
+    def publish(self):
+        """
+        Sends a signal for the changes since the last signal, if any
+        """
+        try:
+            serial, changed = self.collect()
+            if len(changed) > 0 and self._signal is not None:
+                self._signal.notify_changes(serial, changed)
+        except Exception as exc:
+            logging.warning("ChangeFeed: cannot send change notification: %s" % str(exc))
+
+
+def key_resource(key):
+    """
+    Returns the name of the resource an object key refers to
+
+    @return: resource name, or None for keys of nodes and of the common object
+    """
+    res_name = None
+    if ":" in key:
+        key_type, path = key.split(":", 1)
+        key_type += ":"
+        items = path.split("/")
+        if key_type in [KEY_RESOURCE, KEY_VOLUME, KEY_SNAPSHOT]:
+            res_name = items[0]
+        elif key_type in [KEY_ASSIGNMENT, KEY_SNAPS_ASSG] and len(items) >= 2:
+            res_name = items[1]
+    return res_name
@@ -74,41 +74,59 @@ class DrbdManageClientHelper(object):
         delay_for(seconds)
 
     # methods you probably should _not_ overwrite
-    def dbus_connect(self, retries_max=15):
+    def dbus_connect(self):
         self.odm = dbus.SystemBus().get_object(dm_const.DBUS_DRBDMANAGED,
                                                dm_const.DBUS_SERVICE)
         self.odm.ping()
 
-        tries = 0
-        while tries < retries_max:
-            server_rc = self.odm.wait_for_startup()
-            chk = dm_utils.mangle_server_rc(server_rc)
-            if not dm_utils.is_rc_retry(chk):
-                break
-            tries += 1
-            time.sleep(2)
+        self._call_until_ready(self.odm.wait_for_startup)
         # no consequences needed here, the next call to call_or_reconnect handles the answer
 
     def call_or_reconnect(self, fn, *args):
         """Call DBUS function; on a disconnect try once to reconnect."""
         try:
-            retries_max = 15
-            tries = 0
-            server_rc = None
-            while tries < retries_max:
-                server_rc = fn(*args)
-                chk = dm_utils.mangle_server_rc(server_rc)
-                if not dm_utils.is_rc_retry(chk):
-                    break
-                tries += 1
-                time.sleep(2)
-            return server_rc
+            return self._call_until_ready(fn, *args)
         except dbus.DBusException as e:
             self.logger.warning(self._LW('Got disconnected; trying to reconnect. (%s)') % e)
             self.dbus_connect()
             # Old function object is invalid, get new one.
             return getattr(self.odm, fn._method_name)(*args)
 
+    def _call_until_ready(self, fn, *args):
+        """Call DBUS function, retrying while the server is not ready.
+
+        Retries end after RETRY_TIMEOUT seconds. During the server's
+        startup, the server is waited for once instead of polling it
+        (see DrbdManageServer.wait_ready()).
+        """
+        deadline = time.time() + dm_utils.RETRY_TIMEOUT
+        tries = 0
+        wait_ready = True
+        while True:
+            server_rc = fn(*args)
+            chk = dm_utils.mangle_server_rc(server_rc)
+            if not dm_utils.is_rc_retry(chk):
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            startup = len([rc for rc in chk if rc[0] == dm_exc.DM_ENOTREADY_STARTUP]) > 0
+            if not (wait_ready and startup and self._wait_server_ready(remaining)):
+                self.sleep(min(dm_utils.retry_delay(tries, dm_utils.get_retry_hint(chk)),
+                               remaining))
+            wait_ready = wait_ready and not startup
+            tries += 1
+        return server_rc
+
+    def _wait_server_ready(self, timeout):
+        """Returns False if the server does not support waiting."""
+        try:
+            # the D-Bus call's timeout must be longer than the server's
+            self.odm.wait_ready(dbus.Double(timeout), timeout=timeout + 5)
+            return True
+        except dbus.DBusException:
+            return False
+
     def _fetch_answer_data(self, res, key, level=None, req=True):
         for code, fmt, data in res:
             if code == dm_exc.DM_INFO:
@@ -170,6 +188,20 @@ class DrbdManageClientHelper(object):
         pol_inp_data.update(pol_this,
                             starttime=str(time.time()))
 
+        # Let the server answer once the policy is decided; servers that
+        # do not support this yet are polled instead
+        try:
+            reply_timeout = float(pol_inp_data.get('timeout', 300)) + 30
+            res, pol_result = self.odm.wait_for_plugin(plugin, pol_inp_data,
+                                                       timeout=reply_timeout)
+            if not dm_utils.is_rc_retry(res):
+                self._check_result(res)
+                return pol_result['result'] == dm_const.BOOL_TRUE
+        except dbus.DBusException as e:
+            if e.get_dbus_name() != 'org.freedesktop.DBus.Error.UnknownMethod':
+                self.logger.warning(self._LW('Waiting for the policy failed; '
+                                             'polling instead. (%s)') % e)
+
         retry = 0
         while True:
             res, pol_result = self.call_or_reconnect(
@@ -20,6 +20,8 @@
 
 import logging
 import json
+import StringIO
+import weakref
 import drbdmanage.utils as dmutils
 
 import drbdmanage.consts as consts
@@ -40,9 +42,14 @@ class DrbdConnectionConf(object):
         self.target_node = target_node
 
         self._all_nodes = set(servers + clients)
+        self._clients = set(clients)
         self._meshes = []  # list of sets, every set is list of nodes, a set represents a mesh
         self._nodes_interesting = set()  # nodes we have a connection to (+ self)
 
+        self._sites = dict([(node, self._is_part_of_site(node)) for node in self._all_nodes])
+        self._net_opts = {}  # (site_a, site_b) -> net options
+        self._inst_node = self._get_server_instance()
+
         self._indentwidth = 3
 
     def _is_part_of_site(self, node):
@@ -51,53 +58,43 @@ class DrbdConnectionConf(object):
         return site_name
 
     def _is_diskless(self, node):
-        return node in self.clients
-
-    def _get_other_site_nodes(self, node, site_name):
-        others = []
-
-        for n in self._all_nodes:
-            other_site = self._is_part_of_site(n)
-            if other_site and other_site == site_name and n != node:
-                others.append(n)
-
-        return others
-
-    def _gen_mesh(self, base_node, others):
-        if self._is_diskless(base_node):
-            return
-
-        others = [o for o in others if not self._is_diskless(o)]
-
-        # existing mesh?
-        for m in self._meshes:
-            if base_node in m:
-                m.update(others)
-                return
-
-        # new mesh
-        s = set([base_node] + others)
-        if s:
-            self._meshes.append(s)
+        return node in self._clients
 
     def _gen_meshes(self):
+        # group the nodes by site, keeping the order of self._all_nodes
+        site_groups = {}
         for n in self._all_nodes:
-            n_site = self._is_part_of_site(n)
+            n_site = self._sites[n]
             if n_site:
-                others = self._get_other_site_nodes(n, n_site)
-                if others:
-                    self._gen_mesh(n, others)
+                site_groups.setdefault(n_site, []).append(n)
+
+        # the first diskful node of a site that has other nodes creates the
+        # mesh, which contains all diskful nodes of that site
+        meshed_sites = set()
+        for n in self._all_nodes:
+            n_site = self._sites[n]
+            if (n_site and n_site not in meshed_sites and
+                    len(site_groups[n_site]) > 1 and not self._is_diskless(n)):
+                others = [
+                    o for o in site_groups[n_site]
+                    if o is not n and not self._is_diskless(o)
+                ]
+                self._meshes.append(set([n] + others))
+                meshed_sites.add(n_site)
 
     def _get_net_opts(self, site_a, site_b):
+        netopts = self._net_opts.get((site_a, site_b))
+        if netopts is not None:
+            return netopts
+
         common = self.objects_root["common"]
         ns = PropsContainer.NAMESPACES[PropsContainer.KEY_SITES]
         # should be symmetric, but...
         netopts = common.get_props().get_all_props(ns + site_a + ':' + site_b + '/neto')
-        if netopts:
-            return netopts
-
-        # fallback
-        netopts = common.get_props().get_all_props(ns + site_b + ':' + site_a + '/neto')
+        if not netopts:
+            # fallback
+            netopts = common.get_props().get_all_props(ns + site_b + ':' + site_a + '/neto')
+        self._net_opts[(site_a, site_b)] = netopts
         return netopts
 
     def _get_server_instance(self):
@@ -119,10 +116,18 @@ class DrbdConnectionConf(object):
             pass  # returns None
         return None
 
+    def get_server_instance(self):
+        """
+        Returns the node that the configuration is generated for
+
+        @return: node object, or None, if the configuration is generated for all nodes
+        """
+        return self._inst_node
+
     def _gen_mesh_conf(self, mesh, have_same_site=False):
         site = None
         s = self.stream
-        inst_node = self._get_server_instance()
+        inst_node = self._inst_node
 
         if inst_node and inst_node not in mesh:
             return
@@ -130,7 +135,7 @@ class DrbdConnectionConf(object):
         self._nodes_interesting.update([n for n in mesh])
 
         if have_same_site:
-            site = self._is_part_of_site(list(mesh)[0])
+            site = self._sites[list(mesh)[0]]
         s.write(' ' * self._indentwidth + 'connection-mesh {\n')
         s.write(' ' * self._indentwidth * 2 + 'hosts ' + ' '.join([n.get_name() for n in mesh]) + ';\n')
 
@@ -145,7 +150,7 @@ class DrbdConnectionConf(object):
 
     def _gen_connection_conf(self, node_a, node_b, netopts=False):
         s = self.stream
-        inst_node = self._get_server_instance()
+        inst_node = self._inst_node
 
         if inst_node and inst_node not in [node_a, node_b]:
             return
@@ -163,8 +168,8 @@ class DrbdConnectionConf(object):
         s.write(' ' * self._indentwidth + '}\n')
 
     def _two_in_site_cfg(self, node_a, node_b):
-        site_a = self._is_part_of_site(node_a)
-        site_b = self._is_part_of_site(node_b)
+        site_a = self._sites.get(node_a)
+        site_b = self._sites.get(node_b)
         if not site_a or not site_b:
             return False
 
@@ -174,14 +179,43 @@ class DrbdConnectionConf(object):
 
         return False
 
+    def _has_site_cfg(self, node):
+        """
+        Indicates whether there are net options between the site of a node
+        and any site
+        """
+        site = self._sites.get(node)
+        if not site:
+            return False
+        for other_site in set(self._sites.itervalues()):
+            if other_site and self._get_net_opts(site, other_site):
+                return True
+        return False
+
     def _connect_between_meshes(self, mesh_list):
+        inst_node = self._inst_node
+        inst_idx = None
+        if inst_node:
+            for idx, mesh in enumerate(mesh_list):
+                if inst_node in mesh:
+                    inst_idx = idx
+                    break
+            if inst_idx is None:
+                # none of the connections would include the target node
+                return
+
         for idx, mesh in enumerate(mesh_list):
             meshes_right = mesh_list[idx+1:]
             for node in mesh:
-                for mesh_r in meshes_right:
-                    for node_mr in mesh_r:
-                        netopts = self._two_in_site_cfg(node, node_mr)
-                        self._gen_connection_conf(node, node_mr, netopts)
+                if not inst_node or node is inst_node:
+                    for mesh_r in meshes_right:
+                        for node_mr in mesh_r:
+                            netopts = self._two_in_site_cfg(node, node_mr)
+                            self._gen_connection_conf(node, node_mr, netopts)
+                elif inst_idx > idx:
+                    # only the connection to the target node is generated
+                    netopts = self._two_in_site_cfg(node, inst_node)
+                    self._gen_connection_conf(node, inst_node, netopts)
 
     def generate_conf(self):
         # check if it is a single node cluster
@@ -190,7 +224,7 @@ class DrbdConnectionConf(object):
             return self._all_nodes
         # or consists only of clients
         if len(self.servers) == 0:
-            self._all_nodes = [self._get_server_instance()]
+            self._all_nodes = [self._inst_node]
             self._gen_mesh_conf(self._all_nodes, False)
             return self._all_nodes
 
@@ -199,27 +233,26 @@ class DrbdConnectionConf(object):
         # these meshes contain at least 2 nodes.
         self._gen_meshes()
 
-        servers_without_mesh = self.servers[:]
+        in_real_mesh = set()
         for mesh in self._meshes:
             self._gen_mesh_conf(mesh, True)
-            for mesh_node in mesh:
-                servers_without_mesh.remove(mesh_node)
+            in_real_mesh.update(mesh)
+        servers_without_mesh = [node for node in self.servers if node not in in_real_mesh]
 
         # we can form a virtual mesh of config less nodes currently outside a mesh, that:
         # are not part of a site, or
         # are part of a site but we could not connect it to another node with special site settings
-        virtual_mesh = servers_without_mesh[:]
-
+        with_site_cfg = set()
         for idx, node in enumerate(servers_without_mesh):
+            if not self._has_site_cfg(node):
+                continue
             nodes_right = servers_without_mesh[idx+1:]
             for node_r in nodes_right:
                 netopts = self._two_in_site_cfg(node, node_r)
                 if netopts:  # we can set a specific config, therefore remove from virtual mesh
                     self._gen_connection_conf(node, node_r, netopts)
-                    if node_r in virtual_mesh:
-                        virtual_mesh.remove(node_r)
-                    if node in virtual_mesh:
-                        virtual_mesh.remove(node)
+                    with_site_cfg.update([node, node_r])
+        virtual_mesh = [node for node in servers_without_mesh if node not in with_site_cfg]
 
         # nodes in virtual mesh are now these that don't have any special settings in common with others
         # but it might be a single node!
@@ -236,7 +269,8 @@ class DrbdConnectionConf(object):
         # flatten mesh_list (now including virtual mesh)
         in_mesh = [node for mesh in mesh_list for node in mesh]
         # out are all nodes (servers and diskless clients not in real meshes or virtual meshes)
-        out_mesh = [node for node in self._all_nodes if node not in in_mesh]
+        in_mesh_set = set(in_mesh)
+        out_mesh = [node for node in self._all_nodes if node not in in_mesh_set]
 
         # interconnect outsiders with insiders
         self._connect_between_meshes(list((in_mesh, out_mesh)))
@@ -244,8 +278,133 @@ class DrbdConnectionConf(object):
         return self._nodes_interesting
 
 
+# Templates for the resource configuration files
+#
+# The resource file is assembled from fragments that are rendered from
+# these templates. Fragments that depend only on a few objects (option
+# sections, per-node 'on' sections, connection meshes) are cached by the
+# revisions of those objects, see ConfFragmentCache.
+RES_CONF_TEMPLATE = (
+    "%(header)s"
+    "resource %(name)s {\n"
+    "%(template_file)s"
+    "%(options)s"
+    "%(connections)s"
+    "%(hosts)s"
+    "}\n"
+)
+
+# write_excerpt() places the connections after the nodes
+RES_EXCERPT_TEMPLATE = (
+    "%(header)s"
+    "resource %(name)s {\n"
+    "%(template_file)s"
+    "%(options)s"
+    "%(hosts)s"
+    "%(connections)s"
+    "}\n"
+)
+
+RES_HEADER_TEMPLATE = (
+    "# This file was generated by drbdmanage(8), do not edit manually.\n"
+    "%(meta)s\n\n"
+)
+
+TEMPLATE_FILE_TEMPLATE = 'template-file "%(path)s";\n\n'
+
+HOST_TEMPLATE = (
+    "    on %(name)s {\n"
+    "        node-id %(node_id)s;\n"
+    "        address %(addrfam)s %(addr)s:%(port)d;\n"
+    "%(volumes)s"
+    "    }\n"
+)
+
+VOLUME_TEMPLATE = (
+    "        volume %(vol_id)d {\n"
+    "            device minor %(minor)d;\n"
+    "            disk %(bd_path)s;\n"
+    "%(disk)s"
+    "            meta-disk internal;\n"
+    "        }\n"
+)
+
+CONNECTION_MESH_TEMPLATE = (
+    "    connection-mesh {\n"
+    "        hosts %(hosts)s;\n"
+    "    }\n"
+)
+
+CONNECTION_TEMPLATE = (
+    "    connection {\n"
+    "        host %(host_a)s;\n"
+    "        host %(host_b)s;\n"
+    "    }\n"
+)
+
+
+def _revision(drbd_obj):
+    return drbd_obj.get_props().get_revision()
+
+
+class ConfFragmentCache(object):
+
+    """
+    Cache for rendered fragments of resource configuration files
+
+    Fragments are stored per drbdmanage object (the owner) and tag. Each
+    fragment is stored together with a key that is built from the revisions
+    of all objects the fragment was rendered from; a fragment is only
+    returned if the key still matches. Owners are referenced weakly, so
+    the cache does not keep objects alive that were removed or replaced by
+    reloading the configuration.
+    """
+
+    def __init__(self):
+        self._fragments = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, owner, tag, key):
+        """
+        Returns a cached fragment
+
+        @return: the fragment, or None if there is no fragment with a matching key
+        """
+        owner_fragments = self._fragments.get(owner)
+        if owner_fragments is not None:
+            entry = owner_fragments.get(tag)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, owner, tag, key, fragment):
+        """
+        Stores a fragment
+
+        @return: the fragment
+        """
+        owner_fragments = self._fragments.get(owner)
+        if owner_fragments is None:
+            owner_fragments = {}
+            self._fragments[owner] = owner_fragments
+        owner_fragments[tag] = (key, fragment)
+        return fragment
+
+    def clear(self):
+        self._fragments.clear()
+        self.hits = 0
+        self.misses = 0
+
+
 class DrbdAdmConf(object):
 
+    # Shared by all instances, because the server creates a new instance for
+    # every configuration file that it writes
+    fragment_cache = ConfFragmentCache()
+
     def __init__(self, objects_root, target_node=None):
         self.indentwidth = 3
         self.objects_root = objects_root
@@ -290,20 +449,32 @@ class DrbdAdmConf(object):
         ret += json.dumps(opts)
         return ret
 
-    def _write_section(self, section, curstream, opts, indentlevel=0):
+    def _render_section(self, section, opts, indentlevel=0):
         # opts are k, v pairs
-
+        text = ""
         if len(opts):
-            curstream.write("%s%s {\n" % (' ' * indentlevel * self.indentwidth,
-                                          section))
-
             spaces = ' ' * self.indentwidth * (indentlevel + 1)
-            for k, v in opts.iteritems():
-                curstream.write("%s %s %s;\n" % (spaces, k, v))
+            text = "%s%s {\n%s%s}\n" % (
+                ' ' * indentlevel * self.indentwidth, section,
+                "".join(["%s %s %s;\n" % (spaces, k, v) for k, v in opts.iteritems()]),
+                ' ' * indentlevel * self.indentwidth
+            )
+        return text
+
+    def _write_section(self, section, curstream, opts, indentlevel=0):
+        curstream.write(self._render_section(section, opts, indentlevel))
+
+    def write_global(self, globalstream):
+        """
+        Writes the common section shared by all resource configuration files
 
-            curstream.write("%s}\n" % (' ' * indentlevel * self.indentwidth))
+        The resource configuration files reference the global configuration
+        file by its path (see the global_conf_path argument of write() and
+        write_excerpt()), so it only needs to be written if the options of
+        the DrbdCommon object change.
 
-    def _write_global_stream(self, globalstream):
+        @return: True if the common section was written, False otherwise
+        """
         wrote_global = False
 
         if self.objects_root:
@@ -316,72 +487,188 @@ class DrbdAdmConf(object):
                 netopts = self._get_setup_props(common, "/neto/")
                 resopts = self._get_setup_props(common, "/reso/")
                 handlers = self._get_setup_props(common, "/handlers/")
-                if globalstream:
-                    globalstream.write('common {\n')
-                    if diskopts or netopts or resopts or handlers:
-                        if diskopts:
-                            self._write_section('disk', globalstream, diskopts, 1)
-                        if netopts:
-                            self._write_section('net', globalstream, netopts, 1)
-                        if resopts:
-                            self._write_section('options', globalstream, resopts, 1)
-                        if handlers:
-                            self._write_section('handlers', globalstream, handlers, 1)
-                    else:
-                        globalstream.write('# currently empty\n')
-                    globalstream.write('}\n')
-                    wrote_global = True
-                    globalstream.close()
+                globalstream.write('common {\n')
+                if diskopts or netopts or resopts or handlers:
+                    if diskopts:
+                        self._write_section('disk', globalstream, diskopts, 1)
+                    if netopts:
+                        self._write_section('net', globalstream, netopts, 1)
+                    if resopts:
+                        self._write_section('options', globalstream, resopts, 1)
+                    if handlers:
+                        self._write_section('handlers', globalstream, handlers, 1)
+                else:
+                    globalstream.write('# currently empty\n')
+                globalstream.write('}\n')
+                wrote_global = True
 
         return wrote_global
 
-# TODO: only have a single writer that returns a template and a dict of substitutions,
-# and use that in all the functions below.
-    def write(self, stream, assignment, undeployed_flag, globalstream=False):
-        try:
-            wrote_global = self._write_global_stream(globalstream)
-
-            # stream = open('/tmp/bla', 'w')
+    def _render_resource_options(self, resource, excerpt):
+        """
+        Renders the net, options, disk and handlers sections of a resource
 
-            resource = assignment.get_resource()
+        @return: configuration fragment
+        """
+        tag = "excerpt-options" if excerpt else "options"
+        key = _revision(resource)
+        fragment = self.fragment_cache.get(resource, tag, key)
+        if fragment is None:
             secret = resource.get_secret()
             if secret is None:
                 secret = ""
 
-            # begin resource
-            stream.write("# This file was generated by drbdmanage(8), do not edit manually.\n")
-            stream.write(self._get_meta_props(resource) + '\n\n')
-
-            stream.write("resource %s {\n" % (resource.get_name()))
-
-            if wrote_global:
-                stream.write('template-file "%s";\n\n' % (self._get_stream_final_path(globalstream)))
-
-            # begin resource/net-options
             netopts = self._get_setup_props(resource, "neto/")
             netopts['cram-hmac-alg'] = 'sha1'
             netopts['shared-secret'] = '"%s"' % (secret)
-            self._write_section('net', stream, netopts, 1)
-
             resopts = self._get_setup_props(resource, "/reso/")
-            self._write_section('options', stream, resopts, 1)
-
-            # begin resource/disk options
             diskopts = self._get_setup_props(resource, "/disko/")
-            peerdiskopts = self._get_setup_props(resource, "/peerdisko/")
-            for k, v in peerdiskopts.items():
-                diskopts[k] = v
-            self._write_section('disk', stream, diskopts, 1)
-            # end resource/disk options
-
-            # begin resource/handlers
-            handlers = self._get_setup_props(resource, "/handlers/")
-            self._write_section('handlers', stream, handlers, 1)
-            # end resource/disk options
-
-            # begin resource/connection
+            if not excerpt:
+                peerdiskopts = self._get_setup_props(resource, "/peerdisko/")
+                for k, v in peerdiskopts.items():
+                    diskopts[k] = v
+            parts = [
+                self._render_section('net', netopts, 1),
+                self._render_section('options', resopts, 1),
+                self._render_section('disk', diskopts, 1)
+            ]
+            if not excerpt:
+                handlers = self._get_setup_props(resource, "/handlers/")
+                parts.append(self._render_section('handlers', handlers, 1))
+            fragment = self.fragment_cache.put(resource, tag, key, "".join(parts))
+        return fragment
+
+    def _render_volume_disk(self, volume, excerpt):
+        """
+        Renders the disk section of a volume
+
+        The section is the same for all diskful nodes, so it is rendered only
+        once per change of the volume instead of once per node.
+
+        @return: configuration fragment
+        """
+        tag = "excerpt-disk" if excerpt else "disk"
+        key = _revision(volume)
+        fragment = self.fragment_cache.get(volume, tag, key)
+        if fragment is None:
+            diskopts = self._get_setup_props(volume, "/disko/")
+            if not excerpt:
+                peerdiskopts = self._get_setup_props(volume, "/peerdisko/")
+                for k, v in peerdiskopts.items():
+                    diskopts[k] = v
+            diskopts['size'] = str(volume.get_size_kiB()) + 'k'
+            fragment = self.fragment_cache.put(
+                volume, tag, key, self._render_section('disk', diskopts, 4)
+            )
+        return fragment
+
+    def _render_host(self, assignment, vol_states, is_local, excerpt):
+        """
+        Renders the 'on' section of a node, including its volumes
+
+        @param vol_states: the volume states to include
+        @param is_local: True if the node is the node the file is written for
+        @param excerpt: True if rendering for write_excerpt()
+        @return: configuration fragment
+        """
+        node = assignment.get_node()
+        resource = assignment.get_resource()
+        tag = "excerpt-host" if excerpt else "host"
+        key = (
+            is_local, _revision(node), _revision(assignment), _revision(resource),
+            tuple([
+                (_revision(vol_state), _revision(vol_state.get_volume()))
+                for vol_state in vol_states
+            ])
+        )
+        fragment = self.fragment_cache.get(assignment, tag, key)
+        if fragment is not None:
+            return fragment
+
+        diskless = is_set(assignment.get_tstate(), assignment.FLAG_DISKLESS)
+        volumes = []
+        for vol_state in vol_states:
+            volume = vol_state.get_volume()
+            minor = volume.get_minor()
+            if minor is None:
+                raise InvalidMinorNrException
+            bd_path = vol_state.get_bd_path()
+            if bd_path is None or (excerpt and diskless):
+                if (diskless and not excerpt) or is_local:
+                    # If the local node has no backend storage,
+                    # configure it as a DRBD client
+                    bd_path = "none"
+                else:
+                    # If a remote node has no backend storage (probably
+                    # because it is not deployed yet), pretend that there
+                    # is backend storage on that node. This should prevent
+                    # a situation where drbdadm refuses to adjust the
+                    # configuration because none of the nodes seems to have
+                    # some backend storage
+                    bd_path = "/dev/null"
+            volumes.append(VOLUME_TEMPLATE % {
+                "vol_id": volume.get_id(),
+                "minor": minor.get_value(),
+                "bd_path": bd_path,
+                "disk": "" if diskless else self._render_volume_disk(volume, excerpt)
+            })
+
+        fam_label = node.get_addrfam_label()
+        addr = node.get_addr()
+        if fam_label == consts.AF_IPV6_LABEL:
+            addr = '[%s]' % addr
+        fragment = HOST_TEMPLATE % {
+            "name": node.get_name(),
+            "node_id": assignment.get_node_id(),
+            "addrfam": fam_label,
+            "addr": addr,
+            "port": resource.get_port(),
+            "volumes": "".join(volumes)
+        }
+        return self.fragment_cache.put(assignment, tag, key, fragment)
+
+    def _render_connections(self, resource, servers, clients):
+        """
+        Renders the connection-mesh and connection sections of a resource
+
+        @return: tuple of the configuration fragment and the set of names of
+                 the nodes that the target node is connected to
+        """
+        conn_stream = StringIO.StringIO()
+        conn_conf = DrbdConnectionConf(servers, clients, self.objects_root, conn_stream, self.target_node)
+        inst_node = conn_conf.get_server_instance()
+        common = self.objects_root.get("common") if self.objects_root else None
+        key = (
+            inst_node.get_name() if inst_node is not None else None,
+            _revision(common) if common is not None else None,
+            tuple([(node.get_name(), _revision(node)) for node in servers]),
+            tuple([(node.get_name(), _revision(node)) for node in clients])
+        )
+        entry = self.fragment_cache.get(resource, "connections", key)
+        if entry is None:
+            nodes_interesting = conn_conf.generate_conf()
+            names_interesting = frozenset(
+                [node.get_name() for node in nodes_interesting if node is not None]
+            )
+            entry = self.fragment_cache.put(
+                resource, "connections", key, (conn_stream.getvalue(), names_interesting)
+            )
+        return entry
+
+    def _write_resource(self, stream, template, substitutions):
+        """
+        Writes a resource configuration rendered from a template
+        """
+        stream.write(template % substitutions)
+
+    def write(self, stream, assignment, undeployed_flag, global_conf_path=None):
+        try:
+            resource = assignment.get_resource()
+            local_node = assignment.get_node()
+
             servers = []
             clients = []
+            assignments = []
             for assg in resource.iterate_assignments():
                 tstate = assg.get_tstate()
                 if (is_set(tstate, assg.FLAG_DEPLOY) or undeployed_flag):
@@ -390,79 +677,33 @@ class DrbdAdmConf(object):
                         servers.append(node)
                     else:
                         clients.append(node)
+                    assignments.append(assg)
 
             # Generate connections configuration
-            conn_conf = DrbdConnectionConf(servers, clients, self.objects_root, stream, self.target_node)
-            nodes_interesting = conn_conf.generate_conf()
-
-            # begin resource/nodes
-            local_node = assignment.get_node()
-
-            for assg in resource.iterate_assignments():
-                diskless = is_set(assg.get_tstate(), assg.FLAG_DISKLESS)
-                if ((assg.get_tstate() & assg.FLAG_DEPLOY != 0) or undeployed_flag):
-                    node = assg.get_node()
-                    if node not in nodes_interesting:
-                        continue
-                    fam_label = node.get_addrfam_label()
-                    addr = node.get_addr()
-                    if fam_label == consts.AF_IPV6_LABEL:
-                        addr = '[%s]' % addr
-                    stream.write(
-                        "    on %s {\n"
-                        "        node-id %s;\n"
-                        "        address %s %s:%d;\n"
-                        % (node.get_name(), assg.get_node_id(),
-                           fam_label, addr, resource.get_port())
-                    )
-                    for vol_state in assg.iterate_volume_states():
-                        tstate = vol_state.get_tstate()
-                        if (tstate & vol_state.FLAG_DEPLOY) != 0:
-                            volume = vol_state.get_volume()
-                            minor = volume.get_minor()
-                            if minor is None:
-                                raise InvalidMinorNrException
-                            bd_path = vol_state.get_bd_path()
-                            if bd_path is None:
-                                if diskless or node is local_node:
-                                    # If the local node has no
-                                    # backend storage, configure it as
-                                    # a DRBD client
-                                    bd_path = "none"
-                                else:
-                                    # If a remote node has no
-                                    # backend storage (probably because it
-                                    # is not deployed yet), pretend that
-                                    # there is backend storage on that
-                                    # node. This should prevent a
-                                    # situation where drbdadm refuses to
-                                    # adjust the configuration because
-                                    # none of the nodes seems to have some
-                                    # backend storage
-                                    bd_path = "/dev/null"
-                            stream.write(
-                                "        volume %d {\n"
-                                "            device minor %d;\n"
-                                "            disk %s;\n"
-                                % (volume.get_id(), minor.get_value(),
-                                   bd_path)
-                            )
-                            if not diskless:
-                                diskopts = self._get_setup_props(volume, "/disko/")
-                                peerdiskopts = self._get_setup_props(volume, "/peerdisko/")
-                                for k, v in peerdiskopts.items():
-                                    diskopts[k] = v
-                                diskopts['size'] = str(volume.get_size_kiB()) + 'k'
-                                self._write_section('disk', stream, diskopts, 4)
-                                # end volume/disk options
-                            stream.write(
-                                "            meta-disk internal;\n"
-                                "        }\n"
-                            )
-                    stream.write("    }\n")
-            # end resource/nodes
-            stream.write("}\n")
-            # end resource
+            connections, names_interesting = self._render_connections(resource, servers, clients)
+
+            hosts = []
+            for assg in assignments:
+                node = assg.get_node()
+                if node.get_name() not in names_interesting:
+                    continue
+                vol_states = [
+                    vol_state for vol_state in assg.iterate_volume_states()
+                    if is_set(vol_state.get_tstate(), vol_state.FLAG_DEPLOY)
+                ]
+                hosts.append(self._render_host(assg, vol_states, node is local_node, False))
+
+            self._write_resource(stream, RES_CONF_TEMPLATE, {
+                "header": RES_HEADER_TEMPLATE % {"meta": self._get_meta_props(resource)},
+                "name": resource.get_name(),
+                "template_file": (
+                    TEMPLATE_FILE_TEMPLATE % {"path": global_conf_path}
+                    if global_conf_path is not None else ""
+                ),
+                "options": self._render_resource_options(resource, False),
+                "connections": connections,
+                "hosts": "".join(hosts)
+            })
         except InvalidMinorNrException:
             logging.critical("DrbdAdmConf: Volume configuration has no "
                              "MinorNr object")
@@ -471,7 +712,7 @@ class DrbdAdmConf(object):
                           "unhandled exception: %s" % str(exc))
 
 
-    def write_excerpt(self, stream, assignment, nodes, vol_states, globalstream=False):
+    def write_excerpt(self, stream, assignment, nodes, vol_states, global_conf_path=None):
         """
         Writes an excerpt of the configuration file to a stream.
         Used for adjusting resources to an intermediate state
@@ -486,132 +727,47 @@ class DrbdAdmConf(object):
         objects excluded from the configuration for that reason).
         """
         try:
-            wrote_global = self._write_global_stream(globalstream)
-
             resource = assignment.get_resource()
-            secret   = resource.get_secret()
-            if secret is None:
-                secret = ""
-
-            # begin resource
-            stream.write("resource %s {\n" % (resource.get_name()))
-
-            if wrote_global:
-                stream.write('template-file "%s";\n\n' % (self._get_stream_final_path(globalstream)))
-
-            # begin resource/net-options
-            netopts = self._get_setup_props(resource, "neto/")
-            netopts['cram-hmac-alg'] = 'sha1'
-            netopts['shared-secret'] = '"%s"' % (secret)
-            self._write_section('net', stream, netopts, 1)
-
-            resopts = self._get_setup_props(resource, "/reso/")
-            self._write_section('options', stream, resopts, 1)
-
-            # begin resource/disk options
-            diskopts = self._get_setup_props(resource, "/disko/")
-            self._write_section('disk', stream, diskopts, 1)
-            # end resource/disk options
-
-            # begin resource/nodes
             local_node = assignment.get_node()
+
             clients = []
             servers = []
+            hosts = []
             for node in nodes:
                 assg = node.get_assignment(resource.get_name())
                 if assg is not None:
-                    diskless = is_set(assg.get_tstate(), assg.FLAG_DISKLESS)
-                    if not diskless:
-                        servers.append(node)
+                    if is_unset(assg.get_tstate(), assg.FLAG_DISKLESS):
+                        servers.append(node.get_name())
                     else:
-                        clients.append(node)
-                    fam_label = node.get_addrfam_label()
-                    addr = node.get_addr()
-                    if fam_label == consts.AF_IPV6_LABEL:
-                        addr = '[%s]' % addr
-                    stream.write(
-                        "    on %s {\n"
-                        "        node-id %s;\n"
-                        "        address %s %s:%d;\n"
-                        % (node.get_name(), assg.get_node_id(),
-                           fam_label, addr, resource.get_port())
-                    )
-                    # begin resource/nodes/volumes
-                    node_vol_states = vol_states.get(node.get_name())
-                    for vol_state in node_vol_states:
-                        volume  = vol_state.get_volume()
-                        minor   = volume.get_minor()
-                        if minor is None:
-                            raise InvalidMinorNrException
-                        bd_path = vol_state.get_bd_path()
-                        if diskless or bd_path is None:
-                            if node is local_node:
-                                # If the local node has no backend storage,
-                                # configure it as a DRBD client
-                                bd_path = "none"
-                            else:
-                                # If a remote node has no backend storage
-                                # (probably because it is not deployed yet),
-                                # pretend that there is backend storage
-                                # on that node. This should prevent a
-                                # situation where drbdadm refuses to adjust
-                                # the configuration because none of the nodes
-                                # seems to have some backend storage
-                                bd_path = "/dev/null"
-
-                        stream.write(
-                            "        volume %d {\n"
-                            "            device minor %d;\n"
-                            "            disk %s;\n"
-                            % (volume.get_id(), minor.get_value(),
-                               bd_path)
-                        )
-                        if not diskless:
-                            diskopts = self._get_setup_props(volume, "/disko/")
-                            diskopts['size'] = str(volume.get_size_kiB()) + 'k'
-                            self._write_section('disk', stream, diskopts, 4)
-                        stream.write(
-                            "            meta-disk internal;\n"
-                            "        }\n"
-                        )
-                    # end resource/nodes/volumes
-                    stream.write("    }\n")
-            # end resource/nodes
+                        clients.append(node.get_name())
+                    hosts.append(self._render_host(
+                        assg, vol_states.get(node.get_name()), node is local_node, True
+                    ))
 
             # If any hosts are left in the configuration, generate the
             # connection mesh section
             if len(servers) > 0:
-                # begin resource/connection
-                stream.write(
-                    "    connection-mesh {\n"
-                    "        hosts"
-                )
-                for server_node in servers:
-                    stream.write(" %s" % (server_node.get_name()))
-                stream.write(";\n")
-                stream.write("    }\n")
-
+                connections = [CONNECTION_MESH_TEMPLATE % {"hosts": " ".join(servers)}]
                 # connect each client to every server, but not to other clients
-                for client_node in clients:
-                    client_name = client_node.get_name()
-                    for server_node in servers:
-                        stream.write(
-                            "    connection {\n"
-                            "        host %s;\n"
-                            "        host %s;\n"
-                            "    }\n"
-                            % (client_name, server_node.get_name())
-                        )
-                # end resource/connection
+                for client_name in clients:
+                    for server_name in servers:
+                        connections.append(CONNECTION_TEMPLATE % {
+                            "host_a": client_name, "host_b": server_name
+                        })
             else:
-                stream.write(
-                    "    connection-mesh {\n"
-                    "        hosts " + local_node.get_name() + ";\n"
-                    "    }\n"
-                )
-
-            stream.write("}\n")
-            # end resource
+                connections = [CONNECTION_MESH_TEMPLATE % {"hosts": local_node.get_name()}]
+
+            self._write_resource(stream, RES_EXCERPT_TEMPLATE, {
+                "header": "",
+                "name": resource.get_name(),
+                "template_file": (
+                    TEMPLATE_FILE_TEMPLATE % {"path": global_conf_path}
+                    if global_conf_path is not None else ""
+                ),
+                "options": self._render_resource_options(resource, True),
+                "connections": "".join(connections),
+                "hosts": "".join(hosts)
+            })
         except InvalidMinorNrException:
             logging.critical("DrbdAdmConf: Volume configuration has no "
                              "MinorNr object")
@@ -619,13 +775,6 @@ class DrbdAdmConf(object):
             logging.error("Cannot generate configuration file, "
                           "unhandled exception: %s" % str(exc))
 
-    def _get_stream_final_path(self, stream):
-        path = stream.name
-        if path.endswith(".tmp"):
-            path = path[:-4]
-        return path
-
-
     def read_drbdctrl_params(self, stream):
         # parameters that contain specific information
         # FIXME: these parameters should be read from the section of the
@@ -736,3 +885,29 @@ class DrbdAdmConf(object):
                 "    }\n"
             )
         stream.write("}\n")
+
+
+class ConfFileBuffer(StringIO.StringIO):
+
+    """
+    In-memory stream for rendering a DRBD configuration file
+
+    Keeps the path of the file it is rendered for in 'name', like a file
+    object, so that DrbdAdmConf can refer to the final file path. The
+    rendered data remains available through get_data() after close().
+    """
+
+    def __init__(self, path):
+        StringIO.StringIO.__init__(self)
+        self.name = path
+        self._data = None
+
+    def close(self):
+        if self._data is None:
+            self._data = self.getvalue()
+        StringIO.StringIO.close(self)
+
+    def get_data(self):
+        if self._data is not None:
+            return self._data
+        return self.getvalue()
@@ -29,6 +29,8 @@ except:
 
 DBUS_DRBDMANAGED = "org.drbd.drbdmanaged"
 DBUS_SERVICE     = "/interface"
+# Name of the signal object for cluster-wide change notifications
+DBUS_CHANGES     = "changes"
 
 DRBDADM_UTIL   = "drbdadm"
 DRBDMETA_UTIL  = "drbdmeta"
@@ -70,6 +72,10 @@ KEY_DRBD_KERNEL_GIT_HASH = "drbd_kernel_git_hash"
 KEY_DRBD_UTILS_VERSION   = "drbd_utils_version"
 KEY_DRBD_UTILS_GIT_HASH  = "drbd_utils_git_hash"
 
+# Arguments of the "not ready" return codes that tell clients when to retry
+RC_RETRY_AFTER = "retry-after"
+RC_QUEUE_POS   = "queue-position"
+
 # Shut down resources on drbdmanage server shutdown
 KEY_SHUTDOWN_RES = "shutdown-res"
 # Drbdadm down ctrlvol
@@ -142,6 +148,17 @@ KEY_UTF8 = "utf8"
 # auxiliary property prefix
 AUX_PROP_PREFIX     = "aux:"
 
+# resource startup priority (auxiliary property); resources with higher
+# values are started first when the server starts up
+KEY_STARTUP_PRIORITY = AUX_PROP_PREFIX + "startup-priority"
+
+# thin pool usage of a node's storage (node properties, set by storage
+# plugins that manage LVM thin pools); percentages are integers
+KEY_THIN_POOLS             = "thin-pools"
+KEY_THIN_DATA_PERCENT      = "thin-data-percent"
+KEY_THIN_DATA_MAX_PERCENT  = "thin-data-max-percent"
+KEY_THIN_META_MAX_PERCENT  = "thin-metadata-max-percent"
+
 # flags prefixes
 CSTATE_PREFIX       = "cstate:"
 TSTATE_PREFIX       = "tstate:"
@@ -457,6 +457,23 @@ class DBusServer(dbus.service.Object):
             node_names, serial, filter_props, req_props
         )
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asta{ss}assi",
+        out_signature="a(isa(ss))" "a(sa{ss})" "s",
+        message_keyword='message',
+    )
+    def list_nodes_page(self, node_names, serial, filter_props, req_props,
+                        cursor, limit, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_nodes_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        return self._server.list_nodes_page(
+            node_names, serial, dict(filter_props), req_props, str(cursor), int(limit)
+        )
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -539,6 +556,23 @@ class DBusServer(dbus.service.Object):
             res_names, serial, dict(filter_props), req_props
         )
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asta{ss}assi",
+        out_signature="a(isa(ss))" "a(sa{ss})" "s",
+        message_keyword='message',
+    )
+    def list_resources_page(self, res_names, serial, filter_props, req_props,
+                            cursor, limit, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_resources_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        return self._server.list_resources_page(
+            res_names, serial, dict(filter_props), req_props, str(cursor), int(limit)
+        )
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asta{ss}as",
@@ -555,6 +589,23 @@ class DBusServer(dbus.service.Object):
             res_names, serial, dict(filter_props), req_props
         )
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asta{ss}assi",
+        out_signature="a(isa(ss))" "a(sa{ss}a(ia{ss}))" "s",
+        message_keyword='message',
+    )
+    def list_volumes_page(self, res_names, serial, filter_props, req_props,
+                          cursor, limit, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_volumes_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        return self._server.list_volumes_page(
+            res_names, serial, dict(filter_props), req_props, str(cursor), int(limit)
+        )
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asasta{ss}as",
@@ -572,6 +623,24 @@ class DBusServer(dbus.service.Object):
             node_names, res_names, serial, dict(filter_props), req_props
         )
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asasta{ss}assi",
+        out_signature="a(isa(ss))" "a(ssa{ss}a(ia{ss}))" "s",
+        message_keyword='message',
+    )
+    def list_assignments_page(self, node_names, res_names, serial, filter_props,
+                              req_props, cursor, limit, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_assignments_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        return self._server.list_assignments_page(
+            node_names, res_names, serial, dict(filter_props), req_props,
+            str(cursor), int(limit)
+        )
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="ssasa{ss}",
@@ -605,6 +674,24 @@ class DBusServer(dbus.service.Object):
             res_names, snaps_names, serial, dict(filter_props), req_props
         )
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="asasta{ss}assi",
+        out_signature="a(isa(ss))" "a(sa(sa{ss}))" "s",
+        message_keyword='message',
+    )
+    def list_snapshots_page(self, res_names, snaps_names, serial, filter_props,
+                            req_props, cursor, limit, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_snapshots_page(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        return self._server.list_snapshots_page(
+            res_names, snaps_names, serial, dict(filter_props), req_props,
+            str(cursor), int(limit)
+        )
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="asasasta{ss}as",
@@ -623,6 +710,20 @@ class DBusServer(dbus.service.Object):
             dict(filter_props), req_props
         )
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="as",
+        out_signature="a(isa(ss))" "a(sa{ss}a(ia{ss})a(sa{ss}a(ia{ss})))",
+        message_keyword='message',
+    )
+    def list_drbd_states(self, res_names, message=None):
+        """
+        D-Bus interface for DrbdManageServer.list_drbd_states(...)
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        return self._server.list_drbd_states(res_names)
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="sssa(ss)a(ia(ss))",
@@ -818,6 +919,26 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.run_external_plugin(plugin_name, dict(props))
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="sa{ss}",
+        out_signature="a(isa(ss))" "a{ss}",
+        message_keyword='message',
+        async_callbacks=('reply_handler', 'error_handler'),
+    )
+    def wait_for_plugin(self, plugin_name, props, reply_handler, error_handler,
+                        message=None):
+        """
+        D-Bus interface for DrbdManageServer.wait_for_plugin(...)
+
+        The reply is sent once the plugin's policy is decided
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        ret = self._server.wait_for_plugin(plugin_name, dict(props), reply_handler)
+        if ret is not None:
+            reply_handler(*ret)
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -876,6 +997,25 @@ class DBusServer(dbus.service.Object):
             self._dbustracer.record(message.get_member(), message.get_args_list())
         return self._server.wait_for_startup()
 
+    @dbus.service.method(
+        DBUS_DRBDMANAGED,
+        in_signature="d",
+        out_signature="a(isa(ss))",
+        message_keyword='message',
+        async_callbacks=('reply_handler', 'error_handler'),
+    )
+    def wait_ready(self, timeout, reply_handler, error_handler, message=None):
+        """
+        D-Bus interface for DrbdManageServer.wait_ready(...)
+
+        The reply is sent once the server is ready or the timeout ended
+        """
+        if self._dbustracer_running:
+            self._dbustracer.record(message.get_member(), message.get_args_list())
+        ret = self._server.wait_ready(float(timeout), reply_handler)
+        if ret is not None:
+            reply_handler(ret)
+
     @dbus.service.method(
         DBUS_DRBDMANAGED,
         in_signature="",
@@ -964,6 +1104,17 @@ class DBusSignal(dbus.service.Object):
         """
         logging.debug("DBusSignal '%s': notify_removed()" % self._path)
 
+    @dbus.service.signal(DBUS_DRBDMANAGED, signature="xas")
+    def notify_changes(self, serial, keys):
+        """
+        Signal to notify subscribers of changes of the configuration
+
+        Sent by the server's change feed object, see drbdmanage.changefeed;
+        carries the current serial number of the cluster configuration and
+        the keys of the objects that were created, changed or removed
+        """
+        logging.debug("DBusSignal '%s': notify_changes(%d)" % (self._path, serial))
+
     def destroy(self):
         """
         Withdraws this instance from the DBus interface
@@ -21,6 +21,8 @@
 import errno
 import logging
 import os
+import re
+import tempfile
 import drbdmanage.utils as utils
 import drbdmanage.consts as consts
 
@@ -38,6 +40,15 @@ class DrbdAdm(object):
     # Used as a return code to indicate that drbdadm could not be executed
     DRBDUTIL_EXEC_FAILED = 127
 
+    # Lines of drbdadm/drbdsetup output that report a failed command, e.g.
+    # "res0: Failure: (162) Invalid configuration request",
+    # "'res0' not defined in your config (for this host)." or
+    # "Command 'drbdsetup attach res0 ...' terminated with exit code 10"
+    BATCH_ERROR_PATTERN = re.compile(
+        r"\bfailure:|\berror:|not defined in your config|terminated with exit code",
+        re.IGNORECASE
+    )
+
     def __init__(self, conf_path):
         self.conf_path = conf_path
 
@@ -99,6 +110,126 @@ class DrbdAdm(object):
 
         return exit_code
 
+    def adjust_batch(self, res_names):
+        """
+        Adjusts several resources with a single drbdadm run
+
+        If the combined run fails, all resources are retried one by one.
+
+        @return: dict of resource name -> exit code
+        """
+        return self._run_batch("adjust", res_names, self.adjust)
+
+    def down_batch(self, res_names):
+        """
+        Shuts down several resources with a single drbdadm run
+
+        If the combined run fails, all resources are retried one by one.
+
+        @return: dict of resource name -> exit code
+        """
+        return self._run_batch("down", res_names, self.down)
+
+    def _run_batch(self, command, res_names, single_fn):
+        """
+        Runs a drbdadm command for several resources at once
+
+        drbdadm reads a temporary configuration file that includes the
+        configuration files of all resources, so the configuration is
+        parsed only once. If the combined run fails, all resources are
+        retried individually using single_fn, because drbdadm may have
+        stopped before it reached some of the resources; adjust and down
+        can be repeated safely for resources that were processed already.
+
+        @return: dict of resource name -> exit code
+        """
+        results = {}
+        if len(res_names) == 0:
+            return results
+        if len(res_names) == 1:
+            results[res_names[0]] = single_fn(res_names[0])
+            return results
+
+        batch_path = None
+        exit_code = DrbdAdm.DRBDUTIL_EXEC_FAILED
+        output = []
+        try:
+            batch_path = self._write_batch_conf(res_names)
+            exec_args = [self.DRBDADM_UTIL, "-vvv", "-c", batch_path, command]
+            exec_args += res_names
+            exit_code, output = self._run_drbdutils_output(exec_args)
+        except (IOError, OSError) as os_err:
+            logging.error(
+                "Cannot write the drbdadm batch configuration file, "
+                "error returned by the OS is: %s" % (str(os_err))
+            )
+        finally:
+            if batch_path is not None:
+                try:
+                    os.unlink(batch_path)
+                except OSError:
+                    pass
+
+        if exit_code == 0:
+            for res_name in res_names:
+                results[res_name] = 0
+        else:
+            failed = self._failed_batch_resources(res_names, output)
+            logging.warning(
+                "drbdadm %s failed for %d resources (exit code %d, reported: %s), "
+                "retrying the resources individually"
+                % (command, len(res_names), exit_code,
+                   ", ".join(sorted(failed)) if len(failed) > 0 else "none")
+            )
+            for res_name in res_names:
+                results[res_name] = single_fn(res_name)
+        return results
+
+    def _write_batch_conf(self, res_names):
+        """
+        Writes a configuration file that includes the resources' files
+
+        @return: path of the temporary configuration file
+        """
+        conf_dir = os.path.normpath(self.conf_path)
+        fd, batch_path = tempfile.mkstemp(
+            prefix="drbdmanage_batch_", suffix=".conf", dir=conf_dir
+        )
+        batch_file = os.fdopen(fd, "w")
+        try:
+            for res_name in res_names:
+                batch_file.write(
+                    'include "%s";\n'
+                    % (os.path.join(conf_dir, "drbdmanage_" + res_name + ".res"))
+                )
+        finally:
+            batch_file.close()
+        return batch_path
+
+    def _failed_batch_resources(self, res_names, output):
+        """
+        Finds the resources that drbdadm reported errors for
+
+        Used for logging only; resources that are not reported may have
+        failed as well, or may not have been processed at all.
+
+        @return: set of resource names
+        """
+        failed = set()
+        error_lines = [
+            line for line in output
+            if DrbdAdm.BATCH_ERROR_PATTERN.search(line) is not None
+        ]
+        for res_name in res_names:
+            name_pattern = re.compile(
+                r"(?<![\w.-])" + re.escape(res_name) + r"(?![\w.-])"
+            )
+            for line in error_lines:
+                if name_pattern.search(line) is not None:
+                    failed.add(res_name)
+                    break
+        return failed
+
     def _fallback_down(self, res_name):
         exec_args = [self.DRBDSETUP_UTIL, "down", res_name]
         return self._run_drbdutils(exec_args)
@@ -260,7 +391,17 @@ class DrbdAdm(object):
         Runs the drbdadm command as a child process with its standard input
         redirected to a pipe from the drbdmanage server
         """
+        drbdutil_rc, _ = self._run_drbdutils_output(exec_args)
+        return drbdutil_rc
+
+    def _run_drbdutils_output(self, exec_args):
+        """
+        Runs a drbdutils command like _run_drbdutils()
+
+        @return: tuple(exit code, list of stdout and stderr lines)
+        """
         drbdutil_rc = DrbdAdm.DRBDUTIL_EXEC_FAILED
+        output = []
         try:
             # Always log what's being executed and what the exit code was
             drbdutil_exec = utils.ExternalCommandBuffer(
@@ -277,6 +418,7 @@ class DrbdAdm(object):
             else:
                 drbdutil_exec.log_stdout(log_handler=logging.debug)
                 drbdutil_exec.log_stderr(log_handler=logging.debug)
+            output = drbdutil_exec.get_stdout() + drbdutil_exec.get_stderr()
         except OSError as oserr:
             if oserr.errno == errno.ENOENT:
                 logging.error("Cannot find drbdutils utility '%s', in PATH '%s'"
@@ -290,4 +432,4 @@ class DrbdAdm(object):
                     "the OS is: %s\n"
                     % (exec_args[0], oserr.strerror)
                 )
-        return drbdutil_rc
+        return drbdutil_rc, output
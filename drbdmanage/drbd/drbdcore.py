@@ -23,6 +23,8 @@ import os
 import logging
 import time
 import subprocess
+import threading
+import Queue
 import drbdmanage.utils as utils
 import drbdmanage.consts as consts
 import drbdmanage.conf.conffile
@@ -81,6 +83,10 @@ class DrbdManager(object):
     # Acceptable disk states for a diskless client volume
     DRBD_OK_DISKLESS_STATES = ["Diskless"]
 
+    # Maximum number of resources handled by a single drbdadm run when
+    # starting or stopping all resources
+    DRBDADM_BATCH_SIZE = 16
+
     @log_in_out
     def __init__(self, ref_server):
         self._server  = ref_server
@@ -769,18 +775,11 @@ class DrbdManager(object):
                         error_code = snaps_assg.get_error_code()
                         if error_code == 0:
                             set_state_changed = True
-                            deploy_failed = False
-                            snaps_vol_iter = snaps_assg.iterate_snaps_vol_states()
-                            for snaps_vol_state in snaps_vol_iter:
-                                (set_pool_changed, set_failed_actions) = (
-                                    self._snaps_deploy_volume(
-                                        snaps_assg, snaps_vol_state
-                                    )
-                                )
-                                if set_pool_changed:
-                                    pool_changed = True
-                                if set_failed_actions:
-                                    deploy_failed = True
+                            (set_pool_changed, deploy_failed) = (
+                                self._snaps_deploy_volumes(snaps_assg)
+                            )
+                            if set_pool_changed:
+                                pool_changed = True
                             if deploy_failed:
                                 snaps_assg.increase_fail_count()
                             else:
@@ -805,17 +804,11 @@ class DrbdManager(object):
                 elif (snaps_assg.requires_undeploy() or
                       is_unset(assg_tstate, Assignment.FLAG_DEPLOY)):
                     set_state_changed = True
-                    undeploy_failed = False
-                    for snaps_vol_state in snaps_assg.iterate_snaps_vol_states():
-                        (set_pool_changed, set_failed_actions) = (
-                            self._snaps_undeploy_volume(
-                                snaps_assg, snaps_vol_state
-                            )
-                        )
-                        if set_pool_changed:
-                            pool_changed = True
-                        if set_failed_actions:
-                            undeploy_failed = True
+                    (set_pool_changed, undeploy_failed) = (
+                        self._snaps_undeploy_volumes(snaps_assg)
+                    )
+                    if set_pool_changed:
+                        pool_changed = True
                     if undeploy_failed:
                         snaps_assg.increase_fail_count()
                     else:
@@ -882,15 +875,73 @@ class DrbdManager(object):
 
     @log_in_out
     def _snaps_deploy_volume(self, snaps_assg, snaps_vol_state):
+        pool_changed   = False
+        failed_actions = True
+        src_bd_name = self._snaps_deploy_source(snaps_assg, snaps_vol_state)
+        if src_bd_name is not None:
+            # Create the snapshot
+            pool_changed = True
+            bd_mgr = self._server.get_bd_mgr()
+            blockdev = bd_mgr.create_snapshot(
+                snaps_assg.get_snapshot().get_name(),
+                snaps_vol_state.get_id(), src_bd_name
+            )
+            failed_actions = self._snaps_deploy_finish(
+                snaps_assg, snaps_vol_state, src_bd_name, blockdev
+            )
+        if failed_actions:
+            snaps_assg.set_error_code(dmexc.DM_ESTORAGE)
+        return (pool_changed, failed_actions)
+
+    @log_in_out
+    def _snaps_deploy_volumes(self, snaps_assg):
+        """
+        Creates the snapshots of all volumes of a snapshot assignment
+
+        All volume snapshots are requested from the block device manager
+        in one batch to keep the snapshot window small.
+        """
         pool_changed   = False
         failed_actions = False
-        blockdev       = None
-        assg           = snaps_assg.get_assignment()
-        snaps          = snaps_assg.get_snapshot()
-        resource       = snaps.get_resource()
-        bd_mgr = self._server.get_bd_mgr()
-        snaps_name   = snaps.get_name()
-        snaps_vol_id = snaps_vol_state.get_id()
+        snaps_name     = snaps_assg.get_snapshot().get_name()
+        sources        = []
+        src_bd_names   = {}
+        vol_states     = {}
+        for snaps_vol_state in snaps_assg.iterate_snaps_vol_states():
+            src_bd_name = self._snaps_deploy_source(snaps_assg, snaps_vol_state)
+            if src_bd_name is not None:
+                snaps_vol_id = snaps_vol_state.get_id()
+                sources.append((snaps_vol_id, src_bd_name))
+                src_bd_names[snaps_vol_id] = src_bd_name
+                vol_states[snaps_vol_id] = snaps_vol_state
+            else:
+                failed_actions = True
+        if len(sources) > 0:
+            pool_changed = True
+            bd_mgr = self._server.get_bd_mgr()
+            blockdevs = bd_mgr.create_snapshots(snaps_name, sources)
+            for snaps_vol_id, snaps_vol_state in vol_states.iteritems():
+                if self._snaps_deploy_finish(
+                    snaps_assg, snaps_vol_state, src_bd_names[snaps_vol_id],
+                    blockdevs.get(snaps_vol_id)
+                ):
+                    failed_actions = True
+        if failed_actions:
+            snaps_assg.set_error_code(dmexc.DM_ESTORAGE)
+        return (pool_changed, failed_actions)
+
+    def _snaps_deploy_source(self, snaps_assg, snaps_vol_state):
+        """
+        Checks whether the source volume of a snapshot volume is deployed
+
+        @return: name of the source block device; None on error
+        """
+        src_bd_name   = None
+        assg          = snaps_assg.get_assignment()
+        snaps         = snaps_assg.get_snapshot()
+        resource      = snaps.get_resource()
+        snaps_name    = snaps.get_name()
+        snaps_vol_id  = snaps_vol_state.get_id()
         src_vol_state = assg.get_volume_state(snaps_vol_id)
         if src_vol_state is not None:
             src_cstate = src_vol_state.get_cstate()
@@ -898,29 +949,7 @@ class DrbdManager(object):
             # Operate only on deployed volumes
             if (is_set(src_cstate, DrbdVolumeState.FLAG_DEPLOY) and
                 is_set(src_tstate, DrbdVolumeState.FLAG_DEPLOY)):
-                # Create the snapshot
                 src_bd_name = src_vol_state.get_bd_name()
-                pool_changed = True
-                blockdev = bd_mgr.create_snapshot(
-                    snaps_name, snaps_vol_id, src_bd_name
-                )
-                if blockdev is not None:
-                    snaps_vol_state.set_bd(
-                        blockdev.get_name(), blockdev.get_path()
-                    )
-                    snaps_vol_state.set_cstate_flags(
-                        snapshots.DrbdSnapshotVolumeState.FLAG_DEPLOY
-                    )
-                else:
-                    log_message = (
-                        "Failed to create snapshot %s/%s #%u "
-                        "of source volume %s"
-                         % (resource.get_name(), snaps_name, snaps_vol_id,
-                            src_bd_name)
-                    )
-                    logging.error(log_message)
-                    self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
-                    failed_actions = True
             else:
                 log_message = (
                     "Cannot create snapshot %s/%s #%u, "
@@ -929,27 +958,46 @@ class DrbdManager(object):
                 )
                 logging.error(log_message)
                 self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
-                failed_actions = True
         else:
             log_message = (
                 "Snapshot %s/%s references non-existent volume id %d of "
                 "its source resource"
-                % (resource.get_name(), snaps.get_name(), snaps_vol_id)
+                % (resource.get_name(), snaps_name, snaps_vol_id)
             )
             logging.error(log_message)
             self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
-            failed_actions = True
-        if failed_actions:
-            snaps_assg.set_error_code(dmexc.DM_ESTORAGE)
-        return (pool_changed, failed_actions)
+        return src_bd_name
+
+    def _snaps_deploy_finish(self, snaps_assg, snaps_vol_state,
+                             src_bd_name, blockdev):
+        """
+        Updates a snapshot volume state with the created block device
+
+        @return: True if the snapshot could not be created, False otherwise
+        """
+        if blockdev is not None:
+            snaps_vol_state.set_bd(
+                blockdev.get_name(), blockdev.get_path()
+            )
+            snaps_vol_state.set_cstate_flags(
+                snapshots.DrbdSnapshotVolumeState.FLAG_DEPLOY
+            )
+            return False
+        snaps = snaps_assg.get_snapshot()
+        log_message = (
+            "Failed to create snapshot %s/%s #%u "
+            "of source volume %s"
+             % (snaps.get_resource().get_name(), snaps.get_name(),
+                snaps_vol_state.get_id(), src_bd_name)
+        )
+        logging.error(log_message)
+        self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
+        return True
 
     @log_in_out
     def _snaps_undeploy_volume(self, snaps_assg, snaps_vol_state):
         pool_changed   = False
         failed_actions = False
-        snaps          = snaps_assg.get_snapshot()
-        snaps_name     = snaps.get_name()
-        snaps_vol_id   = snaps_vol_state.get_id()
 
         fn_rc = DM_ESTORAGE
         bd_name = snaps_vol_state.get_bd_name()
@@ -959,19 +1007,59 @@ class DrbdManager(object):
             fn_rc = bd_mgr.remove_snapshot(
                 bd_name
             )
+        failed_actions = self._snaps_undeploy_finish(
+            snaps_assg, snaps_vol_state, fn_rc
+        )
+        return (pool_changed, failed_actions)
+
+    @log_in_out
+    def _snaps_undeploy_volumes(self, snaps_assg):
+        """
+        Removes the snapshots of all volumes of a snapshot assignment
+
+        All volume snapshots are passed to the block device manager in one
+        batch, so that the storage plugin can remove them together.
+        """
+        pool_changed   = False
+        failed_actions = False
+        vol_states     = []
+        bd_names       = []
+        for snaps_vol_state in snaps_assg.iterate_snaps_vol_states():
+            vol_states.append(snaps_vol_state)
+            bd_name = snaps_vol_state.get_bd_name()
+            if bd_name is not None:
+                bd_names.append(bd_name)
+        fn_rcs = {}
+        if len(bd_names) > 0:
+            pool_changed = True
+            bd_mgr = self._server.get_bd_mgr()
+            fn_rcs = bd_mgr.remove_snapshots(bd_names)
+        for snaps_vol_state in vol_states:
+            fn_rc = fn_rcs.get(snaps_vol_state.get_bd_name(), DM_ESTORAGE)
+            if self._snaps_undeploy_finish(snaps_assg, snaps_vol_state, fn_rc):
+                failed_actions = True
+        return (pool_changed, failed_actions)
+
+    def _snaps_undeploy_finish(self, snaps_assg, snaps_vol_state, fn_rc):
+        """
+        Resets a snapshot volume state after its block device was removed
+
+        @return: True if the block device could not be removed, False otherwise
+        """
+        bd_name = snaps_vol_state.get_bd_name()
         if fn_rc == DM_SUCCESS or bd_name is None:
             snaps_vol_state.set_bd(None, None)
             snaps_vol_state.set_cstate(0)
             snaps_vol_state.set_tstate(0)
-        else:
-            log_message = (
-                "Failed to remove snapshot %s #%u block device '%s'"
-                 % (snaps_name, snaps_vol_id, bd_name)
-            )
-            logging.error(log_message)
-            self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
-            failed_actions = True
-        return (pool_changed, failed_actions)
+            return False
+        log_message = (
+            "Failed to remove snapshot %s #%u block device '%s'"
+             % (snaps_assg.get_snapshot().get_name(),
+                snaps_vol_state.get_id(), bd_name)
+        )
+        logging.error(log_message)
+        self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
+        return True
 
     @log_in_out
     def adjust_drbdctrl(self, was_previous_leader=False):
@@ -1049,22 +1137,161 @@ class DrbdManager(object):
         """
         Attempts to bring up all deployed resources.
         Used when the drbdmanage server starts up.
+
+        Resources are started in the order of their startup priority
+        (see consts.KEY_STARTUP_PRIORITY). If the startup-concurrency
+        configuration value is greater than one, the drbdadm adjust
+        commands of that many resources run concurrently, while the
+        configuration files of the remaining resources are being prepared.
+        drbdadm adjusts up to DRBDADM_BATCH_SIZE resources per run.
+        The backend block devices of all resources are activated together
+        before any resource is adjusted.
         """
         node = self._server.get_instance_node()
         if node is not None:
+            up_assgs = []
             for assg in node.iterate_assignments():
                 cstate = assg.get_cstate()
                 tstate = assg.get_tstate()
                 if (is_set(cstate, Assignment.FLAG_DEPLOY) and
                     is_set(tstate, Assignment.FLAG_DEPLOY)):
-                        try:
-                            self._up_resource(assg)
-                        except Exception as exc:
-                            logging.debug(
-                                "failed to start resource '%s', "
-                                "unhandled exception: %s"
-                                % (assg.get_resource().get_name(), str(exc))
-                            )
+                        up_assgs.append(assg)
+            # sort() is stable, resources of equal priority keep their order
+            up_assgs.sort(key=self._get_startup_priority, reverse=True)
+
+            concurrency = self._get_startup_concurrency()
+            start_time = time.time()
+            phase_times = {"blockdev": 0.0, "conf": 0.0, "adjust": 0.0}
+            adjust_queue = None
+            adjust_threads = []
+            if concurrency > 1 and len(up_assgs) > 1:
+                adjust_queue = Queue.Queue()
+                for _ in range(min(concurrency, len(up_assgs))):
+                    thread = threading.Thread(
+                        target=self._adjust_worker, args=(adjust_queue,)
+                    )
+                    thread.daemon = True
+                    thread.start()
+                    adjust_threads.append(thread)
+
+            # Split the resources into enough batches to keep all
+            # concurrent drbdadm runs busy
+            batch_size = min(
+                DrbdManager.DRBDADM_BATCH_SIZE,
+                max((len(up_assgs) + concurrency - 1) // concurrency, 1)
+            )
+            adjust_batch = []
+            adjust_start = [None]
+
+            # Activate the backend block devices of all resources at once,
+            # the storage plugin may need far fewer commands to do that
+            phase_start = time.time()
+            try:
+                self._up_blockdevices(
+                    [assg for assg in up_assgs if not assg.is_empty()]
+                )
+            except Exception as exc:
+                logging.debug(
+                    "failed to start backend block devices, "
+                    "unhandled exception: %s"
+                    % (str(exc))
+                )
+            phase_times["blockdev"] = time.time() - phase_start
+
+            def dispatch(res_names):
+                if adjust_queue is not None:
+                    if adjust_start[0] is None:
+                        adjust_start[0] = time.time()
+                    adjust_queue.put(res_names)
+                else:
+                    batch_start = time.time()
+                    self._adjust_batch(res_names)
+                    phase_times["adjust"] += time.time() - batch_start
+
+            for assg in up_assgs:
+                res_name = assg.get_resource().get_name()
+                try:
+                    if assg.is_empty():
+                        logging.info(
+                            "resource '%s' has no volumes, start skipped"
+                            % (res_name)
+                        )
+                        continue
+                    logging.info("starting resource '%s'" % res_name)
+                    phase_start = time.time()
+                    self._server.export_assignment_conf(assg)
+                    phase_end = time.time()
+                    phase_times["conf"] += phase_end - phase_start
+
+                    adjust_batch.append(res_name)
+                except Exception as exc:
+                    logging.debug(
+                        "failed to start resource '%s', "
+                        "unhandled exception: %s"
+                        % (res_name, str(exc))
+                    )
+                    continue
+
+                if len(adjust_batch) >= batch_size:
+                    dispatch(adjust_batch)
+                    adjust_batch = []
+            if len(adjust_batch) > 0:
+                dispatch(adjust_batch)
+
+            if adjust_queue is not None:
+                for _ in adjust_threads:
+                    adjust_queue.put(None)
+                for thread in adjust_threads:
+                    thread.join()
+                if adjust_start[0] is not None:
+                    phase_times["adjust"] = time.time() - adjust_start[0]
+
+            if len(up_assgs) > 0:
+                self._server.get_message_log().add_entry(
+                    msglog.MessageLog.INFO,
+                    "Started %d resources in %.1f s (concurrency %d): "
+                    "block devices %.1f s, configuration files %.1f s, "
+                    "drbdadm adjust %.1f s"
+                    % (len(up_assgs), time.time() - start_time, concurrency,
+                       phase_times["blockdev"], phase_times["conf"],
+                       phase_times["adjust"])
+                )
+
+    def _adjust_worker(self, adjust_queue):
+        """
+        Adjusts batches of resources from the queue until it receives None
+        """
+        while True:
+            res_names = adjust_queue.get()
+            if res_names is None:
+                break
+            self._adjust_batch(res_names)
+
+    def _adjust_batch(self, res_names):
+        try:
+            self._drbdadm.adjust_batch(res_names)
+        except Exception as exc:
+            logging.debug(
+                "failed to start resources '%s', "
+                "unhandled exception: %s"
+                % ("', '".join(res_names), str(exc))
+            )
+
+    def _get_startup_priority(self, assignment):
+        return assignment.get_resource().get_props().get_int_or_default(
+            consts.KEY_STARTUP_PRIORITY, 0
+        )
+
+    def _get_startup_concurrency(self):
+        concurrency = self._server.DEFAULT_STARTUP_CONCURRENCY
+        prop_str = self._server.get_conf_value(self._server.KEY_STARTUP_CONCURRENCY)
+        if prop_str is not None:
+            try:
+                concurrency = max(int(prop_str), 1)
+            except (ValueError, TypeError):
+                pass
+        return concurrency
+
     @log_in_out
     def final_down(self):
         """
@@ -1073,14 +1300,28 @@ class DrbdManager(object):
         """
         node = self._server.get_instance_node()
         if node is not None:
+            down_batch = []
             for assg in node.iterate_assignments():
+                res_name = assg.get_resource().get_name()
                 try:
-                    self._down_resource(assg)
+                    logging.info("DrbdManager: Stopping resource '%s'" % (res_name))
+                    self._server.export_assignment_conf(assg)
+                    down_batch.append(res_name)
                 except Exception as exc:
                     logging.debug(
                         "failed to shut down resource '%s', "
                         "unhandled exception: %s"
-                        % (assg.get_resource().get_name(), str(exc))
+                        % (res_name, str(exc))
+                    )
+            for idx in range(0, len(down_batch), DrbdManager.DRBDADM_BATCH_SIZE):
+                res_names = down_batch[idx:idx + DrbdManager.DRBDADM_BATCH_SIZE]
+                try:
+                    self._drbdadm.down_batch(res_names)
+                except Exception as exc:
+                    logging.debug(
+                        "failed to shut down resources '%s', "
+                        "unhandled exception: %s"
+                        % ("', '".join(res_names), str(exc))
                     )
 
     @log_in_out
@@ -1105,19 +1346,7 @@ class DrbdManager(object):
         else:
             logging.info("starting resource '%s'" % res_name)
 
-            bd_mgr = self._server.get_bd_mgr()
-            for vol_state in assignment.iterate_volume_states():
-                bd_name = vol_state.get_bd_name()
-                if bd_name is not None:
-                    fn_rc = bd_mgr.up_blockdevice(bd_name)
-                    if fn_rc != DM_SUCCESS:
-                        log_message = (
-                            "resource '%s': attempt to start the backend "
-                            "blockdevice '%s' failed"
-                            % (res_name, bd_name)
-                        )
-                        logging.warning(log_message)
-                        self._server.get_message_log().add_entry(msglog.MessageLog.WARN, log_message)
+            self._up_blockdevices([assignment])
 
             # update the configuration file
             self._server.export_assignment_conf(assignment)
@@ -1127,6 +1356,34 @@ class DrbdManager(object):
 
         return fn_rc
 
+    def _up_blockdevices(self, assignments):
+        """
+        Starts the backend block devices of the assignments' volumes
+
+        The block devices of all assignments are activated together
+        """
+        bd_names = []
+        bd_res = {}
+        for assignment in assignments:
+            res_name = assignment.get_resource().get_name()
+            for vol_state in assignment.iterate_volume_states():
+                bd_name = vol_state.get_bd_name()
+                if bd_name is not None:
+                    bd_names.append(bd_name)
+                    bd_res[bd_name] = res_name
+        if len(bd_names) > 0:
+            bd_mgr = self._server.get_bd_mgr()
+            fn_rcs = bd_mgr.up_blockdevices(bd_names)
+            for bd_name in bd_names:
+                if fn_rcs.get(bd_name) != DM_SUCCESS:
+                    log_message = (
+                        "resource '%s': attempt to start the backend "
+                        "blockdevice '%s' failed"
+                        % (bd_res[bd_name], bd_name)
+                    )
+                    logging.warning(log_message)
+                    self._server.get_message_log().add_entry(msglog.MessageLog.WARN, log_message)
+
     @log_in_out
     def _down_resource(self, assignment):
         """
@@ -1293,10 +1550,10 @@ class DrbdManager(object):
                 #        creation failed
                 # Adjust the DRBD resource to configure the volume
                 res_name = resource.get_name()
-                assg_conf, global_conf = self._server.open_assignment_conf(res_name)
+                assg_conf, global_conf_path = self._server.open_assignment_conf(res_name)
                 self._resconf.write_excerpt(assg_conf, assignment,
-                                            nodes, vol_states, global_conf)
-                self._server.close_assignment_conf(assg_conf, global_conf)
+                                            nodes, vol_states, global_conf_path)
+                self._server.close_assignment_conf(assg_conf)
                 self._server.update_assignment_conf(res_name)
 
                 vol_id = vol_state.get_id()
@@ -1499,10 +1756,10 @@ class DrbdManager(object):
         resource = assignment.get_resource()
 
         res_name = assignment.get_resource().get_name()
-        assg_conf, global_conf = self._server.open_assignment_conf(res_name)
+        assg_conf, global_conf_path = self._server.open_assignment_conf(res_name)
         self._resconf.write_excerpt(assg_conf, assignment,
-                                    nodes, vol_states, global_conf)
-        self._server.close_assignment_conf(assg_conf, global_conf)
+                                    nodes, vol_states, global_conf_path)
+        self._server.close_assignment_conf(assg_conf)
         self._server.update_assignment_conf(res_name)
 
         # Initialize DRBD metadata
@@ -1593,10 +1850,10 @@ class DrbdManager(object):
 
         # Update the configuration file
         res_name = resource.get_name()
-        assg_conf, global_conf = self._server.open_assignment_conf(res_name)
+        assg_conf, global_conf_path = self._server.open_assignment_conf(res_name)
         self._resconf.write_excerpt(assg_conf, assignment,
-                                    nodes, vol_states, global_conf)
-        self._server.close_assignment_conf(assg_conf, global_conf)
+                                    nodes, vol_states, global_conf_path)
+        self._server.close_assignment_conf(assg_conf)
         self._server.update_assignment_conf(res_name)
 
         fn_rc = -1
@@ -1729,6 +1986,7 @@ class DrbdManager(object):
                 try:
                     new_size = volume.get_resize_value()
                     volume.set_size_kiB(new_size)
+                    resource.pool_reserved_changed()
                 except ValueError:
                     pass
 
@@ -1757,6 +2015,7 @@ class DrbdManager(object):
                 else:
                     # Rollback the volume size change
                     volume.set_size_kiB(saved_vol_size)
+                    resource.pool_reserved_changed()
                     log_message = (
                         "Resizing resource '%s' volume %d: DRBD resize command failed"
                         % (res_name, vol_id)
@@ -2233,6 +2492,76 @@ class DrbdManager(object):
         res_name = resource.get_name()
         diskless = is_set(assg.get_tstate(), Assignment.FLAG_DISKLESS)
         vol_list = {}
+        drbd_state = self._server.get_drbd_state()
+        if drbd_state is not None and drbd_state.is_initialized():
+            disk_states = []
+            res_state = drbd_state.get_resource(res_name)
+            if res_state is not None:
+                disk_states = [
+                    (vol_id, device.get_disk_state())
+                    for vol_id, device in res_state.iterate_devices()
+                ]
+        else:
+            disk_states = self._query_disk_states(res_name)
+        for vol_id, disk_state in disk_states:
+            # If the assignment's volume was seen, update its cstate
+            vol_state = assg.get_volume_state(vol_id)
+            if vol_state is None:
+                logging.warning(
+                    "DrbdManager: DRBD events report resource '%s' volume nr %d, "
+                    "which is not known to drbdmanage"
+                    % (res_name, vol_id)
+                )
+            elif disk_state is not None:
+                if not diskless and disk_state in DrbdManager.DRBD_OK_DISK_STATES:
+                    logging.warning(
+                        "DrbdManager: Marked storage resource '%s' volume %d deployed because DRBD reports the volume online and attached"
+                        % (res_name, vol_id)
+                    )
+                    # Mark the volume state deployed and attached
+                    vol_state.set_cstate_flags(DrbdVolumeState.FLAG_DEPLOY)
+                    vol_state.set_cstate_flags(DrbdVolumeState.FLAG_ATTACH)
+                    # Remember having seen a good state on this volume id
+                    vol_list[vol_id] = True
+                    state_changed = True
+                elif diskless and disk_state in DrbdManager.DRBD_OK_DISKLESS_STATES:
+                    logging.warning(
+                        "DrbdManager: Marked client resource '%s' volume %d deployed because DRBD reports the volume online and diskless"
+                        % (res_name, vol_id)
+                    )
+                    # Mark the volume state deployed and detached
+                    vol_state.set_cstate_flags(DrbdVolumeState.FLAG_DEPLOY)
+                    vol_state.clear_cstate_flags(DrbdVolumeState.FLAG_ATTACH)
+                    # Remember having seen a good state on this volume id
+                    vol_list[vol_id] = True
+                    state_changed = True
+        # Mark the resource deployed if all volumes were seen in a good state
+        mark_deployed = True
+        for vol_state in assg.iterate_volume_states():
+            vol_id = vol_state.get_id()
+            if vol_list.get(vol_id) is None:
+                mark_deployed = False
+                break
+        if mark_deployed:
+            logging.warning(
+                "DrbdManager: Marked resource '%s' deployed because DRBD reports all its volumes deployed"
+                % (res_name)
+            )
+            assg.set_cstate_flags(Assignment.FLAG_DEPLOY)
+            state_changed = True
+        return state_changed
+
+
+    def _query_disk_states(self, res_name):
+        """
+        Queries the disk states of a resource's volumes from drbdsetup
+
+        Used while the server's DRBD state model has not been initialized
+        from the events log yet.
+
+        @return: list of tuples(volume id, disk state)
+        """
+        disk_states = []
         drbdutil_exec = utils.ExternalCommandBuffer(
             "drbdsetup",
             [consts.DRBDSETUP_UTIL, "events2", "--now", res_name],
@@ -2245,11 +2574,7 @@ class DrbdManager(object):
         try:
             for event_line in events_data:
                 obj_type, obj_props = utils.parse_event_line(event_line)
-                if obj_type == DrbdManager.DRBD_EVENT_RESOURCE:
-                    # No-op; if all volumes were seen, update the resource's cstate
-                    pass
-                elif obj_type == DrbdManager.DRBD_EVENT_VOLUME:
-                    # If the assignment's volume was seen, update its cstate
+                if obj_type == DrbdManager.DRBD_EVENT_VOLUME:
                     vol_id_str = obj_props[DrbdManager.DRBD_EVENT_VOLUME_ID]
                     if vol_id_str is None:
                         raise dmexc.EventException
@@ -2258,38 +2583,9 @@ class DrbdManager(object):
                         vol_id = int(vol_id_str)
                     except ValueError:
                         raise dmexc.EventException
-                    vol_state = assg.get_volume_state(vol_id)
-                    if vol_state is None:
-                        logging.warning(
-                            "DrbdManager: DRBD events report resource '%s' volume nr %d, "
-                            "which is not known to drbdmanage"
-                            % (res_name, vol_id)
-                        )
-                    else:
-                        disk_state = obj_props[DrbdManager.DRBD_EVENT_DISK_STATE]
-                        if disk_state is not None:
-                            if not diskless and disk_state in DrbdManager.DRBD_OK_DISK_STATES:
-                                logging.warning(
-                                    "DrbdManager: Marked storage resource '%s' volume %d deployed because DRBD reports the volume online and attached"
-                                    % (res_name, vol_id)
-                                )
-                                # Mark the volume state deployed and attached
-                                vol_state.set_cstate_flags(DrbdVolumeState.FLAG_DEPLOY)
-                                vol_state.set_cstate_flags(DrbdVolumeState.FLAG_ATTACH)
-                                # Remember having seen a good state on this volume id
-                                vol_list[vol_id] = True
-                                state_changed = True
-                            elif diskless and disk_state in DrbdManager.DRBD_OK_DISKLESS_STATES:
-                                logging.warning(
-                                    "DrbdManager: Marked client resource '%s' volume %d deployed because DRBD reports the volume online and diskless"
-                                    % (res_name, vol_id)
-                                )
-                                # Mark the volume state deployed and detached
-                                vol_state.set_cstate_flags(DrbdVolumeState.FLAG_DEPLOY)
-                                vol_state.clear_cstate_flags(DrbdVolumeState.FLAG_ATTACH)
-                                # Remember having seen a good state on this volume id
-                                vol_list[vol_id] = True
-                                state_changed = True
+                    disk_states.append(
+                        (vol_id, obj_props[DrbdManager.DRBD_EVENT_DISK_STATE])
+                    )
         except dmexc.EventException:
             logging.error(
                 "DrbdManager: Unable to determine the DRBD state of resource '%s': Invalid event line"
@@ -2297,25 +2593,10 @@ class DrbdManager(object):
             )
             if event_line is not None:
                 logging.debug(
-                  "DrbdManager: _check_assignment_state(): Invalid event line: %s"
+                  "DrbdManager: _query_disk_states(): Invalid event line: %s"
                   % (event_line)
                 )
-        # Mark the resource deployed if all volumes were seen in a good state
-        mark_deployed = True
-        for vol_state in assg.iterate_volume_states():
-            vol_id = vol_state.get_id()
-            if vol_list.get(vol_id) is None:
-                mark_deployed = False
-                break
-        if mark_deployed:
-            logging.warning(
-                "DrbdManager: Marked resource '%s' deployed because DRBD reports all its volumes deployed"
-                % (res_name)
-            )
-            assg.set_cstate_flags(Assignment.FLAG_DEPLOY)
-            state_changed = True
-        return state_changed
-
+        return disk_states
 
 class DrbdCommon(GenericDrbdObject):
     """
@@ -2576,6 +2857,18 @@ class DrbdResource(GenericDrbdObject):
         volume = self.get_volume(vol_id)
         vol_props = volume.get_props()
         vol_props.set_prop(DrbdVolume.KEY_RESIZE_VALUE, str(new_size_kiB), namespace=xact)
+        self.pool_reserved_changed()
+
+
+    def pool_reserved_changed(self):
+        """
+        Marks the reserved storage space of all assignments as outdated
+
+        Called whenever a change of a volume's size or resize state affects
+        the storage space reserved on each node the resource is assigned to
+        """
+        for assg in self._assignments.itervalues():
+            assg.pool_reserved_changed()
 
 
     def get_resizing_vol_id_list(self):
@@ -2601,6 +2894,7 @@ class DrbdResource(GenericDrbdObject):
         if volume is not None:
             vol_props = volume.get_props()
             vol_props.remove_prop(DrbdVolume.KEY_RESIZE_VALUE, namespace=xact)
+        self.pool_reserved_changed()
 
 
     def is_managed(self):
@@ -2685,10 +2979,7 @@ class DrbdResource(GenericDrbdObject):
             properties[consts.TSTATE_PREFIX + consts.FLAG_REMOVE] = (
                 bool_to_string(is_set(self._state, self.FLAG_REMOVE))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
         return properties
 
 
@@ -2877,10 +3168,7 @@ class DrbdVolume(GenericStorage, GenericDrbdObject):
             properties[consts.TSTATE_PREFIX + consts.FLAG_REMOVE] = (
                 bool_to_string(is_set(self._state, self.FLAG_REMOVE))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
         return properties
 
 
@@ -2913,6 +3201,15 @@ class DrbdNode(GenericDrbdObject):
 
     _assignments = None
 
+    # Storage space reserved by assignments that are not deployed yet,
+    # tracked per resource name, and the sum of all reservations
+    _pool_reserved       = None
+    _pool_reserved_sum   = 0
+    # Names of resources whose reservation must be recalculated
+    _pool_reserved_dirty = None
+    # Number of peers the reservations were calculated for
+    _pool_reserved_peers = None
+
     # Reference to the server's get_serial() function
     _get_serial = None
 
@@ -2945,6 +3242,7 @@ class DrbdNode(GenericDrbdObject):
         self._addr         = addr
         self._node_id      = node_id
         self._assignments  = {}
+        self.reset_pool_reserved()
 
         checked_state = None
         if state is not None:
@@ -3079,11 +3377,13 @@ class DrbdNode(GenericDrbdObject):
     def init_add_assignment(self, assignment):
         resource = assignment.get_resource()
         self._assignments[resource.get_name()] = assignment
+        self.pool_reserved_changed(assignment)
 
 
     def add_assignment(self, assignment):
         resource = assignment.get_resource()
         self._assignments[resource.get_name()] = assignment
+        self.pool_reserved_changed(assignment)
         self.get_props().new_serial()
 
 
@@ -3100,6 +3400,7 @@ class DrbdNode(GenericDrbdObject):
         resource = assignment.get_resource()
         try:
             del self._assignments[resource.get_name()]
+            self.pool_reserved_changed(assignment)
             self.get_props().new_serial()
         except KeyError:
             pass
@@ -3109,6 +3410,50 @@ class DrbdNode(GenericDrbdObject):
         return len(self._assignments) > 0
 
 
+    def pool_reserved_changed(self, assignment):
+        """
+        Marks an assignment's storage space reservation as outdated
+
+        The assignment's previous reservation is subtracted from the running
+        sum immediately, the new reservation is calculated by the next call
+        of get_pool_reserved()
+        """
+        res_name = assignment.get_resource().get_name()
+        self._pool_reserved_sum -= self._pool_reserved.pop(res_name, 0)
+        self._pool_reserved_dirty.add(res_name)
+
+
+    def get_pool_reserved(self, peers):
+        """
+        Returns the storage space reserved by not-yet-deployed assignments
+
+        Only the reservations of assignments that changed since the last call
+        are recalculated; if the number of peers changed, all reservations
+        are recalculated.
+        """
+        if peers != self._pool_reserved_peers:
+            self.reset_pool_reserved()
+            self._pool_reserved_peers = peers
+        for res_name in self._pool_reserved_dirty:
+            assignment = self._assignments.get(res_name)
+            if assignment is not None:
+                size_kiB = assignment.get_gross_size_kiB_correction(peers)
+                self._pool_reserved[res_name] = size_kiB
+                self._pool_reserved_sum += size_kiB
+        self._pool_reserved_dirty.clear()
+        return self._pool_reserved_sum
+
+
+    def reset_pool_reserved(self):
+        """
+        Discards all storage space reservations, forcing a full recalculation
+        """
+        self._pool_reserved       = {}
+        self._pool_reserved_sum   = 0
+        self._pool_reserved_dirty = set(self._assignments.iterkeys())
+        self._pool_reserved_peers = None
+
+
     def iterate_assignments(self):
         return self._assignments.itervalues()
 
@@ -3203,10 +3548,7 @@ class DrbdNode(GenericDrbdObject):
             properties[consts.TSTATE_PREFIX + consts.FLAG_QIGNORE] = (
                 bool_to_string(is_set(self._state, self.FLAG_QIGNORE))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
         return properties
 
 
@@ -3227,6 +3569,9 @@ class DrbdVolumeState(GenericDrbdObject):
     _cstate  = 0
     _tstate  = 0
 
+    # Reference to the Assignment object this volume state belongs to
+    _assignment = None
+
     # Reference to the server's get_serial() function
     _get_serial = None
 
@@ -3301,6 +3646,15 @@ class DrbdVolumeState(GenericDrbdObject):
         return self._volume.get_id()
 
 
+    def set_assignment(self, assignment):
+        self._assignment = assignment
+
+
+    def _pool_reserved_changed(self):
+        if self._assignment is not None:
+            self._assignment.pool_reserved_changed()
+
+
     def get_bd_path(self):
         return self._bd_path
 
@@ -3344,12 +3698,14 @@ class DrbdVolumeState(GenericDrbdObject):
         if cstate != self._cstate:
             self._cstate = cstate & self.CSTATE_MASK
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def set_tstate(self, tstate):
         if tstate != self._tstate:
             self._tstate = tstate & self.TSTATE_MASK
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def get_cstate(self):
@@ -3364,12 +3720,14 @@ class DrbdVolumeState(GenericDrbdObject):
         if is_unset(self._tstate, self.FLAG_DEPLOY):
             self._tstate = self._tstate | self.FLAG_DEPLOY
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def undeploy(self):
         if self._tstate != 0:
             self._tstate = 0
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def attach(self):
@@ -3451,6 +3809,7 @@ class DrbdVolumeState(GenericDrbdObject):
         self._cstate = (self._cstate | flags) & self.CSTATE_MASK
         if saved_cstate != self._cstate:
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def clear_cstate_flags(self, flags):
@@ -3458,6 +3817,7 @@ class DrbdVolumeState(GenericDrbdObject):
         self._cstate = ((self._cstate | flags) ^ flags) & self.CSTATE_MASK
         if saved_cstate != self._cstate:
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def set_tstate_flags(self, flags):
@@ -3465,6 +3825,7 @@ class DrbdVolumeState(GenericDrbdObject):
         self._tstate = (self._tstate | flags) & self.TSTATE_MASK
         if saved_tstate != self._tstate:
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def clear_tstate_flags(self, flags):
@@ -3472,6 +3833,7 @@ class DrbdVolumeState(GenericDrbdObject):
         self._tstate = ((self._tstate | flags) ^ flags) & self.TSTATE_MASK
         if saved_tstate != self._tstate:
             self.get_props().new_serial()
+            self._pool_reserved_changed()
 
 
     def filter_match(self, filter_props):
@@ -3539,10 +3901,7 @@ class DrbdVolumeState(GenericDrbdObject):
             properties[consts.CSTATE_PREFIX + consts.FLAG_ATTACH] = (
                 bool_to_string(is_set(self._cstate, self.FLAG_ATTACH))
             )
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
         return properties
 
 
@@ -3620,6 +3979,8 @@ class Assignment(GenericDrbdObject):
                     0, 0, None, None,
                     get_serial_fn, None, None
                 )
+        for vol_state in self._vol_states.itervalues():
+            vol_state.set_assignment(self)
         self._node_id      = int(node_id)
         self._rc           = int(init_rc)
         self._snaps_assgs  = {}
@@ -3674,6 +4035,7 @@ class Assignment(GenericDrbdObject):
         if vol_st is not None:
             del self._vol_states[vol_id]
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def has_volume_states(self):
@@ -3696,15 +4058,17 @@ class Assignment(GenericDrbdObject):
                     )
                     if volume.is_resizing():
                         vol_st.begin_resize()
+                    vol_st.set_assignment(self)
                     self._vol_states[volume.get_id()] = vol_st
         # remove volume states for volumes that no longer exist in the resource
-        for vol_st in self._vol_states.itervalues():
+        for vol_st in self._vol_states.values():
             volume = self._resource.get_volume(vol_st.get_id())
             if volume is None:
                 update_assg = True
                 del self._vol_states[vol_st.get_id()]
         if update_assg:
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def add_snaps_assg(self, snaps_assg):
@@ -3778,6 +4142,13 @@ class Assignment(GenericDrbdObject):
         return size_sum
 
 
+    def pool_reserved_changed(self):
+        """
+        Notifies the node that this assignment's reserved storage space changed
+        """
+        self._node.pool_reserved_changed(self)
+
+
     def get_gross_size_kiB_correction(self, peers):
         """
         Calculates the storage size for not-yet-deployed assignments
@@ -3897,6 +4268,7 @@ class Assignment(GenericDrbdObject):
         if cstate != self._cstate:
             self._cstate = cstate & self.CSTATE_MASK
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def get_tstate(self):
@@ -3907,6 +4279,7 @@ class Assignment(GenericDrbdObject):
         if tstate != self._tstate:
             self._tstate = tstate & self.TSTATE_MASK
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def deploy(self):
@@ -3919,6 +4292,7 @@ class Assignment(GenericDrbdObject):
         if is_unset(self._tstate, self.FLAG_DEPLOY):
             self._tstate = self._tstate | self.FLAG_DEPLOY
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def undeploy(self):
@@ -3937,6 +4311,7 @@ class Assignment(GenericDrbdObject):
         if self._tstate != 0:
             self._tstate = 0
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def undeploy_adjust_cstate(self):
@@ -3963,6 +4338,7 @@ class Assignment(GenericDrbdObject):
                 if self._cstate != 0:
                     self._cstate = 0
                     self.get_props().new_serial()
+                    self.pool_reserved_changed()
 
 
     def connect(self):
@@ -4012,6 +4388,7 @@ class Assignment(GenericDrbdObject):
                 self._tstate = (self._tstate | self.FLAG_DEPLOY |
                                 self.FLAG_DISKLESS)
                 self.get_props().new_serial()
+                self.pool_reserved_changed()
 
 
     def update_connections(self):
@@ -4251,6 +4628,7 @@ class Assignment(GenericDrbdObject):
         self._cstate = (self._cstate | flags) & self.CSTATE_MASK
         if saved_cstate != self._cstate:
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def clear_cstate_flags(self, flags):
@@ -4258,6 +4636,7 @@ class Assignment(GenericDrbdObject):
         self._cstate = ((self._cstate | flags) ^ flags) & self.CSTATE_MASK
         if saved_cstate != self._cstate:
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def set_tstate_flags(self, flags):
@@ -4265,6 +4644,7 @@ class Assignment(GenericDrbdObject):
         self._tstate = (self._tstate | flags) & self.TSTATE_MASK
         if saved_tstate != self._tstate:
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def clear_tstate_flags(self, flags):
@@ -4272,6 +4652,7 @@ class Assignment(GenericDrbdObject):
         self._tstate = ((self._tstate | flags) ^ flags) & self.TSTATE_MASK
         if saved_tstate != self._tstate:
             self.get_props().new_serial()
+            self.pool_reserved_changed()
 
 
     def filter_match(self, filter_props):
@@ -4400,9 +4781,6 @@ class Assignment(GenericDrbdObject):
                 )
             )
 
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
 
         return properties
@@ -0,0 +1,373 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+In-memory model of the DRBD state reported by "drbdsetup events2"
+
+The server feeds every line of its "drbdsetup events2 all" child process
+into a DrbdEventsState object, which keeps track of the state of all
+resources, their devices (volumes), their connections and the peer devices
+of each connection. Queries about the current DRBD state are answered by
+looking up that model instead of running drbdsetup.
+
+Since the model is built from event lines only, it can be rebuilt from a
+recorded event log by DrbdEventsState.replay().
+"""
+
+import re
+import logging
+
+
+# events2 event types
+EVT_EXISTS  = "exists"
+EVT_CREATE  = "create"
+EVT_CHANGE  = "change"
+EVT_DESTROY = "destroy"
+
+# events2 object types
+OBJ_RESOURCE    = "resource"
+OBJ_DEVICE      = "device"
+OBJ_CONNECTION  = "connection"
+OBJ_PEER_DEVICE = "peer-device"
+
+# Object type of the "exists -" line that terminates the initial state dump
+OBJ_END_OF_EXISTS = "-"
+
+# events2 fields
+KEY_NAME         = "name"
+KEY_VOLUME       = "volume"
+KEY_PEER_NODE_ID = "peer-node-id"
+KEY_CONN_NAME    = "conn-name"
+KEY_ROLE         = "role"
+KEY_DISK         = "disk"
+KEY_CONNECTION   = "connection"
+KEY_REPLICATION  = "replication"
+KEY_PEER_DISK    = "peer-disk"
+
+DISK_UPTODATE = "UpToDate"
+
+EVT_LINE_PATTERN = re.compile(r'(?P<type>\w+) (?P<source>[\w-]+)(?P<attrs>.*)')
+EVT_ATTR_PATTERN = re.compile(r'([\w-]+):(\S+)')
+
+
+def parse_events2_line(line):
+    """
+    Splits a line of "drbdsetup events2" output
+
+    @return: tuple(event type, object type, dict of fields), or None if the
+             line cannot be parsed
+    """
+    match = EVT_LINE_PATTERN.match(line.strip())
+    if match is None:
+        return None
+    fields = dict(EVT_ATTR_PATTERN.findall(match.group('attrs')))
+    return match.group('type'), match.group('source'), fields
+
+
+class DrbdStateObject(object):
+
+    """
+    Fields of a DRBD object as last reported by events2
+    """
+
+    _props = None
+
+    def __init__(self):
+        self._props = {}
+
+    def update(self, props):
+        self._props.update(props)
+
+    def get_prop(self, key):
+        return self._props.get(key)
+
+    def get_props(self):
+        return dict(self._props)
+
+
+class DrbdDeviceState(DrbdStateObject):
+
+    def get_disk_state(self):
+        return self._props.get(KEY_DISK)
+
+
+class DrbdPeerDeviceState(DrbdStateObject):
+
+    def get_replication_state(self):
+        return self._props.get(KEY_REPLICATION)
+
+    def get_peer_disk_state(self):
+        return self._props.get(KEY_PEER_DISK)
+
+
+class DrbdConnectionState(DrbdStateObject):
+
+    _peer_node_id = None
+    _peer_devices = None
+
+    def __init__(self, peer_node_id):
+        super(DrbdConnectionState, self).__init__()
+        self._peer_node_id = peer_node_id
+        self._peer_devices = {}
+
+    def get_peer_node_id(self):
+        return self._peer_node_id
+
+    def get_conn_name(self):
+        return self._props.get(KEY_CONN_NAME)
+
+    def get_connection_state(self):
+        return self._props.get(KEY_CONNECTION)
+
+    def get_peer_device(self, vol_id):
+        return self._peer_devices.get(vol_id)
+
+    def iterate_peer_devices(self):
+        """
+        @return: iterator over tuples(volume id, DrbdPeerDeviceState)
+        """
+        return self._peer_devices.iteritems()
+
+
+class DrbdResourceState(DrbdStateObject):
+
+    _name        = None
+    _devices     = None
+    _connections = None
+
+    def __init__(self, name):
+        super(DrbdResourceState, self).__init__()
+        self._name = name
+        self._devices = {}
+        self._connections = {}
+
+    def get_name(self):
+        return self._name
+
+    def get_role(self):
+        return self._props.get(KEY_ROLE)
+
+    def get_device(self, vol_id):
+        return self._devices.get(vol_id)
+
+    def iterate_devices(self):
+        """
+        @return: iterator over tuples(volume id, DrbdDeviceState)
+        """
+        return self._devices.iteritems()
+
+    def get_connection(self, peer_node_id):
+        return self._connections.get(peer_node_id)
+
+    def get_connection_by_name(self, conn_name):
+        for connection in self._connections.itervalues():
+            if connection.get_conn_name() == conn_name:
+                return connection
+        return None
+
+    def iterate_connections(self):
+        return self._connections.itervalues()
+
+
+class DrbdEventsState(object):
+
+    """
+    Tracks the state of all DRBD resources from events2 lines
+
+    The model is complete after the "exists -" line that terminates the
+    initial state dump of "drbdsetup events2" has been processed, see
+    is_initialized(). If the events source is restarted, reset() must be
+    called, because the new source starts with a new initial state dump.
+    """
+
+    _resources   = None
+    _initialized = False
+
+    def __init__(self):
+        self._resources = {}
+        self._initialized = False
+
+    def reset(self):
+        self._resources = {}
+        self._initialized = False
+
+    def is_initialized(self):
+        """
+        Indicates whether the model reflects the current DRBD state
+
+        @return: True if the initial state dump was processed completely
+        """
+        return self._initialized
+
+    def process_line(self, line):
+        """
+        Updates the model from a line of "drbdsetup events2" output
+
+        @return: tuple(event type, object type, dict of fields), or None if
+                 the line cannot be parsed
+        """
+        event = parse_events2_line(line)
+        if event is not None:
+            self.process_event(*event)
+        return event
+
+    def process_event(self, evt_type, obj_type, fields):
+        """
+        Updates the model from an already split events2 line
+        """
+        if obj_type == OBJ_END_OF_EXISTS:
+            if evt_type == EVT_EXISTS:
+                self._initialized = True
+            return
+        if evt_type not in (EVT_EXISTS, EVT_CREATE, EVT_CHANGE, EVT_DESTROY):
+            # e.g. "call helper" and "response helper" lines
+            return
+
+        res_name = fields.get(KEY_NAME)
+        if res_name is None:
+            return
+        try:
+            if obj_type == OBJ_RESOURCE:
+                if evt_type == EVT_DESTROY:
+                    self._resources.pop(res_name, None)
+                else:
+                    self._get_resource(res_name).update(fields)
+            elif obj_type == OBJ_DEVICE:
+                vol_id = int(fields[KEY_VOLUME])
+                resource = self._get_resource(res_name)
+                if evt_type == EVT_DESTROY:
+                    resource._devices.pop(vol_id, None)
+                else:
+                    device = resource._devices.get(vol_id)
+                    if device is None:
+                        device = DrbdDeviceState()
+                        resource._devices[vol_id] = device
+                    device.update(fields)
+            elif obj_type == OBJ_CONNECTION:
+                peer_node_id = int(fields[KEY_PEER_NODE_ID])
+                resource = self._get_resource(res_name)
+                if evt_type == EVT_DESTROY:
+                    resource._connections.pop(peer_node_id, None)
+                else:
+                    self._get_connection(resource, peer_node_id).update(fields)
+            elif obj_type == OBJ_PEER_DEVICE:
+                peer_node_id = int(fields[KEY_PEER_NODE_ID])
+                vol_id = int(fields[KEY_VOLUME])
+                resource = self._get_resource(res_name)
+                connection = self._get_connection(resource, peer_node_id)
+                if evt_type == EVT_DESTROY:
+                    connection._peer_devices.pop(vol_id, None)
+                else:
+                    peer_device = connection._peer_devices.get(vol_id)
+                    if peer_device is None:
+                        peer_device = DrbdPeerDeviceState()
+                        connection._peer_devices[vol_id] = peer_device
+                    peer_device.update(fields)
+        except (KeyError, ValueError):
+            logging.debug(
+                "DrbdEventsState: ignored incomplete event: %s %s %s"
+                % (evt_type, obj_type, str(fields))
+            )
+
+    def replay(self, stream):
+        """
+        Rebuilds the model from a recorded "drbdsetup events2" log
+        """
+        self.reset()
+        for line in stream:
+            self.process_line(line)
+
+    def _get_resource(self, res_name):
+        resource = self._resources.get(res_name)
+        if resource is None:
+            resource = DrbdResourceState(res_name)
+            self._resources[res_name] = resource
+        return resource
+
+    def _get_connection(self, resource, peer_node_id):
+        connection = resource._connections.get(peer_node_id)
+        if connection is None:
+            connection = DrbdConnectionState(peer_node_id)
+            resource._connections[peer_node_id] = connection
+        return connection
+
+    def get_resource(self, res_name):
+        return self._resources.get(res_name)
+
+    def iterate_resources(self):
+        return self._resources.itervalues()
+
+    def get_disk_state(self, res_name, vol_id):
+        """
+        @return: the local disk state of a volume, or None if unknown
+        """
+        disk_state = None
+        resource = self._resources.get(res_name)
+        if resource is not None:
+            device = resource.get_device(vol_id)
+            if device is not None:
+                disk_state = device.get_disk_state()
+        return disk_state
+
+    def get_uptodate_count(self, res_name, vol_id):
+        """
+        Counts the UpToDate replicas of a volume known to the local node
+
+        @return: number of nodes (including the local one) with UpToDate data
+        """
+        count = 0
+        resource = self._resources.get(res_name)
+        if resource is not None:
+            if self.get_disk_state(res_name, vol_id) == DISK_UPTODATE:
+                count += 1
+            for connection in resource.iterate_connections():
+                peer_device = connection.get_peer_device(vol_id)
+                if (peer_device is not None and
+                        peer_device.get_peer_disk_state() == DISK_UPTODATE):
+                    count += 1
+        return count
+
+    def get_resource_view(self, res_name):
+        """
+        Generates a view of a resource's state suitable for serialized transfer
+
+        @return: [name, props, [[vol_id, props], ...],
+                  [[conn_name, props, [[vol_id, props], ...]], ...]]
+                 or None if the resource is unknown
+        """
+        resource = self._resources.get(res_name)
+        if resource is None:
+            return None
+        devices = [
+            [vol_id, device.get_props()]
+            for vol_id, device in sorted(resource.iterate_devices())
+        ]
+        connections = []
+        for connection in sorted(resource.iterate_connections(),
+                                 key=lambda conn: conn.get_peer_node_id()):
+            peer_devices = [
+                [vol_id, peer_device.get_props()]
+                for vol_id, peer_device in sorted(connection.iterate_peer_devices())
+            ]
+            conn_name = connection.get_conn_name()
+            if conn_name is None:
+                conn_name = str(connection.get_peer_node_id())
+            connections.append([conn_name, connection.get_props(), peer_devices])
+        return [resource.get_name(), resource.get_props(), devices, connections]
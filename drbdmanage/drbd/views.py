@@ -212,6 +212,12 @@ class AssignmentView(GenericView):
     ]
 
 
+    # Properties the view reads, which the client requests from the server
+    REQ_PROPS = [consts.NODE_NAME, consts.RES_NAME, consts.FAIL_COUNT] + [
+        entry[0] for entry in MR_CSTATE_TEXTS + MR_TSTATE_TEXTS
+    ]
+
+
     def __init__(self, properties, machine_readable):
         try:
             super(AssignmentView, self).__init__(properties)
@@ -382,6 +388,12 @@ class DrbdNodeView(GenericView):
     ]
 
 
+    # Properties the view reads, which the client requests from the server
+    REQ_PROPS = [consts.NODE_NAME, consts.IND_NODE_OFFLINE] + [
+        entry[0] for entry in MR_TSTATE_TEXTS
+    ]
+
+
     def __init__(self, properties, machine_readable):
         try:
             super(DrbdNodeView, self).__init__(properties)
@@ -503,6 +515,12 @@ class DrbdResourceView(GenericView):
     ]
 
 
+    # Properties the view reads, which the client requests from the server
+    REQ_PROPS = [consts.RES_NAME, consts.MANAGED] + [
+        entry[0] for entry in MR_TSTATE_TEXTS
+    ]
+
+
     def __init__(self, properties, machine_readable):
         try:
             super(DrbdResourceView, self).__init__(properties)
@@ -572,6 +590,12 @@ class DrbdVolumeView(GenericView):
     ]
 
 
+    # Properties the view reads, which the client requests from the server
+    REQ_PROPS = [consts.VOL_ID, consts.VOL_SIZE] + [
+        entry[0] for entry in MR_TSTATE_TEXTS
+    ]
+
+
     def __init__(self, properties, machine_readable):
         try:
             super(DrbdVolumeView, self).__init__(properties)
@@ -658,6 +682,12 @@ class DrbdVolumeStateView(GenericView):
     ]
 
 
+    # Properties the view reads, which the client requests from the server
+    REQ_PROPS = [consts.VOL_ID] + [
+        entry[0] for entry in MR_CSTATE_TEXTS + MR_TSTATE_TEXTS
+    ]
+
+
     def __init__(self, properties, machine_readable):
         try:
             super(DrbdVolumeStateView, self).__init__(properties)
@@ -127,3 +127,12 @@ class PluginManager():
             instance = self._get_new_instance(plugin_path)
             self._loaded[plugin_path] = instance
         return instance
+
+    def get_private_plugin_instance(self, plugin_path):
+        """
+        Returns a new plugin instance that is not shared with other callers
+
+        Used for plugins that keep their configuration for a longer time,
+        like the wait-for policies registered with the server's WaiterRegistry
+        """
+        return self._get_new_instance(plugin_path)
@@ -32,7 +32,9 @@ class PolicyBase(object):
 
       * "redundancy", "N"
         "N" copies must be available, ie. "N" nodes with UpToDate data.
-        NOT IMPLEMENTED YET (needs DRBD sync status)
+        The disk states are taken from the DRBD state of the node that runs
+        the plugin, so the resource must be deployed on that node.
+        Only implemented for resources.
 
 
     Additionally, this plugin takes additional arguments 'starttime' and
@@ -155,8 +157,20 @@ class PolicyBase(object):
                             policy=policies,
                             result=False)
 
-    def get_resource(self, res_name):
+    def run(self):
+        """Fetches the current configuration and evaluates the policy."""
         self._server.request_ctrlvol()
+        return self.evaluate()
+
+    def evaluate(self):
+        """Evaluates the policy against the configuration that is loaded.
+
+        Used by the server to evaluate pending policies again without
+        fetching the control volume every time (see WaiterRegistry).
+        """
+        raise RuntimeError("Virtual method")
+
+    def get_resource(self, res_name):
         res = self._server._resources.get(res_name)
         if not res:
             return ([(dm_exc.DM_ENOENT,
@@ -217,7 +231,29 @@ class WaitForResource(PolicyBase):
     def filter_good(self, assg):
         return [a for a in assg if a]
 
-    def run(self):
+    @staticmethod
+    def QD_redundancy(self, srv, xlist, _count):
+
+        c = int(_count)
+        drbd_state = srv.get_drbd_state()
+        if not drbd_state.is_initialized():
+            return False
+
+        res_name = self._conf['resource']
+        res = srv._resources.get(res_name)
+        vols = self._conf.get('volnr', '')
+        if vols == '' or vols == 'all':
+            vol_ids = [vol.get_id() for vol in res.iterate_volumes()]
+        else:
+            vol_ids = [int(vols, base=10)]
+        if not vol_ids:
+            return False
+
+        # the most scarce volume decides
+        uptodate = min([drbd_state.get_uptodate_count(res_name, vid) for vid in vol_ids])
+        return uptodate >= c
+
+    def evaluate(self):
 
         # Get config
         cnf = self._conf
@@ -260,7 +296,7 @@ class WaitForSnapshot(PolicyBase):
     def filter_good(self, xlist):
         return [a for a in xlist if a.is_deployed()]
 
-    def run(self):
+    def evaluate(self):
 
         # Get config
         cnf = self._conf
@@ -295,7 +331,7 @@ class WaitForVolumeSize(PolicyBase):
     Needs 'resource', 'volnr' and 'req_size' (in KB) as inputs.
     """
 
-    def run(self):
+    def evaluate(self):
 
         # Get config
         cnf = self._conf
@@ -200,6 +200,19 @@ class Props(object):
             if key.startswith(norm_namespace):
                 yield value
 
+    def iteritems_selected(self, keys):
+        """
+        Returns an iterator over the items of the given keys
+
+        Keys are looked up without a namespace; keys that are not set are
+        skipped
+        """
+        props = self._props
+        for key in keys:
+            value = props.get(key)
+            if value is not None:
+                yield (key, value)
+
     def iteritems(self, namespace=""):
         """
         Returns an iterator over the items of the container's dictionary
@@ -217,6 +230,13 @@ class PropsContainer(Props):
 
     _get_serial = None
 
+    # Number of changes since the container was created
+    _changes = 0
+
+    # Property index that the container is attached to, see PropsIndex
+    _index       = None
+    _index_owner = None
+
     def __init__(self, get_serial_fn, init_serial, ins_props):
         """
         Initializes a new properties container
@@ -248,27 +268,35 @@ class PropsContainer(Props):
 
     def set_prop(self, key, value, namespace=""):
         super(PropsContainer, self).set_prop(key, value, namespace)
-        self.new_serial()
+        self._changed()
 
     def set_selected_props(self, keys, ins_props, namespace=""):
         super(PropsContainer, self).set_selected_props(keys, ins_props, namespace)
-        self.new_serial()
+        self._changed()
 
     def remove_prop(self, key, namespace=""):
         super(PropsContainer, self).remove_prop(key, namespace)
-        self.new_serial()
+        self._changed()
 
     def remove_selected_props(self, keys, namespace=""):
         super(PropsContainer, self).remove_selected_props(keys, namespace)
-        self.new_serial()
+        self._changed()
 
     def merge_props(self, ins_props, namespace=""):
         super(PropsContainer, self).merge_props(ins_props, namespace)
-        self.new_serial()
+        self._changed()
 
     def merge_gen(self, gen_obj, namespace=""):
         super(PropsContainer, self).merge_gen(gen_obj, namespace)
+        self._changed()
+
+    def _changed(self):
+        """
+        Updates the serial number and the property index after a change
+        """
         self.new_serial()
+        if self._index is not None:
+            self._index.update(self._index_owner, self)
 
     def new_serial(self):
         """
@@ -282,8 +310,20 @@ class PropsContainer(Props):
         """
         serial = self._get_serial()
         self._props[consts.SERIAL] = str(serial)
+        self._changes += 1
         return serial
 
+    def get_revision(self):
+        """
+        Returns a value that identifies the current state of the container
+
+        The serial number alone does not change if the data is changed more
+        than once within the same change generation, therefore the revision
+        also counts the changes made since the container was created.
+        Revisions are only comparable for the same container instance.
+        """
+        return (self._props.get(consts.SERIAL), self._changes)
+
     def new_serial_gen(self):
         """
         Creates a new instance of the SerialNrGen class
@@ -338,3 +378,148 @@ class SerialGen(object):
         will return a new serial number.
         """
         self._change_open = False
+
+
+class PropsIndex(object):
+
+    """
+    Secondary index of objects by the values of selected properties
+
+    Maps each value of the indexed property keys to the objects that have
+    the property set to that value. The properties container of each
+    object attached to the index updates the index whenever its properties
+    change, so that the objects that match a property filter can be looked
+    up instead of checking every object. Objects are attached and detached
+    by synchronizing the index with its source whenever the validity key
+    passed to lookup() changes.
+    """
+
+    _keys      = None
+    _source_fn = None
+    _key       = None
+    # property key -> value -> set of objects
+    _values    = None
+    # object -> (properties container, dict of indexed property key -> value)
+    _members   = None
+
+    def __init__(self, keys, source_fn):
+        """
+        @param keys: property keys to index, without a namespace
+        @param source_fn: function that returns an iterable of all objects;
+                          objects must have a get_props() method
+        """
+        self._keys = frozenset([str(key) for key in keys])
+        self._source_fn = source_fn
+        self._values = dict([(key, {}) for key in self._keys])
+        self._members = {}
+
+    def get_keys(self):
+        return self._keys
+
+    def is_indexed(self, filter_props):
+        """
+        Returns True if all keys of the filter are indexed
+        """
+        if filter_props is None or len(filter_props) == 0:
+            return False
+        for key in filter_props.iterkeys():
+            if key not in self._keys:
+                return False
+        return True
+
+    def lookup(self, key, filter_props):
+        """
+        Returns the objects with a property that matches any of the filter's
+
+        Like GenericDrbdObject.properties_match(), an object matches if any
+        of the key/value pairs in filter_props matches its properties.
+
+        @param key: any value that changes whenever the source's objects change
+        @return: set of objects, or None if not all keys of the filter are
+                 indexed
+        """
+        if not self.is_indexed(filter_props):
+            return None
+        if key != self._key:
+            self.sync()
+            self._key = key
+        matches = set()
+        for prop_key, value in filter_props.iteritems():
+            objects = self._values[prop_key].get(str(value))
+            if objects is not None:
+                matches.update(objects)
+        return matches
+
+    def sync(self):
+        """
+        Attaches new objects of the source and detaches removed ones
+        """
+        current = set()
+        for obj in self._source_fn():
+            current.add(obj)
+            member = self._members.get(obj)
+            if member is None or member[0] is not obj.get_props():
+                self.add(obj)
+        for obj in [obj for obj in self._members.iterkeys() if obj not in current]:
+            self.remove(obj)
+
+    def clear(self):
+        """
+        Detaches all objects from the index
+        """
+        for obj in self._members.keys():
+            self.remove(obj)
+        self._key = None
+
+    def add(self, obj):
+        """
+        Attaches an object's properties container to the index
+        """
+        self.remove(obj)
+        props = obj.get_props()
+        if props._index is not None:
+            props._index.remove(props._index_owner)
+        props._index = self
+        props._index_owner = obj
+        self._members[obj] = (props, {})
+        self.update(obj, props)
+
+    def remove(self, obj):
+        """
+        Detaches an object's properties container from the index
+        """
+        member = self._members.pop(obj, None)
+        if member is not None:
+            props, values = member
+            if props._index is self:
+                props._index = None
+                props._index_owner = None
+            for prop_key, value in values.iteritems():
+                self._discard(prop_key, value, obj)
+
+    def update(self, obj, props):
+        """
+        Updates the index entries of an object after a change of its properties
+        """
+        member = self._members.get(obj)
+        if member is None:
+            return
+        values = member[1]
+        for prop_key in self._keys:
+            value = props._props.get(prop_key)
+            prev_value = values.get(prop_key)
+            if value != prev_value:
+                if prev_value is not None:
+                    self._discard(prop_key, prev_value, obj)
+                if value is None:
+                    del values[prop_key]
+                else:
+                    values[prop_key] = value
+                    self._values[prop_key].setdefault(value, set()).add(obj)
+
+    def _discard(self, prop_key, value, obj):
+        objects = self._values[prop_key].get(value)
+        if objects is not None:
+            objects.discard(obj)
+            if len(objects) == 0:
+                del self._values[prop_key][value]
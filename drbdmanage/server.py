@@ -45,14 +45,15 @@ import drbdmanage.drbd.metadata as md
 import drbdmanage.messagelog as msglog
 
 from drbdmanage.consts import (
-    SERIAL, NODE_NAME, NODE_ADDR, NODE_AF, RES_NAME, RES_PORT, VOL_MINOR, VOL_ID,
+    DBUS_CHANGES, SERIAL, NODE_NAME, NODE_ADDR, NODE_AF, RES_NAME, RES_PORT, VOL_MINOR, VOL_ID,
+    NODE_ID, NODE_POOLSIZE, NODE_POOLFREE, RES_SECRET, VOL_BDEV, CSTATE_PREFIX, TSTATE_PREFIX,
     DEFAULT_VG, KEY_DRBDCTRL_VG, KEY_CUR_MINOR_NR, DRBDCTRL_DEFAULT_PORT, KEY_LOGLEVEL, VOL_SIZE,
     DRBDCTRL_RES_NAME, DRBDCTRL_RES_FILE, DRBDCTRL_RES_PATH, RES_PORT_NR_AUTO,
     RES_PORT_NR_ERROR, FLAG_OVERWRITE, FLAG_DISCARD, FLAG_DISKLESS,
     FLAG_CONNECT, FLAG_DRBDCTRL, FLAG_STORAGE, FLAG_EXTERNAL, FLAG_STANDBY, FLAG_QIGNORE, FLAG_FORCEWIN,
     IND_NODE_OFFLINE, SNAPS_SRC_BLOCKDEV, DM_VERSION, DM_GITHASH,
     KEY_SERVER_VERSION, KEY_DRBD_KERNEL_VERSION, KEY_DRBD_UTILS_VERSION, KEY_SERVER_GITHASH,
-    KEY_DRBD_KERNEL_GIT_HASH, KEY_DRBD_UTILS_GIT_HASH,
+    KEY_DRBD_KERNEL_GIT_HASH, KEY_DRBD_UTILS_GIT_HASH, RC_RETRY_AFTER, RC_QUEUE_POS,
     CONF_NODE, CONF_GLOBAL, KEY_SITE, BOOL_TRUE, FILE_GLOBAL_COMMON_CONF, KEY_VG_NAME,
     KEY_SERVER_INSTANCE, NODE_VOL_0, NODE_VOL_1, NODE_PORT, NODE_SECRET, NODE_ADDRESS,
     DRBDCTRL_LV_NAME_0, DRBDCTRL_LV_NAME_1,
@@ -68,12 +69,14 @@ from drbdmanage.consts import (
     KEY_ERR_STRATEGY, KEY_ERR_RESUME_NO, KEY_ERR_MAX_BOFF, KEY_ERR_INVTERVAL,
 )
 from drbdmanage.utils import NioLineReader
-from drbdmanage.utils import DrbdSetupOpts
+from drbdmanage.utils import DrbdSetupOpts, get_drbdsetup_schema_cache
 from drbdmanage.utils import (
     build_path, extend_path, generate_secret, get_free_number,
-    add_rc_entry, serial_filter, props_filter, string_to_bool, bool_to_string,
+    add_rc_entry, serial_filter, props_filter, NameIndex, list_filter_match,
+    get_obj_serial, max_obj_serial, string_to_bool, bool_to_string,
     aux_props_selector, is_set, is_unset, key_value_string, load_server_conf_file,
     filter_prohibited, filter_allowed, generate_gi_hex_string, drbdctrl_has_primary, pickle_dbus,
+    DataHash,
 )
 from drbdmanage.exceptions import (
     DM_DEBUG, DM_ECTRLVOL, DM_EEXIST, DM_EINVAL, DM_EMINOR, DM_ENAME,
@@ -86,6 +89,9 @@ from drbdmanage.exceptions import (
     PluginException, SyntaxException, VolSizeRangeException, AbortException, QuorumException,
     DeployerException, InvalidAddrFamException, ResourceFileException, DebugException, dm_exc_text
 )
+from drbdmanage.drbd.drbdstate import DrbdEventsState
+from drbdmanage.waiters import WaiterRegistry, StartupWaiters
+from drbdmanage.changefeed import ChangeFeed
 from drbdmanage.drbd.drbdcore import (
     Assignment, DrbdManager, DrbdNode, DrbdResource, DrbdVolume,
     DrbdVolumeState, DrbdCommon
@@ -94,8 +100,8 @@ from drbdmanage.snapshots.snapshots import (
     DrbdSnapshot, DrbdSnapshotAssignment, DrbdSnapshotVolumeState
 )
 from drbdmanage.storage.storagecore import BlockDeviceManager, StoragePlugin, MinorNr
-from drbdmanage.conf.conffile import DrbdAdmConf
-from drbdmanage.propscontainer import PropsContainer
+from drbdmanage.conf.conffile import DrbdAdmConf, ConfFileBuffer
+from drbdmanage.propscontainer import PropsContainer, PropsIndex
 
 from drbdmanage.plugins.plugin import PluginManager
 from drbdmanage.proxy import DrbdManageProxy
@@ -117,6 +123,13 @@ class DrbdManageServer(object):
     OBJ_PERSIST_NAME   = "persistence"
     OBJ_MSGLOG_NAME    = "message_log"
 
+    # Serial number indexes
+    IDX_NODES       = "nodes"
+    IDX_RESOURCES   = "resources"
+    IDX_VOLUMES     = "volumes"
+    IDX_ASSIGNMENTS = "assignments"
+    IDX_SNAPSHOTS   = "snapshots"
+
     EVT_UTIL = "drbdsetup"
 
     EVT_TYPE_CHANGE = "change"
@@ -145,6 +158,25 @@ class DrbdManageServer(object):
 
     DRBD_KMOD_INFO_FILE = "/proc/drbd"
 
+    # Interval (in seconds) of running queued commands, see cmd_queue()
+    CMD_QUEUE_INTERVAL = 0.5
+
+    # Time (in seconds) after which clients should retry requests that the
+    # server was not ready for, if it cannot estimate a better one
+    NOT_READY_RETRY_HINT = 1.0
+
+    # Maximum number of entries returned by one call of the list_*_page
+    # functions
+    LIST_PAGE_MAX = 1000
+
+    # Filter keys that filter_match() also compares with attributes of the
+    # objects instead of their properties; such keys, and the keys of state
+    # flags, cannot be looked up in a property index
+    PROPS_INDEX_EXCLUDED = [
+        NODE_NAME, NODE_AF, NODE_ADDR, NODE_ID, NODE_POOLSIZE, NODE_POOLFREE,
+        RES_NAME, RES_SECRET, RES_PORT, VOL_ID, VOL_SIZE, VOL_MINOR, VOL_BDEV
+    ]
+
     LOGGING_FORMAT = "drbdmanaged[%(process)d]: %(levelname)-10s %(message)s"
 
     KEY_STOR_NAME      = "storage-plugin"
@@ -160,6 +192,11 @@ class DrbdManageServer(object):
     KEY_EXTEND_PATH    = "extend-path"
     KEY_DRBD_CONFPATH  = "drbd-conf-path"
     DEFAULT_DRBD_CONFPATH = "/var/lib/drbd.d"
+    KEY_POOL_CACHE_TTL = "pool-cache-ttl"
+    KEY_STARTUP_CONCURRENCY = "startup-concurrency"
+    # Comma separated list of property keys (e.g., aux:tenant) that the
+    # list_* functions look up in a property index, see _props_matches()
+    KEY_PROPS_INDEX    = "props-index"
 
     KEY_DEBUG_OUT_FILE = "debug-out-file"
 
@@ -172,6 +209,10 @@ class DrbdManageServer(object):
     DEFAULT_MAX_FAIL_COUNT = 3
     DEFAULT_ERR_MAX_BOFF = 65
     DEFAULT_ERR_INVTERVAL = 30
+    # Lifetime of cached storage pool information in seconds
+    DEFAULT_POOL_CACHE_TTL = 5
+    # Number of resources started concurrently when the server starts up
+    DEFAULT_STARTUP_CONCURRENCY = 1
 
     DEFAULT_MSGLOG_SIZE  = 50
 
@@ -190,6 +231,9 @@ class DrbdManageServer(object):
         KEY_MSGLOG_SIZE    : str(DEFAULT_MSGLOG_SIZE),
         KEY_EXTEND_PATH    : "/sbin:/usr/sbin:/bin:/usr/bin",
         KEY_DRBD_CONFPATH  : DEFAULT_DRBD_CONFPATH,
+        KEY_POOL_CACHE_TTL : str(DEFAULT_POOL_CACHE_TTL),
+        KEY_STARTUP_CONCURRENCY : str(DEFAULT_STARTUP_CONCURRENCY),
+        KEY_PROPS_INDEX    : "",
         KEY_DRBDCTRL_VG    : DEFAULT_VG,
         KEY_DEBUG_OUT_FILE : "/dev/stderr",
         KEY_LOGLEVEL       : "INFO",
@@ -242,6 +286,22 @@ class DrbdManageServer(object):
     _proc_evt  = None
     # Reader for the events log
     _reader    = None
+    # DRBD state model maintained from the events log
+    _drbd_state = None
+    # Pending wait-for plugin policies
+    _waiters    = None
+    # Clients waiting for the end of the server's startup
+    _ready_waiters = None
+    # Cluster-wide change notifications
+    _change_feed = None
+    # Objects of the list_* functions with their serial numbers, see _changed_since()
+    _serial_sources = None
+    # Name indexes for the list_*_page functions, see _name_page()
+    _name_indexes = None
+    # Property indexes for filtering the list_* functions, see _props_matches()
+    _props_indexes = None
+    _props_index_sources = None
+    _props_index_conf = None
     # Event handler for incoming data
     _evt_in_h  = None
     # Event handler for the hangup event on the subprocess pipe
@@ -266,6 +326,16 @@ class DrbdManageServer(object):
     # Common DRBD options
     _common    = None
 
+    # Rendered DRBD configuration files that have not been updated yet
+    _conf_buffers = None
+    # Content hashes of the DRBD configuration files written last,
+    # see update_assignment_conf()
+    _conf_file_hashes = None
+    # DrbdCommon object and its revision that the global configuration
+    # file was written from last, see update_global_conf()
+    _global_conf_common   = None
+    _global_conf_revision = None
+
     _path = None
 
     # Logging
@@ -323,6 +393,7 @@ class DrbdManageServer(object):
 
     KEY_NOTHING = "nothing"
     KEY_TWOINT = "twoint"
+    KEY_PAGE = "page"
     wrapped_returns = {
         'assign': KEY_NOTHING,
         'attach': KEY_NOTHING,
@@ -345,9 +416,15 @@ class DrbdManageServer(object):
         'get_site_config': [],
         'init_node': KEY_NOTHING,
         'list_assignments': [],
+        'list_assignments_page': KEY_PAGE,
+        'list_drbd_states': [],
         'list_nodes': [],
+        'list_nodes_page': KEY_PAGE,
         'list_resources': [],
+        'list_resources_page': KEY_PAGE,
         'list_volumes': [],
+        'list_volumes_page': KEY_PAGE,
+        'list_snapshots_page': KEY_PAGE,
         'list_snapshot_assignments': [],
         'modify_assignment': KEY_NOTHING,
         'modify_resource': KEY_NOTHING,
@@ -364,6 +441,7 @@ class DrbdManageServer(object):
         'restore_snapshot': KEY_NOTHING,
         'request_ctrlvol': KEY_NOTHING,
         'run_external_plugin': {},
+        'wait_for_plugin': {},
         'set_cluster_config': KEY_NOTHING,
         'set_ctrlvol': KEY_NOTHING,
         'set_drbdsetup_props': KEY_NOTHING,
@@ -379,6 +457,8 @@ class DrbdManageServer(object):
                 return fn_rc
             if self.wrapped_returns[name] == self.KEY_TWOINT:
                 return fn_rc, 0, 0  # might need update if second fkt besides cluster_free_query
+            if self.wrapped_returns[name] == self.KEY_PAGE:
+                return fn_rc, [], ""
             else:
                 return fn_rc, self.wrapped_returns[name]
         else:
@@ -388,12 +468,8 @@ class DrbdManageServer(object):
     def wait_startup(f):
         @wraps(f)
         def wrapper(self, *args, **kwargs):
-            if (not self._server_role_decided) or\
-               (self._server_role_decided and self._server_role == SAT_SATELLITE and
-                    self._current_leader_ip == ''):
-                fn_rc = []
-                add_rc_entry(fn_rc, DM_ENOTREADY_STARTUP, dm_exc_text(DM_ENOTREADY_STARTUP))
-                return self.gen_wrapped_rc(f.__name__, fn_rc)
+            if self._startup_pending():
+                return self.gen_wrapped_rc(f.__name__, self._startup_rc())
             else:
                 return f(self, *args, **kwargs)
         return wrapper
@@ -436,7 +512,28 @@ class DrbdManageServer(object):
             if self._server_role == SAT_SATELLITE:
                 if not self._request_ctrlvol():
                     fn_rc = []
-                    add_rc_entry(fn_rc, DM_ENOTREADY_REQCTRL, dm_exc_text(DM_ENOTREADY_REQCTRL))
+                    add_rc_entry(fn_rc, DM_ENOTREADY_REQCTRL, dm_exc_text(DM_ENOTREADY_REQCTRL),
+                                 [[RC_RETRY_AFTER, str(self.NOT_READY_RETRY_HINT)]])
+                    return self.gen_wrapped_rc(f.__name__, fn_rc)
+            return f(self, *args, **kwargs)
+        return wrapper
+
+    def req_ctrlvol_first_page(f):
+        # like req_ctrlvol, but for the list_*_page functions: only the first
+        # page (empty cursor) fetches the ctrlvol, continuation pages are
+        # generated from the data that was fetched for the first page, so that
+        # a listing does not transfer the ctrlvol once per page
+        # assumes @wait_startup <- caller responsible
+        cursor_idx = f.__code__.co_varnames.index("cursor") - 1
+
+        @wraps(f)
+        def wrapper(self, *args, **kwargs):
+            cursor = kwargs.get("cursor", args[cursor_idx] if len(args) > cursor_idx else "")
+            if self._server_role == SAT_SATELLITE and not cursor:
+                if not self._request_ctrlvol():
+                    fn_rc = []
+                    add_rc_entry(fn_rc, DM_ENOTREADY_REQCTRL, dm_exc_text(DM_ENOTREADY_REQCTRL),
+                                 [[RC_RETRY_AFTER, str(self.NOT_READY_RETRY_HINT)]])
                     return self.gen_wrapped_rc(f.__name__, fn_rc)
             return f(self, *args, **kwargs)
         return wrapper
@@ -482,6 +579,80 @@ class DrbdManageServer(object):
         # Initialize the server's message log
         self._message_log = msglog.MessageLog(DrbdManageServer.DEFAULT_MSGLOG_SIZE)
 
+        self._conf_buffers = {}
+        self._conf_file_hashes = {}
+
+        self._drbd_state = DrbdEventsState()
+        self._waiters = WaiterRegistry(self)
+        self._ready_waiters = StartupWaiters(self._startup_rc)
+
+        # A change of a volume selects its resource with all of its volumes,
+        # a change of a volume state selects its assignment
+        self._serial_sources = {
+            self.IDX_NODES: (lambda: self._nodes.itervalues(), get_obj_serial),
+            self.IDX_RESOURCES: (lambda: self._resources.itervalues(), get_obj_serial),
+            self.IDX_VOLUMES: (
+                lambda: self._resources.itervalues(),
+                lambda res: max_obj_serial([res] + list(res.iterate_volumes()))
+            ),
+            self.IDX_ASSIGNMENTS: (
+                lambda: (
+                    assg for res in self._resources.itervalues()
+                    for assg in res.iterate_assignments()
+                ),
+                lambda assg: max_obj_serial([assg] + list(assg.iterate_volume_states()))
+            ),
+            self.IDX_SNAPSHOTS: (
+                lambda: (
+                    snaps for res in self._resources.itervalues()
+                    for snaps in res.iterate_snapshots()
+                ),
+                get_obj_serial
+            ),
+        }
+
+        # Assignments and snapshots are named by the names of their node
+        # or resource and their own name, e.g. "node1/res0"
+        self._name_indexes = {
+            self.IDX_NODES: NameIndex(
+                lambda: [(node.get_name(), node) for node in self._nodes.itervalues()]
+            ),
+            self.IDX_RESOURCES: NameIndex(
+                lambda: [(res.get_name(), res) for res in self._resources.itervalues()]
+            ),
+            self.IDX_ASSIGNMENTS: NameIndex(
+                lambda: [
+                    (assg.get_node().get_name() + "/" + res.get_name(), assg)
+                    for res in self._resources.itervalues()
+                    for assg in res.iterate_assignments()
+                ]
+            ),
+            self.IDX_SNAPSHOTS: NameIndex(
+                lambda: [
+                    (res.get_name() + "/" + snaps.get_name(), snaps)
+                    for res in self._resources.itervalues()
+                    for snaps in res.iterate_snapshots()
+                ]
+            ),
+        }
+
+        # Property indexes are created for the configured property keys
+        # when they are first used
+        self._props_indexes = {}
+        self._props_index_sources = {
+            self.IDX_NODES: lambda: self._nodes.itervalues(),
+            self.IDX_RESOURCES: lambda: self._resources.itervalues(),
+            self.IDX_VOLUMES: lambda: [
+                vol for res in self._resources.itervalues() for vol in res.iterate_volumes()
+            ],
+            self.IDX_ASSIGNMENTS: lambda: [
+                assg for res in self._resources.itervalues() for assg in res.iterate_assignments()
+            ],
+            self.IDX_SNAPSHOTS: lambda: [
+                snaps for res in self._resources.itervalues() for snaps in res.iterate_snapshots()
+            ],
+        }
+
         # Initialize the server's objects / datastructures
         self._init_objects()
 
@@ -510,6 +681,7 @@ class DrbdManageServer(object):
         else:
             logging.warning("Server created without passing a signal factory, "
                             "signals are disabled")
+        self._change_feed = ChangeFeed(self, self.create_signal(DBUS_CHANGES))
 
         # DRBD manager (manages DRBD resources using drbdadm etc.)
         self._drbd_mgr = DrbdManager(self)
@@ -715,6 +887,8 @@ class DrbdManageServer(object):
                     fcntl.F_SETFL,
                     fcntl.F_GETFL | os.O_NONBLOCK)
         self._reader = NioLineReader(self._evt_file)
+        # The new events source starts with a new initial state dump
+        self._drbd_state.reset()
 
         # TODO: wait for the "exists -" line from drbdsetup events2,
         #       probably either here or somewhere in run();
@@ -877,6 +1051,7 @@ class DrbdManageServer(object):
             # Start up the resources deployed by drbdmanage on the current node
             self._drbd_mgr.initial_up()
             self._server_role_decided = True
+            self._notify_ready()
             self.reset_grace()
             if self._server_role == SAT_LEADER_NODE:
                 logging.debug("Grace period started at %s" % self._sat_grace_start)
@@ -985,7 +1160,11 @@ class DrbdManageServer(object):
             if not via_queue:
                 self._sat_lock.release()
         else:
-            add_rc_entry(fn_rc, DM_ENOTREADY, dm_exc_text(DM_ENOTREADY))
+            # Queued commands are run one per CMD_QUEUE_INTERVAL
+            queue_pos = self._cmd_queue.qsize()
+            add_rc_entry(fn_rc, DM_ENOTREADY, dm_exc_text(DM_ENOTREADY),
+                         [[RC_RETRY_AFTER, str((queue_pos + 1) * self.CMD_QUEUE_INTERVAL)],
+                          [RC_QUEUE_POS, str(queue_pos)]])
 
         return fn_rc
 
@@ -1003,7 +1182,7 @@ class DrbdManageServer(object):
         return True
 
     def schedule_cmd_queue(self):
-        gobject.timeout_add(500, self.cmd_queue)
+        gobject.timeout_add(int(self.CMD_QUEUE_INTERVAL * 1000), self.cmd_queue)
 
     def set_current_leader(self, addr):
         self._current_leader_ip = addr
@@ -1013,6 +1192,9 @@ class DrbdManageServer(object):
             self._current_leader_name = name
         except:
             pass
+        # Called by the proxy's threads, the clients are answered by the main loop
+        if self._ready_waiters.count() > 0:
+            gobject.idle_add(self._notify_ready)
 
     def resume_service(self):
         # satellites don't resume and as long as the server role is undecided, do nothing
@@ -1175,6 +1357,7 @@ class DrbdManageServer(object):
         _, self._failed_actions = self._drbd_mgr.run(override_hash_check,
                                                      poke_cluster,
                                                      lock_already_hold)
+        self._waiters.notify_conf_changed()
 
     def run_changes(self):
         """
@@ -1198,6 +1381,7 @@ class DrbdManageServer(object):
         invoked to check, whether any changes are required on this node.
         """
         changed = False
+        evt_res_names = set()
         while True:
             line = self._reader.readline()
             if line is not None:
@@ -1209,6 +1393,10 @@ class DrbdManageServer(object):
                 if match is not None:
                     # try to parse args
                     line_data, evt_type, evt_source = self._drbd_event_split(match)
+                    self._drbd_state.process_event(evt_type, evt_source, line_data)
+                    res_name = line_data.get(self.EVT_ARG_NAME)
+                    if res_name is not None:
+                        evt_res_names.add(res_name)
 
                     # Detect potential changes of the data on the
                     # control volume
@@ -1218,6 +1406,8 @@ class DrbdManageServer(object):
                 break
         if changed and self._server_role_decided and self._server_role == SAT_LEADER_NODE:
             self._manager_run(False, False)
+        if len(evt_res_names) > 0:
+            self._waiters.notify_drbd_events(evt_res_names)
         # True = GMainLoop shall not unregister this event handler
         return True
 
@@ -1231,12 +1421,14 @@ class DrbdManageServer(object):
                 line = self._reader.readline()
                 if line is not None:
                     if line.startswith("exists -"):
+                        self._drbd_state.process_line(line)
                         break
                     else:
                         match = self._evt_pat.match(line)
                         if match is not None:
                             # try to parse args
                             line_data, evt_type, evt_source = self._drbd_event_split(match)
+                            self._drbd_state.process_event(evt_type, evt_source, line_data)
 
                             # Detect Quorum changes, etc.
                             self._drbd_event_change_trigger(evt_type, evt_source, line_data)
@@ -1611,6 +1803,37 @@ class DrbdManageServer(object):
             add_rc_entry(fn_rc, DM_EPLUGIN, "error running plugin")
         return fn_rc, {}
 
+    @wait_startup
+    def wait_for_plugin(self, plugin_name, props, reply_fn):
+        """
+        Registers a wait-for plugin policy that is answered once it is decided
+
+        Unlike run_external_plugin(), which evaluates the policy once per
+        call, the policy is evaluated again whenever the configuration of
+        its resource changes or DRBD reports events for the resource, until
+        it is fulfilled, fails or times out (see WaiterRegistry). The result
+        is passed to reply_fn(fn_rc, result) in the same format as the
+        result of run_external_plugin().
+
+        @return: None if the policy was registered, or the return code and
+                 empty result if the request failed
+        """
+        fn_rc = []
+        try:
+            plugin = self._pluginmgr.get_private_plugin_instance(plugin_name)
+            if plugin is None:
+                add_rc_entry(fn_rc, DM_EPLUGIN, "Error loading plugin: %(msg)s",
+                             [["msg", plugin_name]])
+            elif props.get("resource") is None:
+                add_rc_entry(fn_rc, DM_EINVAL, "Missing plugin argument: %(arg)s",
+                             [["arg", "resource"]])
+            else:
+                self._waiters.add(plugin, props, reply_fn)
+                return None
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+        return fn_rc, {}
+
     def peek_serial(self):
         """
         Returns the current serial number without changing it
@@ -1685,6 +1908,109 @@ class DrbdManageServer(object):
         return self._bd_mgr
 
 
+    def _changed_since(self, index_name, serial):
+        """
+        Returns the objects of a list_* function that changed after serial
+        """
+        source_fn, serial_fn = self._serial_sources[index_name]
+        return serial_filter(serial, source_fn(), serial_fn)
+
+    def _name_page(self, index_name, cursor, limit, select_fn=None):
+        """
+        Returns a page of the objects of a name index, see NameIndex.page()
+
+        The index is rebuilt whenever its validity key changes, see
+        _index_key(). The limit is capped at LIST_PAGE_MAX.
+        """
+        if limit <= 0 or limit > self.LIST_PAGE_MAX:
+            limit = self.LIST_PAGE_MAX
+        return self._name_indexes[index_name].page(self._index_key(), cursor, limit, select_fn)
+
+    def _props_matches(self, index_name, filter_props):
+        """
+        Returns the objects of a property index that match filter_props
+
+        The properties containers of the indexed objects update the index
+        on every change of their properties; objects are attached to or
+        detached from the index whenever its validity key changes, see
+        _index_key().
+
+        @return: set of matching objects, or None if not all keys of the
+                 filter are indexed and the objects must be checked by
+                 their filter_match() function instead
+        """
+        if filter_props is None or len(filter_props) == 0:
+            return None
+        index_conf = self.get_conf_value(self.KEY_PROPS_INDEX)
+        if index_conf != self._props_index_conf:
+            self._init_props_indexes(index_conf)
+        props_index = self._props_indexes.get(index_name)
+        if props_index is None:
+            return None
+        return props_index.lookup(self._index_key(), filter_props)
+
+    def _init_props_indexes(self, index_conf):
+        """
+        Creates the property indexes for the keys configured by KEY_PROPS_INDEX
+        """
+        keys = []
+        if index_conf is not None:
+            for key in index_conf.split(","):
+                key = key.strip()
+                if len(key) == 0:
+                    continue
+                if (key in self.PROPS_INDEX_EXCLUDED or key.startswith(TSTATE_PREFIX) or
+                        key.startswith(CSTATE_PREFIX)):
+                    logging.warning("Property '%s' cannot be indexed, ignored" % (key))
+                else:
+                    keys.append(key)
+        for props_index in self._props_indexes.itervalues():
+            props_index.clear()
+        self._props_indexes = {}
+        if len(keys) > 0:
+            for index_name, source_fn in self._props_index_sources.iteritems():
+                self._props_indexes[index_name] = PropsIndex(keys, source_fn)
+        self._props_index_conf = index_conf
+
+    def _props_filter(self, index_name, objects, filter_props):
+        """
+        Selects the objects that match filter_props, see props_filter()
+
+        Uses the property index if all keys of the filter are indexed.
+
+        @param objects: the objects to select from, or None to select from
+                        all objects of the index
+        """
+        matches = self._props_matches(index_name, filter_props)
+        if matches is None:
+            if objects is None:
+                objects = self._props_index_sources[index_name]()
+            return props_filter(objects, filter_props)
+        if objects is None:
+            return matches
+        return (obj for obj in objects if obj in matches)
+
+    def _index_key(self):
+        """
+        Returns the validity key of the name and property indexes
+
+        Every change of an object requests a serial number from the cluster
+        configuration, which changes its revision; the key changes with the
+        revision, the cluster configuration instance (e.g., after the
+        configuration was reloaded) and the number of nodes or resources.
+        """
+        return (
+            self._cluster_conf, self._cluster_conf.get_revision(),
+            len(self._nodes), len(self._resources)
+        )
+
+    def get_drbd_state(self):
+        """
+        Returns the DRBD state model maintained from the events log
+        """
+        return self._drbd_state
+
+
     def get_message_log(self):
         """
         Returns the message log instance
@@ -4035,8 +4361,10 @@ class DrbdManageServer(object):
                         poolfree = self._pool_free_correction(
                             inst_node, poolfree
                         )
+                        usage_props = self._bd_mgr.get_usage_props()
                         if (inst_node.get_poolsize() != poolsize or
-                            inst_node.get_poolfree() != poolfree):
+                            inst_node.get_poolfree() != poolfree or
+                            self._usage_props_changed(inst_node, usage_props)):
                                 fn_rc = self.update_pool(
                                     [ inst_node.get_name() ]
                                 )
@@ -4052,18 +4380,35 @@ class DrbdManageServer(object):
         return fn_rc
 
     def update_satellite_pools(self, satellite_names=[]):
+        """
+        Requests updated storage pool information from satellites
+
+        Returns True if any satellite changed the configuration data,
+        otherwise False. The second pass over the satellites is skipped
+        if the first one did not change anything.
+
+        @return: True if the configuration data changed
+        """
         if len(satellite_names) == 0:
             satellite_names = self.get_satellite_names()
 
         self._persist.json_export(self._objects_root)
+        changed = False
         for i in range(2):
+            pass_changed = False
             for satellite_name in satellite_names:
                 opcode, length, data = self._proxy.send_cmd(satellite_name, KEY_S_CMD_UPPOOL)
                 if opcode != self._proxy.opcodes[KEY_S_ANS_OK]:  # could be a stale socket
                     # THINK: mv retry to proxy?
                     opcode, length, data = self._proxy.send_cmd(satellite_name, KEY_S_CMD_UPPOOL)
                 if opcode == self._proxy.opcodes[KEY_S_ANS_OK]:
-                    self._persist.set_json_data(data)
+                    if data != self._persist.get_json_data():
+                        pass_changed = True
+                        self._persist.set_json_data(data)
+            if not pass_changed:
+                break
+            changed = True
+        return changed
 
     @wait_startup
     @fwd_leader
@@ -4071,21 +4416,32 @@ class DrbdManageServer(object):
         """
         Updates information about the current node's storage pool
 
+        Explicit updates always query the storage plugin instead of using
+        cached storage pool information.
+
         @return: standard return code defined in drbdmanage.exceptions
         free space
         """
         fn_rc = []
         persist = None
         try:
+            if self._bd_mgr is not None:
+                self._bd_mgr.invalidate_pool()
             persist = self.begin_modify_conf()
             if persist is not None:
                 logging.info("updating storage pool information")
+                serial = self.peek_serial()
                 sub_rc = self.update_pool_data()
                 if sub_rc == DM_SUCCESS:
                     self.cleanup()
-                    self.update_satellite_pools(node_names)
-                    self._persist.json_import(self._objects_root)
-                    self.save_conf_data(persist)
+                    sat_changed = self.update_satellite_pools(node_names)
+                    if sat_changed:
+                        self._persist.json_import(self._objects_root)
+                    if sat_changed or self.peek_serial() != serial:
+                        self.save_conf_data(persist)
+                    else:
+                        logging.debug("storage pool information unchanged, "
+                                      "skipping the control volume update")
                 else:
                     add_rc_entry(fn_rc, sub_rc, dm_exc_text(sub_rc))
             else:
@@ -4123,6 +4479,7 @@ class DrbdManageServer(object):
                             inst_node, poolfree
                         )
                         inst_node.set_pool(poolsize, poolfree)
+                        self._set_usage_props(inst_node, self._bd_mgr.get_usage_props())
                     fn_rc = DM_SUCCESS
                 else:
                     # Node without storage
@@ -4136,6 +4493,30 @@ class DrbdManageServer(object):
         return fn_rc
 
 
+    def _usage_props_changed(self, node, usage_props):
+        """
+        Checks whether the storage pool usage properties of a node changed
+        """
+        props = node.get_props()
+        for key, value in usage_props.iteritems():
+            if props.get_prop(key) != value:
+                return True
+        return False
+
+
+    def _set_usage_props(self, node, usage_props):
+        """
+        Sets the storage pool usage properties reported by the storage plugin
+
+        Properties are only changed if their value changed, so that the
+        node's serial number stays the same otherwise.
+        """
+        props = node.get_props()
+        for key, value in usage_props.iteritems():
+            if props.get_prop(key) != value:
+                props.set_prop(key, value)
+
+
     def _pool_free_correction(self, node, poolfree_in):
         """
         Predicts remaining free storage space
@@ -4149,11 +4530,9 @@ class DrbdManageServer(object):
             # Unparseable configuration value;
             # no-op: keep default value
             pass
-        size_sum = 0
-        for assignment in node.iterate_assignments():
-            size_sum += assignment.get_gross_size_kiB_correction(
-                max_peers
-            )
+        size_sum = node.get_pool_reserved(max_peers)
+        if self._root_logger.isEnabledFor(logging.DEBUG):
+            size_sum = self._pool_reserved_check(node, max_peers, size_sum)
         poolfree_out = poolfree_in - size_sum
         # If something is seriously wrong with the storage sizes,
         # (e.g. more storage required for deploying all resources
@@ -4163,6 +4542,30 @@ class DrbdManageServer(object):
         return poolfree_out
 
 
+    def _pool_reserved_check(self, node, max_peers, size_sum):
+        """
+        Compares a node's reserved storage space against a full recalculation
+
+        Debugging aid for the incremental bookkeeping of reserved storage
+        space; on a mismatch, the node's bookkeeping is reset and the result
+        of the full recalculation is returned
+        """
+        check_sum = 0
+        for assignment in node.iterate_assignments():
+            check_sum += assignment.get_gross_size_kiB_correction(
+                max_peers
+            )
+        if check_sum != size_sum:
+            logging.warning(
+                "Node '%s': reserved storage space mismatch, "
+                "tracked %d kiB, recalculated %d kiB"
+                % (node.get_name(), size_sum, check_sum)
+            )
+            node.reset_pool_reserved()
+            size_sum = check_sum
+        return size_sum
+
+
     def cleanup(self):
         """
         Removes entries of undeployed nodes, resources, volumes or their
@@ -4517,31 +4920,21 @@ class DrbdManageServer(object):
             node_list = []
             if node_names is not None and len(node_names) > 0:
                 selected_nodes = node_filter()
+                if serial > 0:
+                    selected_nodes = serial_filter(serial, selected_nodes)
+            elif serial > 0:
+                selected_nodes = self._changed_since(self.IDX_NODES, serial)
             else:
-                selected_nodes = self._nodes.itervalues()
-            if serial > 0:
-                selected_nodes = serial_filter(serial, selected_nodes)
+                selected_nodes = None
 
             if filter_props is not None and len(filter_props) > 0:
-                selected_nodes = props_filter(selected_nodes, filter_props)
-
-            control_node = True if self._server_role_potential == SAT_POTENTIAL_LEADER_NODE else False
+                selected_nodes = self._props_filter(self.IDX_NODES, selected_nodes, filter_props)
+            elif selected_nodes is None:
+                selected_nodes = self._nodes.itervalues()
 
             instance_node = self.get_instance_node()
             for node in selected_nodes:
-                node_props = node.get_properties(req_props)
-                # Indicate if a node with a control volume is not connected/replicating
-
-                if control_node:
-                    if (node is not instance_node and
-                        is_set(node.get_state(), DrbdNode.FLAG_DRBDCTRL)):
-                        if not self._quorum.is_active_member_node(node.get_name()):
-                            node_props[IND_NODE_OFFLINE] = BOOL_TRUE
-                node_entry = [
-                    node.get_name(),
-                    node_props
-                ]
-                node_list.append(node_entry)
+                node_list.append(self._node_entry(node, req_props, instance_node))
                 add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
             return fn_rc, node_list
         except Exception as exc:
@@ -4549,6 +4942,72 @@ class DrbdManageServer(object):
 
         return fn_rc, None
 
+    @wait_startup
+    @req_ctrlvol_first_page
+    def list_nodes_page(self, node_names, serial, filter_props, req_props, cursor, limit):
+        """
+        Generates a page of the list of node views, see list_nodes()
+
+        Returns up to limit entries for the nodes with names that sort after
+        cursor and the cursor for the next page, which is empty after the
+        last page. If filters are applied, a page may have fewer entries
+        than limit, or none at all. Clients can list large clusters in
+        bounded memory this way.
+        """
+        fn_rc = []
+        try:
+            node_set = self._list_name_set(fn_rc, node_names, self._nodes, NODE_NAME, cursor)
+            matches = self._props_matches(self.IDX_NODES, filter_props)
+
+            def select(node):
+                return (
+                    (node_set is None or node.get_name() in node_set) and
+                    list_filter_match(node, serial, filter_props, matches=matches)
+                )
+
+            selected_nodes, next_cursor = self._name_page(self.IDX_NODES, cursor, limit, select)
+            instance_node = self.get_instance_node()
+            node_list = [
+                self._node_entry(node, req_props, instance_node) for node in selected_nodes
+            ]
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+            return fn_rc, node_list, next_cursor
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, [], ""
+
+    def _node_entry(self, node, req_props, instance_node):
+        """
+        Generates the list entry of a node view, see list_nodes()
+        """
+        node_props = node.get_properties(req_props)
+        # Indicate if a node with a control volume is not connected/replicating
+        if self._server_role_potential == SAT_POTENTIAL_LEADER_NODE:
+            if (node is not instance_node and
+                is_set(node.get_state(), DrbdNode.FLAG_DRBDCTRL)):
+                if not self._quorum.is_active_member_node(node.get_name()):
+                    node_props[IND_NODE_OFFLINE] = BOOL_TRUE
+        return [node.get_name(), node_props]
+
+    def _list_name_set(self, fn_rc, names, objects, name_key, cursor):
+        """
+        Returns the set of names that a list_*_page function filters by
+
+        Names of objects that do not exist are reported as DM_ENOENT on the
+        first page, which has an empty cursor.
+
+        @return: set of names, or None if the list is not filtered by name
+        """
+        if names is None or len(names) == 0:
+            return None
+        if not cursor:
+            for name in names:
+                if name not in objects:
+                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
+                                 [ [ name_key, name ] ])
+        return set(names)
+
     @wait_startup
     @req_ctrlvol
     def list_resources(self, res_names, serial, filter_props, req_props):
@@ -4572,13 +5031,17 @@ class DrbdManageServer(object):
             res_list = []
             if res_names is not None and len(res_names) > 0:
                 selected_res = resource_filter(res_names)
+                if serial > 0:
+                    selected_res = serial_filter(serial, selected_res)
+            elif serial > 0:
+                selected_res = self._changed_since(self.IDX_RESOURCES, serial)
             else:
-                selected_res = self._resources.itervalues()
-            if serial > 0:
-                selected_res = serial_filter(serial, selected_res)
+                selected_res = None
 
             if filter_props is not None and len(filter_props) > 0:
-                selected_res = props_filter(selected_res, filter_props)
+                selected_res = self._props_filter(self.IDX_RESOURCES, selected_res, filter_props)
+            elif selected_res is None:
+                selected_res = self._resources.itervalues()
 
             for res in selected_res:
                 res_entry = [
@@ -4593,6 +5056,34 @@ class DrbdManageServer(object):
 
         return fn_rc, None
 
+    @wait_startup
+    @req_ctrlvol_first_page
+    def list_resources_page(self, res_names, serial, filter_props, req_props, cursor, limit):
+        """
+        Generates a page of the list of resource views, see list_nodes_page()
+        """
+        fn_rc = []
+        try:
+            res_set = self._list_name_set(fn_rc, res_names, self._resources, RES_NAME, cursor)
+            matches = self._props_matches(self.IDX_RESOURCES, filter_props)
+
+            def select(res):
+                return (
+                    (res_set is None or res.get_name() in res_set) and
+                    list_filter_match(res, serial, filter_props, matches=matches)
+                )
+
+            selected_res, next_cursor = self._name_page(self.IDX_RESOURCES, cursor, limit, select)
+            res_list = [
+                [res.get_name(), res.get_properties(req_props)] for res in selected_res
+            ]
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+            return fn_rc, res_list, next_cursor
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, [], ""
+
     @wait_startup
     @req_ctrlvol
     def list_volumes(self, res_names, serial, filter_props, req_props):
@@ -4613,33 +5104,25 @@ class DrbdManageServer(object):
                     yield res
 
         try:
-            selected_res = self._resources.itervalues()
+            # A change of the resource or of any of its volumes selects
+            # the resource with all of its volumes
             if res_names is not None and len(res_names) > 0:
                 selected_res = resource_filter(res_names)
-            # TODO: serial filter on vols? or serial bubbled "up", so on res as a perf opt?
-            if serial > 0:
-                selected_res = serial_filter(serial, selected_res)
+                if serial > 0:
+                    selected_res = serial_filter(
+                        serial, selected_res,
+                        lambda res: max_obj_serial([res] + list(res.iterate_volumes()))
+                    )
+            elif serial > 0:
+                selected_res = self._changed_since(self.IDX_VOLUMES, serial)
+            else:
+                selected_res = self._resources.itervalues()
 
-            props_filter_flag = True if filter_props is not None and len(filter_props) > 0 else False
+            matches = self._props_matches(self.IDX_VOLUMES, filter_props)
             res_list = []
             for res in selected_res:
-                selected_vol = res.iterate_volumes()
-                if props_filter_flag:
-                    selected_vol = props_filter(
-                        selected_vol, filter_props
-                    )
-                if serial > 0:
-                    selected_vol = serial_filter(serial, selected_vol)
-
-                vol_list = []
-                for vol in selected_vol:
-                    vol_entry = [ vol.get_id(), vol.get_properties(req_props) ]
-                    vol_list.append(vol_entry)
-                if (not props_filter_flag) or len(vol_list) > 0:
-                    res_entry = [
-                        res.get_name(),
-                        res.get_properties(req_props), vol_list
-                    ]
+                res_entry = self._volumes_entry(res, filter_props, req_props, matches)
+                if res_entry is not None:
                     res_list.append(res_entry)
             add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
             return fn_rc, res_list
@@ -4648,6 +5131,65 @@ class DrbdManageServer(object):
 
         return fn_rc, []
 
+    @wait_startup
+    @req_ctrlvol_first_page
+    def list_volumes_page(self, res_names, serial, filter_props, req_props, cursor, limit):
+        """
+        Generates a page of the list of volume views, see list_nodes_page()
+        """
+        fn_rc = []
+        try:
+            res_set = self._list_name_set(fn_rc, res_names, self._resources, RES_NAME, cursor)
+            matches = self._props_matches(self.IDX_VOLUMES, filter_props)
+
+            def select(res):
+                return (
+                    (res_set is None or res.get_name() in res_set) and
+                    list_filter_match(
+                        res, serial, None,
+                        lambda res: max_obj_serial([res] + list(res.iterate_volumes()))
+                    ) and
+                    (filter_props is None or len(filter_props) == 0 or
+                     any([list_filter_match(vol, 0, filter_props, matches=matches)
+                          for vol in res.iterate_volumes()]))
+                )
+
+            selected_res, next_cursor = self._name_page(self.IDX_RESOURCES, cursor, limit, select)
+            res_list = [
+                self._volumes_entry(res, filter_props, req_props, matches) for res in selected_res
+            ]
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+            return fn_rc, res_list, next_cursor
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, [], ""
+
+    def _volumes_entry(self, res, filter_props, req_props, matches=None):
+        """
+        Generates the list entry of a resource and its volumes, see list_volumes()
+
+        @param matches: set of the volumes that match filter_props, if they
+                        were looked up in a property index
+        @return: the entry, or None if filter_props is set and none of the
+                 resource's volumes match it
+        """
+        selected_vol = res.iterate_volumes()
+        props_filter_flag = True if filter_props is not None and len(filter_props) > 0 else False
+        if props_filter_flag:
+            if matches is None:
+                selected_vol = props_filter(selected_vol, filter_props)
+            else:
+                selected_vol = [vol for vol in selected_vol if vol in matches]
+
+        vol_list = []
+        for vol in selected_vol:
+            vol_entry = [ vol.get_id(), vol.get_properties(req_props) ]
+            vol_list.append(vol_entry)
+        if props_filter_flag and len(vol_list) == 0:
+            return None
+        return [res.get_name(), res.get_properties(req_props), vol_list]
+
     @wait_startup
     @req_ctrlvol
     def list_assignments(self, node_names, res_names, serial,
@@ -4667,7 +5209,9 @@ class DrbdManageServer(object):
                         yield assg
 
         try:
+            filter_names = False
             if node_names is not None and len(node_names) > 0:
+                filter_names = True
                 selected_nodes = {}
                 for node_name in node_names:
                     node = self._nodes.get(node_name)
@@ -4680,6 +5224,7 @@ class DrbdManageServer(object):
                 selected_nodes = self._nodes
 
             if res_names is not None and len(res_names) > 0:
+                filter_names = True
                 selected_res = {}
                 for res_name in res_names:
                     res = self._resources.get(res_name)
@@ -4691,31 +5236,31 @@ class DrbdManageServer(object):
             else:
                 selected_res = self._resources
 
-            selected_assg = assg_filter(selected_nodes, selected_res)
-            if serial > 0:
-                selected_assg = serial_filter(serial, selected_assg)
+            if filter_names:
+                selected_assg = assg_filter(selected_nodes, selected_res)
+                if serial > 0:
+                    selected_assg = serial_filter(
+                        serial, selected_assg,
+                        lambda assg: max_obj_serial(
+                            [assg] + list(assg.iterate_volume_states())
+                        )
+                    )
+            elif serial > 0:
+                selected_assg = self._changed_since(self.IDX_ASSIGNMENTS, serial)
+            elif filter_props is not None and len(filter_props) > 0:
+                # Selected from all assignments by the property filter below
+                selected_assg = None
+            else:
+                selected_assg = assg_filter(selected_nodes, selected_res)
 
             if filter_props is not None and len(filter_props) > 0:
-                selected_assg = props_filter(selected_assg, filter_props)
+                selected_assg = self._props_filter(
+                    self.IDX_ASSIGNMENTS, selected_assg, filter_props
+                )
 
             assg_list = []
             for assg in selected_assg:
-                vol_state_list = []
-                for vol_state in assg.iterate_volume_states():
-                    vol_state_entry = [
-                        vol_state.get_id(),
-                        # FIXME: req_props, filter_props, nothing?
-                        vol_state.get_properties(None)
-                    ]
-                    vol_state_list.append(vol_state_entry)
-                assg_entry = [
-                    assg.get_node().get_name(),
-                    assg.get_resource().get_name(),
-                    # FIXME: req_props, filter_props, nothing?
-                    assg.get_properties(None),
-                    vol_state_list
-                ]
-                assg_list.append(assg_entry)
+                assg_list.append(self._assignment_entry(assg, req_props))
             add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
             return fn_rc, assg_list
         except Exception as exc:
@@ -4723,6 +5268,66 @@ class DrbdManageServer(object):
 
         return fn_rc, None
 
+    @wait_startup
+    @req_ctrlvol_first_page
+    def list_assignments_page(self, node_names, res_names, serial,
+                              filter_props, req_props, cursor, limit):
+        """
+        Generates a page of the list of assignment views, see list_nodes_page()
+
+        The cursor of an assignment is "<node name>/<resource name>".
+        """
+        fn_rc = []
+        try:
+            node_set = self._list_name_set(fn_rc, node_names, self._nodes, NODE_NAME, cursor)
+            res_set = self._list_name_set(fn_rc, res_names, self._resources, RES_NAME, cursor)
+            matches = self._props_matches(self.IDX_ASSIGNMENTS, filter_props)
+
+            def select(assg):
+                return (
+                    (node_set is None or assg.get_node().get_name() in node_set) and
+                    (res_set is None or assg.get_resource().get_name() in res_set) and
+                    list_filter_match(
+                        assg, serial, filter_props,
+                        lambda assg: max_obj_serial(
+                            [assg] + list(assg.iterate_volume_states())
+                        ),
+                        matches
+                    )
+                )
+
+            selected_assg, next_cursor = self._name_page(
+                self.IDX_ASSIGNMENTS, cursor, limit, select
+            )
+            assg_list = [self._assignment_entry(assg, req_props) for assg in selected_assg]
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+            return fn_rc, assg_list, next_cursor
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, [], ""
+
+    def _assignment_entry(self, assg, req_props):
+        """
+        Generates the list entry of an assignment view, see list_assignments()
+
+        The requested properties apply to the assignment and to its volume
+        states; all properties are returned if req_props is empty.
+        """
+        vol_state_list = []
+        for vol_state in assg.iterate_volume_states():
+            vol_state_entry = [
+                vol_state.get_id(),
+                vol_state.get_properties(req_props)
+            ]
+            vol_state_list.append(vol_state_entry)
+        return [
+            assg.get_node().get_name(),
+            assg.get_resource().get_name(),
+            assg.get_properties(req_props),
+            vol_state_list
+        ]
+
     @wait_startup
     @fwd_leader
     def create_snapshot(self, res_name, snaps_name, node_names, props):
@@ -4874,21 +5479,32 @@ class DrbdManageServer(object):
                     yield snaps
 
         try:
+            # Resource name -> changed snapshots, if selected by the index
+            changed_sn = None
             selected_res = self._resources.itervalues()
             if res_names is not None and len(res_names) > 0:
                 selected_res = resource_filter(res_names)
-            #if serial > 0:
-            #    selected_res = serial_filter(serial, selected_res)
+            elif serial > 0 and (snaps_names is None or len(snaps_names) == 0):
+                changed_sn = {}
+                for snaps in self._changed_since(self.IDX_SNAPSHOTS, serial):
+                    changed_sn.setdefault(snaps.get_resource().get_name(), []).append(snaps)
+                selected_res = [
+                    self._resources[res_name] for res_name in sorted(changed_sn.iterkeys())
+                ]
 
             res_list = []
             for res in selected_res:
-                if snaps_names is not None and len(snaps_names) > 0:
+                if changed_sn is not None:
+                    selected_sn = changed_sn[res.get_name()]
+                elif snaps_names is not None and len(snaps_names) > 0:
                     selected_sn = snaps_filter(res, snaps_names)
                 else:
                     selected_sn = res.iterate_snapshots()
+                if changed_sn is None and serial > 0:
+                    selected_sn = serial_filter(serial, selected_sn)
                 if filter_props is not None and len(filter_props) > 0:
-                    selected_sn = props_filter(
-                        selected_sn, filter_props
+                    selected_sn = self._props_filter(
+                        self.IDX_SNAPSHOTS, selected_sn, filter_props
                     )
 
                 sn_list = []
@@ -4908,6 +5524,44 @@ class DrbdManageServer(object):
             self.catch_and_append_internal_error(fn_rc, exc)
         return fn_rc, res_list
 
+    @wait_startup
+    @req_ctrlvol_first_page
+    def list_snapshots_page(self, res_names, snaps_names, serial,
+                            filter_props, req_props, cursor, limit):
+        """
+        Generates a page of the list of snapshots, see list_nodes_page()
+
+        The cursor of a snapshot is "<resource name>/<snapshot name>". The
+        snapshots of a resource may be split across several pages, each
+        page then has an entry for that resource.
+        """
+        fn_rc = []
+        try:
+            res_set = self._list_name_set(fn_rc, res_names, self._resources, RES_NAME, cursor)
+            snaps_set = set(snaps_names) if snaps_names is not None and len(snaps_names) > 0 else None
+            matches = self._props_matches(self.IDX_SNAPSHOTS, filter_props)
+
+            def select(snaps):
+                return (
+                    (res_set is None or snaps.get_resource().get_name() in res_set) and
+                    (snaps_set is None or snaps.get_name() in snaps_set) and
+                    list_filter_match(snaps, serial, filter_props, matches=matches)
+                )
+
+            selected_sn, next_cursor = self._name_page(self.IDX_SNAPSHOTS, cursor, limit, select)
+            res_list = []
+            for sn in selected_sn:
+                res_name = sn.get_resource().get_name()
+                if len(res_list) == 0 or res_list[-1][0] != res_name:
+                    res_list.append([res_name, []])
+                res_list[-1][1].append([sn.get_name(), sn.get_properties(req_props)])
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+            return fn_rc, res_list, next_cursor
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+
+        return fn_rc, [], ""
+
     @wait_startup
     @req_ctrlvol
     def list_snapshot_assignments(self, res_names, snaps_names, node_names,
@@ -4985,6 +5639,38 @@ class DrbdManageServer(object):
 
         return fn_rc, assg_list
 
+    @wait_startup
+    def list_drbd_states(self, res_names):
+        """
+        List the DRBD state of resources on this node
+
+        The state is taken from the model that is maintained from the
+        "drbdsetup events2" log, see drbdmanage.drbd.drbdstate
+        """
+        fn_rc = []
+        state_list = None
+        try:
+            drbd_state = self._drbd_state
+            if res_names is not None and len(res_names) > 0:
+                selected_names = res_names
+            else:
+                selected_names = sorted(
+                    [res_state.get_name() for res_state in drbd_state.iterate_resources()]
+                )
+            state_list = []
+            for res_name in selected_names:
+                res_view = drbd_state.get_resource_view(res_name)
+                if res_view is None:
+                    add_rc_entry(fn_rc, DM_ENOENT, dm_exc_text(DM_ENOENT),
+                                 [ [ RES_NAME, res_name ] ])
+                else:
+                    state_list.append(res_view)
+        except Exception as exc:
+            self.catch_and_append_internal_error(fn_rc, exc)
+        if len(fn_rc) == 0:
+            add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return fn_rc, state_list
+
     @wait_startup
     @fwd_leader
     def restore_snapshot(self, res_name, snaps_res_name, snaps_name,
@@ -5433,6 +6119,8 @@ class DrbdManageServer(object):
         persist.load(self._objects_root)
         self._conf_hash = persist.get_stored_hash()
         self.load_server_conf(self.CONF_STAGE[self.KEY_FROM_CTRL_VOL])
+        # Changes made by other nodes
+        self._change_feed.publish()
 
     def save_conf_data(self, persist):
         """
@@ -5448,6 +6136,7 @@ class DrbdManageServer(object):
         hash_obj = persist.get_hash_obj()
         if hash_obj is not None:
             self._conf_hash = hash_obj.get_hex_hash()
+        self._change_feed.publish()
 
 
     def open_conf(self):
@@ -5663,11 +6352,11 @@ class DrbdManageServer(object):
         resource = assignment.get_resource()
         res_name = resource.get_name()
 
-        assg_conf, global_conf = self.open_assignment_conf(res_name)
+        assg_conf, global_conf_path = self.open_assignment_conf(res_name)
         writer = DrbdAdmConf(self._objects_root)
         file_written = False
         try:
-            writer.write(assg_conf, assignment, False, global_conf)
+            writer.write(assg_conf, assignment, False, global_conf_path)
             file_written = True
         except IOError as io_error:
             res_exc = ResourceFileException(
@@ -5677,7 +6366,7 @@ class DrbdManageServer(object):
             self._message_log.add_entry(msglog.MessageLog.ALERT, res_exc.get_log_message())
             raise res_exc
         finally:
-            self.close_assignment_conf(assg_conf, global_conf)
+            self.close_assignment_conf(assg_conf)
         if file_written:
             self.update_assignment_conf(res_name)
 
@@ -5694,6 +6383,7 @@ class DrbdManageServer(object):
         fn_rc = 0
         file_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
                                  "drbdmanage_" + resource_name + ".res")
+        self._conf_file_hashes.pop(file_path, None)
         return self.remove_file(file_path)
 
 
@@ -5718,98 +6408,158 @@ class DrbdManageServer(object):
 
     def open_assignment_conf(self, resource_name):
         """
-        Opens DRBD configuration files for updating
+        Opens a DRBD resource configuration file for updating
 
-        If either file cannot be opened, both files are closed and
-        a ResourceFileException is generated
+        The configuration is rendered into a memory buffer; the file is
+        only written by update_assignment_conf() if its content changed.
+        The global configuration file that the resource configuration file
+        refers to is updated first, if necessary.
 
-        @returns: tuple(resource configuration file stream, global configuration file stream)
+        @returns: tuple(resource configuration file stream, path of the global configuration file)
         """
+        global_conf_path = self.update_global_conf()
         assg_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
                                  "drbdmanage_" + resource_name + ".res.tmp")
-        global_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
-                                   FILE_GLOBAL_COMMON_CONF + ".tmp")
-        assg_conf = None
-        global_conf = None
-        try:
-            try:
-                assg_conf = open(assg_path, "w")
-            except OSError as os_error:
-                logging.error(
-                    "Cannot update DRBD resource file '%s', error "
-                    "returned by the OS is: %s"
-                    % (assg_path, os_error.strerror)
-                )
-                raise ResourceFileException(assg_path)
+        assg_conf = ConfFileBuffer(assg_path)
+        self._conf_buffers[resource_name] = assg_conf
+        return assg_conf, global_conf_path
+
+
+    def update_global_conf(self):
+        """
+        Updates the global configuration file with the common DRBD options
+
+        The file is only rendered again if the DrbdCommon object has changed
+        (or was replaced by reloading the configuration) since it was written
+        last, and it is only rewritten if its content changed.
+        If the file cannot be updated, a ResourceFileException is generated.
+
+        @returns: path of the global configuration file; None if there are no common options
+        """
+        global_final_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
+                                   FILE_GLOBAL_COMMON_CONF)
+        global_tmp_path = global_final_path + ".tmp"
+
+        common = self._common
+        if common is None:
+            return None
+        revision = common.get_props().get_revision()
+        cached = self._conf_file_hashes.get(global_final_path)
+        if (common is self._global_conf_common and revision == self._global_conf_revision and
+                cached is not None and self._conf_file_unchanged(global_final_path, cached[0])):
+            return global_final_path
+
+        global_conf = ConfFileBuffer(global_tmp_path)
+        writer = DrbdAdmConf(self._objects_root)
+        if not writer.write_global(global_conf):
+            return None
+        global_data = global_conf.get_data()
+        global_conf.close()
+
+        global_hash = self._conf_data_hash(global_data)
+        if self._conf_file_unchanged(global_final_path, global_hash):
+            logging.debug("Configuration file '%s' unchanged, skipped" % (global_final_path))
+        else:
             try:
-                global_conf = open(global_path, "w")
-            except OSError as os_error:
-                logging.error(
-                    "Cannot update DRBD global configuration file '%s', error "
-                    "returned by the OS is: %s"
-                    % (global_path, os_error.strerror)
-                )
-                raise ResourceFileException(global_path)
-        except ResourceFileException as res_file_exc:
-            if assg_conf is None:
-                try:
-                    assg_conf.close()
-                except:
-                    pass
-            if global_conf is None:
-                try:
-                    global_conf.close()
-                except:
-                    pass
-            raise res_file_exc
-        return assg_conf, global_conf
+                self._write_conf_file(global_tmp_path, global_data)
+                os.rename(global_tmp_path, global_final_path)
+            except (IOError, OSError) as os_error:
+                logging.info('Could not rename %s\n' % global_tmp_path)
+                self._conf_file_hashes.pop(global_final_path, None)
+                self._global_conf_common = None
+                raise ResourceFileException(global_final_path)
+            # Resource configuration files must be validated again against
+            # the new common options, even if their own content is unchanged
+            self._conf_file_hashes.clear()
+            self._conf_file_written(global_final_path, global_hash)
+            logging.debug("Configuration file '%s' written" % (global_final_path))
+        self._global_conf_common = common
+        self._global_conf_revision = revision
+        return global_final_path
 
 
     def update_assignment_conf(self, resource_name):
         """
-        Update the final configuration files by moving the temporary ones
+        Update the final resource configuration file from the rendered configuration
 
         If the update fails, a ResourceFileException is generated.
-        The method always attempts to move both files. If the resource configuration file
-        cannot be moved, the exception reports the resource configuration file path. If
-        the global configuration file cannot be moved, the exception reports the global
-        configuration file path. If both files cannot be moved, the exception reports
-        the resource configuration file path.
+
+        Files whose content has not changed since they were written last are
+        neither rewritten nor validated by drbdadm again.
         """
         assg_final_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
                                  "drbdmanage_" + resource_name + ".res")
         assg_tmp_path = assg_final_path + ".tmp"
-        global_final_path = os.path.join(self._conf[self.KEY_DRBD_CONFPATH],
-                                   FILE_GLOBAL_COMMON_CONF)
-        global_tmp_path = global_final_path + ".tmp"
 
-        update_exception = None
+        assg_conf = self._conf_buffers.pop(resource_name, None)
+        if assg_conf is None:
+            raise ResourceFileException(assg_final_path)
 
-        # Attempt to move the global configuration file
-        try:
-            os.rename(global_tmp_path, global_final_path)
-        except OSError as os_error:
-            logging.info('Could not rename %s\n' % global_tmp_path)
-            update_exception = ResourceFileException(global_final_path)
+        update_exception = None
 
-        # Attempt to move the resource configuration file
-        if update_exception is None:
+        assg_data = assg_conf.get_data()
+        assg_hash = self._conf_data_hash(assg_data)
+        if self._conf_file_unchanged(assg_final_path, assg_hash):
+            logging.debug("Configuration file '%s' unchanged, skipped" % (assg_final_path))
+        else:
+            self._conf_file_hashes.pop(assg_final_path, None)
             try:
+                self._write_conf_file(assg_tmp_path, assg_data)
                 if not self._drbd_mgr.check_res_file(resource_name, assg_tmp_path, assg_final_path):
                     logging.info('Resource file %s not valid\n' % assg_tmp_path)
                     os.rename(assg_tmp_path, assg_final_path + '.q')
                     update_exception = ResourceFileException(assg_final_path)
                 else:
                     os.rename(assg_tmp_path, assg_final_path)
-            except OSError as os_error:
+                    self._conf_file_written(assg_final_path, assg_hash)
+                    logging.debug("Configuration file '%s' written" % (assg_final_path))
+            except (IOError, OSError) as os_error:
                 update_exception = ResourceFileException(assg_final_path)
 
         if update_exception is not None:
             raise update_exception
 
-    def close_assignment_conf(self, assg_conf, global_conf):
+    def _conf_data_hash(self, data):
+        data_hash = DataHash()
+        data_hash.update(data)
+        return data_hash.get_hex_hash()
+
+    def _conf_file_unchanged(self, file_path, data_hash):
         """
-        Closes the resource/global configuration file streams
+        Checks whether a configuration file still has the specified content
+
+        The check relies on the hash recorded when the file was written
+        last and on the file's modification time and size, so that files
+        modified or removed by someone else are detected.
+        """
+        cached = self._conf_file_hashes.get(file_path)
+        if cached is None or cached[0] != data_hash:
+            return False
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return False
+        return cached[1:] == (file_stat.st_mtime, file_stat.st_size)
+
+    def _conf_file_written(self, file_path, data_hash):
+        try:
+            file_stat = os.stat(file_path)
+            self._conf_file_hashes[file_path] = (
+                data_hash, file_stat.st_mtime, file_stat.st_size
+            )
+        except OSError:
+            self._conf_file_hashes.pop(file_path, None)
+
+    def _write_conf_file(self, file_path, data):
+        conf_file = open(file_path, "w")
+        try:
+            conf_file.write(data)
+        finally:
+            conf_file.close()
+
+    def close_assignment_conf(self, assg_conf):
+        """
+        Closes the resource configuration file stream
         """
         try:
             if assg_conf is not None:
@@ -5821,16 +6571,6 @@ class DrbdManageServer(object):
                 % (assg_conf.name, os_error.strerror)
             )
 
-        try:
-            if global_conf is not None:
-                global_conf.close()
-        except OSError as os_error:
-            logging.error(
-                "Cannot close DRBD global configuration file '%s', error "
-                "returned by the OS is: %s"
-                % (global_conf.name, os_error.strerror)
-            )
-
 
     def get_conf_hash(self):
         """
@@ -5891,6 +6631,55 @@ class DrbdManageServer(object):
         add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
         return fn_rc
 
+    def wait_ready(self, timeout, reply_fn):
+        """
+        Answers a client once the server finished its startup
+
+        Unlike wait_for_startup(), which answers at once, the request is kept
+        pending until the server is ready or until the timeout ends, so that
+        clients do not have to poll the server during its startup. The
+        return codes are passed to reply_fn(fn_rc); if the timeout ended,
+        they are the same as those of any request during the startup.
+
+        @return: the return codes if the server is ready, None if the
+                 request was registered
+        """
+        if self._startup_pending():
+            self._ready_waiters.add(timeout, reply_fn)
+            return None
+        fn_rc = []
+        add_rc_entry(fn_rc, DM_SUCCESS, dm_exc_text(DM_SUCCESS))
+        return fn_rc
+
+    def _startup_pending(self):
+        """
+        Indicates whether the server is still starting up
+
+        Satellites are not ready until they know the current leader.
+        """
+        return (
+            (not self._server_role_decided) or
+            (self._server_role == SAT_SATELLITE and self._current_leader_ip == '')
+        )
+
+    def _startup_rc(self):
+        fn_rc = []
+        add_rc_entry(fn_rc, DM_ENOTREADY_STARTUP, dm_exc_text(DM_ENOTREADY_STARTUP),
+                     [[RC_RETRY_AFTER, str(self.NOT_READY_RETRY_HINT)]])
+        return fn_rc
+
+    def _notify_ready(self):
+        """
+        Answers the clients waiting for the end of the startup if the server
+        is ready
+
+        Can be used as a GMainLoop callback
+        """
+        if not self._startup_pending():
+            self._ready_waiters.notify_ready()
+        # False = GMainLoop shall unregister this event handler
+        return False
+
     @wait_startup
     def init_node(self, name, props):
         """
@@ -6232,7 +7021,10 @@ class DrbdManageServer(object):
                 except IOError:
                     pass
 
-        # TODO: retrieve the drbd-utils' version
+        # Retrieve the drbd-utils' version, cached with the drbdsetup options
+        utils_version = get_drbdsetup_schema_cache().get_version()
+        if utils_version is not None:
+            drbd_utils_version = utils_version
 
         version_info = [
             key_value_string(KEY_SERVER_VERSION, DM_VERSION),
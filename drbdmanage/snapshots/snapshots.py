@@ -143,10 +143,7 @@ class DrbdSnapshot(drbdcommon.GenericDrbdObject):
             properties[consts.RES_NAME] = self._resource.get_name()
 
         # Add PropsContainer properties
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
 
         return properties
 
@@ -431,10 +428,7 @@ class DrbdSnapshotAssignment(drbdcommon.GenericDrbdObject):
             )
 
         # Add PropsContainer properties
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
 
         return properties
 
@@ -613,9 +607,6 @@ class DrbdSnapshotVolumeState(drbdcommon.GenericDrbdObject,
             )
 
         # Add PropsContainer properties
-        for (key, val) in self.get_props().iteritems():
-            if selected(key):
-                if val is not None:
-                    properties[key] = str(val)
+        selector.select_props(self.get_props(), properties)
 
         return properties
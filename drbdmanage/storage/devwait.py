@@ -0,0 +1,223 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+"""
+Waits for block devices to show up after a backing storage volume was created
+
+The device nodes and symlinks (e.g. /dev/zvol/<pool>/<vol>, /dev/<vg>/<lv>)
+are created asynchronously by udev. Instead of polling each path once per
+second, the nearest existing parent directory of every pending path is
+watched with inotify, so the waiter wakes up as soon as something changes.
+If inotify is not available, the waiter falls back to polling.
+"""
+
+import os
+import stat
+import time
+import errno
+import select
+import logging
+import ctypes
+import ctypes.util
+
+
+# inotify flags, see <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CREATE | IN_MOVED_TO | IN_ATTRIB | IN_ONLYDIR
+
+# Upper limit for a single sleep; pending paths are rechecked at least this
+# often, even if no inotify event arrives (e.g., a symlink that was created
+# before its target device node)
+RECHECK_INTERVAL = 1.0
+
+# Fallback polling interval if inotify is unavailable
+POLL_INTERVAL = 1.0
+
+_libc = None
+
+
+def _get_libc():
+    """
+    Loads the C library for the inotify calls
+
+    @return: the libc handle or None, if inotify is unavailable
+    """
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            # Fail early if the symbols are not there
+            libc.inotify_init1
+            libc.inotify_add_watch
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc if _libc else None
+
+
+def is_blockdev(path):
+    """
+    Checks whether path exists and is (or links to) a block device
+
+    @return: True if path is a block device, False otherwise
+    """
+    try:
+        return stat.S_ISBLK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def _watch_dir(path):
+    """
+    Finds the nearest existing ancestor directory of a path
+
+    @return: directory path
+    """
+    watch_dir = os.path.dirname(os.path.abspath(path))
+    while not os.path.isdir(watch_dir):
+        parent = os.path.dirname(watch_dir)
+        if parent == watch_dir:
+            break
+        watch_dir = parent
+    return watch_dir
+
+
+class DeviceWaiter(object):
+
+    """
+    Waits for a set of block devices to appear
+
+    Any number of paths can be waited for concurrently; all of them share
+    one inotify instance and one deadline.
+    """
+
+    _fd = None
+    _watched = None
+
+    def __init__(self):
+        self._fd = None
+        self._watched = set()
+        libc = _get_libc()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+            else:
+                logging.debug(
+                    "DeviceWaiter: inotify_init1() failed (%s), "
+                    "falling back to polling"
+                    % (os.strerror(ctypes.get_errno()))
+                )
+
+    def close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+            self._watched = set()
+
+    def uses_inotify(self):
+        return self._fd is not None
+
+    def _add_watches(self, paths):
+        """
+        Watches the nearest existing directory of each pending path
+
+        The set of watched directories changes while intermediate directories
+        are created (e.g. /dev/zvol/<pool> for the first volume of a pool),
+        therefore this is rerun after every wakeup.
+        """
+        libc = _get_libc()
+        for path in paths:
+            watch_dir = _watch_dir(path)
+            if watch_dir in self._watched:
+                continue
+            wd = libc.inotify_add_watch(self._fd, watch_dir, WATCH_MASK)
+            if wd >= 0:
+                self._watched.add(watch_dir)
+
+    def _drain(self):
+        while True:
+            try:
+                if not os.read(self._fd, 4096):
+                    break
+            except OSError as os_err:
+                if os_err.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+
+    def _sleep(self, timeout):
+        if self._fd is not None:
+            try:
+                ready, _, _ = select.select([self._fd], [], [], timeout)
+                if ready:
+                    self._drain()
+            except (select.error, OSError):
+                time.sleep(timeout)
+        else:
+            time.sleep(timeout)
+
+    def wait(self, paths, timeout):
+        """
+        Waits until all paths are block devices or the timeout expires
+
+        @param paths: iterable of device paths
+        @param timeout: maximum time to wait in seconds
+        @return: set of paths that did not appear in time (empty on success)
+        """
+        pending = set(paths)
+        deadline = time.time() + timeout
+        interval = RECHECK_INTERVAL if self._fd is not None else POLL_INTERVAL
+        while True:
+            # Arm the watches before checking to avoid missing an event
+            # that fires between the check and the sleep
+            if self._fd is not None:
+                self._add_watches(pending)
+            pending = set([path for path in pending if not is_blockdev(path)])
+            if not pending:
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            self._sleep(min(remaining, interval))
+        return pending
+
+
+def wait_for_devices(paths, timeout):
+    """
+    Waits for several block devices concurrently
+
+    @param paths: iterable of device paths
+    @param timeout: maximum time to wait in seconds
+    @return: set of paths that did not appear in time (empty on success)
+    """
+    waiter = DeviceWaiter()
+    try:
+        return waiter.wait(paths, timeout)
+    finally:
+        waiter.close()
@@ -204,7 +204,7 @@ class Lvm(lvmcom.LvmCommon):
                 self._conf[consts.KEY_VG_NAME]
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            lvm_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_create,
                 env=self._subproc_env, close_fds=True
@@ -218,6 +218,9 @@ class Lvm(lvmcom.LvmCommon):
             raise StoragePluginException
 
         devpath = "/dev/" + self._conf[consts.KEY_VG_NAME] + "/" + lv_name
+        if lvm_rc == 0:
+            # udev creates the device node asynchronously
+            self._wait_dev_to_settle(devpath)
         utils.wipefs(devpath)
 
     def _extend_vol(self, lv_name, size):
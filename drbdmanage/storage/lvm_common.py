@@ -2,6 +2,7 @@
 
 import subprocess
 import logging
+import drbdmanage.consts as consts
 import drbdmanage.utils as utils
 import drbdmanage.storage.storagecore as storcore
 from drbdmanage.storage.storageplugin_common import (
@@ -16,8 +17,14 @@ class LvmCommon(StoragePluginCommon, storcore.StoragePlugin):
 
     LVM_LVS_ENOENT = 5
 
+    # Maximum number of LVs that are activated by a single lvchange command
+    LVM_ACTIVATE_CHUNK = 100
+
     def __init__(self):
         super(LvmCommon, self).__init__()
+        # Names of the VGs and of the thin pools ("vg/pool") that were
+        # activated by this plugin instance, see activate_vg()
+        self._activated = set()
 
     def check_lv_exists(self, lv_name, vg_name,
                         cmd_lvs, subproc_env, plugin_name):
@@ -106,6 +113,200 @@ class LvmCommon(StoragePluginCommon, storcore.StoragePlugin):
             )
             raise StoragePluginException
 
+    def activate_vg(self, vg_name, cmd_vgchange, subproc_env, plugin_name):
+        """
+        Activates an LVM volume group
+
+        A VG that was activated before is not activated again, unless its
+        activation was forgotten by forget_activated().
+
+        @returns: True if the VG was activated, False otherwise
+        Throws a StoragePluginException if vgchange cannot be run
+        """
+        if vg_name in self._activated:
+            return True
+        try:
+            exec_args = [cmd_vgchange, "-ay", vg_name]
+            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
+            lvm_rc = subprocess.call(
+                exec_args,
+                0, cmd_vgchange,
+                env=subproc_env, close_fds=True
+            )
+        except OSError as os_err:
+            logging.error(
+                plugin_name + ": Volume group activation failed, "
+                "unable to run external program '%s', error message "
+                "from the OS: %s"
+                % (cmd_vgchange, str(os_err))
+            )
+            raise StoragePluginException
+        if lvm_rc != 0:
+            return False
+        self._activated.add(vg_name)
+        return True
+
+    def activate_pools(self, pool_names, vg_name, cmd_lvchange, subproc_env, plugin_name):
+        """
+        Activates several LVM thin pools
+
+        Like activate_vg(), skips the thin pools that were activated before.
+
+        @returns: set of the names of all pools that are active
+        Throws a StoragePluginException if lvchange cannot be run
+        """
+        pending = [
+            pool_name for pool_name in pool_names
+            if vg_name + "/" + pool_name not in self._activated
+        ]
+        activated = self.activate_lvs(pending, vg_name, cmd_lvchange, subproc_env, plugin_name)
+        self._activated.update([vg_name + "/" + pool_name for pool_name in activated])
+        activated.update(set(pool_names).difference(pending))
+        return activated
+
+    def forget_activated(self, vg_name, pool_names=None):
+        """
+        Forgets the activation of thin pools or of a whole VG
+
+        The next activation runs the LVM commands again, e.g. after an LV
+        could not be activated, because the VG or its pools might have been
+        deactivated by someone else, or after a thin pool was removed.
+
+        @param   pool_names: the pools to forget; None forgets the VG and all of its pools
+        """
+        if pool_names is None:
+            prefix = vg_name + "/"
+            self._activated = set([
+                name for name in self._activated
+                if name != vg_name and not name.startswith(prefix)
+            ])
+        else:
+            self._activated.difference_update(
+                [vg_name + "/" + pool_name for pool_name in pool_names]
+            )
+
+    def activate_lvs(self, lv_names, vg_name, cmd_lvchange, subproc_env, plugin_name):
+        """
+        Activates several LVM logical volumes
+
+        Each lvchange command activates up to LVM_ACTIVATE_CHUNK LVs. If the
+        command fails, the LVs of that chunk are activated one by one to
+        find out which of them failed.
+
+        @returns: set of the names of all LVs that were activated
+        Throws a StoragePluginException if lvchange cannot be run
+        """
+        activated = set()
+        for idx in range(0, len(lv_names), self.LVM_ACTIVATE_CHUNK):
+            chunk = lv_names[idx:idx + self.LVM_ACTIVATE_CHUNK]
+            if self._lvchange_activate(chunk, vg_name, cmd_lvchange, subproc_env, plugin_name):
+                activated.update(chunk)
+            elif len(chunk) > 1:
+                for lv_name in chunk:
+                    if self._lvchange_activate([lv_name], vg_name, cmd_lvchange,
+                                               subproc_env, plugin_name):
+                        activated.add(lv_name)
+        return activated
+
+    def _lvchange_activate(self, lv_names, vg_name, cmd_lvchange, subproc_env, plugin_name):
+        try:
+            exec_args = [cmd_lvchange, "-ay", "-K"]
+            exec_args.extend([vg_name + "/" + lv_name for lv_name in lv_names])
+            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
+            lvm_rc = subprocess.call(
+                exec_args,
+                0, cmd_lvchange,
+                env=subproc_env, close_fds=True
+            )
+        except OSError as os_err:
+            logging.error(
+                plugin_name + ": LV activation failed, unable to run "
+                "external program '%s', error message from the OS: %s"
+                % (cmd_lvchange, str(os_err))
+            )
+            raise StoragePluginException
+        return lvm_rc == 0
+
+    def query_thin_pools(self, vg_name, cmd_lvs, subproc_env, plugin_name):
+        """
+        Reports the size and the fill level of all thin pools of a VG
+
+        A single lvs command reports all thin pools of the volume group.
+        The fill level of inactive thin pools is reported as 0 percent.
+
+        @returns: dict of pool name -> (size in kiB, data %, metadata %)
+        Throws a StoragePluginCheckFailedException if the query fails
+        """
+        thin_pools = {}
+        lvm_proc = None
+        lvm_rc = None
+        try:
+            exec_args = [
+                cmd_lvs, "--noheadings", "--nosuffix",
+                "--units", "k", "--separator", ",",
+                "--options", "lv_name,lv_attr,lv_size,data_percent,metadata_percent",
+                vg_name
+            ]
+            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
+            lvm_proc = subprocess.Popen(
+                exec_args,
+                0, cmd_lvs,
+                env=subproc_env, stdout=subprocess.PIPE,
+                close_fds=True
+            )
+            for line in lvm_proc.stdout:
+                try:
+                    lv_name, lv_attr, size_data, data_part, meta_part = (
+                        line.strip().split(",")
+                    )
+                    # Thin pools have the volume type 't'
+                    if lv_attr.startswith("t"):
+                        thin_pools[lv_name] = (
+                            long(self.discard_fraction(size_data)),
+                            float(data_part) if len(data_part) > 0 else 0.0,
+                            float(meta_part) if len(meta_part) > 0 else 0.0
+                        )
+                except ValueError:
+                    pass
+        except OSError:
+            logging.error(
+                plugin_name + ": Unable to retrieve the list of thin pools"
+            )
+            raise StoragePluginCheckFailedException
+        finally:
+            if lvm_proc is not None:
+                try:
+                    lvm_proc.stdout.close()
+                except Exception:
+                    pass
+                lvm_rc = lvm_proc.wait()
+        if lvm_rc != 0:
+            raise StoragePluginCheckFailedException
+        return thin_pools
+
+    def thin_usage_props(self, thin_pools):
+        """
+        Summarizes the usage of thin pools as node properties
+
+        @param   thin_pools: dict as returned by query_thin_pools()
+        @return: dict of node property key -> value
+        """
+        pool_size = sum([size for size, _, _ in thin_pools.itervalues()])
+        data_used = sum([size * data_perc / 100 for size, data_perc, _ in thin_pools.itervalues()])
+        usage = {
+            consts.KEY_THIN_POOLS: len(thin_pools),
+            consts.KEY_THIN_DATA_PERCENT: (
+                int(data_used * 100 / pool_size) if pool_size > 0 else 0
+            ),
+            consts.KEY_THIN_DATA_MAX_PERCENT: int(max(
+                [data_perc for _, data_perc, _ in thin_pools.itervalues()] + [0]
+            )),
+            consts.KEY_THIN_META_MAX_PERCENT: int(max(
+                [meta_perc for _, _, meta_perc in thin_pools.itervalues()] + [0]
+            ))
+        }
+        return dict([(key, str(value)) for key, value in usage.iteritems()])
+
     def discard_fraction(self, text):
         """
         Discards the fraction part from a string representing a number
@@ -157,58 +157,34 @@ class LvmThinLv(lvmcom.LvmCommon):
             raise unhandled_exc
 
     def up_blockdevice(self, blockdevice):
-        fn_rc = exc.DM_ESTORAGE
-        try:
+        return self.up_blockdevices([blockdevice])[blockdevice.get_name()]
+
+    def up_blockdevices(self, blockdevices):
+        """
+        Activates the volume group once and all LVs with bulk lvchange commands
+
+        The volume group is skipped if it was activated by an earlier call;
+        once an LV fails to activate, it is activated again by the next call.
+        """
+        fn_rcs = {}
+        lv_names = []
+        for blockdevice in blockdevices:
             lv_name = blockdevice.get_name()
-
-            vg_activated = False
-            lv_activated = False
-
-            try:
-                exec_args = [
-                    self._cmd_vgchange, "-ay",
-                    self._conf[consts.KEY_VG_NAME],
-                ]
-                utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-                lvm_rc = subprocess.call(
-                    exec_args,
-                    0, self._cmd_vgchange,
-                    env=self._subproc_env, close_fds=True
-                )
-                if lvm_rc == 0:
-                    vg_activated = True
-            except OSError as os_err:
-                logging.error(
-                    "LvmThinLv: Volume group activation failed, "
-                    "unable to run external program '%s', error message "
-                    "from the OS: %s"
-                    % (self._cmd_vgchange, str(os_err))
-                )
-                raise StoragePluginException
-
-            try:
-                exec_args = [
-                    self._cmd_lvchange, "-ay", "-K",
-                    self._conf[consts.KEY_VG_NAME] + "/" +
-                    lv_name
-                ]
-                utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-                lvm_rc = subprocess.call(
-                    exec_args,
-                    0, self._cmd_lvchange,
-                    env=self._subproc_env, close_fds=True
-                )
-                if lvm_rc == 0:
-                    lv_activated = True
-            except OSError as os_err:
-                logging.error(
-                    "LvmThinLv: LV activation failed, unable to run "
-                    "external program '%s', error message from the OS: %s"
-                    % (self._cmd_lvchange, str(os_err))
-                )
-                raise StoragePluginException
-            if vg_activated and lv_activated:
-                fn_rc = exc.DM_SUCCESS
+            fn_rcs[lv_name] = exc.DM_ESTORAGE
+            lv_names.append(lv_name)
+        try:
+            vg_name = self._conf[consts.KEY_VG_NAME]
+            vg_activated = self.activate_vg(
+                vg_name, self._cmd_vgchange, self._subproc_env, "LvmThinLv"
+            )
+            lvs_activated = self.activate_lvs(
+                lv_names, vg_name, self._cmd_lvchange, self._subproc_env, "LvmThinLv"
+            )
+            if len(lvs_activated) < len(lv_names):
+                self.forget_activated(vg_name)
+            if vg_activated:
+                for lv_name in lvs_activated:
+                    fn_rcs[lv_name] = exc.DM_SUCCESS
         except StoragePluginException:
             # Unable to run one of the LVM commands
             # The error is reported by the corresponding function
@@ -217,12 +193,12 @@ class LvmThinLv(lvmcom.LvmCommon):
             pass
         except Exception as unhandled_exc:
             logging.error(
-                "LvmThinLv: Block device creation failed, "
+                "LvmThinLv: Block device activation failed, "
                 "unhandled exception: %s"
                 % (str(unhandled_exc))
             )
 
-        return fn_rc
+        return fn_rcs
 
     def update_pool(self, node):
         fn_rc = exc.DM_ESTORAGE
@@ -308,7 +284,7 @@ class LvmThinLv(lvmcom.LvmCommon):
                 self._conf[consts.KEY_VG_NAME]
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            lvm_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_create,
                 env=self._subproc_env, close_fds=True
@@ -322,6 +298,9 @@ class LvmThinLv(lvmcom.LvmCommon):
             raise StoragePluginException
 
         devpath = "/dev/" + self._conf[consts.KEY_VG_NAME] + "/" + lv_name
+        if lvm_rc == 0:
+            # udev creates the device node asynchronously
+            self._wait_dev_to_settle(devpath)
         utils.wipefs(devpath)
 
     def _extend_vol(self, lv_name, size):
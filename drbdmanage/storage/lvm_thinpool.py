@@ -79,6 +79,9 @@ class LvmThinPool(lvmcom.LvmCommon):
     # Maximum number of retries
     MAX_RETRIES = 2
 
+    # Lifetime (float, in seconds) of the cached thin pool usage report
+    THIN_USAGE_TTL = 5
+
     # Module configuration defaults
     CONF_DEFAULTS = {
         KEY_DEV_PATH: "/dev/",
@@ -99,6 +102,10 @@ class LvmThinPool(lvmcom.LvmCommon):
     # Lookup table for finding the pool that contains a volume
     _pool_lookup = None
 
+    # Cached thin pool usage report, see get_thin_usage()
+    _thin_usage      = None
+    _thin_usage_time = None
+
     # Cached settings
     # Set during initialization
     _vg_path      = None
@@ -417,6 +424,10 @@ class LvmThinPool(lvmcom.LvmCommon):
                                 )
                                 if not pool_exists:
                                     del self._pools[pool_name]
+                                    self.forget_activated(
+                                        self._conf[consts.KEY_VG_NAME],
+                                        [pool_name]
+                                    )
                                     # Removal of the LV and its corresponding
                                     # pool was successful
                                     fn_rc = exc.DM_SUCCESS
@@ -592,101 +603,67 @@ class LvmThinPool(lvmcom.LvmCommon):
 
         return blockdev
 
+    def create_snapshots(self, name, sources):
+        # Each snapshot is tracked in its own thin pool, see create_snapshot()
+        return storcore.StoragePlugin.create_snapshots(self, name, sources)
+
     def restore_snapshot(self, name, vol_id, source_blockdev):
         return self.create_snapshot(name, vol_id, source_blockdev)
 
+    def remove_snapshots(self, blockdevices):
+        # Removing a snapshot may remove its thin pool, see remove_blockdevice()
+        return storcore.StoragePlugin.remove_snapshots(self, blockdevices)
+
     def _remove_snapshot(self, blockdevice):
         # actually unused, see remove_snapshot in storagecore
         return self.remove_blockdevice(blockdevice)
 
     def up_blockdevice(self, blockdevice):
-        fn_rc = exc.DM_ESTORAGE
-        try:
-            lv_name   = blockdevice.get_name()
-            pool_name = None
-            try:
-                pool_name = self._pool_lookup[lv_name]
-            except KeyError:
-                pass
+        return self.up_blockdevices([blockdevice])[blockdevice.get_name()]
 
-            vg_activated   = False
-            pool_activated = False
-            lv_activated   = False
-
-            try:
-                exec_args = [
-                    self._cmd_vgchange, "-ay",
-                    self._conf[consts.KEY_VG_NAME],
-                ]
-                utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-                lvm_rc = subprocess.call(
-                    exec_args,
-                    0, self._cmd_vgchange,
-                    env=self._subproc_env, close_fds=True
-                )
-                if lvm_rc == 0:
-                    vg_activated = True
-            except OSError as os_err:
-                logging.error(
-                    "LvmThinPool: Volume group activation failed, "
-                    "unable to run external program '%s', error message "
-                    "from the OS: %s"
-                    % (self._cmd_vgchange, str(os_err))
-                )
-                raise StoragePluginException
+    def up_blockdevices(self, blockdevices):
+        """
+        Activates the volume group, the thin pools and the LVs
 
-            if pool_name is not None:
-                try:
-                    exec_args = [
-                        self._cmd_lvchange, "-ay", "-K",
-                        self._conf[consts.KEY_VG_NAME] + "/" +
-                        pool_name
-                    ]
-                    utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-                    lvm_rc = subprocess.call(
-                        exec_args,
-                        0, self._cmd_lvchange,
-                        env=self._subproc_env, close_fds=True
-                    )
-                    if lvm_rc == 0:
-                        pool_activated = True
-                except OSError as os_err:
-                    logging.error(
-                        "LvmThinPool: Thin pool activation failed, "
-                        "unable to run external program '%s', error message "
-                        "from the OS: %s"
-                        % (self._cmd_lvchange, str(os_err))
-                    )
-                    raise StoragePluginException
-            else:
+        The volume group is activated once, then all thin pools that contain
+        any of the LVs and then all LVs, each with bulk lvchange commands.
+        The volume group and thin pools that were activated by an earlier
+        call are skipped; once an LV fails to activate, they are all
+        activated again by the next call.
+        """
+        fn_rcs = {}
+        lv_names = []
+        pool_names = []
+        for blockdevice in blockdevices:
+            lv_name = blockdevice.get_name()
+            fn_rcs[lv_name] = exc.DM_ESTORAGE
+            lv_names.append(lv_name)
+            pool_name = self._pool_lookup.get(lv_name)
+            if pool_name is None:
                 logging.error(
                     "LvmThinPool: Incomplete activation of volume '%s', "
                     "cannot find the associated thin pool"
                     % (lv_name)
                 )
-            try:
-                exec_args = [
-                    self._cmd_lvchange, "-ay", "-K",
-                    self._conf[consts.KEY_VG_NAME] + "/" +
-                    lv_name
-                ]
-                utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-                lvm_rc = subprocess.call(
-                    exec_args,
-                    0, self._cmd_lvchange,
-                    env=self._subproc_env, close_fds=True
-                )
-                if lvm_rc == 0:
-                    lv_activated = True
-            except OSError as os_err:
-                logging.error(
-                    "LvmThinPool: LV activation failed, unable to run "
-                    "external program '%s', error message from the OS: %s"
-                    % (self._cmd_lvchange, str(os_err))
-                )
-                raise StoragePluginException
-            if vg_activated and pool_activated and lv_activated:
-                fn_rc = exc.DM_SUCCESS
+            elif pool_name not in pool_names:
+                pool_names.append(pool_name)
+        try:
+            vg_name = self._conf[consts.KEY_VG_NAME]
+            vg_activated = self.activate_vg(
+                vg_name, self._cmd_vgchange, self._subproc_env, "LvmThinPool"
+            )
+            pools_activated = self.activate_pools(
+                pool_names, vg_name, self._cmd_lvchange, self._subproc_env, "LvmThinPool"
+            )
+            lvs_activated = self.activate_lvs(
+                lv_names, vg_name, self._cmd_lvchange, self._subproc_env, "LvmThinPool"
+            )
+            if len(lvs_activated) < len(lv_names):
+                self.forget_activated(vg_name)
+            if vg_activated:
+                for lv_name in lvs_activated:
+                    if self._pool_lookup.get(lv_name) in pools_activated:
+                        fn_rcs[lv_name] = exc.DM_SUCCESS
         except (StoragePluginCheckFailedException, StoragePluginException):
             # Unable to run one of the LVM commands
             # The error is reported by the corresponding function
@@ -695,12 +672,12 @@ class LvmThinPool(lvmcom.LvmCommon):
             pass
         except Exception as unhandled_exc:
             logging.error(
-                "LvmThinPool: Block device creation failed, "
+                "LvmThinPool: Block device activation failed, "
                 "unhandled exception: %s"
                 % (str(unhandled_exc))
             )
 
-        return fn_rc
+        return fn_rcs
 
     def update_pool(self, node):
         """
@@ -768,6 +745,43 @@ class LvmThinPool(lvmcom.LvmCommon):
 
         return (fn_rc, pool_size, pool_free)
 
+    def get_thin_usage(self):
+        """
+        Returns the size and the fill level of all thin pools
+
+        The usage of all thin pools is retrieved by a single lvs command and
+        cached for THIN_USAGE_TTL seconds; creating or removing volumes
+        discards the cached report.
+
+        @return: dict of pool name -> (size in kiB, data %, metadata %)
+        """
+        now = time.time()
+        if self._thin_usage is None or now - self._thin_usage_time >= self.THIN_USAGE_TTL:
+            self._thin_usage = self.query_thin_pools(
+                self._conf[consts.KEY_VG_NAME], self._cmd_lvs,
+                self._subproc_env, "LvmThinPool"
+            )
+            self._thin_usage_time = now
+        return self._thin_usage
+
+    def get_usage_props(self):
+        """
+        Returns node properties that summarize the usage of the thin pools
+
+        @return: dict of node property key -> value
+        """
+        usage_props = {}
+        try:
+            usage_props = self.thin_usage_props(self.get_thin_usage())
+        except StoragePluginCheckFailedException:
+            logging.warning(
+                "LvmThinPool: Cannot retrieve the usage of the thin pools"
+            )
+        return usage_props
+
+    def _invalidate_thin_usage(self):
+        self._thin_usage = None
+
     def _deserialize(self, data):
         loaded_pools = {}
         loaded_volumes = {}
@@ -825,6 +839,7 @@ class LvmThinPool(lvmcom.LvmCommon):
         return state_con
 
     def _create_vol(self, lv_name, pool_name, size):
+        self._invalidate_thin_usage()
         try:
             exec_args = [
                 self._cmd_create, "-n", lv_name, "-V", str(size) + "k",
@@ -832,7 +847,7 @@ class LvmThinPool(lvmcom.LvmCommon):
                 self._conf[consts.KEY_VG_NAME]
             ]
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
+            lvm_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_create,
                 env=self._subproc_env, close_fds=True
@@ -846,6 +861,9 @@ class LvmThinPool(lvmcom.LvmCommon):
             raise StoragePluginException
 
         devpath = "/dev/" + self._conf[consts.KEY_VG_NAME] + "/" + lv_name
+        if lvm_rc == 0:
+            # udev creates the device node asynchronously
+            self._wait_dev_to_settle(devpath)
         utils.wipefs(devpath)
 
     def _check_vol_exists(self, lv_name):
@@ -859,12 +877,14 @@ class LvmThinPool(lvmcom.LvmCommon):
                               self._cmd_extend, self._subproc_env, "LvmThinPool")
 
     def _remove_vol(self, lv_name):
+        self._invalidate_thin_usage()
         self.remove_lv(lv_name, self._conf[consts.KEY_VG_NAME],
                        self._cmd_remove, self._subproc_env, "LvmThinPool")
 
     def _create_snapshot_impl(self, snaps_name, lv_name):
         # "LVMThinPool: exec: %s -s %s/%s -n %s"
         #    % (lvcreate, self._conf[consts.KEY_VG_NAME], lv_name, snaps_name)
+        self._invalidate_thin_usage()
         try:
             exec_args = [
                 self._cmd_create, "-s",
@@ -889,6 +909,7 @@ class LvmThinPool(lvmcom.LvmCommon):
         """
         Creates an LVM thin pool
         """
+        self._invalidate_thin_usage()
         try:
             exec_args = [
                 self._cmd_create, "-L", str(size) + "k",
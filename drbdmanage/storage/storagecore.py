@@ -20,6 +20,7 @@
 
 
 import logging
+import time
 import drbdmanage.utils
 import drbdmanage.messagelog as msglog
 
@@ -72,12 +73,17 @@ class BlockDeviceManager(object):
     _server = None
     _plugin = None
 
+    # Cached storage pool information, maps node names to
+    # (timestamp, pool size, pool free) tuples
+    _pool_cache = None
+
 
     def __init__(self, server, plugin_name, plugin_mgr):
         """
         Creates a new instance of the BlockDeviceManager
         """
         self._server = server
+        self._pool_cache = {}
         self._plugin = plugin_mgr.get_plugin_instance(plugin_name)
         if self._plugin is None:
             log_message = (
@@ -112,6 +118,7 @@ class BlockDeviceManager(object):
         if self._plugin is not None:
             try:
                 blockdev = self._plugin.create_blockdevice(name, vol_id, size)
+                self.invalidate_pool()
                 status = "successful" if blockdev is not None else "failed"
                 logging.debug(
                     "BlockDeviceManager: create_blockdevice('%s', %u, %u): %s"
@@ -134,6 +141,7 @@ class BlockDeviceManager(object):
                 blockdev = self.get_blockdevice(bd_name)
                 if blockdev is not None:
                     fn_rc = self._plugin.extend_blockdevice(blockdev, new_size)
+                    self.invalidate_pool()
                     status = "successful" if fn_rc == DM_SUCCESS else "failed"
                     logging.debug(
                         "BlockDeviceManager: extend_blockdevice('%s', %d): "
@@ -165,6 +173,7 @@ class BlockDeviceManager(object):
                 blockdev = self.get_blockdevice(bd_name)
                 if blockdev is not None:
                     fn_rc = self._plugin.remove_blockdevice(blockdev)
+                    self.invalidate_pool()
                     status = "successful" if fn_rc == DM_SUCCESS else "failed"
                     logging.debug(
                         "BlockDeviceManager: remove_blockdevice('%s'): "
@@ -214,6 +223,50 @@ class BlockDeviceManager(object):
         return fn_rc
 
 
+    def up_blockdevices(self, bd_names):
+        """
+        Activates several block devices at once
+
+        The storage plugin may activate all block devices together, e.g.
+        with a single command, which is much faster than activating each
+        block device separately if many block devices must be started.
+
+        @param   bd_names: list of block device names
+        @return: dict of block device name -> standard return code
+        """
+        fn_rcs = {}
+        for bd_name in bd_names:
+            fn_rcs[bd_name] = DM_ESTORAGE
+        if self._plugin is not None:
+            try:
+                up_blockdevs = []
+                for bd_name in bd_names:
+                    blockdev = self.get_blockdevice(bd_name)
+                    if blockdev is not None:
+                        up_blockdevs.append(blockdev)
+                    else:
+                        logging.debug(
+                            "BlockDeviceManager: up_blockdevices(): "
+                            "Cannot find the BlockDevice object '%s'"
+                            % (bd_name)
+                        )
+                if len(up_blockdevs) > 0:
+                    fn_rcs.update(self._plugin.up_blockdevices(up_blockdevs))
+                failed = [bd_name for bd_name in bd_names if fn_rcs[bd_name] != DM_SUCCESS]
+                logging.debug(
+                    "BlockDeviceManager: up_blockdevices(): "
+                    "%d of %d block devices activated"
+                    % (len(bd_names) - len(failed), len(bd_names))
+                )
+            except NotImplementedError:
+                self._log_not_implemented("up_blockdevice")
+                for bd_name in bd_names:
+                    fn_rcs[bd_name] = DM_ENOTIMPL
+        else:
+            self._log_no_plugin()
+        return fn_rcs
+
+
     def down_blockdevice(self, bd_name):
         """
         Deactivates a block device (e.g., disconnects an iSCSI resource)
@@ -250,6 +303,7 @@ class BlockDeviceManager(object):
                     blockdev = self._plugin.create_snapshot(
                         name, vol_id, src_blockdev
                     )
+                    self.invalidate_pool()
                 else:
                     log_message = (
                         "BlockDeviceManager: Cannot find the source "
@@ -279,6 +333,63 @@ class BlockDeviceManager(object):
         return blockdev
 
 
+    def create_snapshots(self, name, sources):
+        """
+        Creates snapshots of several volumes of an existing resource at once
+
+        The storage plugin issues the snapshot operations of all volumes
+        together to keep the window between the first and the last volume
+        snapshot as small as possible.
+
+        @param   name: snapshot name
+        @param   sources: list of (vol_id, src_bd_name) tuples
+        @return: dict of vol_id -> BlockDevice object (None if failed)
+        """
+        blockdevs = {}
+        if self._plugin is not None:
+            try:
+                src_list = []
+                for vol_id, src_bd_name in sources:
+                    blockdevs[vol_id] = None
+                    src_blockdev = self.get_blockdevice(src_bd_name)
+                    if src_blockdev is not None:
+                        src_list.append((vol_id, src_blockdev))
+                    else:
+                        log_message = (
+                            "BlockDeviceManager: Cannot find the source "
+                            "BlockDevice object '%s' required for "
+                            "snapshot creation"
+                            % (src_bd_name)
+                        )
+                        logging.error(log_message)
+                        self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
+                if len(src_list) > 0:
+                    blockdevs.update(
+                        self._plugin.create_snapshots(name, src_list)
+                    )
+                    self.invalidate_pool()
+                for vol_id, src_bd_name in sources:
+                    status_text = (
+                        "successful" if blockdevs.get(vol_id) is not None
+                        else "failed"
+                    )
+                    logging.debug(
+                        "BlockDeviceManager: create snapshot('%s', %u, '%s'): %s"
+                        % (name, vol_id, src_bd_name, status_text)
+                    )
+            except NotImplementedError:
+                log_message = (
+                    "BlockDeviceManager: The currently loaded storage "
+                    "management plugin does not implement "
+                    "snapshot capabilities"
+                )
+                logging.error(log_message)
+                self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
+        else:
+            self._log_no_plugin()
+        return blockdevs
+
+
     def restore_snapshot(self, name, vol_id, src_bd_name):
         """
         Creates a volume for a new resource from a snapshot
@@ -291,6 +402,7 @@ class BlockDeviceManager(object):
                     blockdev = self._plugin.restore_snapshot(
                         name, vol_id, src_blockdev
                     )
+                    self.invalidate_pool()
                 else:
                     log_message = (
                         "BlockDeviceManager: Cannot find the source "
@@ -320,6 +432,55 @@ class BlockDeviceManager(object):
         return blockdev
 
 
+    def remove_snapshots(self, bd_names):
+        """
+        Deallocates several snapshot block devices at once
+
+        @param   bd_names: list of block device names
+        @return: dict of block device name -> standard return code
+        """
+        fn_rcs = {}
+        for bd_name in bd_names:
+            fn_rcs[bd_name] = DM_ESTORAGE
+        if self._plugin is not None:
+            try:
+                rm_blockdevs = []
+                for bd_name in bd_names:
+                    rm_blockdev = self.get_blockdevice(bd_name)
+                    if rm_blockdev is not None:
+                        rm_blockdevs.append(rm_blockdev)
+                    else:
+                        logging.debug(
+                            "BlockDeviceManager: remove snapshot: "
+                            "volume '%s' not found"
+                            % (bd_name)
+                        )
+                if len(rm_blockdevs) > 0:
+                    fn_rcs.update(self._plugin.remove_snapshots(rm_blockdevs))
+                    self.invalidate_pool()
+                for bd_name in bd_names:
+                    fn_rc = fn_rcs[bd_name]
+                    status_text = "successful" if fn_rc == 0 else "failed"
+                    logging.debug(
+                        "BlockDeviceManager: remove snapshot blockdev=%s, "
+                        "rc=%d, %s"
+                        % (bd_name, fn_rc, status_text)
+                    )
+            except NotImplementedError:
+                log_message = (
+                    "BlockDeviceManager: The currently loaded storage "
+                    "management plugin does not implement "
+                    "snapshot capabilities"
+                )
+                logging.error(log_message)
+                self._server.get_message_log().add_entry(msglog.MessageLog.ALERT, log_message)
+                for bd_name in bd_names:
+                    fn_rcs[bd_name] = DM_ENOTIMPL
+        else:
+            self._log_no_plugin()
+        return fn_rcs
+
+
     def remove_snapshot(self, bd_name):
         """
         Deallocates a snapshot block device
@@ -333,6 +494,7 @@ class BlockDeviceManager(object):
                     # but all existing ones would call remove_blockdevice anyways
                     # and I don't want to potentially break existing code so keep it that way
                     fn_rc = self._plugin.remove_blockdevice(rm_blockdev)
+                    self.invalidate_pool()
                 else:
                     logging.debug(
                         "BlockDeviceManager: remove snapshot: "
@@ -362,15 +524,34 @@ class BlockDeviceManager(object):
     def update_pool(self, drbd_node):
         """
         Retrieves storage pool space information
+
+        Successful queries are cached for the number of seconds configured
+        by the server's pool-cache-ttl setting. The cache is invalidated by
+        any operation that allocates or releases storage through this
+        BlockDeviceManager.
         """
         fn_rc = DM_ESTORAGE
         pool_size = -1
         pool_free = -1
         if self._plugin is not None:
             try:
-                fn_rc, pool_size, pool_free = (
-                    self._plugin.update_pool(drbd_node)
-                )
+                node_name = drbd_node.get_name()
+                now = time.time()
+                cache_entry = self._pool_cache.get(node_name)
+                if cache_entry is not None and now - cache_entry[0] < self._get_pool_cache_ttl():
+                    fn_rc = DM_SUCCESS
+                    pool_size, pool_free = cache_entry[1], cache_entry[2]
+                    logging.debug(
+                        "BlockDeviceManager: update_pool(): using cached storage pool information"
+                    )
+                else:
+                    fn_rc, pool_size, pool_free = (
+                        self._plugin.update_pool(drbd_node)
+                    )
+                    if fn_rc == DM_SUCCESS:
+                        self._pool_cache[node_name] = (now, pool_size, pool_free)
+                    else:
+                        self._pool_cache.pop(node_name, None)
             except NotImplementedError:
                 log_message = (
                     "BlockDeviceManager: The currently loaded storage "
@@ -384,6 +565,40 @@ class BlockDeviceManager(object):
         return fn_rc, pool_size, pool_free
 
 
+    def get_usage_props(self):
+        """
+        Retrieves the node properties that describe the storage pool's usage
+
+        @return: dict of node property key -> value
+        """
+        usage_props = {}
+        if self._plugin is not None:
+            try:
+                usage_props = self._plugin.get_usage_props()
+            except NotImplementedError:
+                pass
+        return usage_props
+
+
+    def invalidate_pool(self):
+        """
+        Discards cached storage pool information
+        """
+        self._pool_cache.clear()
+
+
+    def _get_pool_cache_ttl(self):
+        """
+        Returns the lifetime of cached storage pool information in seconds
+        """
+        ttl = self._server.DEFAULT_POOL_CACHE_TTL
+        try:
+            ttl = float(self._server.get_conf_value(self._server.KEY_POOL_CACHE_TTL))
+        except (ValueError, TypeError):
+            pass
+        return ttl
+
+
     def reconfigure(self):
         """
         Reconfigures the storage plugin
@@ -391,6 +606,7 @@ class BlockDeviceManager(object):
         fn_rc = DM_ESTORAGE
         if self._plugin is not None:
             try:
+                self.invalidate_pool()
                 self._plugin.reconfigure()
                 fn_rc = DM_SUCCESS
             except NotImplementedError:
@@ -586,6 +802,24 @@ class StoragePlugin(object):
         """
         raise NotImplementedError
 
+    def up_blockdevices(self, blockdevices):
+        """
+        Activates several block devices
+
+        Plugins that can activate several block devices at once should
+        override this; the default implementation calls up_blockdevice()
+        for each block device.
+
+        @param   blockdevices: list of BlockDevice objects to activate
+        @type    blockdevices: list
+        @return: dict of block device name -> standard return code
+        @rtype:  dict
+        """
+        fn_rcs = {}
+        for blockdevice in blockdevices:
+            fn_rcs[blockdevice.get_name()] = self.up_blockdevice(blockdevice)
+        return fn_rcs
+
     def down_blockdevice(self, blockdevice):
         """
         Deactivates a block device (e.g., disconnects an iSCSI resource)
@@ -610,6 +844,28 @@ class StoragePlugin(object):
         """
         raise NotImplementedError
 
+    def create_snapshots(self, name, sources):
+        """
+        Creates snapshots of several volumes under the same snapshot name
+
+        Plugins that can snapshot several volumes at once should override
+        this; the default implementation calls create_snapshot() for each
+        volume.
+
+        @param   name: snapshot name; subject to name constraints
+        @type    name: str
+        @param   sources: list of (vol_id, BlockDevice object) tuples
+        @type    sources: list
+        @return: dict of vol_id -> BlockDevice object (None if failed)
+        @rtype:  dict
+        """
+        blockdevs = {}
+        start = time.time()
+        for vol_id, blockdevice in sources:
+            blockdevs[vol_id] = self.create_snapshot(name, vol_id, blockdevice)
+        log_snapshot_window(self.NAME, name, blockdevs, time.time() - start)
+        return blockdevs
+
     def restore_snapshot(self, name, vol_id, blockdevice):
         """
         Creates a snapshot of a volume under a new resource prefix name
@@ -635,6 +891,24 @@ class StoragePlugin(object):
         """
         raise NotImplementedError
 
+    def remove_snapshots(self, blockdevices):
+        """
+        Deallocates several snapshot block devices
+
+        Plugins that can remove several volumes at once should override
+        this; the default implementation calls remove_blockdevice() for
+        each block device.
+
+        @param   blockdevices: list of BlockDevice objects to deallocate
+        @type    blockdevices: list
+        @return: dict of block device name -> standard return code
+        @rtype:  dict
+        """
+        fn_rcs = {}
+        for blockdevice in blockdevices:
+            fn_rcs[blockdevice.get_name()] = self.remove_blockdevice(blockdevice)
+        return fn_rcs
+
     def update_pool(self, drbdnode):
         """
         Retrieves storage pool space information
@@ -649,6 +923,19 @@ class StoragePlugin(object):
         """
         raise NotImplementedError
 
+    def get_usage_props(self):
+        """
+        Retrieves details about the usage of the storage pool
+
+        Plugins that report more than the pool's total and free space, e.g.
+        the fill level of thin pools, return it as node properties, which
+        the server sets on the node along with the pool size.
+
+        @return: dict of node property key -> value
+        @rtype:  dict
+        """
+        return {}
+
     def get_trait(self, key):
         """
         Returns the trait value selected by the key, otherwise None
@@ -681,8 +968,26 @@ class StoragePlugin(object):
     def _create_snapshot_impl(self, snaps_name, lv_name):
         raise NotImplementedError
 
+    def _create_snapshots_impl(self, snaps_list):
+        raise NotImplementedError
+
     def _remove_snapshot(self, blockdevice):
         raise NotImplementedError
 
+    def _remove_vols_impl(self, vol_names):
+        raise NotImplementedError
+
     def _restore_snapshot(self, vol_name, source_blockdev):
         return self._create_snapshot(vol_name, source_blockdev)
+
+
+def log_snapshot_window(plugin_name, snaps_name, blockdevs, window):
+    """
+    Reports the time between the first and the last volume snapshot
+    """
+    created = len([bd for bd in blockdevs.itervalues() if bd is not None])
+    logging.info(
+        "%s: snapshot '%s': %d of %d volumes created, "
+        "snapshot window %.3f sec"
+        % (plugin_name, snaps_name, created, len(blockdevs), window)
+    )
@@ -20,10 +20,12 @@
 import errno
 import json
 import logging
+import threading
 import time
 import drbdmanage.exceptions as exc
 import drbdmanage.storage.storagecore as storcore
 import drbdmanage.storage.persistence as storpers
+import drbdmanage.storage.devwait as devwait
 import drbdmanage.utils as utils
 
 
@@ -61,6 +63,10 @@ class StoragePluginCommon(object):
     # Traits map, str = str key/value pairs
     traits = None
 
+    # Maximum number of snapshot commands that _create_snapshots_impl()
+    # runs concurrently
+    SNAPSHOT_THREADS_MAX = 8
+
     def __init__(self):
         self.traits = {}
 
@@ -225,6 +231,28 @@ class StoragePluginCommon(object):
             if state_file is not None:
                 state_file.close()
 
+    def _wait_dev_to_settle(self, path, retries_s=45):
+        """
+        Waits for udev to create the device node of a new volume
+
+        @return: True if the device appeared within retries_s seconds
+        """
+        return self._wait_devs_to_settle([path], retries_s)
+
+    def _wait_devs_to_settle(self, paths, retries_s=45):
+        """
+        Waits for the device nodes of several new volumes concurrently
+
+        @return: True if all devices appeared within retries_s seconds
+        """
+        missing = devwait.wait_for_devices(paths, retries_s)
+        for path in sorted(missing):
+            logging.error(
+                "%s: LV creation failed, %s did not exist after %d sec"
+                % (self.NAME, path, retries_s)
+            )
+        return len(missing) == 0
+
     def get_blockdevice(self, bd_name):
         """
         Retrieves a registered BlockDevice object
@@ -663,6 +691,167 @@ class StoragePluginCommon(object):
 
         return blockdev
 
+    def create_snapshots(self, snaps_name, sources):
+        """
+        Creates snapshots of several volumes under the same snapshot name
+
+        The snapshot commands for all volumes are issued together (see
+        _create_snapshots_impl()), failed volumes are retried and the
+        plugin state is saved once for the entire batch.
+
+        @param   snaps_name: snapshot name; subject to name constraints
+        @type    snaps_name: str
+        @param   sources: list of (vol_id, BlockDevice object) tuples
+        @type    sources: list
+        @return: dict of vol_id -> BlockDevice object (None if failed)
+        @rtype:  dict
+        """
+        blockdevs = {}
+        pending = {}
+        for vol_id, source_blockdev in sources:
+            blockdevs[vol_id] = None
+            vol_name = self.snapshot_volume_name(
+                snaps_name, source_blockdev.get_name(), vol_id
+            )
+            pending[vol_name] = (vol_id, source_blockdev)
+
+        created = []
+        first_ts = None
+        last_ts = None
+        try:
+            tries = 0
+            while len(pending) > 0 and tries < self.MAX_RETRIES:
+                if tries > 0:
+                    try:
+                        time.sleep(self.RETRY_DELAY)
+                    except OSError:
+                        pass
+                tries += 1
+
+                snaps_list = [
+                    (vol_name, source_blockdev.get_name())
+                    for vol_name, (_, source_blockdev) in pending.iteritems()
+                ]
+                start_ts = time.time()
+                if first_ts is None:
+                    first_ts = start_ts
+                self._create_snapshots_impl(snaps_list)
+                end_ts = time.time()
+
+                for vol_name in pending.keys():
+                    vol_id, source_blockdev = pending[vol_name]
+                    if self._check_vol_exists(vol_name):
+                        blockdev = storcore.BlockDevice(
+                            vol_name, source_blockdev.get_size_kiB(),
+                            self._vg_path + vol_name
+                        )
+                        self._volumes[vol_name] = blockdev
+                        self.up_blockdevice(blockdev)
+                        blockdevs[vol_id] = blockdev
+                        created.append(blockdev)
+                        del pending[vol_name]
+                        last_ts = end_ts
+                    else:
+                        logging.warning(
+                            "%s: Attempt %d of %d: "
+                            "Creation of snapshot volume '%s' failed."
+                            % (self.NAME, tries, self.MAX_RETRIES, vol_name)
+                        )
+        except (StoragePluginCheckFailedException, StoragePluginException):
+            # Unable to run one of the LV commands
+            # The error is reported by the corresponding function
+            pass
+        except NotImplementedError:
+            raise NotImplementedError
+        except Exception as unhandled_exc:
+            logging.error(
+                "%s: Block device creation failed, "
+                "unhandled exception: %s"
+                % (self.NAME, str(unhandled_exc))
+            )
+
+        if len(created) > 0:
+            try:
+                self.save_state(self._volumes)
+            except exc.PersistenceException:
+                # Roll back all snapshots of the batch
+                for blockdev in created:
+                    vol_name = blockdev.get_name()
+                    try:
+                        self._remove_vol(vol_name)
+                    except StoragePluginException:
+                        pass
+                    try:
+                        if not self._check_vol_exists(vol_name):
+                            try:
+                                del self._volumes[vol_name]
+                            except KeyError:
+                                pass
+                    except StoragePluginCheckFailedException:
+                        pass
+                for vol_id in blockdevs.iterkeys():
+                    blockdevs[vol_id] = None
+                last_ts = None
+
+        window = 0.0
+        if first_ts is not None and last_ts is not None:
+            window = last_ts - first_ts
+        storcore.log_snapshot_window(self.NAME, snaps_name, blockdevs, window)
+        return blockdevs
+
+    def _create_snapshots_impl(self, snaps_list):
+        """
+        Runs the snapshot command for several volumes concurrently
+
+        Up to SNAPSHOT_THREADS_MAX snapshot commands run at the same time.
+        Plugins that support snapshotting several volumes with a single
+        command should override this.
+
+        @param   snaps_list: list of (snaps_name, lv_name) tuples
+        Throws a NotImplementedError if the plugin does not support snapshots
+        """
+        if len(snaps_list) == 1:
+            snaps_name, lv_name = snaps_list[0]
+            self._create_snapshot_impl(snaps_name, lv_name)
+            return
+
+        pending = list(snaps_list)
+        not_implemented = []
+        lock = threading.Lock()
+
+        def run_impl():
+            while True:
+                with lock:
+                    if len(pending) == 0 or len(not_implemented) > 0:
+                        return
+                    snaps_name, lv_name = pending.pop(0)
+                try:
+                    self._create_snapshot_impl(snaps_name, lv_name)
+                except NotImplementedError:
+                    # Reported by the caller after all threads finished
+                    with lock:
+                        not_implemented.append(snaps_name)
+                except StoragePluginException:
+                    # Reported by _create_snapshot_impl()
+                    pass
+                except Exception as unhandled_exc:
+                    logging.error(
+                        "%s: Snapshot creation of '%s' failed, "
+                        "unhandled exception: %s"
+                        % (self.NAME, snaps_name, str(unhandled_exc))
+                    )
+
+        threads = []
+        for _ in range(min(len(snaps_list), self.SNAPSHOT_THREADS_MAX)):
+            thread = threading.Thread(target=run_impl)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        if len(not_implemented) > 0:
+            raise NotImplementedError
+
     def restore_snapshot(self, restore_name, vol_id, source_blockdev):
         """
         Creates a snapshot of a volume under a new resource prefix name
@@ -711,5 +900,104 @@ class StoragePluginCommon(object):
         except NotImplementedError:
             raise NotImplementedError
 
+    def remove_snapshots(self, blockdevices):
+        """
+        Deallocates several snapshot block devices
+
+        The removal commands for all volumes are issued together (see
+        _remove_vols_impl()), and the plugin state is saved once for the
+        entire batch.
+
+        @param   blockdevices: list of BlockDevice objects to deallocate
+        @type    blockdevices: list
+        @return: dict of block device name -> standard return code
+        @rtype:  dict
+        """
+        fn_rcs = {}
+        pending = []
+        for blockdevice in blockdevices:
+            vol_name = blockdevice.get_name()
+            fn_rcs[vol_name] = exc.DM_ESTORAGE
+            if self._volumes.get(vol_name) is not None:
+                pending.append(vol_name)
+            else:
+                logging.error(
+                    "%s: vol '%s' exists, but is unknown to "
+                    "drbdmanage's storage subsystem. Aborting removal."
+                    % (self.NAME, vol_name)
+                )
+
+        removed = False
+        try:
+            tries = 0
+            while len(pending) > 0 and tries <= self.MAX_RETRIES:
+                if tries > 0:
+                    if tries > 1:
+                        try:
+                            time.sleep(self.RETRY_DELAY)
+                        except OSError:
+                            pass
+                    self._remove_vols_impl(pending)
+                # Check which volumes are gone; the first pass only skips
+                # volumes that do not exist anymore
+                remaining = []
+                for vol_name in pending:
+                    if self._check_vol_exists(vol_name):
+                        remaining.append(vol_name)
+                        if tries > 0:
+                            logging.warning(
+                                "%s: Attempt %d of %d: "
+                                "Removal of vol '%s' failed"
+                                % (self.NAME, tries, self.MAX_RETRIES, vol_name)
+                            )
+                    else:
+                        fn_rcs[vol_name] = exc.DM_SUCCESS
+                        try:
+                            del self._volumes[vol_name]
+                            removed = True
+                        except KeyError:
+                            pass
+                pending = remaining
+                tries += 1
+        except (StoragePluginCheckFailedException, StoragePluginException):
+            # Unable to run one of the commands
+            # The error is reported by the corresponding function
+            pass
+        except Exception as unhandled_exc:
+            logging.error(
+                "%s: Removal of a block device failed, "
+                "unhandled exception: %s"
+                % (self.NAME, str(unhandled_exc))
+            )
+
+        if removed:
+            try:
+                self.save_state(self._volumes)
+            except exc.PersistenceException:
+                # If the module has a volume listed although it has actually
+                # been removed successfully, then that can easily be corrected
+                # later
+                pass
+
+        for vol_name, fn_rc in fn_rcs.iteritems():
+            if fn_rc != exc.DM_SUCCESS:
+                logging.error(
+                    "%s: Removal of vol '%s' failed"
+                    % (self.NAME, vol_name)
+                )
+        return fn_rcs
+
+    def _remove_vols_impl(self, vol_names):
+        """
+        Removes several volumes
+
+        Plugins that support removing several volumes with a single command
+        should override this.
+
+        @param   vol_names: list of volume names
+        """
+        for vol_name in vol_names:
+            self._remove_vol(vol_name)
+
     def get_trait(self, key):
         return self.traits.get(key)
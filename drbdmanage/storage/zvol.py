@@ -21,8 +21,6 @@
 import os
 import logging
 import subprocess
-import time
-import stat
 import drbdmanage.storage.storagecore as storcore
 from drbdmanage.storage.storageplugin_common import (
     StoragePluginCommon, StoragePluginException, StoragePluginCheckFailedException)
@@ -233,28 +231,6 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
             bs = consts.DEFAULT_BLOCKSIZE
         return final_size, bs
 
-    def _wait_dev_to_settle(self, path, retries_s=45):
-        # currently we saw that for zfs, if we need that for other LVMs, move to storagecore
-        # give udev some time to create the device
-        retries = 0
-        while True:
-            try:
-                mode = os.stat(path).st_mode
-                if stat.S_ISBLK(mode):
-                    return True
-            except:
-                pass
-
-            retries += 1
-            if retries >= retries_s:
-                break
-            time.sleep(1)
-
-        logging.error(
-            "%s: LV creation failed, %s did not exist after %d sec" % (self.NAME, path, retries_s)
-        )
-        return False
-
     def _create_vol(self, vol_name, size, thin=False):
         size, bs = self._final_size(size)
         zfs_vol_name = utils.build_path(self._conf[consts.KEY_VG_NAME], vol_name)
@@ -391,40 +367,80 @@ class Zvol(StoragePluginCommon, storcore.StoragePlugin):
 
     # SNAPSHOTTING
     def _create_snapshot_impl(self, snaps_name, lv_name):
-        try:
-            zfs_snap_name = utils.build_path(self._conf[consts.KEY_VG_NAME], lv_name) + '@' + snaps_name
-            exec_args = [
-                self._cmd_create, self.ZVOL_SNAP_CREATE,
-                zfs_snap_name
-            ]
-            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
-                exec_args,
-                0, self._cmd_create,
-                env=self._subproc_env, close_fds=True
-            )
+        self._create_snapshots_impl([(snaps_name, lv_name)])
 
-            exec_args = [
-                self._cmd_create, self.ZVOL_SNAP_CLONE, zfs_snap_name,
-                utils.build_path(self._conf[consts.KEY_VG_NAME], snaps_name)
-            ]
+    def _create_snapshots_impl(self, snaps_list):
+        self._zfs_snapshot(snaps_list)
+
+        paths = []
+        for snaps_name, lv_name in snaps_list:
+            try:
+                zfs_snap_name = utils.build_path(self._conf[consts.KEY_VG_NAME], lv_name) + '@' + snaps_name
+                exec_args = [
+                    self._cmd_create, self.ZVOL_SNAP_CLONE, zfs_snap_name,
+                    utils.build_path(self._conf[consts.KEY_VG_NAME], snaps_name)
+                ]
+                utils.debug_log_exec_args(self.__class__.__name__, exec_args)
+                zfs_proc = subprocess.Popen(
+                    exec_args,
+                    0, self._cmd_create,
+                    env=self._subproc_env, close_fds=True
+                )
+                zfs_rc = zfs_proc.wait()
+                if zfs_rc == 0:
+                    paths.append(os.path.join(self._conf[self.KEY_DEV_PATH],
+                                              utils.build_path(self._conf[consts.KEY_VG_NAME], snaps_name)))
+            except OSError as os_err:
+                logging.error(
+                    "Zvol: Snapshot creation failed, unable to run "
+                    "external program '%s', error message from the OS: %s"
+                    % (self._cmd_create, str(os_err))
+                )
+                raise StoragePluginException
+
+        # Wait for the devices of all clones at once
+        if not self._wait_devs_to_settle(paths):
+            raise StoragePluginException
+
+    def _zfs_snapshot(self, snaps_list):
+        """
+        Snapshots several zvols atomically with a single 'zfs snapshot'
+
+        If the combined command fails (e.g., because one of the snapshots
+        already exists from an earlier attempt), each snapshot is retried
+        with its own command.
+
+        @param   snaps_list: list of (snaps_name, lv_name) tuples
+        """
+        zfs_snap_names = [
+            utils.build_path(self._conf[consts.KEY_VG_NAME], lv_name) + '@' + snaps_name
+            for snaps_name, lv_name in snaps_list
+        ]
+        try:
+            exec_args = [self._cmd_create, self.ZVOL_SNAP_CREATE] + zfs_snap_names
             utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            zfs_proc = subprocess.Popen(
+            zfs_rc = subprocess.call(
                 exec_args,
                 0, self._cmd_create,
                 env=self._subproc_env, close_fds=True
             )
-            zfs_rc = zfs_proc.wait()
-            if zfs_rc == 0:
-                path = os.path.join(self._conf[self.KEY_DEV_PATH],
-                                    utils.build_path(self._conf[consts.KEY_VG_NAME], snaps_name))
-                if not self._wait_dev_to_settle(path):
-                    raise StoragePluginException
+            if zfs_rc != 0 and len(zfs_snap_names) > 1:
+                for zfs_snap_name in zfs_snap_names:
+                    exec_args = [
+                        self._cmd_create, self.ZVOL_SNAP_CREATE,
+                        zfs_snap_name
+                    ]
+                    utils.debug_log_exec_args(self.__class__.__name__, exec_args)
+                    subprocess.call(
+                        exec_args,
+                        0, self._cmd_create,
+                        env=self._subproc_env, close_fds=True
+                    )
         except OSError as os_err:
             logging.error(
-                "Zvol: Snapshot creation failed, unable to run "
+                "%s: Snapshot creation failed, unable to run "
                 "external program '%s', error message from the OS: %s"
-                % (self._cmd_create, str(os_err))
+                % (self.NAME, self._cmd_create, str(os_err))
             )
             raise StoragePluginException
 
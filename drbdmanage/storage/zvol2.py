@@ -172,6 +172,43 @@ class Zvol2(Zvol):
             )
             raise StoragePluginException
 
+    def _remove_vols_impl(self, vol_names):
+        """
+        Removes several volumes, destroying snapshots in bulk
+
+        'zfs destroy' accepts a comma-separated list of snapshots of the
+        same dataset, so all snapshots of a zvol are destroyed with one
+        command (and in one transaction group).
+        """
+        snaps_map = {}
+        for vol_name in vol_names:
+            if '.' in vol_name:
+                dataset, snaps_name = self._vol_name_to_snapshot(vol_name).split('@', 1)
+                snaps_map.setdefault(dataset, []).append(snaps_name)
+            else:
+                self._remove_vol(vol_name)
+
+        for dataset in sorted(snaps_map.iterkeys()):
+            try:
+                exec_args = [
+                    self._cmd_remove, self.ZVOL_REMOVE,
+                    utils.build_path(self._conf[consts.KEY_VG_NAME], dataset) +
+                    '@' + ','.join(snaps_map[dataset])
+                ]
+                utils.debug_log_exec_args(self.__class__.__name__, exec_args)
+                subprocess.call(
+                    exec_args,
+                    0, self._cmd_remove,
+                    env=self._subproc_env, close_fds=True
+                )
+            except OSError as os_err:
+                logging.error(
+                    "Zvol2: LV remove failed, unable to run "
+                    "external program '%s', error message from the OS: %s"
+                    % (self._cmd_remove, str(os_err))
+                )
+                raise StoragePluginException
+
     def _check_vol_exists(self, vol_name):
         exists = False
 
@@ -201,26 +238,9 @@ class Zvol2(Zvol):
         return exists
 
     # SNAPSHOTTING
-    def _create_snapshot_impl(self, snaps_name, lv_name):
-        try:
-            zfs_snap_name = utils.build_path(self._conf[consts.KEY_VG_NAME], lv_name) + '@' + snaps_name
-            exec_args = [
-                self._cmd_create, self.ZVOL_SNAP_CREATE,
-                zfs_snap_name
-            ]
-            utils.debug_log_exec_args(self.__class__.__name__, exec_args)
-            subprocess.call(
-                exec_args,
-                0, self._cmd_create,
-                env=self._subproc_env, close_fds=True
-            )
-        except OSError as os_err:
-            logging.error(
-                "Zvol2: Snapshot creation failed, unable to run "
-                "external program '%s', error message from the OS: %s"
-                % (self._cmd_create, str(os_err))
-            )
-            raise StoragePluginException
+    def _create_snapshots_impl(self, snaps_list):
+        # Zvol2 uses the snapshots directly, no clones
+        self._zfs_snapshot(snaps_list)
 
     def _restore_snapshot(self, vol_name, source_blockdev):
         try:
@@ -29,16 +29,18 @@ import sys
 import hashlib
 import base64
 import operator
+import bisect
 import subprocess
 import select
 import fcntl
 import errno
-import uuid
 import drbdmanage.consts as consts
 import logging
 import locale
 import pickle
+import copy
 import copy_reg
+import json
 import ConfigParser
 from functools import wraps
 from drbdmanage.exceptions import SyntaxException, InvalidNameException, EventException
@@ -126,7 +128,7 @@ class Table():
             raise SyntaxException("Row len does not match headers")
 
         coloroverride = [None] * len(row)
-        for idx, c in enumerate(row[:]):
+        for idx, c in enumerate(row):
             if isinstance(c, tuple):
                 color, text = c
                 row[idx] = text
@@ -153,7 +155,20 @@ class Table():
         if groups:
             self.groups = groups
 
+    @staticmethod
+    def _is_separator(row):
+        return len(row) == 1 and row[0] is None
+
     def show(self, machine_readable=False, overwrite=False):
+        """
+        Writes the table to stdout
+
+        The shown columns are copied column by column, sorting for group-by
+        columns only reorders row indexes, each column's cells are converted
+        to text and measured in one pass, and each line is written as soon
+        as it is formatted. Listings with tens of thousands of rows are
+        therefore rendered in well under a second.
+        """
         if machine_readable:
             overwrite = False
 
@@ -164,18 +179,12 @@ class Table():
         if self.groups:
             self.view += [g for g in self.groups if g not in self.view]
 
-        pcnt = 0
-        for idx, c in enumerate(self.header[:]):
-            if c['name'] not in self.view:
-                pidx = idx - pcnt
-                pcnt += 1
-                self.header.pop(pidx)
-                for row in self.table:
-                    row.pop(pidx)
-                for row in self.coloroverride:
-                    row.pop(pidx)
-
-        columnmax = [0] * len(self.header)
+        # indexes of the columns that are shown
+        view = set(self.view)
+        cols = [idx for idx, h in enumerate(self.header) if h['name'] in view]
+        header = [self.header[idx] for idx in cols]
+        hdrnames = [h['name'] for h in header]
+
         if self.maxwidth:
             maxwidth = self.maxwidth
         else:
@@ -184,80 +193,89 @@ class Table():
 
         # color overhead
         co = len(COLOR_RED) + len(COLOR_NONE)
-        co_sum = 0
+        co_sum = co * len([h for h in header if h['color']])
 
-        hdrnames = [h['name'] for h in self.header]
-        if self.groups:
+        # Output order: index of a row in columns, or None for a separator
+        order = []
+        rows = []
+        for row in self.table:
+            if self._is_separator(row):
+                order.append(None)
+            else:
+                order.append(len(rows))
+                rows.append(row)
+        # Index of each row in columns -> index in rows and coloroverride
+        data_rows = range(len(rows))
+
+        # column-oriented copy of the shown cells
+        columns = [[row[col] for row in rows] for col in cols]
+
+        if self.groups and len(data_rows) > 0:
             group_bys = [hdrnames.index(g) for g in self.groups if g in hdrnames]
-            for row in self.table:
-                for idx in group_bys:
+            # numeric group values are sorted as numbers
+            for gidx in group_bys:
+                converted = {}
+                column = columns[gidx]
+                for ridx, value in enumerate(column):
                     try:
-                        row[idx] = int(row[idx])
-                    except ValueError:
+                        column[ridx] = converted[value]
+                    except KeyError:
+                        try:
+                            new_value = int(value)
+                        except ValueError:
+                            new_value = value
+                        converted[value] = new_value
+                        column[ridx] = new_value
+                    except TypeError:
+                        # unhashable or not a number
                         pass
-            orig_table = self.table[:]
-            orig_coloroverride = self.coloroverride[:]
-            tidx_used = set()
+
+            group_keys = zip(*[columns[gidx] for gidx in group_bys])
             try:
                 from natsort import natsorted
-                self.table = natsorted(self.table, key=operator.itemgetter(*group_bys))
+                sorted_rows = natsorted(range(len(data_rows)), key=group_keys.__getitem__)
             except:
-                self.table.sort(key=operator.itemgetter(*group_bys))
-
-            # restore color overrides after sort
-            for oidx, orow in enumerate(orig_table):
-                for tidx, trow in enumerate(self.table):
-                    if orow == trow and oidx != tidx and tidx not in tidx_used:
-                        tidx_used.add(tidx)
-                        self.coloroverride[tidx] = orig_coloroverride[oidx]
-                        break
+                sorted_rows = sorted(range(len(data_rows)), key=group_keys.__getitem__)
+            columns = [[column[ridx] for ridx in sorted_rows] for column in columns]
+            data_rows = [data_rows[ridx] for ridx in sorted_rows]
 
-            lstlen = len(self.table)
             seps = set()
-            for c in range(len(self.header)):
-                if c not in group_bys:
-                    continue
-                cur = self.table[0][c]
-                for idx, l in enumerate(self.table):
-                    if idx < lstlen - 1:
-                        if self.table[idx + 1][c] == cur:
-                            if overwrite:
-                                self.table[idx + 1][c] = ' '
-                        else:
-                            cur = self.table[idx + 1][c]
-                            seps.add(idx + 1)
-
-            if self.showseps:
-                for c, pos in enumerate(sorted(seps)):
-                    self.table.insert(c + pos, [None])
-
-        # calc max width per column and set final strings (with color codes)
-        self.table.insert(0, [h.replace('_', ' ') for h in hdrnames])
-        ridx = 0
-        self.coloroverride.insert(0, [None] * len(self.header))
-
-        for row in self.table:
-            if not row[0]:
-                continue
-            for idx, col in enumerate(self.header):
-                row[idx] = str(row[idx])
-                if col['color']:
-                    if self.coloroverride[ridx][idx]:
-                        color = self.coloroverride[ridx][idx]
+            for gidx in sorted(group_bys):
+                column = columns[gidx]
+                cur = column[0]
+                for ridx in xrange(1, len(column)):
+                    if column[ridx] == cur:
+                        if overwrite:
+                            column[ridx] = ' '
                     else:
-                        color = col["color"]
-                    row[idx] = color + row[idx] + COLOR_NONE
-                columnmax[idx] = max(len(row[idx]), columnmax[idx])
-            ridx += 1
-
-        for h in self.header:
-            if h['color']:
-                co_sum += co
-
-        # insert frames
-        self.table.insert(0, [None])
-        self.table.insert(2, [None])
-        self.table.append([None])
+                        cur = column[ridx]
+                        seps.add(ridx)
+
+            order = []
+            for ridx in xrange(len(data_rows)):
+                if self.showseps and ridx in seps:
+                    order.append(None)
+                order.append(ridx)
+
+        # final strings (with color codes) and max width per column
+        columnmax = []
+        names = []
+        for vidx, col in enumerate(header):
+            name = hdrnames[vidx].replace('_', ' ')
+            column = columns[vidx]
+            color = col['color']
+            if color:
+                name = color + name + COLOR_NONE
+                colors = [self.coloroverride[didx][cols[vidx]] for didx in data_rows]
+                column = [
+                    (cell_color if cell_color else color) + str(value) + COLOR_NONE
+                    for cell_color, value in zip(colors, column)
+                ]
+            else:
+                column = [str(value) for value in column]
+            columns[vidx] = column
+            columnmax.append(max([len(name)] + [len(value) for value in column]))
+            names.append(name)
 
         # build format string
         ctbl = {
@@ -294,34 +312,39 @@ class Table():
             pass
 
         fstr = ctbl[enc]['pipe']
-        for idx, col in enumerate(self.header):
+        for idx, col in enumerate(header):
             if col['just_col'] == '>':
                 space = (maxwidth - sum(columnmax) + co_sum)
-                space_and_overhead = space - (len(self.header) * 3) - 2
+                space_and_overhead = space - (len(header) * 3) - 2
                 if space_and_overhead >= 0:
                     fstr += ' ' * space_and_overhead + ctbl[enc]['pipe']
 
             fstr += ' {' + str(idx) + ':' + col['just_txt'] + str(columnmax[idx]) + '} ' + ctbl[enc]['pipe']
 
-        try:
-            for idx, row in enumerate(self.table):
-                if not row[0]:  # print a separator
-                    if idx == 0:
-                        l, m, r = ctbl[enc]['tl'], ctbl[enc]['msc'], ctbl[enc]['tr']
-                    elif idx == len(self.table) - 1:
-                        l, m, r = ctbl[enc]['bl'], ctbl[enc]['msc'], ctbl[enc]['br']
-                    else:
-                        l, m, r = ctbl[enc]['ml'], ctbl[enc]['mdc'], ctbl[enc]['mr']
-                    sep = l + m * (sum(columnmax) - co_sum + (3 * len(self.header)) - 1) + r
-                    if enc == 'utf8':  # should be save on non utf-8 too...
-                        sep = sep.decode('utf-8')
+        def separator(l, m, r):
+            sep = l + m * (sum(columnmax) - co_sum + (3 * len(header)) - 1) + r
+            if enc == 'utf8':  # should be save on non utf-8 too...
+                sep = sep.decode('utf-8')
 
-                    if self.r_just and len(sep) < maxwidth:
-                        sys.stdout.write(l + m * (maxwidth - 2) + r + "\n")
-                    else:
-                        sys.stdout.write(sep + "\n")
+            if self.r_just and len(sep) < maxwidth:
+                return l + m * (maxwidth - 2) + r + "\n"
+            else:
+                return sep + "\n"
+
+        mid_sep = separator(ctbl[enc]['ml'], ctbl[enc]['mdc'], ctbl[enc]['mr'])
+        row_fmt = (fstr + "\n").format
+
+        try:
+            write = sys.stdout.write
+            write(separator(ctbl[enc]['tl'], ctbl[enc]['msc'], ctbl[enc]['tr']))
+            write(row_fmt(*names))
+            write(mid_sep)
+            for ridx in order:
+                if ridx is None:
+                    write(mid_sep)
                 else:
-                    sys.stdout.write(fstr.format(*row) + "\n")
+                    write(row_fmt(*[column[ridx] for column in columns]))
+            write(separator(ctbl[enc]['bl'], ctbl[enc]['msc'], ctbl[enc]['br']))
         except IOError as e:
             if e.errno == errno.EPIPE:
                 return
@@ -349,6 +372,54 @@ def is_rc_retry(server_rc):
     return False
 
 
+# Limits (in seconds) of the delay between retries of requests that the server
+# was not ready for, and of the total time spent retrying a request
+RETRY_DELAY_MIN = 0.1
+RETRY_DELAY_MAX = 5.0
+RETRY_TIMEOUT   = 30.0
+
+
+def get_retry_hint(server_rc):
+    """
+    Returns the time after which the server suggests retrying a request
+
+    @return: seconds as a float; None if the server did not suggest a time
+    """
+    hint = None
+    for rc_entry in server_rc:
+        _, _, rc_args = rc_entry
+        for key, value in rc_args:
+            if key == consts.RC_RETRY_AFTER:
+                try:
+                    value = float(value)
+                    hint = value if hint is None else max(hint, value)
+                except ValueError:
+                    pass
+    return hint
+
+
+def retry_delay(tries, hint=None):
+    """
+    Returns the delay before retrying a request that the server was not ready for
+
+    Without a hint from the server, the delay grows exponentially with the
+    number of tries. Each delay is randomized, so that clients that were
+    rejected at the same time do not all retry at the same time again.
+
+    @param   tries: number of tries so far, starting at 0
+    @param   hint:  time after which the server suggests retrying (seconds)
+    @return: delay in seconds
+    """
+    import random
+    if hint is not None:
+        delay = min(max(hint, RETRY_DELAY_MIN), RETRY_DELAY_MAX)
+        delay = random.uniform(delay, delay * 1.5)
+    else:
+        delay = min(RETRY_DELAY_MIN * (2 ** tries), RETRY_DELAY_MAX)
+        delay = random.uniform(delay / 2, delay)
+    return min(delay, RETRY_DELAY_MAX)
+
+
 # a wrapper for subprocess.check_output
 def check_output(*args, **kwargs):
     def _wrapcall_2_6(*args, **kwargs):
@@ -647,49 +718,260 @@ def filter_new_args(unsetprefix, args):
     return new
 
 
+class DrbdSetupSchemaCache(object):
+
+    """
+    Persistent cache of the option schemas reported by drbdsetup
+
+    Parsing "drbdsetup xml-help <command>" requires running drbdsetup once
+    for each command. The parsed schemas are saved to CACHE_FILE, which is
+    shared by the client and the server, together with the path, the
+    modification time and the size of the drbdsetup binary and the
+    drbd-utils version. If the binary changes, e.g. because drbd-utils was
+    upgraded, the saved schemas are discarded.
+    """
+
+    CACHE_FILE = "/var/lib/drbdmanage/drbdsetup-options.json"
+
+    DRBDSETUP_NAME = "drbdsetup"
+    DRBDSETUP_FALLBACK_PATH = "/sbin"
+
+    KEY_PATH    = "path"
+    KEY_MTIME   = "mtime"
+    KEY_SIZE    = "size"
+    KEY_VERSION = "version"
+    KEY_SCHEMAS = "schemas"
+
+    # Prefix of the drbd-utils version line in the output of
+    # "drbdsetup --version"
+    VERSION_PREFIX = "DRBDADM_VERSION="
+
+    def __init__(self):
+        self._binary = None
+        self._version = None
+        self._schemas = None
+
+    def get_schema(self, setup_command):
+        """
+        Returns the option schema of a drbdsetup command
+
+        The schema is loaded from the cache file, or, if it is not cached,
+        from drbdsetup, in which case the cache file is updated.
+
+        @return: dict of option name -> option description; None on error
+        """
+        self._load()
+        schema = self._schemas.get(setup_command)
+        if schema is None:
+            out = self._run_drbdsetup(["xml-help", setup_command])
+            if out is not None:
+                schema = parse_drbdsetup_xml_help(out)
+                self._schemas[setup_command] = schema
+                if self._version is None:
+                    self._version = self._query_version()
+                self._save()
+        return schema
+
+    def get_version(self):
+        """
+        Returns the drbd-utils version of the drbdsetup binary
+
+        @return: version string; None if the version is unknown
+        """
+        self._load()
+        if self._version is None and self._binary is not None:
+            self._version = self._query_version()
+            if self._version is not None:
+                self._save()
+        return self._version
+
+    def _find_drbdsetup(self):
+        """
+        Returns the path, modification time and size of the drbdsetup binary
+
+        @return: (path, mtime, size) tuple; None if drbdsetup was not found
+        """
+        search_path = os.environ.get("PATH", "").split(os.pathsep)
+        search_path.append(DrbdSetupSchemaCache.DRBDSETUP_FALLBACK_PATH)
+        for dir_path in search_path:
+            if len(dir_path) == 0:
+                continue
+            path = os.path.join(dir_path, DrbdSetupSchemaCache.DRBDSETUP_NAME)
+            try:
+                stat_info = os.stat(path)
+                if os.access(path, os.X_OK):
+                    return (path, stat_info.st_mtime, stat_info.st_size)
+            except OSError:
+                pass
+        return None
+
+    def _load(self):
+        """
+        Loads the cache file, unless it is already loaded and drbdsetup did
+        not change since then
+        """
+        binary = self._find_drbdsetup()
+        if self._schemas is not None and binary == self._binary:
+            return
+        self._binary = binary
+        self._version = None
+        self._schemas = {}
+        if binary is None:
+            return
+
+        cache_file = None
+        try:
+            cache_file = open(DrbdSetupSchemaCache.CACHE_FILE, "r")
+            cache = _json_str(json.load(cache_file))
+            path, mtime, size = binary
+            if (cache.get(DrbdSetupSchemaCache.KEY_PATH) == path and
+                    cache.get(DrbdSetupSchemaCache.KEY_MTIME) == mtime and
+                    cache.get(DrbdSetupSchemaCache.KEY_SIZE) == size):
+                self._version = cache.get(DrbdSetupSchemaCache.KEY_VERSION)
+                self._schemas = cache.get(DrbdSetupSchemaCache.KEY_SCHEMAS, {})
+        except (IOError, ValueError, AttributeError):
+            # missing or invalid cache file, schemas are loaded from drbdsetup
+            pass
+        finally:
+            if cache_file is not None:
+                cache_file.close()
+
+    def _save(self):
+        """
+        Saves the cached schemas
+
+        The cache file is replaced atomically, so that concurrent readers
+        never see a partially written file. Failing to save the cache, e.g.
+        because the directory is not writable, is not an error.
+        """
+        import tempfile
+        if self._binary is None:
+            return
+        path, mtime, size = self._binary
+        cache = {
+            DrbdSetupSchemaCache.KEY_PATH:    path,
+            DrbdSetupSchemaCache.KEY_MTIME:   mtime,
+            DrbdSetupSchemaCache.KEY_SIZE:    size,
+            DrbdSetupSchemaCache.KEY_VERSION: self._version,
+            DrbdSetupSchemaCache.KEY_SCHEMAS: self._schemas
+        }
+        tmp_name = None
+        try:
+            cache_dir, cache_name = os.path.split(DrbdSetupSchemaCache.CACHE_FILE)
+            tmp_fd, tmp_name = tempfile.mkstemp(prefix="." + cache_name, dir=cache_dir)
+            tmp_file = os.fdopen(tmp_fd, "w")
+            try:
+                json.dump(cache, tmp_file, indent=4, sort_keys=True)
+            finally:
+                tmp_file.close()
+            os.chmod(tmp_name, 0644)
+            os.rename(tmp_name, DrbdSetupSchemaCache.CACHE_FILE)
+            tmp_name = None
+        except (IOError, OSError) as err:
+            logging.debug("Cannot save the drbdsetup options cache '%s': %s"
+                          % (DrbdSetupSchemaCache.CACHE_FILE, str(err)))
+        finally:
+            if tmp_name is not None:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+
+    def _query_version(self):
+        version = None
+        out = self._run_drbdsetup(["--version"])
+        if out is not None:
+            for line in out.splitlines():
+                if line.startswith(DrbdSetupSchemaCache.VERSION_PREFIX):
+                    version = line[len(DrbdSetupSchemaCache.VERSION_PREFIX):].strip()
+                    break
+        return version
+
+    def _run_drbdsetup(self, cmd_args):
+        if self._binary is None:
+            return None
+        try:
+            return check_output([self._binary[0]] + cmd_args)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+# Shared by all DrbdSetupOpts instances, created on first use
+_drbdsetup_schema_cache = None
+
+
+def get_drbdsetup_schema_cache():
+    """
+    Returns the process-wide drbdsetup option schema cache
+    """
+    global _drbdsetup_schema_cache
+    if _drbdsetup_schema_cache is None:
+        _drbdsetup_schema_cache = DrbdSetupSchemaCache()
+    return _drbdsetup_schema_cache
+
+
+def _json_str(obj):
+    """
+    Converts the unicode strings returned by the json module to str objects
+    """
+    if isinstance(obj, dict):
+        return dict([(_json_str(key), _json_str(val)) for key, val in obj.iteritems()])
+    elif isinstance(obj, list):
+        return [_json_str(val) for val in obj]
+    elif isinstance(obj, unicode):
+        return obj.encode("utf-8")
+    return obj
+
+
+def parse_drbdsetup_xml_help(out):
+    """
+    Parses the output of "drbdsetup xml-help <command>"
+
+    @return: dict of option name -> option description, and the command's
+             summary text as the 'help' entry
+    """
+    import xml.etree.ElementTree as ET
+    config = {}
+    root = ET.fromstring(out)
+
+    for child in root:
+        if child.tag == 'summary':
+            config['help'] = child.text
+        elif child.tag == 'argument':
+            # ignore them
+            pass
+        elif child.tag == 'option':
+            opt = child.attrib['name']
+            config[opt] = {'type': child.attrib['type']}
+            if child.attrib['name'] == 'set-defaults':
+                continue
+            if child.attrib['type'] == 'boolean':
+                config[opt]['default'] = child.find('default').text
+            if child.attrib['type'] == 'handler':
+                config[opt]['handlers'] = [h.text for h in child.findall('handler')]
+            elif child.attrib['type'] == 'numeric':
+                for v in ('min', 'max', 'default', 'unit_prefix', 'unit'):
+                    val = child.find(v)
+                    if val is not None:
+                        config[opt][v] = val.text
+    return config
+
+
 class DrbdSetupOpts():
     def __init__(self, setup_command, dm_command=None):
         import sys
-        import xml.etree.ElementTree as ET
         self.setup_command = setup_command
         self.dm_command = dm_command if dm_command else setup_command
         self.config = {}
         self.unsetprefix = 'unset'
         self.ok = False
 
-        out = False
-        for cmd in ('drbdsetup', '/sbin/drbdsetup'):
-            try:
-                out = check_output([cmd, "xml-help", self.setup_command])
-                break
-            except OSError:
-                pass
-        if not out:
+        config = get_drbdsetup_schema_cache().get_schema(self.setup_command)
+        if config is None:
             sys.stderr.write("Could not execute drbdsetup\n")
             return
-
-        root = ET.fromstring(out)
-
-        for child in root:
-            if child.tag == 'summary':
-                self.config['help'] = child.text
-            elif child.tag == 'argument':
-                # ignore them
-                pass
-            elif child.tag == 'option':
-                opt = child.attrib['name']
-                self.config[opt] = {'type': child.attrib['type']}
-                if child.attrib['name'] == 'set-defaults':
-                    continue
-                if child.attrib['type'] == 'boolean':
-                    self.config[opt]['default'] = child.find('default').text
-                if child.attrib['type'] == 'handler':
-                    self.config[opt]['handlers'] = [h.text for h in child.findall('handler')]
-                elif child.attrib['type'] == 'numeric':
-                    for v in ('min', 'max', 'default', 'unit_prefix', 'unit'):
-                        val = child.find(v)
-                        if val is not None:
-                            self.config[opt][v] = val.text
+        # copy, so that changes do not end up in the shared cache
+        self.config = copy.deepcopy(config)
         self.ok = True
 
     def genArgParseSubcommand(self, subp):
@@ -904,16 +1186,113 @@ def add_rc_entry(fn_rc, err_code, err_msg, args=[]):
         logging.error("Implementation error: Incorrect use of drbdmanage.utils.add_rc_entry(): %s" % e)
 
 
-def serial_filter(serial, objects):
+def get_obj_serial(obj):
+    """
+    Returns the serial number of an object's last change
+
+    @return: serial number, or None if the object has no valid serial number
+    """
+    return obj.get_props().get_int_or_default(consts.SERIAL, None)
+
+
+def max_obj_serial(objects):
+    """
+    Returns the greatest serial number of a group of objects
+
+    @return: serial number, or None if any of the objects has no valid
+             serial number (it must then be considered changed)
+    """
+    max_serial = 0
+    for obj in objects:
+        obj_serial = get_obj_serial(obj)
+        if obj_serial is None:
+            return None
+        max_serial = max(max_serial, obj_serial)
+    return max_serial
+
+
+def serial_filter(serial, objects, serial_fn=get_obj_serial):
     """
     Generator for iterating over objects with obj_serial > serial
     """
     for obj in objects:
-        obj_serial = obj.get_props().get_prop(consts.SERIAL)
+        obj_serial = serial_fn(obj)
         if obj_serial is None or obj_serial > serial:
             yield obj
 
 
+def list_filter_match(obj, serial, filter_props, serial_fn=get_obj_serial, matches=None):
+    """
+    Checks whether an object passes the serial number and the property
+    filters of the list_* functions, see serial_filter() and props_filter()
+
+    @param matches: set of the objects that match filter_props, e.g. as
+                    looked up in a PropsIndex, or None to check the object
+                    by its filter_match() function
+    """
+    if serial > 0:
+        obj_serial = serial_fn(obj)
+        if obj_serial is not None and obj_serial <= serial:
+            return False
+    if filter_props is None or len(filter_props) == 0:
+        return True
+    if matches is not None:
+        return obj in matches
+    return obj.filter_match(filter_props)
+
+
+class NameIndex(object):
+
+    """
+    Index of objects ordered by their names
+
+    Lets the paginated list_* functions continue after the name of the last
+    object of the previous page by a binary search, so that a page does not
+    require iterating over or copying all objects. The index is rebuilt from
+    its source whenever the validity key passed to page() changes.
+    """
+
+    _source_fn = None
+    _key       = None
+    _names     = None
+    _items     = None
+
+    def __init__(self, source_fn):
+        """
+        @param source_fn: function that returns an iterable of tuples
+                          (name, item); names must be unique
+        """
+        self._source_fn = source_fn
+
+    def page(self, key, cursor, limit, select_fn=None):
+        """
+        Returns up to limit selected items with names that sort after cursor
+
+        @param key: any value that changes whenever the source's objects change
+        @param cursor: name of the last item of the previous page, or an
+                       empty string for the first page
+        @param select_fn: optional function that returns True for the items
+                          that are returned
+        @return: tuple (list of items, cursor for the next page); the cursor
+                 is an empty string if there are no more items
+        """
+        if self._items is None or key != self._key:
+            entries = sorted(self._source_fn(), key=operator.itemgetter(0))
+            self._names = [entry[0] for entry in entries]
+            self._items = [entry[1] for entry in entries]
+            self._key = key
+        items = []
+        idx = bisect.bisect_right(self._names, cursor) if cursor else 0
+        count = len(self._items)
+        while idx < count and len(items) < limit:
+            item = self._items[idx]
+            if select_fn is None or select_fn(item):
+                items.append(item)
+            idx += 1
+        next_cursor = self._names[idx - 1] if idx < count else ""
+        return items, next_cursor
+
+
 def props_filter(source, filter_props):
     """
     Generator for iterating over objects that match filter properties
@@ -967,6 +1346,7 @@ def generate_secret():
     except:
         # Fallback to uuid if the usual
         # method of secret generation fails
+        import uuid
         secret = uuid.uuid4()
 
     return secret
@@ -1260,12 +1640,14 @@ class ExternalCommand(object):
             try:
                 events = epoll.poll()
                 for (poll_fd, event_id) in events:
-                    if event_id == select.EPOLLIN:
+                    # A process that exits quickly may report EPOLLIN
+                    # together with EPOLLHUP; read the data before closing
+                    if event_id & select.EPOLLIN:
                         if poll_fd == err_fd:
                             self._read_stream(err_reader, self.stderr_handler)
                         elif poll_fd == out_fd:
                             self._read_stream(out_reader, self.stdout_handler)
-                    else:
+                    if event_id & ~select.EPOLLIN:
                         epoll.unregister(poll_fd)
                         if poll_fd == err_fd:
                             err_ok = False
@@ -1466,10 +1848,7 @@ class Selector(object):
 
 
     def __init__(self, keys_list):
-        self._keys = {}
-        if keys_list is not None:
-            for key in keys_list:
-                self._keys[key] = None
+        self._keys = dict.fromkeys(keys_list) if keys_list is not None else {}
 
 
     def all_selector(self, key):
@@ -1486,6 +1865,23 @@ class Selector(object):
         return (True if key is not None and key in self._keys else False)
 
 
+    def select_props(self, props, properties):
+        """
+        Adds the selected properties of a properties container to a dictionary
+
+        Equivalent to checking every property with list_selector() or
+        all_selector(). If keys are selected, only those are looked up
+        instead of iterating over all properties.
+        """
+        if len(self._keys) == 0:
+            for (key, val) in props.iteritems():
+                if val is not None:
+                    properties[key] = str(val)
+        else:
+            for (key, val) in props.iteritems_selected(self._keys):
+                properties[key] = str(val)
+
+
 def _aux_prop_name(key):
     """
     Returns the key of auxiliary properties without prefix, otherwise None
@@ -0,0 +1,292 @@
+#!/usr/bin/env python2
+"""
+    drbdmanage - management of distributed DRBD9 resources
+    Copyright (C) 2013 - 2017  LINBIT HA-Solutions GmbH
+                               Author: R. Altnoeder, Roland Kammerer
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import logging
+import time
+import gobject
+
+import drbdmanage.consts as consts
+import drbdmanage.exceptions as dmexc
+from drbdmanage.utils import add_rc_entry
+
+
+class Waiter(object):
+
+    """
+    A wait-for policy that is pending on a resource
+    """
+
+    plugin   = None
+    res_name = None
+    reply_fn = None
+    # Configuration revision of the resource seen by the last evaluation
+    revision = None
+    # GMainLoop source id of the timeout
+    timer_id = None
+
+    def __init__(self, plugin, res_name, reply_fn):
+        self.plugin   = plugin
+        self.res_name = res_name
+        self.reply_fn = reply_fn
+
+
+class WaiterRegistry(object):
+
+    """
+    Pending wait-for plugin policies
+
+    Instead of having clients call a wait-for plugin in a loop, the server
+    keeps the plugin's policy registered here and evaluates it again only
+    if the configuration of the policy's resource changed or if DRBD
+    reported events for that resource. The client's request is answered
+    once, as soon as the policy is fulfilled, fails or times out.
+
+    Only the first evaluation fetches the control volume (plugin.run()),
+    later evaluations use the configuration that is already loaded
+    (plugin.evaluate()), which is kept up to date by the leader's updates.
+    """
+
+    # Timeout in seconds if the client did not specify one
+    DEFAULT_TIMEOUT = 300
+
+    # Pending policies are evaluated at least this often (seconds), which
+    # covers changes that are not reported to this node, e.g. changes of
+    # peers' states on a satellite node that does not have the resource
+    RECHECK_INTERVAL = 10
+
+    _server     = None
+    # Resource name -> list of Waiter objects
+    _waiters    = None
+    _recheck_id = None
+
+    def __init__(self, server):
+        self._server  = server
+        self._waiters = {}
+
+    def add(self, plugin, config, reply_fn):
+        """
+        Registers a wait-for policy, or replies at once if it is decided
+
+        @param plugin: a private instance of a wait-for plugin
+        @param config: the plugin's configuration, which must contain the
+                       name of the resource the policy refers to
+        @param reply_fn: function(fn_rc, result) that answers the client
+        """
+        config = dict(config)
+        if not config.get('starttime'):
+            config['starttime'] = str(time.time())
+        if not config.get('timeout'):
+            config['timeout'] = str(self.DEFAULT_TIMEOUT)
+        plugin.set_config(config)
+
+        waiter = Waiter(plugin, config.get('resource'), reply_fn)
+        if not self._evaluate(waiter, True):
+            self._waiters.setdefault(waiter.res_name, []).append(waiter)
+            end = float(config['starttime']) + float(config['timeout'])
+            delay_ms = max(int((end - time.time()) * 1000), 0)
+            waiter.timer_id = gobject.timeout_add(delay_ms, self._timeout, waiter)
+            if self._recheck_id is None:
+                self._recheck_id = gobject.timeout_add_seconds(
+                    self.RECHECK_INTERVAL, self._recheck
+                )
+
+    def count(self):
+        return sum([len(waiters) for waiters in self._waiters.itervalues()])
+
+    def notify_conf_changed(self):
+        """
+        Evaluates policies whose resource's configuration changed
+
+        Called after changes of the configuration have been loaded
+        """
+        for res_name in self._waiters.keys():
+            revision = self._get_revision(res_name)
+            for waiter in list(self._waiters.get(res_name, [])):
+                if waiter.revision != revision:
+                    self._evaluate(waiter)
+
+    def notify_drbd_events(self, res_names):
+        """
+        Evaluates the policies of resources that DRBD reported events for
+        """
+        for res_name in res_names:
+            for waiter in list(self._waiters.get(res_name, [])):
+                self._evaluate(waiter)
+
+    def _evaluate(self, waiter, fetch=False):
+        """
+        Runs the waiter's policy and answers the client if it is decided
+
+        @param fetch: if set, the plugin fetches the control volume before
+                      evaluating the policy
+        @return: True if the client was answered, False otherwise
+        """
+        try:
+            plugin = waiter.plugin
+            if fetch or not hasattr(plugin, "evaluate"):
+                fn_rc, result = plugin.run()
+            else:
+                fn_rc, result = plugin.evaluate()
+        except Exception as exc:
+            fn_rc, result = [], {}
+            add_rc_entry(fn_rc, dmexc.DM_EINVAL,
+                         "Error running plugin: %(msg)s", [["msg", str(exc)]])
+        waiter.revision = self._get_revision(waiter.res_name)
+
+        decided = (
+            result.get('result') == consts.BOOL_TRUE or
+            result.get('timeout') == consts.BOOL_TRUE or
+            len([rc for rc in fn_rc
+                 if rc[0] != dmexc.DM_SUCCESS and rc[0] != dmexc.DM_INFO]) > 0
+        )
+        if decided:
+            self._reply(waiter, fn_rc, result)
+        return decided
+
+    def _reply(self, waiter, fn_rc, result):
+        waiters = self._waiters.get(waiter.res_name)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if len(waiters) == 0:
+                del self._waiters[waiter.res_name]
+        if waiter.timer_id is not None:
+            gobject.source_remove(waiter.timer_id)
+            waiter.timer_id = None
+        try:
+            waiter.reply_fn(fn_rc, result)
+        except Exception as exc:
+            # e.g., the client disconnected in the meantime
+            logging.debug("WaiterRegistry: cannot answer a wait-for request: %s" % str(exc))
+
+    def _timeout(self, waiter):
+        """
+        GMainLoop callback for the end of a policy's timeout
+        """
+        # The plugin reports the timeout itself; the fixed answer is only
+        # a guard against timers that fire early
+        waiter.timer_id = None
+        if not self._evaluate(waiter):
+            fn_rc = []
+            add_rc_entry(fn_rc, dmexc.DM_SUCCESS, dmexc.dm_exc_text(dmexc.DM_SUCCESS))
+            self._reply(waiter, fn_rc,
+                        {'result': consts.BOOL_FALSE, 'timeout': consts.BOOL_TRUE})
+        # False = GMainLoop shall unregister this event handler
+        return False
+
+    def _recheck(self):
+        """
+        GMainLoop callback for the periodic evaluation of pending policies
+        """
+        for res_name in self._waiters.keys():
+            for waiter in list(self._waiters.get(res_name, [])):
+                self._evaluate(waiter)
+        keep = len(self._waiters) > 0
+        if not keep:
+            self._recheck_id = None
+        return keep
+
+    def _get_revision(self, res_name):
+        """
+        Returns a value that changes whenever the configuration of a resource,
+        its volumes, assignments or snapshots changes
+        """
+        resource = self._server.get_resource(res_name)
+        if resource is None:
+            return None
+        objects = [resource]
+        objects.extend(resource.iterate_volumes())
+        for assg in resource.iterate_assignments():
+            objects.append(assg)
+            objects.extend(assg.iterate_volume_states())
+        for snaps in resource.iterate_snapshots():
+            objects.append(snaps)
+            objects.extend(snaps.iterate_snaps_assgs())
+        return [(obj, obj.get_props().get_revision()) for obj in objects]
+
+
+class StartupWaiters(object):
+
+    """
+    Clients waiting for the server to finish its startup
+
+    Instead of retrying their requests periodically while the server reports
+    that it is not ready, clients can register here. All registered clients
+    are answered at once when the server becomes ready, and each client is
+    answered individually when its timeout ends.
+    """
+
+    # Longest time in seconds that a client can wait
+    MAX_TIMEOUT = 300
+
+    # reply_fn -> GMainLoop source id of the timeout
+    _waiters = None
+    _timeout_rc_fn = None
+
+    def __init__(self, timeout_rc_fn):
+        """
+        @param timeout_rc_fn: function() that returns the return codes for
+                              clients whose timeout ended
+        """
+        self._waiters = {}
+        self._timeout_rc_fn = timeout_rc_fn
+
+    def add(self, timeout, reply_fn):
+        """
+        Registers a client
+
+        @param timeout: seconds until the client is answered if the server
+                        is still not ready
+        @param reply_fn: function(fn_rc) that answers the client
+        """
+        timeout = min(max(timeout, 0), self.MAX_TIMEOUT)
+        self._waiters[reply_fn] = gobject.timeout_add(
+            int(timeout * 1000), self._timeout, reply_fn
+        )
+
+    def count(self):
+        return len(self._waiters)
+
+    def notify_ready(self):
+        """
+        Answers all clients, called when the server became ready
+        """
+        waiters = self._waiters
+        self._waiters = {}
+        for reply_fn, timer_id in waiters.iteritems():
+            gobject.source_remove(timer_id)
+            fn_rc = []
+            add_rc_entry(fn_rc, dmexc.DM_SUCCESS, dmexc.dm_exc_text(dmexc.DM_SUCCESS))
+            self._reply(reply_fn, fn_rc)
+
+    def _timeout(self, reply_fn):
+        """
+        GMainLoop callback for the end of a client's timeout
+        """
+        if self._waiters.pop(reply_fn, None) is not None:
+            self._reply(reply_fn, self._timeout_rc_fn())
+        # False = GMainLoop shall unregister this event handler
+        return False
+
+    def _reply(self, reply_fn, fn_rc):
+        try:
+            reply_fn(fn_rc)
+        except Exception as exc:
+            # e.g., the client disconnected in the meantime
+            logging.debug("StartupWaiters: cannot answer a wait-for-ready request: %s" % str(exc))
@@ -36,10 +36,7 @@ import subprocess
 import time
 import traceback
 import locale
-import drbdmanage.drbd.drbdcore
-import drbdmanage.drbd.persistence
 import drbdmanage.argparse.argparse as argparse
-import drbdmanage.argcomplete as argcomplete
 
 from drbdmanage.consts import (
     KEY_DRBDCTRL_VG, KEY_CUR_MINOR_NR, DEFAULT_VG, DRBDCTRL_DEFAULT_PORT, DBUS_DRBDMANAGED, DBUS_SERVICE,
@@ -47,7 +44,7 @@ from drbdmanage.consts import (
     NODE_ADDR, NODE_AF, NODE_ID, NODE_POOLSIZE, NODE_POOLFREE, RES_PORT,
     VOL_MINOR, VOL_BDEV, RES_PORT_NR_AUTO, FLAG_DISKLESS, FLAG_OVERWRITE,
     FLAG_DRBDCTRL, FLAG_STORAGE, FLAG_EXTERNAL, FLAG_DISCARD, FLAG_CONNECT, FLAG_QIGNORE, FLAG_FORCEWIN,
-    KEY_DRBD_CONFPATH, DEFAULT_DRBD_CONFPATH, DM_VERSION, DM_GITHASH,
+    KEY_DRBD_CONFPATH, DEFAULT_DRBD_CONFPATH, DM_VERSION, DM_GITHASH, DBUS_CHANGES,
     CONF_NODE, CONF_GLOBAL, KEY_SITE, BOOL_TRUE, BOOL_FALSE, FILE_GLOBAL_COMMON_CONF, KEY_VG_NAME,
     NODE_SITE, NODE_VOL_0, NODE_VOL_1, NODE_PORT, NODE_SECRET,
     DRBDCTRL_LV_NAME_0, DRBDCTRL_LV_NAME_1, DRBDCTRL_DEV_0, DRBDCTRL_DEV_1,
@@ -62,7 +59,7 @@ from drbdmanage.utils import ExternalCommandBuffer
 from drbdmanage.utils import (
     build_path, bool_to_string, string_to_bool, rangecheck, namecheck, ssh_exec,
     load_server_conf_file, filter_prohibited, get_uname, approximate_size_string, wipefs, cmd_try_ignore,
-    is_rc_retry, mangle_server_rc,
+    is_rc_retry, mangle_server_rc, get_retry_hint, retry_delay, RETRY_TIMEOUT,
 )
 from drbdmanage.utils import (
     COLOR_NONE, COLOR_RED, COLOR_DARKRED, COLOR_DARKGREEN, COLOR_BROWN,
@@ -75,21 +72,12 @@ from drbdmanage.exceptions import dm_exc_text
 from drbdmanage.exceptions import (
     DM_SUCCESS, DM_EEXIST, DM_ENOENT, DM_ENOTREADY, DM_ENOTREADY_STARTUP, DM_ENOTREADY_REQCTRL
 )
-from drbdmanage.dbusserver import DBusServer
-from drbdmanage.drbd.drbdcore import Assignment
-from drbdmanage.drbd.views import AssignmentView
-from drbdmanage.drbd.views import DrbdNodeView
-from drbdmanage.drbd.views import DrbdResourceView
-from drbdmanage.drbd.views import DrbdVolumeView
-from drbdmanage.drbd.views import DrbdVolumeStateView
-from drbdmanage.drbd.views import GenericView
-from drbdmanage.snapshots.views import DrbdSnapshotAssignmentView
-from drbdmanage.storage.storagecore import MinorNr
-from drbdmanage.storage.header import gen_header
-from drbdmanage.defaultip import default_ip
-
 from drbdmanage.propscontainer import Props
 
+# Modules that are only needed by a few commands (in particular the
+# server's object model and persistence layer) are imported by the
+# functions that use them, which keeps the startup of the client short
+
 
 class DrbdManage(object):
 
@@ -109,17 +97,39 @@ class DrbdManage(object):
     UMHELPER_OVERRIDE = "/bin/true"
     UMHELPER_WAIT_TIME = 5.0
 
+    # Subcommands that are generated from drbdsetup's option descriptions
+    # or that use them, and subcommands that work with the complete set of
+    # subcommands; all other subcommands are parsed without running drbdsetup
+    SETUP_OPTS_CMDS = [
+        "disk-options", "peer-device-options", "resource-options", "net-options",
+        "list-options", "show-options"
+    ]
+    PARSER_TREE_CMDS = ["interactive", "batch", "help", "list", "commands"]
+
+    # Subcommands that cannot be run from a batch file
+    BATCH_EXCLUDED_CMDS = ["interactive", "batch"]
+
+    # Number of entries requested per call of the server's list_*_page
+    # functions for the JSON output of the list commands
+    LIST_PAGE_SIZE = 500
+
     def __init__(self):
         try:
             locale.setlocale(locale.LC_ALL, '')
         except:
             pass
         try:
-            self._parser = self.setup_parser()
+            subcommand = self._get_subcommand(sys.argv[1:])
+            setup_opts = self._needs_setup_opts(subcommand)
+            self._parser = self.setup_parser(setup_opts)
+            self._all_commands = self.parser_cmds()
+            if not setup_opts and subcommand not in [cmd for cmds in self._all_commands for cmd in cmds]:
+                # Unknown subcommand, build the complete parser to report it
+                self._parser = self.setup_parser()
+                self._all_commands = self.parser_cmds()
         except dbus.exceptions.DBusException as exc:
             self._print_dbus_exception(exc)
             exit(1)
-        self._all_commands = self.parser_cmds()
         self._config = load_server_conf_file(localonly=True)
         if KEY_COLORS in self._config:
             self._colors = True if self._config[KEY_COLORS].strip().lower() == 'yes' else False
@@ -149,13 +159,19 @@ class DrbdManage(object):
             exit(1)
 
     def dsc(self, fn, *args, **kwargs):
-        tries, retries_max = 0, 15
-        while tries <= retries_max:
-            if tries > 0:
-                if tries == 1:
-                    sys.stderr.write('Waiting for server: ')
-                sys.stderr.write('.')
-                sys.stderr.flush()
+        """
+        Calls a server function, retrying while the server is not ready
+
+        During the server's startup, the client waits on the server side
+        until the server is ready (see DrbdManageServer.wait_ready()).
+        Otherwise, the delays between retries follow the server's hints or
+        grow exponentially (see retry_delay()).
+        """
+        deadline = time.time() + RETRY_TIMEOUT
+        tries = 0
+        wait_ready = True
+        timed_out = False
+        while True:
             server_rc = fn(*args, **kwargs)
             try:
                 # single int return codes like ping
@@ -165,20 +181,55 @@ class DrbdManage(object):
                 pass
 
             chk = mangle_server_rc(server_rc)
-            if is_rc_retry(chk):
-                tries += 1
-                time.sleep(2)
-                continue
-            else:
+            if not is_rc_retry(chk):
+                break
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                timed_out = True
                 break
+            if tries == 0:
+                sys.stderr.write('Waiting for server: ')
+            sys.stderr.write('.')
+            sys.stderr.flush()
+
+            startup = len([rc for rc in chk if rc[0] == DM_ENOTREADY_STARTUP]) > 0
+            if not (wait_ready and startup and self._wait_server_ready(remaining)):
+                time.sleep(min(retry_delay(tries, get_retry_hint(chk)), remaining))
+            # The server is waited for only once, after that, the request
+            # is retried periodically until the deadline
+            wait_ready = wait_ready and not startup
+            tries += 1
         if tries > 0:
             sys.stderr.write('\n')
-        if tries == retries_max + 1:
+        if timed_out:
             self._process_rc_entries(chk, True)
 
         return server_rc
 
-    def setup_parser(self):
+    def _wait_server_ready(self, timeout):
+        """
+        Waits on the server side until the server finished its startup
+
+        @return: True if the server answered, False if the server does not
+                 support waiting
+        """
+        try:
+            # the D-Bus call's timeout must be longer than the server's
+            self._server.wait_ready(dbus.Double(timeout), timeout=timeout + 5)
+            return True
+        except dbus.exceptions.DBusException:
+            # e.g., an older server without the wait_ready function
+            return False
+
+    def setup_parser(self, setup_opts=True):
+        """
+        Creates the command line parser
+
+        @param setup_opts: if False, the subcommands that are generated from
+                           drbdsetup's option descriptions are left out,
+                           which saves several runs of drbdsetup
+        """
         parser = argparse.ArgumentParser(prog='drbdmanage')
         parser.add_argument('--version', '-v', action='version',
                             version='%(prog)s ' + DM_VERSION + '; ' + DM_GITHASH)
@@ -193,6 +244,22 @@ class DrbdManage(object):
                                     description='Start interactive mode')
         parser_ia.set_defaults(func=self.cmd_interactive)
 
+        # batch mode
+        p_batch = subp.add_parser('batch',
+                                  description='Run the commands from a file, one command per '
+                                  'line, using a single connection to the server. A line is '
+                                  'either a command line like the arguments of drbdmanage, '
+                                  'or a JSON array of arguments. Empty lines and lines '
+                                  'starting with "#" are ignored.')
+        p_batch.add_argument('file', nargs='?', default='-',
+                             help='File to read the commands from (default: standard input)')
+        p_batch.add_argument('--stop-on-error', action='store_true',
+                             help='Do not run any further commands after a command failed')
+        p_batch.add_argument('--json', action='store_true',
+                             help='Report the result of each command as a line containing '
+                             'a JSON object, including the output of the command')
+        p_batch.set_defaults(func=self.cmd_batch)
+
         # help
         p_help = subp.add_parser('help',
                                  description='Print help for a command')
@@ -805,6 +872,8 @@ class DrbdManage(object):
                                    description='Prints a list of all cluster nodes known to drbdmanage. '
                                    'By default, the list is printed as a human readable table.')
         p_lnodes.add_argument('-m', '--machine-readable', action="store_true")
+        p_lnodes.add_argument('-j', '--json', action="store_true",
+                              help='Print one JSON object per line as the list is received from the server')
         p_lnodes.add_argument('-p', '--pastable', action="store_true", help='Generate pastable output')
         p_lnodes.add_argument('-s', '--show', nargs='+',
                               choices=nodesverbose).completer = nodes_verbose_completer
@@ -825,6 +894,8 @@ class DrbdManage(object):
                                    description='Prints a list of all resource definitions known to '
                                    'drbdmanage. By default, the list is printed as a human readable table.')
         p_lreses.add_argument('-m', '--machine-readable', action="store_true")
+        p_lreses.add_argument('-j', '--json', action="store_true",
+                              help='Print one JSON object per line as the list is received from the server')
         p_lreses.add_argument('-p', '--pastable', action="store_true", help='Generate pastable output')
         p_lreses.add_argument('-s', '--show', nargs='+',
                               choices=resverbose).completer = res_verbose_completer
@@ -843,6 +914,8 @@ class DrbdManage(object):
                                   description=' Prints a list of all volume definitions known to drbdmanage. '
                                   'By default, the list is printed as a human readable table.')
         p_lvols.add_argument('-m', '--machine-readable', action="store_true")
+        p_lvols.add_argument('-j', '--json', action="store_true",
+                             help='Print one JSON object per line as the list is received from the server')
         p_lvols.add_argument('-p', '--pastable', action="store_true", help='Generate pastable output')
         p_lvols.add_argument('-s', '--show', nargs='+',
                              choices=resverbose).completer = res_verbose_completer
@@ -860,6 +933,8 @@ class DrbdManage(object):
         p_lsnaps = subp.add_parser('list-snapshots', aliases=['s', 'snapshots'],
                                    description='List available snapshots')
         p_lsnaps.add_argument('-m', '--machine-readable', action="store_true")
+        p_lsnaps.add_argument('-j', '--json', action="store_true",
+                              help='Print one JSON object per line as the list is received from the server')
         p_lsnaps.add_argument('-p', '--pastable', action="store_true", help='Generate pastable output')
         p_lsnaps.add_argument('-g', '--groupby', nargs='+',
                               choices=snapgroupby).completer = snap_group_completer
@@ -900,6 +975,8 @@ class DrbdManage(object):
                                         "list. By default, the list is printed as a human readable table.")
         p_assignments.add_argument('-m', '--machine-readable',
                                    action="store_true")
+        p_assignments.add_argument('-j', '--json', action="store_true",
+                                   help='Print one JSON object per line as the list is received from the server')
         p_assignments.add_argument('-p', '--pastable', action="store_true", help='Generate pastable output')
         p_assignments.add_argument('-s', '--show', nargs='+',
                                    choices=assignverbose).completer = ass_verbose_completer
@@ -1034,6 +1111,18 @@ class DrbdManage(object):
         p_ping = subp.add_parser('wait-for-startup', description='Wait until server is started up')
         p_ping.set_defaults(func=self.cmd_wait_for_startup)
 
+        # watch
+        p_watch = subp.add_parser('watch',
+                                  description='Prints the serial number and the changed objects '
+                                  'whenever the configuration changes, until interrupted. '
+                                  'Objects are printed as keys like "resource:NAME", '
+                                  '"volume:RES/ID" or "assignment:NODE/RES".')
+        p_watch.add_argument('-m', '--machine-readable', action="store_true",
+                             help='Print one JSON object per change')
+        p_watch.add_argument('-R', '--resources', nargs='+', type=check_res_name,
+                             help='Filter by list of resources').completer = res_completer
+        p_watch.set_defaults(func=self.cmd_watch)
+
         # startup
         p_startup = subp.add_parser('startup',
                                     description='Start the server via D-Bus')
@@ -1070,8 +1159,8 @@ class DrbdManage(object):
         p_init.add_argument('-q', '--quiet', action="store_true")
         p_init.add_argument('-s', '--no-storage', action="store_true")
         p_init.add_argument('ip', nargs='?',
-                            default=default_ip(),
-                            help="IP address of the machine",
+                            help="IP address of the machine "
+                            "(Default: the address of the default route's interface)",
                             choices=IPAddressCheck())
         p_init.set_defaults(func=self.cmd_init)
 
@@ -1125,8 +1214,8 @@ class DrbdManage(object):
             return possible
 
         # disk-options
-        do = DrbdSetupOpts('disk-options')
-        if do.ok:
+        do = DrbdSetupOpts('disk-options') if setup_opts else None
+        if do is not None and do.ok:
             p_do = do.genArgParseSubcommand(subp)
             p_do.add_argument('--common', action="store_true")
             p_do.add_argument('--resource', type=check_res_name,
@@ -1138,8 +1227,8 @@ class DrbdManage(object):
             p_do.set_defaults(func=self.cmd_disk_options)
 
         # peer-device-options (shares func with disk-options)
-        pdo = DrbdSetupOpts('peer-device-options')
-        if pdo.ok:
+        pdo = DrbdSetupOpts('peer-device-options') if setup_opts else None
+        if pdo is not None and pdo.ok:
             p_pdo = pdo.genArgParseSubcommand(subp)
             p_pdo.add_argument('--common', action="store_true")
             p_pdo.add_argument('--resource', type=check_res_name,
@@ -1151,8 +1240,8 @@ class DrbdManage(object):
             p_pdo.set_defaults(func=self.cmd_disk_options)
 
         # resource-options
-        ro = DrbdSetupOpts('resource-options')
-        if ro.ok:
+        ro = DrbdSetupOpts('resource-options') if setup_opts else None
+        if ro is not None and ro.ok:
             p_ro = ro.genArgParseSubcommand(subp)
             p_ro.add_argument('--common', action="store_true")
             p_ro.add_argument('--resource', type=check_res_name,
@@ -1165,8 +1254,8 @@ class DrbdManage(object):
         # TODO: not allowed to set per connection, drbdmanage currently has no notion of a
         # connection in its object model.
         #
-        no = DrbdSetupOpts('new-peer', 'net-options')
-        if no.ok:
+        no = DrbdSetupOpts('new-peer', 'net-options') if setup_opts else None
+        if no is not None and no.ok:
             p_no = no.genArgParseSubcommand(subp)
             p_no.add_argument('--common', action="store_true")
             p_no.add_argument('--resource', type=check_res_name,
@@ -1272,13 +1361,37 @@ class DrbdManage(object):
                                'in 2 node cluster)')
         p_reelect.set_defaults(func=self.cmd_reelect)
 
-        argcomplete.autocomplete(parser)
+        if "_ARGCOMPLETE" in os.environ:
+            import drbdmanage.argcomplete as argcomplete
+            argcomplete.autocomplete(parser)
 
         return parser
 
     def parse(self, pargs):
         args = self._parser.parse_args(pargs)
-        args.func(args)
+        return args.func(args)
+
+    def _get_subcommand(self, pargs):
+        """
+        Returns the subcommand of a command line, or None if there is none
+        """
+        subcommand = None
+        for arg in pargs:
+            if not arg.startswith("-"):
+                subcommand = arg
+                break
+        return subcommand
+
+    def _needs_setup_opts(self, subcommand):
+        """
+        Indicates whether the parser must contain the subcommands that are
+        generated from drbdsetup's option descriptions
+        """
+        return (
+            subcommand is None or "_ARGCOMPLETE" in os.environ or
+            subcommand in DrbdManage.SETUP_OPTS_CMDS or
+            subcommand in DrbdManage.PARSER_TREE_CMDS
+        )
 
     def parser_cmds(self):
         # AFAIK there is no other way to get the subcommands out of argparse.
@@ -1385,6 +1498,7 @@ class DrbdManage(object):
         # if loaded, raw_input makes use of it
         try:
             import readline
+            import drbdmanage.argcomplete as argcomplete
             completer = argcomplete.CompletionFinder(self._parser)
             readline.set_completer_delims("")
             readline.set_completer(completer.rl_complete)
@@ -1407,6 +1521,115 @@ class DrbdManage(object):
                 sys.stdout.write("\n")  # additional newline, makes shell prompt happy
                 return
 
+    def cmd_batch(self, args):
+        """
+        Runs the commands from a file, one command per line
+
+        All commands use the same parser and the same connection to the
+        server. Each command is run after the previous one finished, and the
+        result of each command is reported separately.
+        """
+        import shlex
+        batch_file = None
+        failed = 0
+        try:
+            if args.file == '-':
+                batch_file = sys.stdin
+            else:
+                batch_file = open(args.file, 'r')
+            # not "for line in batch_file", which would read ahead on stdin
+            for line_nr, line in enumerate(iter(batch_file.readline, ''), 1):
+                line = line.strip()
+                if len(line) == 0 or line.startswith('#'):
+                    continue
+
+                cmd_args = None
+                try:
+                    if line.startswith('['):
+                        cmd_args = json.loads(line)
+                        if not (isinstance(cmd_args, list) and
+                                all([isinstance(arg, basestring) for arg in cmd_args])):
+                            raise ValueError("not an array of strings")
+                        cmd_args = [arg.encode('utf-8') if isinstance(arg, unicode) else arg
+                                    for arg in cmd_args]
+                    else:
+                        cmd_args = shlex.split(line)
+                    if len(cmd_args) > 0 and cmd_args[0] == 'drbdmanage':
+                        cmd_args = cmd_args[1:]
+                except ValueError as value_exc:
+                    fn_rc, output, errors = 1, '', 'Invalid command line: %s\n' % (str(value_exc))
+                else:
+                    if len(cmd_args) > 0 and cmd_args[0] in ['exit', 'quit']:
+                        break
+                    fn_rc, output, errors = self._run_batch_command(cmd_args, args.json)
+
+                if args.json:
+                    result = {"line": line_nr, "command": cmd_args, "rc": fn_rc,
+                              "output": output, "errors": errors}
+                    sys.stdout.write(json.dumps(result, sort_keys=True) + "\n")
+                else:
+                    sys.stderr.write(errors)
+                    sys.stdout.write("[line %d] %s\n"
+                                     % (line_nr, "OK" if fn_rc == 0 else "FAILED (%d)" % (fn_rc)))
+                sys.stdout.flush()
+
+                if fn_rc != 0:
+                    failed += 1
+                    if args.stop_on_error:
+                        break
+        except IOError as io_err:
+            sys.stderr.write("Cannot read the batch file '%s': %s\n" % (args.file, str(io_err)))
+            sys.exit(1)
+        finally:
+            if batch_file is not None and batch_file is not sys.stdin:
+                batch_file.close()
+
+        if failed > 0:
+            sys.exit(1)
+        return 0
+
+    def _run_batch_command(self, cmd_args, capture):
+        """
+        Runs a single command of a batch file
+
+        @param   capture: if set, the standard output and error output of the
+                          command are returned instead of being written
+        @return: tuple (return code, output, error output)
+        """
+        from StringIO import StringIO
+        if len(cmd_args) > 0 and cmd_args[0] in DrbdManage.BATCH_EXCLUDED_CMDS:
+            return 1, '', 'The %s command cannot be used in batch mode\n' % (cmd_args[0])
+
+        # Commands that ask for confirmation must not read the following
+        # lines of a batch from stdin; without input, the answer is "no"
+        stdin, stdout, stderr = sys.stdin, sys.stdout, sys.stderr
+        sys.stdin = open(os.devnull, 'r')
+        if capture:
+            sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            try:
+                fn_rc = self.parse(cmd_args)
+            except SystemExit as exit_exc:
+                # raised by argparse and by commands that exit on errors
+                fn_rc = exit_exc.code
+            except dbus.exceptions.DBusException as exc:
+                self._print_dbus_exception(exc)
+                fn_rc = 1
+            output, errors = '', ''
+            if capture:
+                output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdin.close()
+            sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+
+        if fn_rc is None:
+            fn_rc = 0
+        elif not isinstance(fn_rc, int):
+            # sys.exit() with a message
+            errors += "%s\n" % (fn_rc)
+            fn_rc = 1
+        return fn_rc, output, errors
+
     def cmd_help(self, args):
         self.parse([args.command, "-h"])
 
@@ -1434,6 +1657,7 @@ class DrbdManage(object):
         ip = args.ip
         af = args.address_family
         if af is None:
+            import drbdmanage.drbd.drbdcore
             af = drbdmanage.drbd.drbdcore.DrbdNode.AF_IPV4_LABEL
         flag_storage = not args.no_storage
         flag_external = args.external
@@ -1501,6 +1725,8 @@ class DrbdManage(object):
         return fn_rc
 
     def cmd_new_volume(self, args):
+        from drbdmanage.storage.storagecore import MinorNr
+
         fn_rc = 1
 
         minor = MinorNr.MINOR_NR_AUTO
@@ -1795,6 +2021,8 @@ class DrbdManage(object):
         return fn_rc
 
     def cmd_flags(self, args):
+        from drbdmanage.drbd.drbdcore import Assignment
+
         fn_rc = 1
         clear_mask = 0
         set_mask = 0
@@ -2190,14 +2418,86 @@ class DrbdManage(object):
         self._server = None
         self.cmd_startup(None)
 
-    def _get_nodes(self, sort=False, node_filter=[]):
+    def _list_pages(self, page_fn, list_fn, list_args):
+        """
+        Generates the pages of a list from the server
+
+        Pages of up to LIST_PAGE_SIZE entries are requested from a
+        list_*_page server function until the server returns an empty
+        cursor, so that neither the server nor the client hold the whole
+        list. Servers without the page function return the whole list from
+        the list_* function instead.
+
+        @return: generator of tuples (server return codes, list entries)
+        """
+        cursor = ""
+        while True:
+            try:
+                server_rc, entries, cursor = self.dsc(
+                    page_fn, *(list_args + [dbus.String(cursor), dbus.Int32(self.LIST_PAGE_SIZE)])
+                )
+            except dbus.exceptions.DBusException as dbus_exc:
+                if cursor or dbus_exc.get_dbus_name() != "org.freedesktop.DBus.Error.UnknownMethod":
+                    raise
+                server_rc, entries = self.dsc(list_fn, *list_args)
+            yield server_rc, entries
+            if not cursor:
+                break
+
+    def _write_json_records(self, pages, record_fn):
+        """
+        Writes one JSON object per line for the entries of a list
+
+        Each page is written as soon as it is received.
+
+        @param pages: generator as returned by _list_pages()
+        @param record_fn: function that returns a list of the records (dicts)
+                          for a list entry
+        @return: 0 on success, 1 if the server reported errors
+        """
+        fn_rc = 0
+        for server_rc, entries in pages:
+            errors = [rc_entry for rc_entry in server_rc if rc_entry[0] != DM_SUCCESS]
+            if len(errors) > 0:
+                self._list_rc_entries(errors)
+                fn_rc = 1
+            if entries is not None:
+                for entry in entries:
+                    for record in record_fn(entry):
+                        sys.stdout.write(json.dumps(record, sort_keys=True) + "\n")
+            sys.stdout.flush()
+        return fn_rc
+
+    def _list_req_props(self, views, column_props, columns):
+        """
+        Returns the properties to request from the server for a list
+
+        Only the properties that the views read and those of the columns
+        that are displayed are requested, so that the server neither
+        generates nor sends the other properties of each object.
+
+        @param views: view classes used for the list entries
+        @param column_props: dict of column name -> list of property keys
+        @param columns: names of the displayed columns, or None for all
+        @return: list of property keys
+        """
+        req_props = []
+        for view in views:
+            req_props.extend(view.REQ_PROPS)
+        if columns is None:
+            columns = column_props.keys()
+        for column in columns:
+            req_props.extend(column_props.get(column, []))
+        return req_props
+
+    def _get_nodes(self, sort=False, node_filter=[], req_props=[]):
         self.dbus_init()
 
         server_rc, node_list = self.dsc(self._server.list_nodes,
                                         dbus.Array(node_filter, signature="s"),
                                         0,
                                         dbus.Dictionary({}, signature="ss"),
-                                        dbus.Array([], signature="s"))
+                                        dbus.Array(req_props, signature="s"))
 
         if sort:
             node_list.sort(key=lambda node_entry: node_entry[0])
@@ -2205,6 +2505,8 @@ class DrbdManage(object):
         return (server_rc, node_list)
 
     def cmd_list_nodes(self, args):
+        from drbdmanage.drbd.views import DrbdNodeView
+
         color = self.color
 
         machine_readable = args.machine_readable
@@ -2214,8 +2516,32 @@ class DrbdManage(object):
 
         node_filter_arg = [] if args.nodes is None else args.nodes
 
+        if args.json:
+            self.dbus_init()
+            return self._write_json_records(
+                self._list_pages(
+                    self._server.list_nodes_page, self._server.list_nodes,
+                    [dbus.Array(node_filter_arg, signature="s"), 0,
+                     dbus.Dictionary({}, signature="ss"), dbus.Array([], signature="s")]
+                ),
+                lambda node_entry: [{"name": node_entry[0], "props": dict(node_entry[1])}]
+            )
+
+        column_props = {
+            "Pool_Size": [NODE_POOLSIZE],
+            "Pool_Free": [NODE_POOLFREE],
+            "Site": [Props.NAMESPACES[Props.KEY_DMCONFIG] + NODE_SITE],
+            "Family": [NODE_AF],
+            "IP": [NODE_ADDR],
+        }
+        columns = None
+        if not machine_readable:
+            columns = ["Pool_Size", "Pool_Free"] + (args.show or []) + (args.groupby or [])
+        req_props = self._list_req_props([DrbdNodeView], column_props, columns)
+
         server_rc, node_list = self._get_nodes(sort=True,
-                                               node_filter=node_filter_arg)
+                                               node_filter=node_filter_arg,
+                                               req_props=req_props)
 
         if (not machine_readable) and (node_list is None or len(node_list) == 0):
             sys.stdout.write("No nodes defined\n")
@@ -2319,7 +2645,7 @@ class DrbdManage(object):
     def cmd_list_volumes(self, args):
         return self._list_resources(args, True)
 
-    def __list_resources(self, list_volumes, resource_filter=[]):
+    def __list_resources(self, list_volumes, resource_filter=[], req_props=[]):
         self.dbus_init()
 
         if list_volumes:
@@ -2327,13 +2653,13 @@ class DrbdManage(object):
                                            dbus.Array(resource_filter, signature="s"),
                                            0,
                                            dbus.Dictionary({}, signature="ss"),
-                                           dbus.Array([], signature="s"))
+                                           dbus.Array(req_props, signature="s"))
         else:
             server_rc, res_list = self.dsc(self._server.list_resources,
                                            dbus.Array(resource_filter, signature="s"),
                                            0,
                                            dbus.Dictionary({}, signature="ss"),
-                                           dbus.Array([], signature="s"))
+                                           dbus.Array(req_props, signature="s"))
 
         # sort the resource list by resource name
         res_list.sort(key=lambda res_entry: res_entry[0])
@@ -2353,6 +2679,8 @@ class DrbdManage(object):
         description is followed by a description of all volumes of the
         respective resource.
         """
+        from drbdmanage.drbd.views import DrbdResourceView, DrbdVolumeView, GenericView
+
         color = self.color
 
         machine_readable = args.machine_readable
@@ -2362,8 +2690,46 @@ class DrbdManage(object):
 
         resource_filter_arg = [] if args.resources is None else args.resources
 
+        if args.json:
+            self.dbus_init()
+            list_args = [
+                dbus.Array(resource_filter_arg, signature="s"), 0,
+                dbus.Dictionary({}, signature="ss"), dbus.Array([], signature="s")
+            ]
+            if list_volumes:
+                pages = self._list_pages(
+                    self._server.list_volumes_page, self._server.list_volumes, list_args
+                )
+                record_fn = lambda res_entry: [{
+                    "name": res_entry[0], "props": dict(res_entry[1]),
+                    "volumes": [
+                        {"id": int(vol_id), "props": dict(vol_props)}
+                        for vol_id, vol_props in res_entry[2]
+                    ]
+                }]
+            else:
+                pages = self._list_pages(
+                    self._server.list_resources_page, self._server.list_resources, list_args
+                )
+                record_fn = lambda res_entry: [
+                    {"name": res_entry[0], "props": dict(res_entry[1])}
+                ]
+            return self._write_json_records(pages, record_fn)
+
+        column_props = {"Port": [RES_PORT]}
+        views = [DrbdResourceView]
+        if list_volumes:
+            column_props["Minor"] = [VOL_MINOR]
+            views.append(DrbdVolumeView)
+        columns = None
+        if not machine_readable:
+            columns = (args.show or []) + (args.groupby or [])
+            if list_volumes:
+                columns.append("Minor")
+        req_props = self._list_req_props(views, column_props, columns)
+
         server_rc, res_list = self.__list_resources(
-            list_volumes, resource_filter=resource_filter_arg
+            list_volumes, resource_filter=resource_filter_arg, req_props=req_props
         )
 
         if (not machine_readable) and (res_list is None or len(res_list) == 0):
@@ -2466,7 +2832,7 @@ class DrbdManage(object):
             t.show()
         return 0
 
-    def _list_snapshots(self, resource_filter=[]):
+    def _list_snapshots(self, resource_filter=[], req_props=[]):
         self.dbus_init()
 
         server_rc, res_list = self.dsc(self._server.list_snapshots,
@@ -2474,7 +2840,7 @@ class DrbdManage(object):
                                        dbus.Array([], signature="s"),
                                        0,
                                        dbus.Dictionary({}, signature="ss"),
-                                       dbus.Array([], signature="s"))
+                                       dbus.Array(req_props, signature="s"))
 
         # sort the list by resource name
         res_list.sort(key=lambda res_entry: res_entry[0])
@@ -2491,8 +2857,23 @@ class DrbdManage(object):
 
         resource_filter_arg = [] if args.resources is None else args.resources
 
+        if args.json:
+            self.dbus_init()
+            return self._write_json_records(
+                self._list_pages(
+                    self._server.list_snapshots_page, self._server.list_snapshots,
+                    [dbus.Array(resource_filter_arg, signature="s"), dbus.Array([], signature="s"), 0,
+                     dbus.Dictionary({}, signature="ss"), dbus.Array([], signature="s")]
+                ),
+                lambda res_entry: [
+                    {"resource": res_entry[0], "name": snaps_name, "props": dict(snaps_props)}
+                    for snaps_name, snaps_props in res_entry[1]
+                ]
+            )
+
+        # Only the names of the snapshots are displayed
         server_rc, res_list = self._list_snapshots(
-            resource_filter=resource_filter_arg
+            resource_filter=resource_filter_arg, req_props=[SNAPS_NAME]
         )
 
         if (not machine_readable) and (res_list is None or len(res_list) == 0):
@@ -2528,6 +2909,8 @@ class DrbdManage(object):
         return 0
 
     def cmd_list_snapshot_assignments(self, args):
+        from drbdmanage.snapshots.views import DrbdSnapshotAssignmentView
+
         color = self.color
 
         self.dbus_init()
@@ -2593,6 +2976,8 @@ class DrbdManage(object):
         return 0
 
     def cmd_list_assignments(self, args):
+        from drbdmanage.drbd.views import AssignmentView, DrbdVolumeStateView, GenericView
+
         color = self.color
 
         self.dbus_init()
@@ -2605,12 +2990,41 @@ class DrbdManage(object):
         node_filter_arg = [] if args.nodes is None else args.nodes
         resource_filter_arg = [] if args.resources is None else args.resources
 
+        if args.json:
+            return self._write_json_records(
+                self._list_pages(
+                    self._server.list_assignments_page, self._server.list_assignments,
+                    [dbus.Array(node_filter_arg, signature="s"),
+                     dbus.Array(resource_filter_arg, signature="s"), 0,
+                     dbus.Dictionary({}, signature="ss"), dbus.Array([], signature="s")]
+                ),
+                lambda assg_entry: [{
+                    "node": assg_entry[0], "resource": assg_entry[1],
+                    "props": dict(assg_entry[2]),
+                    "volumes": [
+                        {"id": int(vol_id), "props": dict(vol_props)}
+                        for vol_id, vol_props in assg_entry[3]
+                    ]
+                }]
+            )
+
+        column_props = {
+            "Blockdevice": [VOL_BDEV],
+            "Node_ID": [NODE_ID],
+        }
+        columns = None
+        if not machine_readable:
+            columns = (args.show or []) + (args.groupby or [])
+        req_props = self._list_req_props(
+            [AssignmentView, DrbdVolumeStateView], column_props, columns
+        )
+
         server_rc, assg_list = self.dsc(self._server.list_assignments,
                                         dbus.Array(node_filter_arg, signature="s"),
                                         dbus.Array(resource_filter_arg, signature="s"),
                                         0,
                                         dbus.Dictionary({}, signature="ss"),
-                                        dbus.Array([], signature="s"))
+                                        dbus.Array(req_props, signature="s"))
         if (not machine_readable) and (assg_list is None or len(assg_list) == 0):
             sys.stdout.write("No assignments defined\n")
             return 0
@@ -2900,6 +3314,39 @@ class DrbdManage(object):
 
         return fn_rc
 
+    def cmd_watch(self, args):
+        """
+        Prints the server's change notifications until interrupted
+        """
+        import gobject
+        from drbdmanage.dbusserver import DBusSignal
+        from drbdmanage.changefeed import key_resource
+
+        self.dbus_init()
+
+        def changes_received(serial, keys):
+            keys = [str(key) for key in keys]
+            if args.resources:
+                keys = [key for key in keys if key_resource(key) in args.resources]
+            if len(keys) > 0:
+                if args.machine_readable:
+                    sys.stdout.write(json.dumps({"serial": int(serial), "keys": keys}) + "\n")
+                else:
+                    sys.stdout.write("%d %s\n" % (serial, " ".join(keys)))
+                sys.stdout.flush()
+
+        self._dbus.add_signal_receiver(
+            changes_received, signal_name="notify_changes",
+            dbus_interface=DBUS_DRBDMANAGED,
+            path=DBusSignal.PATH_PREFIX + "/" + DBUS_CHANGES
+        )
+        self._gmainloop = gobject.MainLoop()
+        try:
+            self._gmainloop.run()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
     def cmd_ping(self, args):
         fn_rc = 1
         try:
@@ -2959,6 +3406,9 @@ or the drbdmanage server.
 
             af = args.address_family
             address = args.ip
+            if address is None:
+                from drbdmanage.defaultip import default_ip
+                address = default_ip()
             port = args.port
             quiet = args.quiet
             flag_storage = not args.no_storage
@@ -3531,6 +3981,8 @@ Confirm:
         """
         Selects a color for a level returned by GenericView subclasses
         """
+        from drbdmanage.drbd.views import GenericView
+
         level_color = COLOR_RED
         if level == GenericView.STATE_NORM:
             level_color = COLOR_DARKGREEN
@@ -4057,6 +4509,9 @@ Confirm:
     def _drbdctrl_init(self, drbdctrl_file):
         fn_rc = 1
 
+        import drbdmanage.drbd.persistence
+        from drbdmanage.storage.header import gen_header
+
         init_blks = 4
         persist = drbdmanage.drbd.persistence.ServerDualPersistence
         blksz = persist.BLOCK_SIZE
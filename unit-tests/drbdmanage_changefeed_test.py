@@ -0,0 +1,115 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import drbdmanage.consts as consts
+import drbdmanage.drbd.drbdcore as drbdcore
+
+from drbdmanage.changefeed import ChangeFeed, key_resource
+from drbdmanage_fixtures import Cluster
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class ClusterServer(object):
+
+    """
+    Provides the server functions used by the change feed for a Cluster
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def peek_serial(self):
+        return int(self.cluster._serial_props[consts.SERIAL])
+
+    def get_common(self):
+        return self.cluster.objects_root["common"]
+
+    def iterate_nodes(self):
+        return iter(self.cluster.nodes)
+
+    def iterate_resources(self):
+        return iter([self.cluster.resource])
+
+
+class ChangeFeedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cluster = Cluster(2, 1, 2)
+        self.signal = mock.Mock()
+        self.feed = ChangeFeed(ClusterServer(self.cluster), self.signal)
+
+    def test_no_changes(self):
+        """does not send a signal without changes"""
+        self.feed.publish()
+        self.assertFalse(self.signal.notify_changes.called)
+
+    def test_changes(self):
+        """reports the keys of changed objects once"""
+        vol_state = self.cluster.get_assignment(1).get_volume_state(1)
+        vol_state.set_cstate_flags(drbdcore.DrbdVolumeState.FLAG_ATTACH)
+        self.cluster.resource.get_volume(0).get_props().set_prop("test", "1")
+        self.feed.publish()
+        self.cluster.close_serial()
+        self.feed.publish()
+
+        self.assertEqual(1, self.signal.notify_changes.call_count)
+        serial, keys = self.signal.notify_changes.call_args[0]
+        self.assertEqual(self.feed._server.peek_serial(), serial)
+        self.assertEqual(["assignment:node01/res0", "volume:res0/0"], keys)
+
+    def test_same_generation(self):
+        """reports changes made within the generation of the last signal"""
+        self.cluster.nodes[0].get_props().set_prop("test", "1")
+        self.feed.publish()
+        self.cluster.nodes[0].get_props().set_prop("test", "2")
+        self.feed.publish()
+
+        self.assertEqual(2, self.signal.notify_changes.call_count)
+        self.assertEqual(["node:node00"], self.signal.notify_changes.call_args[0][1])
+
+    def test_removed(self):
+        """reports the keys of removed objects"""
+        self.cluster.resource.remove_volume(1)
+        for node in self.cluster.nodes:
+            node.get_assignment("res0").remove_volume_state(1)
+        self.feed.publish()
+
+        keys = self.signal.notify_changes.call_args[0][1]
+        self.assertTrue("volume:res0/1" in keys)
+
+    def test_key_resource(self):
+        """finds the resource an object key refers to"""
+        self.assertEqual("res0", key_resource("volume:res0/1"))
+        self.assertEqual("res0", key_resource("assignment:node01/res0"))
+        self.assertEqual("res0", key_resource("snapshot-assignment:node01/res0/snap"))
+        self.assertTrue(key_resource("node:node01") is None)
+        self.assertTrue(key_resource("common") is None)
+
+
+if __name__ == "__main__":
+    unittest.main()
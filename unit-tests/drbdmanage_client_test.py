@@ -0,0 +1,280 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import dbus
+from StringIO import StringIO
+
+import drbdmanage_client
+import drbdmanage.consts as consts
+import drbdmanage.exceptions as DME
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class ClientStartupTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(drbdmanage_client, "DrbdSetupOpts")
+        self.setup_opts = patcher.start()
+        self.setup_opts.return_value.ok = False
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(
+            drbdmanage_client, "load_server_conf_file", return_value={}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_client(self, *cmd_args):
+        with mock.patch.object(sys, "argv", ["drbdmanage"] + list(cmd_args)):
+            return drbdmanage_client.DrbdManage()
+
+    def test_lazy_imports(self):
+        """does not load server modules on import"""
+        for name in ["drbdmanage.dbusserver", "drbdmanage.drbd.drbdcore",
+                     "drbdmanage.drbd.persistence", "drbdmanage.argcomplete"]:
+            self.assertFalse(name in sys.modules, name)
+
+    def test_plain_subcommand(self):
+        """does not run drbdsetup to set up a plain subcommand"""
+        client = self.create_client("ping")
+        self.assertFalse(self.setup_opts.called)
+        self.assertTrue(["ping"] in client._all_commands)
+
+    def test_setup_opts_subcommand(self):
+        """sets up the drbdsetup option subcommands where needed"""
+        for cmd_args in [["list-options", "res0"], ["help", "ping"], ["bogus"], []]:
+            self.setup_opts.reset_mock()
+            self.create_client(*cmd_args)
+            self.assertEqual(4, self.setup_opts.call_count)
+
+
+class ClientBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(drbdmanage_client, "DrbdSetupOpts")
+        patcher.start().return_value.ok = False
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            drbdmanage_client, "load_server_conf_file", return_value={}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.batch_file = os.path.join(self.tmpdir, "commands")
+
+        with mock.patch.object(sys, "argv", ["drbdmanage", "batch"]):
+            self.client = drbdmanage_client.DrbdManage()
+        self.client._server = mock.Mock()
+        self.client._server.ping.return_value = 0
+        self.client._server.create_resource.return_value = [[0, "", {}]]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_batch(self, lines, *options):
+        with open(self.batch_file, "w") as batch_file:
+            batch_file.write("\n".join(lines) + "\n")
+        stdout = StringIO()
+        exit_code = 0
+        with mock.patch.object(sys, "stdout", stdout), \
+                mock.patch.object(sys, "stderr", StringIO()):
+            try:
+                self.client.parse(["batch", self.batch_file] + list(options))
+            except SystemExit as exit_exc:
+                exit_code = exit_exc.code
+        return exit_code, stdout.getvalue()
+
+    def test_batch(self):
+        """runs all commands using one connection and reports each line"""
+        exit_code, output = self.run_batch(
+            ["# provisioning", "ping", "", '["new-resource", "r0"]',
+             "drbdmanage new-resource --port 7001 r1", "no-such-command", "ping"],
+            "--json"
+        )
+        self.assertEqual(1, exit_code)
+        results = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([2, 4, 5, 6, 7], [result["line"] for result in results])
+        self.assertEqual([0, 0, 0, 2, 0], [result["rc"] for result in results])
+        self.assertEqual("pong\n", results[0]["output"])
+        self.assertEqual(["new-resource", "--port", "7001", "r1"], results[2]["command"])
+        self.assertEqual("r0", self.client._server.create_resource.call_args_list[0][0][0])
+        self.assertEqual(2, self.client._server.ping.call_count)
+
+    def test_confirm_from_stdin(self):
+        """questions do not consume the following lines of the batch input"""
+        with open(self.batch_file, "w") as batch_file:
+            batch_file.write("remove-resource r0\nping\n")
+        stdout = StringIO()
+        with open(self.batch_file) as stdin, \
+                mock.patch.object(sys, "stdin", stdin), \
+                mock.patch.object(sys, "stdout", stdout), \
+                mock.patch.object(sys, "stderr", StringIO()):
+            self.client.parse(["batch", "-", "--json"])
+        results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([1, 2], [result["line"] for result in results])
+        self.assertIn("Please confirm:", results[0]["output"])
+        self.assertFalse(self.client._server.remove_resource.called)
+        self.assertEqual("pong\n", results[1]["output"])
+
+    def test_stop_on_error(self):
+        """stops at the first failed command or at exit"""
+        exit_code, output = self.run_batch(["interactive", "ping"], "--stop-on-error")
+        self.assertEqual(1, exit_code)
+        self.assertEqual("[line 1] FAILED (1)\n", output)
+
+        exit_code, output = self.run_batch(["ping", "exit", "ping"])
+        self.assertEqual(0, exit_code)
+        self.assertEqual("pong\n[line 1] OK\n", output)
+
+class ClientRetryTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(drbdmanage_client, "DrbdSetupOpts")
+        patcher.start().return_value.ok = False
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            drbdmanage_client, "load_server_conf_file", return_value={}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(drbdmanage_client.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(sys, "stderr", StringIO())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with mock.patch.object(sys, "argv", ["drbdmanage", "ping"]):
+            self.client = drbdmanage_client.DrbdManage()
+        self.client._server = mock.Mock()
+        self.fn = mock.Mock()
+
+    def test_wait_ready(self):
+        """waits on the server side during the server's startup"""
+        self.fn.side_effect = [
+            [(DME.DM_ENOTREADY_STARTUP, "starting", [])],
+            [(DME.DM_SUCCESS, "ok", [])],
+        ]
+        server_rc = self.client.dsc(self.fn, "res0")
+        self.assertEqual([(DME.DM_SUCCESS, "ok", [])], server_rc)
+        self.assertEqual(1, self.client._server.wait_ready.call_count)
+        self.assertFalse(self.sleep.called)
+
+    def test_retry_hint(self):
+        """sleeps for the time suggested by the server"""
+        self.fn.side_effect = [
+            [(DME.DM_ENOTREADY, "busy", [(consts.RC_RETRY_AFTER, "1.5")])],
+            [(DME.DM_ENOTREADY, "busy", [])],
+            [(DME.DM_SUCCESS, "ok", [])],
+        ]
+        self.client.dsc(self.fn)
+        delays = [call[0][0] for call in self.sleep.call_args_list]
+        self.assertEqual(2, len(delays))
+        self.assertTrue(1.5 <= delays[0] <= 2.25)
+        self.assertTrue(delays[1] < 1.0)
+        self.assertFalse(self.client._server.wait_ready.called)
+
+
+class ClientListTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(drbdmanage_client, "DrbdSetupOpts")
+        patcher.start().return_value.ok = False
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            drbdmanage_client, "load_server_conf_file", return_value={}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with mock.patch.object(sys, "argv", ["drbdmanage", "list-nodes"]):
+            self.client = drbdmanage_client.DrbdManage()
+        self.client._server = mock.Mock()
+
+    def run_list(self, *cmd_args):
+        stdout = StringIO()
+        with mock.patch.object(sys, "stdout", stdout), \
+                mock.patch.object(sys, "stderr", StringIO()):
+            fn_rc = self.client.parse(list(cmd_args))
+        return fn_rc, [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_pages(self):
+        """requests and prints the list page by page"""
+        success = [dbus.Struct((DME.DM_SUCCESS, "ok", []))]
+        self.client._server.list_assignments_page.side_effect = [
+            (success, [("n1", "r0", {"state": "1"}, [(0, {"minor": "100"})])], "n1/r0"),
+            (success, [("n2", "r0", {}, [])], ""),
+        ]
+        fn_rc, records = self.run_list("list-assignments", "--json", "-R", "r0")
+        self.assertEqual(0, fn_rc)
+        self.assertEqual([
+            {"node": "n1", "resource": "r0", "props": {"state": "1"},
+             "volumes": [{"id": 0, "props": {"minor": "100"}}]},
+            {"node": "n2", "resource": "r0", "props": {}, "volumes": []},
+        ], records)
+        calls = self.client._server.list_assignments_page.call_args_list
+        self.assertEqual(["", "n1/r0"], [call[0][-2] for call in calls])
+        self.assertEqual(["r0"], list(calls[0][0][1]))
+        self.assertFalse(self.client._server.list_assignments.called)
+
+    def test_old_server(self):
+        """falls back to the whole list if the server cannot paginate"""
+        self.client._server.list_snapshots_page.side_effect = (
+            dbus.exceptions.DBusException(
+                name="org.freedesktop.DBus.Error.UnknownMethod"
+            )
+        )
+        self.client._server.list_snapshots.return_value = (
+            [dbus.Struct((DME.DM_ENOENT, "missing", []))],
+            [("r0", [("s1", {}), ("s2", {})])]
+        )
+        fn_rc, records = self.run_list("list-snapshots", "--json")
+        self.assertEqual(1, fn_rc)
+        self.assertEqual(["s1", "s2"], [record["name"] for record in records])
+
+    def test_req_props(self):
+        """requests only the properties that are displayed"""
+        self.client._server.list_assignments.return_value = (
+            [dbus.Struct((DME.DM_SUCCESS, "ok", []))], []
+        )
+        with mock.patch.object(sys, "stdout", StringIO()):
+            self.client.parse(["list-assignments", "--show", "Blockdevice"])
+        req_props = list(self.client._server.list_assignments.call_args[0][4])
+        self.assertTrue(consts.VOL_BDEV in req_props)
+        self.assertTrue(consts.TSTATE_PREFIX + consts.FLAG_DEPLOY in req_props)
+        self.assertFalse(consts.NODE_ID in req_props)
+
+
+if __name__ == "__main__":
+    unittest.main()
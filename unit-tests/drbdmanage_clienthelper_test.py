@@ -0,0 +1,95 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import dbus
+
+import drbdmanage.clienthelper as clienthelper
+import drbdmanage.consts as consts
+import drbdmanage.exceptions as DME
+import drbdmanage.utils as utils
+
+from drbdmanage.clienthelper import DrbdManageClientHelper
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+NOT_READY = [(DME.DM_ENOTREADY, "not ready", [(consts.RC_RETRY_AFTER, "0.5")])]
+STARTUP = [(DME.DM_ENOTREADY_STARTUP, "startup", [])]
+SUCCESS = [(DME.DM_SUCCESS, "ok", [])]
+
+
+class RetryTests(unittest.TestCase):
+
+    def setUp(self):
+        with mock.patch.object(DrbdManageClientHelper, "dbus_connect"):
+            self.helper = DrbdManageClientHelper()
+        self.helper.odm = mock.Mock()
+
+        # The helper's sleep() advances the clock
+        self.now = 1000.0
+        patcher = mock.patch.object(clienthelper.time, "time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.helper.sleep = self.sleep
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def test_retry_timeout(self):
+        """retries a busy server until RETRY_TIMEOUT has passed"""
+        fn = mock.Mock(return_value=NOT_READY)
+        self.assertEqual(NOT_READY, self.helper.call_or_reconnect(fn, "res0"))
+        self.assertGreaterEqual(self.now - 1000.0, utils.RETRY_TIMEOUT)
+        self.assertLess(self.now - 1000.0, utils.RETRY_TIMEOUT + 1)
+        # far more tries than the former limit of 15 tries
+        self.assertGreater(fn.call_count, 15)
+        fn.assert_called_with("res0")
+
+    def test_ready(self):
+        """returns the answer once the server is ready"""
+        fn = mock.Mock(side_effect=[NOT_READY, NOT_READY, SUCCESS])
+        self.assertEqual(SUCCESS, self.helper.call_or_reconnect(fn))
+        self.assertEqual(3, fn.call_count)
+
+    def test_wait_ready(self):
+        """waits on the server side during the server's startup"""
+        fn = mock.Mock(side_effect=[STARTUP, SUCCESS])
+        self.assertEqual(SUCCESS, self.helper.call_or_reconnect(fn))
+        self.assertEqual(1, self.helper.odm.wait_ready.call_count)
+        self.assertEqual(1000.0, self.now)
+
+    def test_wait_ready_unsupported(self):
+        """polls servers that do not support waiting"""
+        self.helper.odm.wait_ready.side_effect = dbus.DBusException("unknown method")
+        fn = mock.Mock(side_effect=[STARTUP, STARTUP, SUCCESS])
+        self.assertEqual(SUCCESS, self.helper.call_or_reconnect(fn))
+        self.assertEqual(1, self.helper.odm.wait_ready.call_count)
+        self.assertGreater(self.now, 1000.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from drbdmanage.drbd.commands import DrbdAdm
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class DrbdAdmBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.drbdadm = DrbdAdm(self.tmpdir)
+        self.res_names = ["res0", "res1", "res1-a", "res2"]
+
+        patcher = mock.patch.object(self.drbdadm, "_run_drbdutils_output")
+        self.run_output = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.single_fn = mock.Mock(return_value=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_batch(self):
+        """runs drbdadm once with a configuration that includes all resources"""
+        def run_output(exec_args):
+            with open(exec_args[3]) as batch_file:
+                self.conf = batch_file.read()
+            return 0, []
+        self.run_output.side_effect = run_output
+
+        results = self.drbdadm._run_batch("adjust", self.res_names, self.single_fn)
+        self.assertEqual(dict([(res_name, 0) for res_name in self.res_names]), results)
+        exec_args = self.run_output.call_args[0][0]
+        self.assertEqual(["adjust"] + self.res_names, exec_args[4:])
+        self.assertTrue(
+            'include "%s";' % (os.path.join(self.tmpdir, "drbdmanage_res1-a.res")) in self.conf
+        )
+        self.assertFalse(self.single_fn.called)
+        self.assertEqual([], os.listdir(self.tmpdir))
+
+    def test_partial_failure(self):
+        """retries all resources if some of them failed"""
+        self.run_output.return_value = (10, [
+            "res1: Failure: (162) Invalid configuration request",
+            "Command 'drbdsetup attach res1 0 /dev/vg/res1_00' terminated with exit code 10",
+        ])
+        self.single_fn.side_effect = lambda res_name: 10 if res_name == "res1" else 0
+
+        results = self.drbdadm._run_batch("adjust", self.res_names, self.single_fn)
+        self.assertEqual({"res0": 0, "res1": 10, "res1-a": 0, "res2": 0}, results)
+        self.assertEqual(
+            self.res_names, [call[0][0] for call in self.single_fn.call_args_list]
+        )
+
+    def test_aborted_run(self):
+        """retries all resources if drbdadm did not report any of them"""
+        self.run_output.return_value = (DrbdAdm.DRBDUTIL_EXEC_FAILED, [])
+        results = self.drbdadm._run_batch("down", self.res_names, self.single_fn)
+        self.assertEqual(dict([(res_name, 0) for res_name in self.res_names]), results)
+        self.assertEqual(len(self.res_names), self.single_fn.call_count)
+
+    def test_single_resource(self):
+        """runs a single resource without a batch configuration"""
+        self.single_fn.return_value = 5
+        self.assertEqual({"res0": 5}, self.drbdadm._run_batch("adjust", ["res0"], self.single_fn))
+        self.assertFalse(self.run_output.called)
+
+    def test_failed_batch_resources(self):
+        """finds the resources named in error lines"""
+        output = [
+            "drbdsetup-84 new-resource res0 --on-no-data-accessible=io-error",
+            "res1: Failure: (162) Invalid configuration request",
+            "'res2' not defined in your config (for this host).",
+            "Command 'drbdsetup down res1-a' terminated with exit code 11",
+        ]
+        self.assertEqual(
+            set(["res1", "res2", "res1-a"]),
+            self.drbdadm._failed_batch_resources(self.res_names, output)
+        )
+        self.assertEqual(
+            set(), self.drbdadm._failed_batch_resources(self.res_names, output[:1])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+from StringIO import StringIO
+
+from drbdmanage.conf.conffile import DrbdAdmConf
+from drbdmanage_fixtures import Cluster, SETUPOPT_NS
+
+
+EXPECTED_CONF = """\
+# This file was generated by drbdmanage(8), do not edit manually.
+#dm-meta:{}
+
+resource res0 {
+   net {
+       shared-secret "secret";
+       cram-hmac-alg sha1;
+   }
+   options {
+       quorum majority;
+   }
+   disk {
+       on-io-error detach;
+   }
+   connection-mesh {
+      hosts node00 node01;
+   }
+   connection {
+      host node00;
+      host node02;
+   }
+   connection {
+      host node01;
+      host node02;
+   }
+    on node02 {
+        node-id 2;
+        address ipv4 10.0.0.3:7000;
+        volume 0 {
+            device minor 100;
+            disk none;
+            meta-disk internal;
+        }
+    }
+    on node00 {
+        node-id 0;
+        address ipv4 10.0.0.1:7000;
+        volume 0 {
+            device minor 100;
+            disk /dev/drbdpool/res0_00;
+            disk {
+                resync-rate 10M;
+                size 1024k;
+            }
+            meta-disk internal;
+        }
+    }
+    on node01 {
+        node-id 1;
+        address ipv4 10.0.0.2:7000;
+        volume 0 {
+            device minor 100;
+            disk /dev/drbdpool/res0_00;
+            disk {
+                resync-rate 10M;
+                size 1024k;
+            }
+            meta-disk internal;
+        }
+    }
+}
+"""
+
+EXPECTED_EXCERPT = """\
+resource res0 {
+   net {
+       shared-secret "secret";
+       cram-hmac-alg sha1;
+   }
+   options {
+       quorum majority;
+   }
+   disk {
+       on-io-error detach;
+   }
+    on node00 {
+        node-id 0;
+        address ipv4 10.0.0.1:7000;
+        volume 0 {
+            device minor 100;
+            disk /dev/drbdpool/res0_00;
+            disk {
+                resync-rate 10M;
+                size 1024k;
+            }
+            meta-disk internal;
+        }
+    }
+    on node02 {
+        node-id 2;
+        address ipv4 10.0.0.3:7000;
+        volume 0 {
+            device minor 100;
+            disk /dev/null;
+            meta-disk internal;
+        }
+    }
+    connection-mesh {
+        hosts node00;
+    }
+    connection {
+        host node02;
+        host node00;
+    }
+}
+"""
+
+
+class DrbdAdmConfTests(unittest.TestCase):
+
+    def setUp(self):
+        DrbdAdmConf.fragment_cache.clear()
+        self.cluster = Cluster(2, 1, 1)
+
+    def test_write(self):
+        """renders the complete resource configuration"""
+        self.assertEqual(EXPECTED_CONF, self.cluster.write(2))
+
+    def test_write_excerpt(self):
+        """renders the selected nodes only"""
+        nodes = [self.cluster.nodes[0], self.cluster.nodes[2]]
+        self.assertEqual(EXPECTED_EXCERPT, self.cluster.write_excerpt(0, nodes))
+
+    def test_fragments_cached(self):
+        """renders unchanged fragments from the cache"""
+        conf = self.cluster.write(0)
+        misses = DrbdAdmConf.fragment_cache.misses
+
+        self.assertEqual(conf, self.cluster.write(0))
+        self.assertEqual(misses, DrbdAdmConf.fragment_cache.misses)
+        self.assertTrue(DrbdAdmConf.fragment_cache.hits > 0)
+
+    def test_change_within_generation(self):
+        """rerenders fragments of objects changed in the same generation"""
+        self.cluster.write(0)
+        vol_state = self.cluster.get_assignment(1).get_volume_state(0)
+        vol_state.set_bd("res0_00", "/dev/drbdpool/first")
+        self.assertTrue("/dev/drbdpool/first" in self.cluster.write(0))
+        vol_state.set_bd("res0_00", "/dev/drbdpool/second")
+
+        conf = self.cluster.write(0)
+        self.assertTrue("/dev/drbdpool/second" in conf)
+        self.assertFalse("/dev/drbdpool/first" in conf)
+
+    def test_option_change(self):
+        """rerenders the volume options if they change"""
+        self.cluster.write(0)
+        volume = self.cluster.resource.get_volume(0)
+        volume.get_props().set_prop("resync-rate", "20M", SETUPOPT_NS + "disko")
+
+        self.assertEqual(
+            EXPECTED_CONF.replace("resync-rate 10M", "resync-rate 20M"),
+            self.cluster.write(2)
+        )
+
+    def test_global_conf_path(self):
+        """refers to the global configuration file without rendering it"""
+        conf = self.cluster.write(0, "/etc/drbd.d/drbdmanage_global_common.conf")
+        self.assertTrue(
+            'resource res0 {\ntemplate-file "/etc/drbd.d/drbdmanage_global_common.conf";\n\n'
+            in conf
+        )
+
+    def test_write_global(self):
+        """renders the common options into the global configuration file"""
+        common = self.cluster.objects_root["common"]
+        stream = StringIO()
+        DrbdAdmConf(self.cluster.objects_root).write_global(stream)
+        self.assertEqual("common {\n# currently empty\n}\n", stream.getvalue())
+
+        common.get_props().set_prop("c-max-rate", "100M", SETUPOPT_NS + "disko")
+        stream = StringIO()
+        DrbdAdmConf(self.cluster.objects_root).write_global(stream)
+        self.assertEqual(
+            "common {\n   disk {\n       c-max-rate 100M;\n   }\n}\n", stream.getvalue()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+  The connection sections generated for randomized topologies are compared
+  to the golden files in unit-tests/golden. Run with --regen to rewrite the
+  golden files.
+"""
+import os
+import random
+import sys
+import unittest
+
+from StringIO import StringIO
+
+from drbdmanage.conf.conffile import DrbdConnectionConf
+from drbdmanage.propscontainer import Props
+
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+GOLDEN_FILE = "connconf_%.2d.conf"
+TOPOLOGIES = 16
+
+SITES_NS = Props.NAMESPACES[Props.KEY_SITES]
+DMCONFIG_NS = Props.NAMESPACES[Props.KEY_DMCONFIG]
+
+
+class FakeNode(object):
+
+    """
+    Node with a reproducible hash value
+
+    DrbdConnectionConf iterates over sets of nodes, so the order of the
+    generated sections depends on the hash values of the nodes.
+    """
+
+    def __init__(self, idx, site):
+        self._idx = idx
+        self._name = "node%.2d" % (idx)
+        self._props = Props(None)
+        if site is not None:
+            self._props.set_prop("site", site, DMCONFIG_NS)
+
+    def __hash__(self):
+        return self._idx
+
+    def get_name(self):
+        return self._name
+
+    def get_props(self):
+        return self._props
+
+
+class FakeCommon(object):
+
+    def __init__(self):
+        self._props = Props(None)
+
+    def get_props(self):
+        return self._props
+
+
+def build_topology(seed):
+    """
+    Builds a random set of servers and clients with random site settings
+
+    @return: tuple of servers, clients and objects_root
+    """
+    rnd = random.Random(seed)
+    sites = ["alpha", "beta", "gamma", "delta"][:rnd.randint(1, 4)]
+    servers = []
+    clients = []
+    for idx in range(rnd.randint(1, 4 + seed)):
+        node = FakeNode(idx, rnd.choice(sites + [None]))
+        if rnd.random() < 0.2:
+            clients.append(node)
+        else:
+            servers.append(node)
+
+    common = FakeCommon()
+    for site_a in sites:
+        for site_b in sites:
+            if rnd.random() < 0.4:
+                common.get_props().set_prop(
+                    "protocol", rnd.choice(["A", "B", "C"]),
+                    SITES_NS + site_a + ":" + site_b + "/neto"
+                )
+    return servers, clients, {"common": common}
+
+
+def render_topology(seed):
+    """
+    Renders the connection sections of a topology for no target node and
+    for some of the nodes as target node
+
+    @return: configuration text
+    """
+    servers, clients, objects_root = build_topology(seed)
+    text = []
+    for target_node in [None] + servers[:2] + clients[:1]:
+        stream = StringIO()
+        conn_conf = DrbdConnectionConf(
+            servers, clients, objects_root, stream, target_node
+        )
+        nodes = conn_conf.generate_conf()
+        text.append(
+            "# target %s, nodes %s\n"
+            % (target_node.get_name() if target_node is not None else "-",
+               " ".join(sorted([node.get_name() for node in nodes])))
+        )
+        text.append(stream.getvalue())
+    return "".join(text)
+
+
+class DrbdConnectionConfTests(unittest.TestCase):
+
+    def test_golden(self):
+        """generates the same connections as recorded in the golden files"""
+        for seed in range(TOPOLOGIES):
+            with open(os.path.join(GOLDEN_DIR, GOLDEN_FILE % (seed))) as golden_file:
+                self.assertEqual(
+                    golden_file.read(), render_topology(seed),
+                    "topology %d differs from its golden file" % (seed)
+                )
+
+    def test_single_site_mesh(self):
+        """puts diskful nodes of a site into one connection-mesh"""
+        servers = [FakeNode(0, "alpha"), FakeNode(1, "alpha"), FakeNode(2, None)]
+        clients = [FakeNode(3, "alpha")]
+        stream = StringIO()
+        conn_conf = DrbdConnectionConf(
+            servers, clients, {"common": FakeCommon()}, stream
+        )
+        nodes = conn_conf.generate_conf()
+
+        self.assertTrue("hosts node00 node01;" in stream.getvalue())
+        self.assertEqual(set(servers + clients), set(nodes))
+
+
+def regen():
+    if not os.path.isdir(GOLDEN_DIR):
+        os.mkdir(GOLDEN_DIR)
+    for seed in range(TOPOLOGIES):
+        with open(os.path.join(GOLDEN_DIR, GOLDEN_FILE % (seed)), "w") as golden_file:
+            golden_file.write(render_topology(seed))
+
+
+if __name__ == "__main__":
+    if "--regen" in sys.argv:
+        regen()
+    else:
+        unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import drbdmanage.storage.devwait as devwait
+
+from drbdmanage.storage.devwait import DeviceWaiter
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class DeviceWaiterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        # Creating block devices requires privileges, regular files stand
+        # in for the device nodes
+        patcher = mock.patch.object(devwait, "is_blockdev", os.path.exists)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create_later(self, path, delay=0.2):
+        def create():
+            time.sleep(delay)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, "w").close()
+        thread = threading.Thread(target=create)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def wait(self, waiter, paths, timeout):
+        start = time.time()
+        try:
+            missing = waiter.wait(paths, timeout)
+        finally:
+            waiter.close()
+        return missing, time.time() - start
+
+    def test_existing(self):
+        """returns immediately if the devices exist"""
+        path = os.path.join(self.tmpdir, "res0_00")
+        open(path, "w").close()
+        missing, elapsed = self.wait(DeviceWaiter(), [path], 10)
+        self.assertEqual(set(), missing)
+        self.assertLess(elapsed, 1)
+
+    def test_created(self):
+        """wakes up when the device and its parent directory are created"""
+        waiter = DeviceWaiter()
+        if not waiter.uses_inotify():
+            waiter.close()
+            self.skipTest("inotify is not available")
+        path = os.path.join(self.tmpdir, "pool", "res0_00")
+        self.create_later(path)
+        # Without inotify events, the path would only be rechecked
+        # after the timeout
+        with mock.patch.object(devwait, "RECHECK_INTERVAL", 30):
+            missing, elapsed = self.wait(waiter, [path], 30)
+        self.assertEqual(set(), missing)
+        self.assertLess(elapsed, 10)
+
+    def test_timeout(self):
+        """returns the devices that did not appear in time"""
+        present = os.path.join(self.tmpdir, "res0_00")
+        absent = os.path.join(self.tmpdir, "res0_01")
+        open(present, "w").close()
+        missing, elapsed = self.wait(DeviceWaiter(), [present, absent], 0.3)
+        self.assertEqual(set([absent]), missing)
+        self.assertGreaterEqual(elapsed, 0.3)
+        self.assertLess(elapsed, 5)
+
+    def test_no_inotify(self):
+        """falls back to polling if inotify is unavailable"""
+        path = os.path.join(self.tmpdir, "pool", "res0_00")
+        self.create_later(path)
+        with mock.patch.object(devwait, "_get_libc", return_value=None), \
+                mock.patch.object(devwait, "POLL_INTERVAL", 0.05):
+            waiter = DeviceWaiter()
+            self.assertFalse(waiter.uses_inotify())
+            missing, elapsed = self.wait(waiter, [path], 10)
+        self.assertEqual(set(), missing)
+        self.assertLess(elapsed, 5)
+
+    def test_inotify_init_failed(self):
+        """falls back to polling if no inotify instance can be created"""
+        libc = mock.Mock()
+        libc.inotify_init1.return_value = -1
+        with mock.patch.object(devwait, "_get_libc", return_value=libc):
+            waiter = DeviceWaiter()
+        self.assertFalse(waiter.uses_inotify())
+        path = os.path.join(self.tmpdir, "res0_00")
+        with mock.patch.object(devwait, "POLL_INTERVAL", 0.05):
+            missing, elapsed = self.wait(waiter, [path], 0.2)
+        self.assertEqual(set([path]), missing)
+        self.assertFalse(libc.inotify_add_watch.called)
+
+
+if __name__ == "__main__":
+    unittest.main()
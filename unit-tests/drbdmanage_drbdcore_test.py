@@ -0,0 +1,298 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import threading
+import unittest
+
+import drbdmanage.consts as consts
+import drbdmanage.drbd.drbdcore as drbdcore
+
+from drbdmanage.drbd.drbdcore import Assignment, DrbdManager, DrbdVolumeState
+from drbdmanage.storage.storagecore import MinorNr
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+def get_serial():
+    return 1
+
+
+class InitialUpTests(unittest.TestCase):
+
+    def setUp(self):
+        self.node = drbdcore.DrbdNode(
+            "node00", "10.0.0.1", 4, 0, 0, 0, 0, get_serial, None, None
+        )
+        self.server = mock.Mock()
+        self.server._conf = {}
+        self.server.DEFAULT_STARTUP_CONCURRENCY = 1
+        self.server.get_instance_node.return_value = self.node
+        self.server.get_conf_value.return_value = "1"
+
+        patcher = mock.patch.object(drbdcore.drbdcmd, "DrbdAdm")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.drbd_mgr = DrbdManager(self.server)
+        self.drbdadm = self.drbd_mgr._drbdadm
+
+        # drbdadm runs in worker threads if startup-concurrency is set
+        self.lock = threading.Lock()
+        self.batches = []
+        self.drbdadm.adjust_batch.side_effect = self.record_batch
+
+    def record_batch(self, res_names):
+        with self.lock:
+            self.batches.append(list(res_names))
+
+    def add_resource(self, res_name, priority=None, volumes=1, deployed=True):
+        resource = drbdcore.DrbdResource(
+            res_name, 7000, "secret", 0, None, get_serial, None, None
+        )
+        if priority is not None:
+            resource.get_props().set_prop(consts.KEY_STARTUP_PRIORITY, str(priority))
+        for vol_id in range(volumes):
+            resource.add_volume(drbdcore.DrbdVolume(
+                vol_id, 1024, MinorNr(100 + vol_id), 0, get_serial, None, None
+            ))
+        state = Assignment.FLAG_DEPLOY if deployed else 0
+        assignment = Assignment(
+            self.node, resource, 0, state, state, 0, None, get_serial, None, None
+        )
+        for vol_state in assignment.iterate_volume_states():
+            vol_state.set_tstate(drbdcore.DrbdVolumeState.FLAG_DEPLOY)
+        self.node.add_assignment(assignment)
+        resource.add_assignment(assignment)
+
+    def exported(self):
+        return [
+            call[0][0].get_resource().get_name()
+            for call in self.server.export_assignment_conf.call_args_list
+        ]
+
+    def test_priority(self):
+        """starts resources in the order of their startup priority"""
+        for res_name, priority in [("r0", None), ("r1", 10), ("r2", None),
+                                   ("r3", 5), ("r4", -1), ("r5", 0)]:
+            self.add_resource(res_name, priority)
+        self.drbd_mgr.initial_up()
+        exported = self.exported()
+        self.assertEqual(["r1", "r3"], exported[:2])
+        # Resources of equal priority follow the node's assignment order
+        self.assertEqual(set(["r0", "r2", "r5"]), set(exported[2:5]))
+        self.assertEqual("r4", exported[5])
+        self.assertEqual([exported], self.batches)
+
+    def test_skipped(self):
+        """skips resources that are not deployed or have no volumes"""
+        self.add_resource("r0")
+        self.add_resource("r1", volumes=0)
+        self.add_resource("r2", deployed=False)
+        self.drbd_mgr.initial_up()
+        self.assertEqual(["r0"], self.exported())
+        self.assertEqual([["r0"]], self.batches)
+
+    def test_batch_size(self):
+        """limits the number of resources per drbdadm run"""
+        res_names = ["r%.2d" % (idx) for idx in range(40)]
+        for res_name in res_names:
+            self.add_resource(res_name)
+        self.drbd_mgr.initial_up()
+        exported = self.exported()
+        self.assertEqual(sorted(res_names), sorted(exported))
+        batch_size = DrbdManager.DRBDADM_BATCH_SIZE
+        self.assertEqual(
+            [exported[idx:idx + batch_size] for idx in range(0, 40, batch_size)],
+            self.batches
+        )
+
+    def test_concurrency(self):
+        """splits the resources into batches for the concurrent drbdadm runs"""
+        self.server.get_conf_value.return_value = "3"
+        res_names = ["r%d" % (idx) for idx in range(7)]
+        for res_name in res_names:
+            self.add_resource(res_name, 7 - int(res_name[1:]))
+        self.drbd_mgr.initial_up()
+        self.assertEqual(res_names, self.exported())
+        # The batches may complete in any order
+        self.assertEqual(
+            sorted([res_names[0:3], res_names[3:6], res_names[6:7]]),
+            sorted(self.batches)
+        )
+
+
+class PoolReservedTests(unittest.TestCase):
+
+    PEERS = 7
+
+    def setUp(self):
+        self.node = drbdcore.DrbdNode(
+            "node00", "10.0.0.1", 4, 0, 0, 0, 0, get_serial, None, None
+        )
+        self.resource = drbdcore.DrbdResource(
+            "res0", 7000, "secret", 0, None, get_serial, None, None
+        )
+        for vol_id in range(2):
+            self.resource.add_volume(drbdcore.DrbdVolume(
+                vol_id, 1048576 * (vol_id + 1), MinorNr(100 + vol_id), 0,
+                get_serial, None, None
+            ))
+        self.assg = self.assign(self.resource)
+
+        # A deployed resource that does not reserve any space
+        other = drbdcore.DrbdResource(
+            "res1", 7001, "secret", 0, None, get_serial, None, None
+        )
+        other.add_volume(drbdcore.DrbdVolume(
+            0, 1048576, MinorNr(110), 0, get_serial, None, None
+        ))
+        other_assg = self.assign(other)
+        other_assg.set_cstate(Assignment.FLAG_DEPLOY)
+        for vol_state in other_assg.iterate_volume_states():
+            vol_state.set_cstate(DrbdVolumeState.FLAG_DEPLOY)
+
+    def assign(self, resource):
+        assg = Assignment(
+            self.node, resource, 0, 0, Assignment.FLAG_DEPLOY, 0, None,
+            get_serial, None, None
+        )
+        for vol_state in assg.iterate_volume_states():
+            vol_state.set_tstate(DrbdVolumeState.FLAG_DEPLOY)
+        self.node.add_assignment(assg)
+        resource.add_assignment(assg)
+        return assg
+
+    def check(self, peers=PEERS):
+        """
+        Compares the tracked reserved space with a full recalculation
+
+        @return: the reserved space in kiB
+        """
+        expected = sum([
+            assg.get_gross_size_kiB_correction(peers)
+            for assg in self.node.iterate_assignments()
+        ])
+        self.assertEqual(expected, self.node.get_pool_reserved(peers))
+        return expected
+
+    def deploy_volumes(self):
+        for vol_state in self.assg.iterate_volume_states():
+            vol_state.set_cstate(DrbdVolumeState.FLAG_DEPLOY)
+
+    def test_deploy(self):
+        """releases the reservation when the volumes are deployed"""
+        self.assertTrue(self.check() > 3145728)
+        self.assg.get_volume_state(0).set_cstate_flags(DrbdVolumeState.FLAG_DEPLOY)
+        self.assertTrue(2097152 < self.check() < 3145728)
+        self.assg.get_volume_state(0).clear_cstate_flags(DrbdVolumeState.FLAG_DEPLOY)
+        self.assertTrue(self.check() > 3145728)
+        self.assg.set_cstate(Assignment.FLAG_DEPLOY)
+        self.assertEqual(0, self.check())
+
+    def test_undeploy(self):
+        """releases the reservation when the assignment is undeployed"""
+        self.check()
+        self.assg.undeploy()
+        self.assertEqual(0, self.check())
+        # undeploy() marks the assignment deployed, see Assignment.undeploy()
+        self.assg.deploy()
+        self.assg.set_cstate(0)
+        self.assertTrue(self.check() > 0)
+        for vol_state in self.assg.iterate_volume_states():
+            vol_state.undeploy()
+        self.assertEqual(0, self.check())
+        self.assg.get_volume_state(1).deploy()
+        self.assertTrue(self.check() > 2097152)
+
+    def test_diskless_to_diskful(self):
+        """reserves space for deployed diskless volumes that get storage"""
+        self.assg.set_tstate(Assignment.FLAG_DEPLOY | Assignment.FLAG_DISKLESS)
+        self.assertEqual(0, self.check())
+        self.assg.set_cstate(Assignment.FLAG_DEPLOY | Assignment.FLAG_DISKLESS)
+        self.deploy_volumes()
+        self.assertEqual(0, self.check())
+        self.assg.set_tstate(Assignment.FLAG_DEPLOY)
+        self.assertTrue(self.check() > 3145728)
+        self.assg.set_cstate(Assignment.FLAG_DEPLOY)
+        self.assertEqual(0, self.check())
+
+    def test_resize(self):
+        """reserves the additional space of a resize"""
+        self.assg.set_cstate(Assignment.FLAG_DEPLOY)
+        self.deploy_volumes()
+        self.assertEqual(0, self.check())
+        self.resource.begin_resize(0, 2097152)
+        self.assertTrue(self.check() > 1048576)
+        volume = self.resource.get_volume(0)
+        volume.set_size_kiB(2097152)
+        self.resource.pool_reserved_changed()
+        self.resource.finish_resize_drbd(0)
+        self.assertEqual(0, self.check())
+
+    def test_volumes(self):
+        """follows volume states that are added or removed"""
+        self.deploy_volumes()
+        self.assertEqual(0, self.check())
+        self.resource.add_volume(drbdcore.DrbdVolume(
+            2, 4194304, MinorNr(102), 0, get_serial, None, None
+        ))
+        self.assg.update_volume_states(get_serial())
+        self.assertEqual(0, self.check())
+        self.assg.get_volume_state(2).set_tstate(DrbdVolumeState.FLAG_DEPLOY)
+        self.assertTrue(self.check() > 4194304)
+
+        self.assg.remove_volume_state(2)
+        self.assertEqual(0, self.check())
+
+        self.assg.get_volume_state(1).set_cstate(0)
+        self.assertTrue(self.check() > 2097152)
+        self.resource.remove_volume(1)
+        self.assg.update_volume_states(get_serial())
+        self.assertEqual(0, self.check())
+
+    def test_unassign(self):
+        """releases the reservation of a removed assignment"""
+        self.assertTrue(self.check() > 0)
+        self.node.remove_assignment(self.assg)
+        self.resource.remove_assignment(self.assg)
+        self.assertEqual(0, self.check())
+        self.node.add_assignment(self.assg)
+        self.assertTrue(self.check() > 0)
+
+    def test_max_peers(self):
+        """recalculates all reservations if the number of peers changes"""
+        # The metadata size currently does not depend on the number of peers
+        with mock.patch.object(
+            drbdcore.md.MetaData, "get_gross_kiB",
+            side_effect=lambda net_kiB, peers, al_stripes, al_stripe_kiB: net_kiB + peers * 64
+        ):
+            reserved = self.check()
+            self.assertEqual(reserved + 2 * 24 * 64, self.check(31))
+            self.assg.get_volume_state(0).set_cstate(DrbdVolumeState.FLAG_DEPLOY)
+            self.assertEqual(2097152 + 31 * 64, self.check(31))
+            self.assertEqual(2097152 + 7 * 64, self.check())
+
+
+if __name__ == "__main__":
+    unittest.main()
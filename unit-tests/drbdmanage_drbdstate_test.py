@@ -0,0 +1,123 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+from StringIO import StringIO
+
+from drbdmanage.drbd.drbdstate import DrbdEventsState
+
+
+# Recorded "drbdsetup events2 all" output: initial state dump of a resource
+# with two volumes and two peers, followed by a resync of volume 1 from
+# node "beta" and the removal of node "gamma"
+EVENTS_LOG = """\
+exists resource name:.drbdctrl role:Secondary suspended:no
+exists connection name:.drbdctrl peer-node-id:1 conn-name:beta connection:Connected role:Primary
+exists device name:.drbdctrl volume:0 minor:0 disk:UpToDate
+exists resource name:res0 role:Primary suspended:no
+exists connection name:res0 peer-node-id:1 conn-name:beta connection:Connected role:Secondary
+exists connection name:res0 peer-node-id:2 conn-name:gamma connection:Connected role:Secondary
+exists device name:res0 volume:0 minor:100 disk:UpToDate
+exists device name:res0 volume:1 minor:101 disk:Inconsistent
+exists peer-device name:res0 peer-node-id:1 conn-name:beta volume:0 replication:Established peer-disk:UpToDate resync-suspended:no
+exists peer-device name:res0 peer-node-id:1 conn-name:beta volume:1 replication:SyncTarget peer-disk:UpToDate resync-suspended:no
+exists peer-device name:res0 peer-node-id:2 conn-name:gamma volume:0 replication:Established peer-disk:UpToDate resync-suspended:no
+exists peer-device name:res0 peer-node-id:2 conn-name:gamma volume:1 replication:Established peer-disk:Inconsistent resync-suspended:no
+exists -
+change peer-device name:res0 peer-node-id:1 conn-name:beta volume:1 replication:Established
+change device name:res0 volume:1 disk:UpToDate
+call helper name:res0 peer-node-id:2 conn-name:gamma helper:before-resync-target
+change connection name:res0 peer-node-id:2 conn-name:gamma connection:TearDown
+destroy peer-device name:res0 peer-node-id:2 conn-name:gamma volume:0
+destroy peer-device name:res0 peer-node-id:2 conn-name:gamma volume:1
+destroy connection name:res0 peer-node-id:2 conn-name:gamma
+"""
+
+# number of lines of the initial state dump, including "exists -"
+INITIAL_LINES = 13
+
+
+class DrbdEventsStateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.state = DrbdEventsState()
+
+    def replay(self, lines=None):
+        log = EVENTS_LOG.splitlines(True)
+        if lines is not None:
+            log = log[:lines]
+        self.state.replay(StringIO("".join(log)))
+
+    def test_initial_state(self):
+        """builds the model from the initial state dump"""
+        self.replay(INITIAL_LINES)
+
+        self.assertTrue(self.state.is_initialized())
+        res_state = self.state.get_resource("res0")
+        self.assertEqual("Primary", res_state.get_role())
+        self.assertEqual("UpToDate", self.state.get_disk_state("res0", 0))
+        self.assertEqual("Inconsistent", self.state.get_disk_state("res0", 1))
+        peer_device = res_state.get_connection_by_name("beta").get_peer_device(1)
+        self.assertEqual("SyncTarget", peer_device.get_replication_state())
+        self.assertEqual(3, self.state.get_uptodate_count("res0", 0))
+        self.assertEqual(1, self.state.get_uptodate_count("res0", 1))
+
+    def test_not_initialized(self):
+        """is not initialized before the end of the initial state dump"""
+        self.replay(INITIAL_LINES - 1)
+        self.assertFalse(self.state.is_initialized())
+
+    def test_changes(self):
+        """merges change events and drops destroyed objects"""
+        self.replay()
+
+        res_state = self.state.get_resource("res0")
+        self.assertEqual("UpToDate", self.state.get_disk_state("res0", 1))
+        self.assertEqual(
+            "Established",
+            res_state.get_connection(1).get_peer_device(1).get_replication_state()
+        )
+        # fields that were not part of the change event are kept
+        self.assertEqual("101", res_state.get_device(1).get_prop("minor"))
+        self.assertTrue(res_state.get_connection(2) is None)
+        self.assertEqual(2, self.state.get_uptodate_count("res0", 1))
+
+    def test_resource_view(self):
+        """generates the view transferred by list_drbd_states"""
+        self.replay()
+
+        name, props, devices, connections = self.state.get_resource_view("res0")
+        self.assertEqual("res0", name)
+        self.assertEqual("Primary", props["role"])
+        self.assertEqual([0, 1], [vol_id for vol_id, _ in devices])
+        self.assertEqual(["beta"], [conn[0] for conn in connections])
+        self.assertEqual("Connected", connections[0][1]["connection"])
+        self.assertTrue(self.state.get_resource_view("res1") is None)
+
+    def test_reset(self):
+        """forgets all state when the events source is restarted"""
+        self.replay()
+        self.state.reset()
+
+        self.assertFalse(self.state.is_initialized())
+        self.assertTrue(self.state.get_resource("res0") is None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+  Object graphs shared by the unit tests
+"""
+from StringIO import StringIO
+
+import drbdmanage.consts as consts
+import drbdmanage.drbd.drbdcore as drbdcore
+
+from drbdmanage.conf.conffile import DrbdAdmConf
+from drbdmanage.propscontainer import PropsContainer, SerialGen
+from drbdmanage.storage.storagecore import MinorNr
+
+
+SETUPOPT_NS = PropsContainer.NAMESPACES[PropsContainer.KEY_SETUPOPT]
+
+
+class Cluster(object):
+
+    """
+    Builds a resource that is assigned to a number of nodes
+    """
+
+    def __init__(self, servers, clients, volumes):
+        self._serial_props = {consts.SERIAL: "1"}
+        self._serial_gen = SerialGen(self._serial_props)
+
+        self.objects_root = {"common": drbdcore.DrbdCommon(self.get_serial, None, None)}
+        self.resource = drbdcore.DrbdResource(
+            "res0", 7000, "secret", 0, None, self.get_serial, None, None
+        )
+        props = self.resource.get_props()
+        props.set_prop("on-io-error", "detach", SETUPOPT_NS + "disko")
+        props.set_prop("quorum", "majority", SETUPOPT_NS + "reso")
+        for vol_id in range(volumes):
+            volume = drbdcore.DrbdVolume(
+                vol_id, 1024 * (vol_id + 1), MinorNr(100 + vol_id), 0,
+                self.get_serial, None, None
+            )
+            volume.get_props().set_prop("resync-rate", "10M", SETUPOPT_NS + "disko")
+            self.resource.add_volume(volume)
+
+        self.nodes = []
+        for node_id in range(servers + clients):
+            node = drbdcore.DrbdNode(
+                "node%.2d" % (node_id), "10.0.0.%d" % (node_id + 1), 4, node_id,
+                0, 0, 0, self.get_serial, None, None
+            )
+            tstate = drbdcore.Assignment.FLAG_DEPLOY
+            if node_id >= servers:
+                tstate |= drbdcore.Assignment.FLAG_DISKLESS
+            assignment = drbdcore.Assignment(
+                node, self.resource, node_id, 0, tstate, 0, None,
+                self.get_serial, None, None
+            )
+            for vol_state in assignment.iterate_volume_states():
+                vol_state.set_tstate(drbdcore.DrbdVolumeState.FLAG_DEPLOY)
+                if node_id < servers:
+                    bd_name = "res0_%.2d" % (vol_state.get_id())
+                    vol_state.set_bd(bd_name, "/dev/drbdpool/" + bd_name)
+            node.add_assignment(assignment)
+            self.resource.add_assignment(assignment)
+            self.nodes.append(node)
+        self.close_serial()
+
+    def get_serial(self):
+        serial = self._serial_gen.get_serial()
+        self._serial_props[consts.SERIAL] = str(serial)
+        return serial
+
+    def close_serial(self):
+        self._serial_gen.close_serial()
+
+    def get_assignment(self, idx):
+        return self.nodes[idx].get_assignment("res0")
+
+    def write(self, idx, global_conf_path=None):
+        stream = StringIO()
+        DrbdAdmConf(self.objects_root).write(
+            stream, self.get_assignment(idx), False, global_conf_path
+        )
+        return stream.getvalue()
+
+    def write_excerpt(self, idx, nodes):
+        stream = StringIO()
+        vol_states = dict([
+            (node.get_name(), list(node.get_assignment("res0").iterate_volume_states()))
+            for node in nodes
+        ])
+        DrbdAdmConf(self.objects_root).write_excerpt(
+            stream, self.get_assignment(idx), nodes, vol_states
+        )
+        return stream.getvalue()
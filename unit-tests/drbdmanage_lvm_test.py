@@ -0,0 +1,308 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import drbdmanage.consts as consts
+import drbdmanage.drbd.drbdcore
+import drbdmanage.exceptions as DME
+import drbdmanage.storage.lvm_common as lvmcom
+import drbdmanage.storage.storagecore as storcore
+
+from drbdmanage.storage.lvm import Lvm
+from drbdmanage.storage.lvm_thinlv import LvmThinLv
+from drbdmanage.storage.lvm_thinpool import LvmThinPool, ThinPool
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class LvmThinPoolActivationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.object(
+            LvmThinPool, "STATEFILE", os.path.join(self.tmpdir, "state.json")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.plugin = LvmThinPool(None)
+        conf = self.plugin.get_default_config()
+        conf[consts.KEY_VG_NAME] = "vg"
+        conf[LvmThinPool.KEY_LVM_PATH] = "/sbin"
+        self.plugin.reconfigure(conf)
+
+        self.lv_names = ["res%.3d_00" % (idx) for idx in range(250)]
+        for lv_name in self.lv_names:
+            self.plugin._pool_lookup[lv_name] = "pool_" + lv_name[:4]
+        self.blockdevs = [
+            storcore.BlockDevice(lv_name, 1024, "/dev/vg/" + lv_name)
+            for lv_name in self.lv_names
+        ]
+
+        patcher = mock.patch.object(lvmcom.subprocess, "call")
+        self.call = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.failed = set()
+        self.call.side_effect = (
+            lambda args, *rest, **kwargs:
+            1 if self.failed.intersection(args) else 0
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def get_calls(self):
+        return [call[0][0] for call in self.call.call_args_list]
+
+    def test_bulk_activation(self):
+        """activates the VG once and all pools and LVs in chunks"""
+        fn_rcs = self.plugin.up_blockdevices(self.blockdevs)
+
+        calls = self.get_calls()
+        self.assertEqual(["/sbin/vgchange", "-ay", "vg"], calls[0])
+        # one call for the three pools, three calls for 250 LVs
+        self.assertEqual(5, len(calls))
+        self.assertEqual(
+            ["vg/pool_res0", "vg/pool_res1", "vg/pool_res2"], calls[1][3:]
+        )
+        self.assertEqual(
+            set(["vg/" + lv_name for lv_name in self.lv_names]),
+            set([arg for args in calls[2:] for arg in args[3:]])
+        )
+        self.assertEqual(
+            set([DME.DM_SUCCESS]), set(fn_rcs.values())
+        )
+        self.assertEqual(len(self.lv_names), len(fn_rcs))
+
+    def test_failed_lv(self):
+        """retries the chunk of a failed LV one by one"""
+        self.failed.add("vg/res007_00")
+        fn_rcs = self.plugin.up_blockdevices(self.blockdevs)
+
+        self.assertEqual(DME.DM_ESTORAGE, fn_rcs["res007_00"])
+        self.assertEqual(
+            [DME.DM_ESTORAGE],
+            [fn_rc for fn_rc in fn_rcs.values() if fn_rc != DME.DM_SUCCESS]
+        )
+        self.assertEqual(5 + lvmcom.LvmCommon.LVM_ACTIVATE_CHUNK, len(self.get_calls()))
+
+    def test_failed_pool(self):
+        """reports the LVs of a pool that cannot be activated as failed"""
+        self.failed.add("vg/pool_res1")
+        fn_rcs = self.plugin.up_blockdevices(self.blockdevs)
+
+        self.assertEqual(DME.DM_ESTORAGE, fn_rcs["res100_00"])
+        self.assertEqual(DME.DM_SUCCESS, fn_rcs["res000_00"])
+        self.assertEqual(DME.DM_SUCCESS, self.plugin.up_blockdevice(self.blockdevs[0]))
+
+    def test_activated(self):
+        """does not activate the VG and pools again within a run"""
+        self.plugin.up_blockdevices(self.blockdevs)
+        self.call.reset_mock()
+        self.assertEqual(DME.DM_SUCCESS, self.plugin.up_blockdevice(self.blockdevs[100]))
+        self.assertEqual(
+            [["/sbin/lvchange", "-ay", "-K", "vg/res100_00"]], self.get_calls()
+        )
+
+        # A pool that was not activated yet is activated
+        self.plugin._pool_lookup["res300_00"] = "pool_res3"
+        self.call.reset_mock()
+        self.plugin.up_blockdevice(
+            storcore.BlockDevice("res300_00", 1024, "/dev/vg/res300_00")
+        )
+        self.assertEqual(
+            [["/sbin/lvchange", "-ay", "-K", "vg/pool_res3"],
+             ["/sbin/lvchange", "-ay", "-K", "vg/res300_00"]],
+            self.get_calls()
+        )
+
+    def test_activated_failed_lv(self):
+        """activates the VG and pools again after an LV failed"""
+        self.plugin.up_blockdevices(self.blockdevs)
+        self.failed.add("vg/res100_00")
+        self.assertEqual(DME.DM_ESTORAGE, self.plugin.up_blockdevice(self.blockdevs[100]))
+        self.failed.clear()
+        self.call.reset_mock()
+        self.assertEqual(DME.DM_SUCCESS, self.plugin.up_blockdevice(self.blockdevs[100]))
+        self.assertEqual(
+            [["/sbin/vgchange", "-ay", "vg"],
+             ["/sbin/lvchange", "-ay", "-K", "vg/pool_res1"],
+             ["/sbin/lvchange", "-ay", "-K", "vg/res100_00"]],
+            self.get_calls()
+        )
+
+    def test_activated_removed_pool(self):
+        """activates a thin pool again after it was removed"""
+        self.plugin.up_blockdevices(self.blockdevs)
+        pool = ThinPool("pool_res1", 1024)
+        pool.add_volume("res100_00")
+        self.plugin._pools["pool_res1"] = pool
+        self.plugin._volumes["res100_00"] = self.blockdevs[100]
+        with mock.patch.object(self.plugin, "_check_vol_exists", return_value=False), \
+                mock.patch.object(self.plugin, "_remove_vol"):
+            self.assertEqual(
+                DME.DM_SUCCESS, self.plugin.remove_blockdevice(self.blockdevs[100])
+            )
+        self.plugin._pool_lookup["res100_00"] = "pool_res1"
+        self.call.reset_mock()
+        self.plugin.up_blockdevices(self.blockdevs[99:101])
+        self.assertEqual(
+            [["/sbin/lvchange", "-ay", "-K", "vg/pool_res1"],
+             ["/sbin/lvchange", "-ay", "-K", "vg/res099_00", "vg/res100_00"]],
+            self.get_calls()
+        )
+
+
+class LvmSnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sources = [
+            (vol_id, storcore.BlockDevice(
+                "res_%.2d" % (vol_id), 1024, "/dev/vg/res_%.2d" % (vol_id)
+            ))
+            for vol_id in range(6)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create_plugin(self, plugin_class):
+        patcher = mock.patch.object(
+            plugin_class, "STATEFILE", os.path.join(self.tmpdir, "state.json")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        plugin = plugin_class(None)
+        plugin.RETRY_DELAY = 0
+        return plugin
+
+    @mock.patch("drbdmanage.storage.storageplugin_common.logging")
+    def test_not_implemented(self, mock_logging):
+        """reports plugins without snapshot support without retrying"""
+        plugin = self.create_plugin(Lvm)
+        with mock.patch.object(plugin, "_check_vol_exists") as check_vol_exists:
+            self.assertRaises(
+                NotImplementedError, plugin.create_snapshots, "snap", self.sources
+            )
+        self.assertFalse(check_vol_exists.called)
+        self.assertFalse(mock_logging.error.called)
+        self.assertFalse(mock_logging.warning.called)
+
+    def test_thread_limit(self):
+        """runs a limited number of snapshot commands concurrently"""
+        plugin = self.create_plugin(LvmThinLv)
+        plugin.SNAPSHOT_THREADS_MAX = 2
+        lock = threading.Lock()
+        state = {"active": 0, "max_active": 0}
+        created = []
+
+        def create_snapshot_impl(snaps_name, lv_name):
+            with lock:
+                state["active"] += 1
+                state["max_active"] = max(state["max_active"], state["active"])
+            time.sleep(0.01)
+            with lock:
+                state["active"] -= 1
+                created.append(lv_name)
+
+        with mock.patch.object(plugin, "_create_snapshot_impl", side_effect=create_snapshot_impl):
+            plugin._create_snapshots_impl(
+                [("snap_" + blockdev.get_name(), blockdev.get_name())
+                 for _, blockdev in self.sources]
+            )
+        self.assertEqual(
+            sorted([blockdev.get_name() for _, blockdev in self.sources]), sorted(created)
+        )
+        self.assertEqual(2, state["max_active"])
+
+
+LVS_REPORT = [
+    "  pool_res0,twi-aotz--,1024.00,50.00,10.00\n",
+    "  res000_00,Vwi-aotz--,512.00,100.00,\n",
+    "  pool_res1,twi-aotz--,3072.00,10.00,30.50\n",
+    "  pool_res2,twi---tz--,1024.00,,\n",
+]
+
+
+class LvmThinPoolUsageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch.object(
+            LvmThinPool, "STATEFILE", os.path.join(self.tmpdir, "state.json")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.plugin = LvmThinPool(None)
+
+        patcher = mock.patch.object(lvmcom.subprocess, "Popen")
+        self.popen = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.popen.return_value.stdout = iter(LVS_REPORT)
+        self.popen.return_value.wait.return_value = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_query_thin_pools(self):
+        """reports all thin pools from one lvs call"""
+        self.assertEqual(
+            {"pool_res0": (1024, 50.0, 10.0),
+             "pool_res1": (3072, 10.0, 30.5),
+             "pool_res2": (1024, 0.0, 0.0)},
+            self.plugin.get_thin_usage()
+        )
+        self.plugin.get_thin_usage()
+        self.assertEqual(1, self.popen.call_count)
+
+        self.plugin._invalidate_thin_usage()
+        self.popen.return_value.stdout = iter(LVS_REPORT)
+        self.plugin.get_thin_usage()
+        self.assertEqual(2, self.popen.call_count)
+
+    def test_usage_props(self):
+        """summarizes the thin pools in node properties"""
+        usage_props = self.plugin.get_usage_props()
+        self.assertEqual("3", usage_props[consts.KEY_THIN_POOLS])
+        # (512 + 307.2) kiB of 5120 kiB
+        self.assertEqual("16", usage_props[consts.KEY_THIN_DATA_PERCENT])
+        self.assertEqual("50", usage_props[consts.KEY_THIN_DATA_MAX_PERCENT])
+        self.assertEqual("30", usage_props[consts.KEY_THIN_META_MAX_PERCENT])
+
+    def test_usage_props_failed(self):
+        """reports no usage if the thin pools cannot be queried"""
+        self.popen.return_value.wait.return_value = 5
+        self.assertEqual({}, self.plugin.get_usage_props())
+
+
+if __name__ == "__main__":
+    unittest.main()
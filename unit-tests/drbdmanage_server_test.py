@@ -0,0 +1,171 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import drbdmanage.consts as consts
+import drbdmanage.exceptions as DME
+
+from drbdmanage.conf.conffile import ConfFileBuffer
+from drbdmanage.server import DrbdManageServer
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class PageCtrlvolTests(unittest.TestCase):
+
+    def setUp(self):
+        # Satellite server without any objects; the functions are called
+        # unbound, with the mock in place of the server instance
+        self.server = mock.Mock()
+        self.server._server_role = consts.SAT_SATELLITE
+        self.server._startup_pending.return_value = False
+        self.server._request_ctrlvol.return_value = True
+        self.server.gen_wrapped_rc.side_effect = lambda name, fn_rc: (fn_rc, [], "")
+        self.list_nodes_page = DrbdManageServer.__dict__["list_nodes_page"]
+        self.list_assignments_page = DrbdManageServer.__dict__["list_assignments_page"]
+
+    def test_first_page(self):
+        """fetches the control volume only for the first page"""
+        self.list_nodes_page(self.server, [], 0, {}, [], "", 10)
+        self.assertEqual(1, self.server._request_ctrlvol.call_count)
+        self.list_nodes_page(self.server, [], 0, {}, [], "node05", 10)
+        self.list_nodes_page(self.server, [], 0, {}, [], cursor="node10", limit=10)
+        self.list_assignments_page(self.server, [], [], 0, {}, [], "node05/res0", 10)
+        self.assertEqual(1, self.server._request_ctrlvol.call_count)
+        self.list_assignments_page(self.server, [], [], 0, {}, [], "", 10)
+        self.assertEqual(2, self.server._request_ctrlvol.call_count)
+
+    def test_not_ready(self):
+        """answers that the server is not ready if the fetch fails"""
+        self.server._request_ctrlvol.return_value = False
+        fn_rc, entries, cursor = self.list_nodes_page(self.server, [], 0, {}, [], "", 10)
+        self.assertEqual(DME.DM_ENOTREADY_REQCTRL, fn_rc[0][0])
+        self.assertEqual(([], ""), (entries, cursor))
+        self.assertFalse(self.server._list_name_set.called)
+
+    def test_leader(self):
+        """does not fetch the control volume on the leader"""
+        self.server._server_role = consts.SAT_LEADER_NODE
+        self.list_nodes_page(self.server, [], 0, {}, [], "", 10)
+        self.assertFalse(self.server._request_ctrlvol.called)
+
+
+class ConfFileSkipTests(unittest.TestCase):
+
+    def setUp(self):
+        self.conf_path = tempfile.mkdtemp()
+        self.res_path = os.path.join(self.conf_path, "drbdmanage_res0.res")
+        # Server object without the D-Bus service and control volume setup
+        self.server = DrbdManageServer.__new__(DrbdManageServer)
+        self.server._conf = {DrbdManageServer.KEY_DRBD_CONFPATH: self.conf_path}
+        self.server._conf_buffers = {}
+        self.server._conf_file_hashes = {}
+        self.server._drbd_mgr = mock.Mock()
+        self.server._drbd_mgr.check_res_file.return_value = True
+
+    def tearDown(self):
+        shutil.rmtree(self.conf_path)
+
+    def update(self, data):
+        assg_conf = ConfFileBuffer(self.res_path + ".tmp")
+        assg_conf.write(data)
+        assg_conf.close()
+        self.server._conf_buffers["res0"] = assg_conf
+        self.server.update_assignment_conf("res0")
+
+    def read(self):
+        with open(self.res_path) as res_file:
+            return res_file.read()
+
+    def test_unchanged(self):
+        """neither rewrites nor checks a file whose content is unchanged"""
+        self.update("resource res0 {}\n")
+        self.assertEqual(1, self.server._drbd_mgr.check_res_file.call_count)
+        with mock.patch.object(self.server, "_write_conf_file") as write_mock:
+            self.update("resource res0 {}\n")
+            self.assertFalse(write_mock.called)
+        self.assertEqual(1, self.server._drbd_mgr.check_res_file.call_count)
+        self.assertFalse(os.path.exists(self.res_path + ".tmp"))
+        self.assertEqual("resource res0 {}\n", self.read())
+
+    def test_changed(self):
+        """rewrites a file whose content changed"""
+        self.update("resource res0 {}\n")
+        self.update("resource res0 { }\n")
+        self.assertEqual(2, self.server._drbd_mgr.check_res_file.call_count)
+        self.assertEqual("resource res0 { }\n", self.read())
+
+    def test_external_mtime(self):
+        """rewrites a file that was modified by someone else"""
+        self.update("resource res0 {}\n")
+        with open(self.res_path, "w") as res_file:
+            res_file.write("resource res0 []\n")
+        file_stat = os.stat(self.res_path)
+        os.utime(self.res_path, (file_stat.st_atime, file_stat.st_mtime + 10))
+        self.update("resource res0 {}\n")
+        self.assertEqual(2, self.server._drbd_mgr.check_res_file.call_count)
+        self.assertEqual("resource res0 {}\n", self.read())
+
+    def test_external_size(self):
+        """rewrites a file whose size changed, even with the same mtime"""
+        self.update("resource res0 {}\n")
+        file_stat = os.stat(self.res_path)
+        with open(self.res_path, "a") as res_file:
+            res_file.write("# edited\n")
+        os.utime(self.res_path, (file_stat.st_atime, file_stat.st_mtime))
+        self.update("resource res0 {}\n")
+        self.assertEqual(2, self.server._drbd_mgr.check_res_file.call_count)
+        self.assertEqual("resource res0 {}\n", self.read())
+
+    def test_removed(self):
+        """forgets the file when it is removed"""
+        self.update("resource res0 {}\n")
+        self.assertTrue(self.res_path in self.server._conf_file_hashes)
+        self.server._message_log = mock.Mock()
+        self.server.remove_assignment_conf("res0")
+        self.assertFalse(os.path.exists(self.res_path))
+        self.assertFalse(self.res_path in self.server._conf_file_hashes)
+        self.update("resource res0 {}\n")
+        self.assertEqual(2, self.server._drbd_mgr.check_res_file.call_count)
+        # removed by someone else
+        os.unlink(self.res_path)
+        self.update("resource res0 {}\n")
+        self.assertEqual(3, self.server._drbd_mgr.check_res_file.call_count)
+        self.assertEqual("resource res0 {}\n", self.read())
+
+    def test_invalid(self):
+        """does not remember a file that failed the check"""
+        self.server._drbd_mgr.check_res_file.return_value = False
+        self.assertRaises(DME.ResourceFileException, self.update, "resource res0 {}\n")
+        self.assertEqual({}, self.server._conf_file_hashes)
+        self.assertTrue(os.path.exists(self.res_path + ".q"))
+
+
+if __name__ == "__main__":
+    unittest.main()
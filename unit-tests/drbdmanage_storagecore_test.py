@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import drbdmanage.exceptions as DME
+import drbdmanage.storage.storagecore as storcore
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class PoolCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = mock.Mock()
+        self.server.DEFAULT_POOL_CACHE_TTL = 5
+        self.server.get_conf_value.return_value = "5"
+        plugin_mgr = mock.Mock()
+        self.plugin = plugin_mgr.get_plugin_instance.return_value
+        self.plugin.update_pool.return_value = (DME.DM_SUCCESS, 1000, 400)
+        self.plugin.remove_blockdevice.return_value = DME.DM_SUCCESS
+        self.bd_mgr = storcore.BlockDeviceManager(self.server, "plugin", plugin_mgr)
+
+        self.node = mock.Mock()
+        self.node.get_name.return_value = "node00"
+
+        patcher = mock.patch.object(storcore.time, "time", return_value=100.0)
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_hit(self):
+        """queries the plugin once within the cache lifetime"""
+        self.assertEqual((DME.DM_SUCCESS, 1000, 400), self.bd_mgr.update_pool(self.node))
+        self.plugin.update_pool.return_value = (DME.DM_SUCCESS, 1000, 300)
+        self.time.return_value = 104.0
+        self.assertEqual((DME.DM_SUCCESS, 1000, 400), self.bd_mgr.update_pool(self.node))
+        self.assertEqual(1, self.plugin.update_pool.call_count)
+
+    def test_cache_expiry(self):
+        """queries the plugin again after the cache lifetime"""
+        self.bd_mgr.update_pool(self.node)
+        self.plugin.update_pool.return_value = (DME.DM_SUCCESS, 1000, 300)
+        self.time.return_value = 105.0
+        self.assertEqual((DME.DM_SUCCESS, 1000, 300), self.bd_mgr.update_pool(self.node))
+        self.assertEqual(2, self.plugin.update_pool.call_count)
+
+    def test_failed_query(self):
+        """does not cache failed queries"""
+        self.plugin.update_pool.return_value = (DME.DM_ESTORAGE, -1, -1)
+        self.bd_mgr.update_pool(self.node)
+        self.plugin.update_pool.return_value = (DME.DM_SUCCESS, 1000, 400)
+        self.assertEqual((DME.DM_SUCCESS, 1000, 400), self.bd_mgr.update_pool(self.node))
+        self.assertEqual(2, self.plugin.update_pool.call_count)
+
+    def test_invalidate_on_create(self):
+        """creating a block device discards the cached information"""
+        self.bd_mgr.update_pool(self.node)
+        self.bd_mgr.create_blockdevice("res0", 0, 1024)
+        self.bd_mgr.update_pool(self.node)
+        self.assertEqual(2, self.plugin.update_pool.call_count)
+
+    def test_invalidate_on_remove(self):
+        """removing a block device discards the cached information"""
+        self.bd_mgr.update_pool(self.node)
+        self.assertEqual(DME.DM_SUCCESS, self.bd_mgr.remove_blockdevice("res0_00"))
+        self.bd_mgr.update_pool(self.node)
+        self.assertEqual(2, self.plugin.update_pool.call_count)
+
+    def test_invalidate(self):
+        """invalidate_pool() discards the cached information"""
+        self.bd_mgr.update_pool(self.node)
+        self.bd_mgr.invalidate_pool()
+        self.bd_mgr.update_pool(self.node)
+        self.assertEqual(2, self.plugin.update_pool.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
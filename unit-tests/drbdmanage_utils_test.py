@@ -17,8 +17,11 @@
   You should have received a copy of the GNU General Public License
   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+import os
+import shutil
 import string
 import sys
+import tempfile
 import unittest
 
 from StringIO import StringIO
@@ -28,6 +31,7 @@ import drbdmanage.exceptions as DME
 import drbdmanage.utils as utils
 
 from drbdmanage.argparse import argparse
+from drbdmanage.propscontainer import Props, PropsContainer, PropsIndex
 
 # Python 3 compatibility
 try:
@@ -167,6 +171,24 @@ class TableShowTests(unittest.TestCase):
             ".*2.*\n.*7.*\n.*9.*\n.*"
         )
 
+    def test_show_groupby_colors(self):
+        """keeps each row's colors and rows with a zero group value"""
+        self.table.add_column("node")
+        self.table.add_column("state", color=utils.COLOR_RED)
+        self.table.add_row(["b", (utils.COLOR_GREEN, "ok")])
+        self.table.add_row(["a", "ok"])
+        self.table.add_row(["0", "zero"])
+
+        self.table.set_view(["state"])
+        self.table.set_groupby(["node"])
+        self.table.show()
+
+        lines = sys.stdout.getvalue().splitlines()
+        self.assertIn(utils.COLOR_RED + "zero", lines[3])
+        self.assertIn(utils.COLOR_RED + "ok", lines[4])
+        self.assertIn(utils.COLOR_GREEN + "ok", lines[5])
+        self.assertEqual(7, len(lines))
+
 
 class CheckrangeTests(unittest.TestCase):
 
@@ -433,5 +455,289 @@ class AddRcEntryTests(unittest.TestCase):
         utils.add_rc_entry(fn_rc, err_no, err_message, args)
         self.assertTrue(mock_logging.error.called)
 
+
+class SerialTests(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = []
+        for serial in ["9", "10", "120", None]:
+            obj = mock.Mock()
+            obj.get_props.return_value = Props(
+                {} if serial is None else {const.SERIAL: serial}
+            )
+            self.objects.append(obj)
+
+    def test_serial_filter(self):
+        """compares serial numbers as numbers"""
+        self.assertEqual(
+            self.objects[2:], list(utils.serial_filter(10, self.objects))
+        )
+
+    def test_max_obj_serial(self):
+        """returns the greatest serial number, or None if any is unknown"""
+        self.assertEqual(120, utils.max_obj_serial(self.objects[:3]))
+        self.assertTrue(utils.max_obj_serial(self.objects) is None)
+
+    def test_name_index(self):
+        """returns pages of selected objects after the cursor"""
+        names = ["n%.2d" % (idx) for idx in range(10)]
+        source = mock.Mock(side_effect=lambda: [(name, name) for name in reversed(names)])
+        index = utils.NameIndex(source)
+
+        self.assertEqual((names[:4], "n03"), index.page(1, "", 4))
+        self.assertEqual((names[4:8], "n07"), index.page(1, "n03", 4))
+        self.assertEqual((names[8:], ""), index.page(1, "n07", 4))
+        self.assertEqual(1, source.call_count)
+
+        odd = lambda name: int(name[1:]) % 2 == 1
+        self.assertEqual((["n05", "n07"], "n07"), index.page(1, "n04", 2, odd))
+        self.assertEqual((["n09"], ""), index.page(1, "n07", 2, odd))
+
+        names.append("n04a")
+        self.assertEqual((["n04a", "n05"], "n05"), index.page(2, "n04", 2))
+        self.assertEqual(2, source.call_count)
+
+    def test_list_filter_match(self):
+        """applies the serial number and the property filters"""
+        for obj in self.objects:
+            obj.filter_match.return_value = obj is not self.objects[3]
+        self.assertEqual(
+            [False, False, True, True],
+            [utils.list_filter_match(obj, 10, None) for obj in self.objects]
+        )
+        self.assertEqual(
+            [True, True, True, False],
+            [utils.list_filter_match(obj, 0, {"key": "value"}) for obj in self.objects]
+        )
+        self.assertEqual(
+            [False, True, False, False],
+            [utils.list_filter_match(obj, 0, {"key": "value"}, matches=set([self.objects[1]]))
+             for obj in self.objects]
+        )
+
+
+class PropsIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = []
+        for tenant in ["a", "b", "a", None]:
+            obj = mock.Mock()
+            obj.get_props.return_value = PropsContainer(lambda: 1, None, None)
+            if tenant is not None:
+                obj.get_props().set_prop("aux:tenant", tenant)
+            self.objects.append(obj)
+        self.objects[3].get_props().set_prop("aux:zone", "z1")
+        self.source = mock.Mock(side_effect=lambda: list(self.objects))
+        self.index = PropsIndex(["aux:tenant", "aux:zone"], self.source)
+
+    def test_lookup(self):
+        """looks up the objects that match any of the filter's properties"""
+        self.assertEqual(
+            set([self.objects[0], self.objects[2]]),
+            self.index.lookup(1, {"aux:tenant": "a"})
+        )
+        self.assertEqual(
+            set([self.objects[1], self.objects[3]]),
+            self.index.lookup(1, {"aux:tenant": "b", "aux:zone": "z1"})
+        )
+        self.assertEqual(set(), self.index.lookup(1, {"aux:zone": "z2"}))
+        self.assertTrue(self.index.lookup(1, {"aux:tenant": "a", "other": "x"}) is None)
+        self.assertTrue(self.index.lookup(1, {}) is None)
+        self.assertEqual(1, self.source.call_count)
+
+    def test_update(self):
+        """is updated by the properties containers of the objects"""
+        self.index.lookup(1, {"aux:tenant": "a"})
+        self.objects[0].get_props().set_prop("aux:tenant", "b")
+        self.objects[3].get_props().merge_props({"aux:tenant": "a", "aux:zone": "z2"})
+        self.objects[2].get_props().remove_prop("aux:tenant")
+
+        self.assertEqual(set([self.objects[3]]), self.index.lookup(1, {"aux:tenant": "a"}))
+        self.assertEqual(set(self.objects[:2]), self.index.lookup(1, {"aux:tenant": "b"}))
+        self.assertEqual(set(), self.index.lookup(1, {"aux:zone": "z1"}))
+        self.assertEqual(1, self.source.call_count)
+
+    def test_sync(self):
+        """attaches new and detaches removed objects if the key changes"""
+        self.index.lookup(1, {"aux:tenant": "a"})
+        removed = self.objects.pop(0)
+        added = mock.Mock()
+        added.get_props.return_value = PropsContainer(lambda: 1, None, {"aux:tenant": "a"})
+        self.objects.append(added)
+
+        self.assertEqual(
+            set([self.objects[1], added]), self.index.lookup(2, {"aux:tenant": "a"})
+        )
+        removed.get_props().set_prop("aux:tenant", "b")
+        self.assertEqual(set([self.objects[0]]), self.index.lookup(2, {"aux:tenant": "b"}))
+
+        self.index.clear()
+        self.assertEqual(set(), self.index.lookup(2, {"aux:zone": "z2"}))
+        self.assertEqual(3, self.source.call_count)
+
+
+FAKE_DRBDSETUP = """#!/bin/sh
+echo "$@" >> "$(dirname "$0")/calls"
+if [ "$1" = "--version" ]; then
+    echo "DRBDADM_API_VERSION=2"
+    echo "DRBDADM_VERSION=%(version)s"
+    exit 0
+fi
+cat <<EOT
+<command name="$2">
+  <summary>Change the disk options of an attached lower-level device.</summary>
+  <argument>minor</argument>
+  <option name="set-defaults" type="flag"></option>
+  <option name="on-io-error" type="handler">
+    <handler>pass_on</handler><handler>call-local-io-error</handler>
+  </option>
+  <option name="al-updates" type="boolean"><default>yes</default></option>
+  <option name="resync-rate" type="numeric">
+    <min>1</min><max>4194304</max><default>250</default><unit>bytes/second</unit>
+  </option>
+</command>
+EOT
+"""
+
+
+class SelectorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.props = PropsContainer(lambda: 1, None, None)
+        self.props.set_prop("site", "a", "/dmconfig/")
+        self.props.set_prop("fail-count", "2")
+
+    def test_select_props(self):
+        """selects the requested properties, or all of them"""
+        properties = {}
+        utils.Selector(["fail-count", "missing"]).select_props(self.props, properties)
+        self.assertEqual({"fail-count": "2"}, properties)
+
+        properties = {}
+        utils.Selector(["/dmconfig/site"]).select_props(self.props, properties)
+        self.assertEqual({"/dmconfig/site": "a"}, properties)
+
+        properties = {}
+        utils.Selector([]).select_props(self.props, properties)
+        self.assertEqual("a", properties["/dmconfig/site"])
+        self.assertEqual("2", properties["fail-count"])
+
+
+class DrbdSetupSchemaCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.drbdsetup = os.path.join(self.tmpdir, "drbdsetup")
+        self.install_drbdsetup("9.0.0")
+
+        patcher = mock.patch.dict(
+            os.environ, {"PATH": self.tmpdir + os.pathsep + os.environ.get("PATH", "")}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            utils.DrbdSetupSchemaCache, "CACHE_FILE",
+            os.path.join(self.tmpdir, "drbdsetup-options.json")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            utils.DrbdSetupSchemaCache, "DRBDSETUP_FALLBACK_PATH", self.tmpdir
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reset_process_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def install_drbdsetup(self, version):
+        with open(self.drbdsetup, "w") as script:
+            script.write(FAKE_DRBDSETUP % {"version": version})
+        os.chmod(self.drbdsetup, 0755)
+
+    def reset_process_cache(self):
+        patcher = mock.patch.object(utils, "_drbdsetup_schema_cache", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_calls(self):
+        try:
+            with open(os.path.join(self.tmpdir, "calls")) as calls:
+                return [line.strip() for line in calls]
+        except IOError:
+            return []
+
+    def test_parse(self):
+        """parses the options of a drbdsetup command"""
+        opts = utils.DrbdSetupOpts("disk-options")
+        self.assertTrue(opts.ok)
+        self.assertEqual(
+            ["pass_on", "call-local-io-error"], opts.config["on-io-error"]["handlers"]
+        )
+        self.assertEqual("250", opts.config["resync-rate"]["default"])
+        self.assertTrue(isinstance(opts.config["resync-rate"]["default"], str))
+        self.assertEqual("9.0.0", utils.get_drbdsetup_schema_cache().get_version())
+
+    def test_cache(self):
+        """runs drbdsetup only once per command across processes"""
+        utils.DrbdSetupOpts("disk-options")
+        utils.DrbdSetupOpts("disk-options")
+        self.assertEqual(["xml-help disk-options", "--version"], self.get_calls())
+
+        # a new process loads the schema from the cache file
+        self.reset_process_cache()
+        opts = utils.DrbdSetupOpts("disk-options")
+        self.assertTrue(opts.ok)
+        self.assertEqual("yes", opts.config["al-updates"]["default"])
+        self.assertEqual(2, len(self.get_calls()))
+
+        utils.DrbdSetupOpts("resource-options")
+        self.assertEqual(["xml-help disk-options", "--version", "xml-help resource-options"],
+                         self.get_calls())
+
+    def test_invalidate(self):
+        """discards the cache if the drbdsetup binary changes"""
+        utils.DrbdSetupOpts("disk-options")
+        self.install_drbdsetup("9.1.0")
+        os.utime(self.drbdsetup, (0, 0))
+
+        self.reset_process_cache()
+        utils.DrbdSetupOpts("disk-options")
+        self.assertEqual(4, len(self.get_calls()))
+        self.assertEqual("9.1.0", utils.get_drbdsetup_schema_cache().get_version())
+
+    def test_no_drbdsetup(self):
+        """reports an error if drbdsetup cannot be run"""
+        os.unlink(self.drbdsetup)
+        with mock.patch.dict(os.environ, {"PATH": self.tmpdir}), \
+                mock.patch.object(sys, "stderr", StringIO()):
+            opts = utils.DrbdSetupOpts("disk-options")
+        self.assertFalse(opts.ok)
+        self.assertFalse(os.path.exists(utils.DrbdSetupSchemaCache.CACHE_FILE))
+
+class RetryTests(unittest.TestCase):
+
+    def test_retry_hint(self):
+        """returns the longest retry time suggested by the server"""
+        server_rc = [
+            (DME.DM_ENOTREADY, "not ready", [(const.RC_RETRY_AFTER, "1.5"),
+                                             (const.RC_QUEUE_POS, "2")]),
+            (DME.DM_ENOTREADY_REQCTRL, "not ready", [(const.RC_RETRY_AFTER, "0.5")]),
+        ]
+        self.assertEqual(1.5, utils.get_retry_hint(server_rc))
+        self.assertEqual(None, utils.get_retry_hint([(DME.DM_ENOTREADY, "not ready", [])]))
+
+    def test_retry_delay(self):
+        """randomizes delays, which grow without a hint"""
+        for tries in range(10):
+            delay = utils.retry_delay(tries)
+            max_delay = min(utils.RETRY_DELAY_MIN * 2 ** tries, utils.RETRY_DELAY_MAX)
+            self.assertTrue(max_delay / 2 <= delay <= max_delay)
+        delays = set([utils.retry_delay(0, 2.0) for _ in range(20)])
+        self.assertTrue(len(delays) > 1)
+        self.assertTrue(all([2.0 <= delay <= 3.0 for delay in delays]))
+        self.assertEqual(utils.RETRY_DELAY_MAX, utils.retry_delay(0, 3600))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+
+import drbdmanage.consts as consts
+import drbdmanage.drbd.drbdcore as drbdcore
+import drbdmanage.exceptions as DME
+import drbdmanage.waiters
+
+from drbdmanage.plugins.plugins.wait_for import WaitForResource
+from drbdmanage.waiters import WaiterRegistry, StartupWaiters
+from drbdmanage_fixtures import Cluster
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+class CountingPlugin(object):
+
+    """
+    Policy that is fulfilled once the resource is deployed on all nodes
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.runs = 0
+
+    def set_config(self, config):
+        self.config = config
+
+    def run(self):
+        self.runs += 1
+        deployed = [
+            assg for assg in self.cluster.resource.iterate_assignments()
+            if assg.get_cstate() & drbdcore.Assignment.FLAG_DEPLOY
+        ]
+        done = len(deployed) == len(self.cluster.nodes)
+        return (
+            [(DME.DM_SUCCESS, "ok", [])],
+            {'result': consts.BOOL_TRUE if done else consts.BOOL_FALSE,
+             'timeout': consts.BOOL_FALSE}
+        )
+
+
+class WaiterRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(drbdmanage.waiters, "gobject")
+        self.gobject = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cluster = Cluster(2, 0, 1)
+        server = mock.Mock()
+        server.get_resource.side_effect = (
+            lambda name: self.cluster.resource if name == "res0" else None
+        )
+        self.registry = WaiterRegistry(server)
+        self.plugin = CountingPlugin(self.cluster)
+        self.replies = []
+        self.registry.add(
+            self.plugin, {'resource': "res0", 'timeout': "60"},
+            lambda fn_rc, result: self.replies.append(result)
+        )
+
+    def deploy(self, idx):
+        self.cluster.get_assignment(idx).set_cstate_flags(
+            drbdcore.Assignment.FLAG_DEPLOY
+        )
+
+    def test_pending(self):
+        """keeps an undecided policy and arms its timeout"""
+        self.assertEqual([], self.replies)
+        self.assertEqual(1, self.registry.count())
+        delay_ms = self.gobject.timeout_add.call_args[0][0]
+        self.assertTrue(59000 < delay_ms < 61000)
+
+    def test_unchanged_conf(self):
+        """does not evaluate the policy if the resource did not change"""
+        self.registry.notify_conf_changed()
+        self.assertEqual(1, self.plugin.runs)
+
+    def test_conf_changed(self):
+        """answers once after the resource's configuration changed"""
+        self.deploy(0)
+        self.registry.notify_conf_changed()
+        self.assertEqual([], self.replies)
+        self.assertEqual(2, self.plugin.runs)
+
+        self.deploy(1)
+        self.registry.notify_conf_changed()
+        self.registry.notify_conf_changed()
+        self.assertEqual([consts.BOOL_TRUE], [reply['result'] for reply in self.replies])
+        self.assertEqual(0, self.registry.count())
+        self.assertTrue(self.gobject.source_remove.called)
+
+    def test_drbd_events(self):
+        """evaluates policies of resources that DRBD reported events for"""
+        self.registry.notify_drbd_events(["res1"])
+        self.assertEqual(1, self.plugin.runs)
+        self.registry.notify_drbd_events(["res0"])
+        self.assertEqual(2, self.plugin.runs)
+
+    def test_timeout(self):
+        """answers with a timeout when the timer expires"""
+        waiter = self.gobject.timeout_add.call_args[0][2]
+        self.registry._timeout(waiter)
+        self.assertEqual([consts.BOOL_TRUE], [reply['timeout'] for reply in self.replies])
+        self.assertEqual(0, self.registry.count())
+
+
+class WaitForPluginTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(drbdmanage.waiters, "gobject")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cluster = Cluster(2, 0, 1)
+        self.server = mock.Mock()
+        self.server._resources = {"res0": self.cluster.resource}
+        self.server.get_resource.side_effect = self.server._resources.get
+        self.registry = WaiterRegistry(self.server)
+        self.replies = []
+        self.registry.add(
+            WaitForResource(self.server), {'resource': "res0", 'count': "2"},
+            lambda fn_rc, result: self.replies.append(result)
+        )
+
+    def deploy(self, idx):
+        for vol_state in self.cluster.get_assignment(idx).iterate_volume_states():
+            vol_state.set_cstate_flags(drbdcore.DrbdVolumeState.FLAG_DEPLOY)
+
+    def test_no_ctrlvol_request(self):
+        """fetches the control volume only when the policy is registered"""
+        self.assertEqual(1, self.server.request_ctrlvol.call_count)
+        self.deploy(0)
+        self.registry.notify_conf_changed()
+        self.registry.notify_drbd_events(["res0"])
+        self.registry._recheck()
+        self.assertEqual([], self.replies)
+
+        self.deploy(1)
+        self.registry.notify_conf_changed()
+        self.assertEqual([consts.BOOL_TRUE], [reply['result'] for reply in self.replies])
+        self.assertEqual(1, self.server.request_ctrlvol.call_count)
+
+
+class StartupWaitersTests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(drbdmanage.waiters, "gobject")
+        self.gobject = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gobject.timeout_add.side_effect = range(1, 10)
+
+        self.waiters = StartupWaiters(
+            lambda: [(DME.DM_ENOTREADY_STARTUP, "not ready", [])]
+        )
+        self.replies = []
+        for timeout in [10, 1000]:
+            self.waiters.add(timeout, lambda fn_rc: self.replies.append(fn_rc[0][0]))
+
+    def test_ready(self):
+        """answers all clients when the server becomes ready"""
+        self.assertEqual(2, self.waiters.count())
+        self.assertEqual(
+            [10000, StartupWaiters.MAX_TIMEOUT * 1000],
+            [call[0][0] for call in self.gobject.timeout_add.call_args_list]
+        )
+        self.waiters.notify_ready()
+        self.assertEqual([DME.DM_SUCCESS, DME.DM_SUCCESS], self.replies)
+        self.assertEqual(0, self.waiters.count())
+        self.assertEqual(2, self.gobject.source_remove.call_count)
+
+    def test_timeout(self):
+        """answers a client whose timeout ended"""
+        reply_fn = self.gobject.timeout_add.call_args_list[0][0][2]
+        self.assertFalse(self.waiters._timeout(reply_fn))
+        self.assertEqual([DME.DM_ENOTREADY_STARTUP], self.replies)
+        self.assertEqual(1, self.waiters.count())
+
+if __name__ == "__main__":
+    unittest.main()
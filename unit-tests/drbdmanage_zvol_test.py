@@ -0,0 +1,208 @@
+#!/usr/bin/env python2
+"""
+  drbdmanage - management of distributed DRBD9 resources
+  Copyright (C) 2017   LINBIT HA-Solutions GmbH
+
+  This program is free software: you can redistribute it and/or modify
+  it under the terms of the GNU General Public License as published by
+  the Free Software Foundation, either version 3 of the License, or
+  (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+import drbdmanage.consts as consts
+import drbdmanage.drbd.drbdcore
+import drbdmanage.exceptions as DME
+import drbdmanage.storage.storagecore as storcore
+
+from drbdmanage.storage.zvol import Zvol
+from drbdmanage.storage.zvol2 import Zvol2
+
+# Python 3 compatibility
+try:
+    import unittest.mock as mock
+except ImportError:
+    try:
+        import mock
+    except ImportError as err:
+        raise err("module 'mock' is required to run these tests")
+
+
+# Minimal stand-in for the zfs utility: keeps the set of existing datasets
+# in a JSON file and logs every invocation
+FAKE_ZFS = """#!%(python)s
+import json, os, sys
+base = os.path.dirname(os.path.abspath(__file__))
+state_path = os.path.join(base, "datasets.json")
+datasets = set(json.load(open(state_path)))
+args = sys.argv[1:]
+with open(os.path.join(base, "calls.log"), "a") as log:
+    log.write(" ".join(args) + "\\n")
+rc = 0
+cmd, params = args[0], [arg for arg in args[1:] if not arg.startswith("-")]
+if cmd == "list":
+    rc = 0 if params[-1] in datasets else 1
+elif cmd == "snapshot":
+    if [name for name in params if name in datasets]:
+        rc = 1
+    else:
+        datasets.update(params)
+elif cmd == "clone":
+    datasets.add(params[1])
+elif cmd == "destroy":
+    target = params[-1]
+    if "@" in target:
+        dataset, snaps = target.split("@", 1)
+        names = [dataset + "@" + snap for snap in snaps.split(",")]
+    else:
+        names = [target]
+    if [name for name in names if name not in datasets]:
+        rc = 1
+    else:
+        datasets.difference_update(names)
+json.dump(sorted(datasets), open(state_path, "w"))
+sys.exit(rc)
+"""
+
+
+class FakeZfsSetup(object):
+
+    PLUGIN = None
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        zfs_path = os.path.join(self.tmpdir, "zfs")
+        with open(zfs_path, "w") as zfs_file:
+            zfs_file.write(FAKE_ZFS % {"python": sys.executable})
+        os.chmod(zfs_path, stat.S_IRWXU)
+        self.set_datasets(["tank/res_00", "tank/res_01", "tank/res_02"])
+
+        patcher = mock.patch.object(
+            self.PLUGIN, "STATEFILE", os.path.join(self.tmpdir, "state.json")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.plugin = self.PLUGIN(None)
+        conf = self.plugin.get_default_config()
+        conf[self.PLUGIN.KEY_ZVOL_PATH] = self.tmpdir
+        conf[self.PLUGIN.KEY_DEV_PATH] = self.tmpdir
+        conf[consts.KEY_VG_NAME] = "tank"
+        self.plugin.reconfigure(conf)
+        self.plugin.RETRY_DELAY = 0
+
+        self.sources = [
+            (vol_id, storcore.BlockDevice(
+                "res_%.2d" % (vol_id), 1024, "/dev/zvol/tank/res_%.2d" % (vol_id)
+            ))
+            for vol_id in range(3)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def set_datasets(self, datasets):
+        with open(os.path.join(self.tmpdir, "datasets.json"), "w") as state_file:
+            json.dump(datasets, state_file)
+        open(os.path.join(self.tmpdir, "calls.log"), "w").close()
+
+    def get_datasets(self):
+        with open(os.path.join(self.tmpdir, "datasets.json")) as state_file:
+            return set(json.load(state_file))
+
+    def get_calls(self, cmd):
+        with open(os.path.join(self.tmpdir, "calls.log")) as log:
+            return [line.split() for line in log if line.startswith(cmd + " ")]
+
+
+class Zvol2BatchTests(FakeZfsSetup, unittest.TestCase):
+
+    PLUGIN = Zvol2
+
+    def test_create_snapshots_single_command(self):
+        """snapshots all volumes with one atomic zfs snapshot call"""
+        blockdevs = self.plugin.create_snapshots("snap", self.sources)
+
+        self.assertEqual(
+            [["snapshot", "tank/res_00@res.snap_00",
+              "tank/res_01@res.snap_01", "tank/res_02@res.snap_02"]],
+            self.get_calls("snapshot")
+        )
+        self.assertEqual(
+            ["res.snap_00", "res.snap_01", "res.snap_02"],
+            [blockdevs[vol_id].get_name() for vol_id in range(3)]
+        )
+
+    def test_create_snapshots_fallback(self):
+        """falls back to single snapshots if one snapshot exists already"""
+        self.set_datasets([
+            "tank/res_00", "tank/res_01", "tank/res_02",
+            "tank/res_01@res.snap_01"
+        ])
+        blockdevs = self.plugin.create_snapshots("snap", self.sources)
+
+        self.assertEqual(4, len(self.get_calls("snapshot")))
+        self.assertTrue(
+            "tank/res_02@res.snap_02" in self.get_datasets()
+        )
+        self.assertTrue(blockdevs[2] is not None)
+
+    def test_remove_snapshots_bulk_destroy(self):
+        """destroys all snapshots of a zvol with one zfs destroy call"""
+        blockdevs = []
+        for snaps_name in ["snap1", "snap2"]:
+            blockdevs.extend(
+                self.plugin.create_snapshots(snaps_name, self.sources[:1]).values()
+            )
+        open(os.path.join(self.tmpdir, "calls.log"), "w").close()
+
+        fn_rcs = self.plugin.remove_snapshots(blockdevs)
+
+        self.assertEqual(
+            [["destroy", "tank/res_00@res.snap1_00,res.snap2_00"]],
+            self.get_calls("destroy")
+        )
+        self.assertEqual(
+            {"res.snap1_00": DME.DM_SUCCESS, "res.snap2_00": DME.DM_SUCCESS},
+            fn_rcs
+        )
+        self.assertEqual(
+            set(["tank/res_00", "tank/res_01", "tank/res_02"]),
+            self.get_datasets()
+        )
+
+
+class ZvolBatchTests(FakeZfsSetup, unittest.TestCase):
+
+    PLUGIN = Zvol
+
+    def test_create_snapshots_single_command(self):
+        """snapshots all volumes at once and waits for all clones together"""
+        with mock.patch.object(
+            Zvol, "_wait_devs_to_settle", return_value=True
+        ) as mock_wait:
+            blockdevs = self.plugin.create_snapshots("snap", self.sources)
+
+        self.assertEqual(1, len(self.get_calls("snapshot")))
+        self.assertEqual(3, len(self.get_calls("clone")))
+        self.assertEqual(1, mock_wait.call_count)
+        self.assertEqual(3, len(mock_wait.call_args[0][0]))
+        self.assertTrue(blockdevs[1] is not None)
+
+
+if __name__ == "__main__":
+    unittest.main()